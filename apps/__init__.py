@@ -1,16 +1,25 @@
 import os
 
-import motor.motor_asyncio
-from beanie import init_beanie
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
 
-from apps.connections import redis_cache
-from apps.game.documents import Game, GamePlayer, GameRound, Merchant, Tip
-from apps.config import settings
+def create_app():
+    """The web application. Its imports are kept here, ``apps`` is imported by the celery
+    worker too, see ``apps.worker``."""
+    import motor.motor_asyncio
+    import redis
+    from beanie import init_beanie
+    from fastapi import FastAPI
+    from fastapi.middleware.cors import CORSMiddleware
 
+    from apps.connections import redis_cache
+    from apps.config import settings
+    from apps.game.documents import Game, GamePlayer, GameRound, Merchant, Tip
+    from apps.game.services.timer_wheel import timer_wheel
+    from apps.instrumentation import command_monitor, instrument_motor
+    from apps.logging import configure_logging, stop_logging
+    from apps.metrics import MongoSpanListener
+    from apps.profiler import listen as listen_to_profiler
+    from apps.tracing import exporter
 
-def create_app() -> FastAPI:
     app = FastAPI(
         root_path="/blackjack/api/v1"
         if os.environ.get("ENVIRONMENT") == "production"
@@ -39,18 +48,26 @@ def create_app() -> FastAPI:
 
     @app.on_event("startup")
     async def startup_event():
+        configure_logging()
         client = motor.motor_asyncio.AsyncIOMotorClient(
-            os.environ.get("BLACKJACK_MONGODB_URL")
+            os.environ.get("BLACKJACK_MONGODB_URL"),
+            event_listeners=[MongoSpanListener(), command_monitor],
         )
+        instrument_motor()
         await init_beanie(
             database=client[os.environ.get("DATABASE_NAME")],
             document_models=[Game, GameRound, GamePlayer, Merchant, Tip],
         )
         await redis_cache.init_cache()
+        await timer_wheel.start(redis_cache.redis_cache)
+        listen_to_profiler(redis.Redis.from_url(settings.REDIS_CACHE_URL))
 
     @app.on_event("shutdown")
     async def shutdown_event():
+        await timer_wheel.stop()
         await redis_cache.close()
+        exporter.flush()
+        stop_logging()
 
     @app.get("/health")
     async def root():
@@ -1,6 +1,27 @@
+from typing import Dict
+
 from celery import current_app as current_celery_app
+from celery.signals import (
+    before_task_publish,
+    setup_logging,
+    task_postrun,
+    task_prerun,
+    worker_process_init,
+    worker_process_shutdown,
+)
 
 from apps.config import settings
+from apps.logging import (
+    bind_log_context,
+    configure_logging,
+    get_log_context,
+    log_context,
+    stop_logging,
+)
+from apps.tracing import Span, exporter, get_trace_context, start_span
+
+# task id -> span of the running task
+task_spans: Dict[str, Span] = {}
 
 
 def create_celery():
@@ -8,3 +29,64 @@ def create_celery():
     current_celery_app.config_from_object(settings, namespace="CELERY")
 
     return celery_app
+
+
+@setup_logging.connect
+def setup_celery_logging(**kwargs):
+    """Replaces the logging setup of celery with the queue of ``apps.logging``."""
+    configure_logging()
+
+
+@worker_process_init.connect
+def setup_worker_process_logging(**kwargs):
+    configure_logging()
+
+
+@worker_process_shutdown.connect
+def stop_worker_process_logging(**kwargs):
+    exporter.flush()
+    stop_logging()
+
+
+@before_task_publish.connect
+def send_log_context(headers=None, **kwargs):
+    """The log context of the socket event or task which publishes the task goes with it."""
+    if headers is not None and (context := get_log_context()):
+        headers["log_context"] = context
+
+
+@before_task_publish.connect
+def send_trace_context(headers=None, **kwargs):
+    """The task is traced as a child of the span which publishes it."""
+    if headers is not None and (context := get_trace_context()):
+        headers["trace_context"] = context
+
+
+@task_prerun.connect
+def bind_task_log_context(task=None, **kwargs):
+    log_context.set(getattr(task.request, "log_context", None) or {})
+    bind_log_context(event=task.name.rsplit(".", 1)[-1])
+
+
+@task_postrun.connect
+def reset_task_log_context(**kwargs):
+    log_context.set(None)
+
+
+@task_prerun.connect
+def start_task_span(task_id=None, task=None, **kwargs):
+    span = start_span(
+        f"task:{task.name.rsplit('.', 1)[-1]}",
+        "task",
+        parent=getattr(task.request, "trace_context", None),
+        eta=task.request.eta,
+    )
+    if isinstance(span, Span):
+        task_spans[task_id] = span.__enter__()
+
+
+@task_postrun.connect
+def finish_task_span(task_id=None, state=None, **kwargs):
+    if (span := task_spans.pop(task_id, None)) is not None:
+        span.attributes["state"] = state
+        span.__exit__(None, None, None)
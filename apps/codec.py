@@ -0,0 +1,42 @@
+""" JSON codec of redis cache values, socket.io packets and merchant requests.
+Uses orjson when it is installed and falls back to the standard library ``json``.
+Both produce compact JSON, so values written by one are read by the other.
+The module doubles as the ``json`` module of socket.io (``dumps``/``loads``). """
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+CONTENT_TYPE_HEADERS = {"Content-Type": "application/json"}
+
+if orjson is not None:
+    NAME = "orjson"
+    # seat numbers are int keys of cached dicts
+    _OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps_bytes(obj) -> bytes:
+        return orjson.dumps(obj, option=_OPTIONS)
+
+    def dumps(obj, **kwargs) -> str:
+        """``kwargs`` (socket.io passes ``separators``) are ignored, output is compact."""
+        return orjson.dumps(obj, option=_OPTIONS).decode()
+
+    loads = orjson.loads
+
+else:  # pragma: no cover
+    NAME = "json"
+
+    def dumps(obj, **kwargs) -> str:
+        return json.dumps(obj, separators=(",", ":"))
+
+    def dumps_bytes(obj) -> bytes:
+        return dumps(obj).encode()
+
+    loads = json.loads
+
+
+def load_response(response) -> dict:
+    """Body of a ``requests`` or ``httpx`` response."""
+    return loads(response.content)
@@ -38,6 +38,80 @@ class BaseConfig:
 
     MIN_SIDE_BET = 1
     MAX_SIDE_BET = 25
+    BET_UPDATE_ATTEMPTS = 3
+
+    TIMER_WHEEL_TICK_SECONDS: float = 0.05
+    TIMER_WHEEL_SLOTS: int = 64
+    TIMER_WHEEL_LEVELS: int = 4
+    TIMER_STORE_POLL_SECONDS: float = 0.25
+
+    MERCHANT_TIMEOUT: float = 5
+    MERCHANT_LATENCY_TARGET: float = 1
+    # per process limits of a merchant host, see apps.game.services.merchant_guard: the 4
+    # gunicorn workers send up to 200 requests at once, a dispatcher starts at its concurrency
+    MERCHANT_CONCURRENCY_INITIAL: int = 20
+    MERCHANT_CONCURRENCY_MIN: int = 2
+    MERCHANT_CONCURRENCY_MAX: int = 50
+    MERCHANT_BREAKER_FAILURES: int = 5
+    MERCHANT_BREAKER_COOLDOWN: float = 10
+    MERCHANT_QUEUE_TIMEOUT: float = 5
+
+    # merchant transactions outbox, see apps.game.services.outbox
+    OUTBOX_PARTITIONS: int = 16
+    OUTBOX_BATCH_SIZE: int = 50
+    OUTBOX_CONCURRENCY: int = 20
+    OUTBOX_LEASE_SECONDS: float = 30
+    OUTBOX_BACKOFF_BASE: float = 1
+    OUTBOX_BACKOFF_MAX: float = 300
+    OUTBOX_MAX_ATTEMPTS: int = 10
+    # a transaction whose dependency is still pending is checked again after this delay,
+    # the wait does not count as an attempt
+    OUTBOX_DEPENDENCY_WAIT_SECONDS: float = 1
+    OUTBOX_POLL_SECONDS: float = 0.5
+
+    # JSON logging through a queue, see apps.logging
+    LOG_LEVEL: str = os.environ.get("LOG_LEVEL", "INFO")
+    LOG_FILE: str = os.environ.get("LOG_FILE", "")
+    # records logged while the queue is full are dropped
+    LOG_QUEUE_SIZE: int = 10000
+    # share of the records below warning kept per socket event, celery task or logger
+    LOG_SAMPLE_RATES = {
+        "place_bet": 0.1,
+        "send_chat_message": 0.1,
+        "socketio.server": 0.01,
+        "engineio.server": 0.01,
+    }
+
+    # spans of the rounds, see apps.tracing: "" (off), "file" or "otlp"
+    TRACE_EXPORTER: str = os.environ.get("TRACE_EXPORTER", "")
+    TRACE_FILE: str = os.environ.get("TRACE_FILE", "traces.jsonl")
+    TRACE_OTLP_ENDPOINT: str = os.environ.get(
+        "TRACE_OTLP_ENDPOINT", "http://127.0.0.1:4318/v1/traces"
+    )
+    TRACE_SERVICE_NAME: str = "blackjack"
+    # spans finished while the queue is full are dropped
+    TRACE_QUEUE_SIZE: int = 10000
+    TRACE_BATCH_SIZE: int = 512
+    TRACE_FLUSH_SECONDS: float = 1
+
+    # sampling profiler started by POST /profiler/start, see apps.profiler
+    PROFILER_DIR: str = os.environ.get("PROFILER_DIR", "profiles")
+    PROFILER_MAX_SECONDS: float = 300
+    PROFILER_MIN_INTERVAL: float = 0.001
+    # admin-key header of the admin routes, they are closed while it is empty
+    ADMIN_API_KEY: str = os.environ.get("ADMIN_API_KEY", "")
+
+    # mongo and redis commands which take longer are logged, see apps.instrumentation
+    SLOW_COMMAND_SECONDS: float = float(os.environ.get("SLOW_COMMAND_SECONDS", 0.05))
+
+    # trusted reads of the live state are validated and the differences are logged,
+    # see apps.game.state
+    VALIDATE_TRUSTED_READS: bool = os.environ.get("VALIDATE_TRUSTED_READS") == "1"
+
+    # 0 places every chip on its own
+    CHIP_BATCH_WINDOW_SECONDS: float = float(
+        os.environ.get("CHIP_BATCH_WINDOW_SECONDS", 0)
+    )
 
 
 class DevelopmentConfig(BaseConfig):
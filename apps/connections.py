@@ -1,13 +1,85 @@
-import json
 from typing import Optional
 
-from aioredis import Redis, from_url
+from aioredis import Redis
+from aioredis.client import Pipeline
 from bson import ObjectId
 
 from apps.game.documents import GamePlayer, GameRound, Merchant, Game
 from apps.game.services.custom_exception import ValidationError
 
+from . import codec
 from .config import settings
+from .instrumentation import get_call_site, record_redis_command
+from .metrics import span
+
+INCREMENT_TOTAL_BET_SCRIPT = """
+if redis.call('hexists', KEYS[1], ARGV[1]) == 1 then
+    local total = redis.call('hincrbyfloat', KEYS[1], ARGV[1], ARGV[2])
+    redis.call('expire', KEYS[1], ARGV[3])
+    return total
+end
+return false
+"""
+
+# a concurrent bet may have seeded the total first, its aggregate already counts this bet
+SEED_TOTAL_BET_SCRIPT = """
+if redis.call('hsetnx', KEYS[1], ARGV[1], ARGV[2]) == 1 then
+    redis.call('expire', KEYS[1], ARGV[3])
+    return ARGV[2]
+end
+return redis.call('hget', KEYS[1], ARGV[1])
+"""
+
+# KEYS - seats of the round followed by the same seats of the previous round
+TAKE_SEATS_SCRIPT = """
+local count = #KEYS / 2
+for index = 1, count do
+    local seat = redis.call('get', KEYS[index])
+    local previous_round_seat = redis.call('get', KEYS[index + count])
+    if seat ~= ARGV[1] then
+        if previous_round_seat and previous_round_seat ~= ARGV[1] then
+            return 'Seat is locked for the previous player.'
+        end
+        if seat then
+            return 'Seat is already taken.'
+        end
+    end
+end
+for index = 1, count do
+    redis.call('set', KEYS[index], ARGV[1])
+end
+return false
+"""
+
+
+class MonitoredPipeline(Pipeline):
+    async def execute(self, raise_on_error: bool = True):
+        call_site = get_call_site()
+        with span("redis") as redis_span:
+            try:
+                return await super().execute(raise_on_error)
+            finally:
+                record_redis_command(
+                    ("pipeline",), call_site, redis_span.get_duration()
+                )
+
+
+class MonitoredRedis(Redis):
+    """aioredis client which adds the time of its commands to the running socket event and
+    counts them by call-site, see ``apps.instrumentation``."""
+
+    async def execute_command(self, *args, **options):
+        call_site = get_call_site()
+        with span("redis") as redis_span:
+            try:
+                return await super().execute_command(*args, **options)
+            finally:
+                record_redis_command(args, call_site, redis_span.get_duration())
+
+    def pipeline(self, transaction: bool = True, shard_hint: str = None) -> Pipeline:
+        return MonitoredPipeline(
+            self.connection_pool, self.response_callbacks, transaction, shard_hint
+        )
 
 
 class RedisCache:
@@ -15,7 +87,7 @@ class RedisCache:
         self.redis_cache: Optional[Redis] = None
 
     async def init_cache(self):
-        self.redis_cache = await from_url(
+        self.redis_cache = await MonitoredRedis.from_url(
             settings.REDIS_CACHE_URL, encoding="utf-8", decode_responses=True
         )
 
@@ -33,12 +105,12 @@ class RedisCache:
     async def get_repeat_data(self, key) -> dict:
         repeat_data = await self.redis_cache.get(key)
         if repeat_data:
-            return json.loads(repeat_data)
+            return codec.loads(repeat_data)
         raise ValidationError("can't make repeat")
 
     async def get_or_cache_game_player_seats(self, game_round_id: str) -> list:
         if players_seat_numbers := await self.redis_cache.get(f"{game_round_id}:seats"):
-            return json.loads(players_seat_numbers)
+            return codec.loads(players_seat_numbers)
         game_players = (
             GamePlayer.get_motor_collection()
             .find({"game_round": game_round_id})
@@ -48,37 +120,37 @@ class RedisCache:
         for player in await game_players.to_list(14):
             if player["bet"] > 0:
                 seats.append(player["seat_number"])
-        await self.redis_cache.set(f"{game_round_id}:seats", json.dumps(seats))
+        await self.redis_cache.set(f"{game_round_id}:seats", codec.dumps(seats))
         return seats
 
     async def get_or_cache_game_type(self, game_id: str) -> str:
         if game_type := await self.redis_cache.get(f"{game_id}:type"):
-            return json.loads(game_type)
+            return codec.loads(game_type)
         game = (
             await Game.get_motor_collection()
             .find({"_id": ObjectId(game_id)})
             .to_list(1)
         )
         game_type = game[0]["type"]
-        await self.redis_cache.set(f"{game_id}:type", json.dumps(game_type))
+        await self.redis_cache.set(f"{game_id}:type", codec.dumps(game_type))
         return game_type
 
     async def update_cached_seats(self, game_round_id: str, seat_number: int):
         seats = await self.get_or_cache_game_player_seats(game_round_id=game_round_id)
         index = seats.index(seat_number)
         seats.insert(index + 1, seat_number + 1)
-        await self.redis_cache.set(f"{game_round_id}:seats", json.dumps(seats))
+        await self.redis_cache.set(f"{game_round_id}:seats", codec.dumps(seats))
 
     async def get_taken_seats(self, game_id: str) -> dict or None:
         if taken_seats := await self.redis_cache.get(f"{game_id}:taken_seats"):
-            return json.loads(taken_seats)
+            return codec.loads(taken_seats)
         return {}
 
     async def get_or_cache_round_start_timestamp(self, game_round_id: str):
         if start_timestamp := await self.redis_cache.get(
             f"{game_round_id}:start_timestamp"
         ):
-            return json.loads(start_timestamp)
+            return codec.loads(start_timestamp)
         start_timestamp = await GameRound.get_motor_collection().find_one(
             {"_id": ObjectId(game_round_id)}, {"_id": 0, "start_timestamp": 1}
         )
@@ -90,7 +162,7 @@ class RedisCache:
 
     async def get_or_cache_merchant(self, merchant_id: str, game_id: str):
         if merchant_data := await self.redis_cache.get(f"{merchant_id}:{game_id}"):
-            return json.loads(merchant_data)
+            return codec.loads(merchant_data)
         merchant = await Merchant.get_motor_collection().find_one(
             {"_id": ObjectId(merchant_id), "games.game_id": game_id},
             {
@@ -117,19 +189,19 @@ class RedisCache:
             ]
             merchant_data_for_cache["schema_type"] = merchant["schema_type"]
             await self.redis_cache.set(
-                f"{merchant_id}:{game_id}", json.dumps(merchant_data_for_cache)
+                f"{merchant_id}:{game_id}", codec.dumps(merchant_data_for_cache)
             )
             return merchant_data_for_cache
         raise ValidationError(f"Can not find game with id '{game_id}'")
 
     async def get_or_cache_game(self, game_id: str):
         if game_data := await self.redis_cache.get(game_id):
-            return json.loads(game_data)
+            return codec.loads(game_data)
         game = await Game.get_motor_collection().find_one(
             {"_id": ObjectId(game_id)},
             {"_id": 0, "table_stream_key_1": 1, "table_stream_key_2": 1, "name": 1},
         )
-        await self.redis_cache.set(game_id, json.dumps(game))
+        await self.redis_cache.set(game_id, codec.dumps(game))
         return dict(game)
 
     async def set_user_balance_in_cache(self, user_id: str, merchant_id, balance):
@@ -163,10 +235,64 @@ class RedisCache:
             else:
                 raise ValidationError("Seat is already taken.")
 
+    async def take_seats(
+        self,
+        round_id: str,
+        seat_numbers: list,
+        merchant_id: str,
+        user_id: str,
+        previous_round_id: str,
+    ):
+        """Takes all seats at once or none of them, see ``take_seat``."""
+        if error := await self.redis_cache.eval(
+            TAKE_SEATS_SCRIPT,
+            len(seat_numbers) * 2,
+            *[f"{round_id}:{seat_number}" for seat_number in seat_numbers],
+            *[f"{previous_round_id}:{seat_number}" for seat_number in seat_numbers],
+            f"{user_id}:{merchant_id}",
+        ):
+            raise ValidationError(error)
+
     async def clean_no_bet_seat_after_rollback(self, total_bet, round_id, seat_number):
         if total_bet == 0:
             await self.redis_cache.delete(f"{round_id}:{seat_number}")
 
+    @staticmethod
+    def get_total_bets_key(round_id: str) -> str:
+        return f"{round_id}:total_bets"
+
+    async def increment_user_total_bet(
+        self, round_id: str, player_id: str, amount: float
+    ) -> Optional[float]:
+        """Returns None when the running total of the player is not cached."""
+        total = await self.redis_cache.eval(
+            INCREMENT_TOTAL_BET_SCRIPT,
+            1,
+            self.get_total_bets_key(round_id),
+            player_id,
+            amount,
+            settings.REDIS_CACHE_EXPIRATION_TIME,
+        )
+        return float(total) if total is not None else None
+
+    async def seed_user_total_bet(
+        self, round_id: str, player_id: str, total: float
+    ) -> float:
+        """Caches ``total`` unless the total is already cached, returns the cached total."""
+        return float(
+            await self.redis_cache.eval(
+                SEED_TOTAL_BET_SCRIPT,
+                1,
+                self.get_total_bets_key(round_id),
+                player_id,
+                total,
+                settings.REDIS_CACHE_EXPIRATION_TIME,
+            )
+        )
+
+    async def delete_total_bets(self, round_id: str):
+        await self.redis_cache.delete(self.get_total_bets_key(round_id))
+
     async def flush_db(self):
         await self.redis_cache.flushdb()
 
@@ -1,8 +1,9 @@
-import json
 import socketio
 
 from uuid import uuid4
-from typing import Optional, Dict, Any
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from typing import Optional, Dict, Any, List, Union
 
 from apps.config import settings
 from apps.connections import redis_cache
@@ -15,8 +16,11 @@ from apps.game.services.schema_generator import (
 )
 from apps.game.services.core_bridge import send_data_to_merchant
 from apps.game.services.utils import get_timestamp
-from apps.game.tasks import send_bets_to_merchant, clean_all_seats_if_no_bets_are_placed
+from apps.game.tasks import send_bets_to_merchant
+from apps.game.services.timer_wheel import timer_wheel
+from apps.game.services.wallet_ledger import wallet_ledger
 from apps.game.managers.base_game_manager import BaseGameManager
+from apps.game.state import RoundState, SeatState
 
 external_sio = socketio.AsyncRedisManager(settings.WS_MESSAGE_QUEUE, write_only=True)
 
@@ -61,7 +65,7 @@ class BettingManager(BaseGameManager):
         return await self.update_game_player()
 
     @staticmethod
-    async def make_double(user_session_data: dict, game_player: GamePlayer):
+    async def make_double(user_session_data: dict, game_player: SeatState):
         double_external_id = str(uuid4())
         merchant = await redis_cache.get_or_cache_merchant(
             game_player.merchant, game_player.game_id
@@ -70,7 +74,7 @@ class BettingManager(BaseGameManager):
         send_data = generate_bet_request_data(
             merchant["schema_type"],
             amount,
-            json.loads(game_player.json()),
+            game_player.to_document(),
             double_external_id,
         )
         status_code, data = await send_data_to_merchant(merchant["bet_url"], send_data)
@@ -101,30 +105,13 @@ class BettingManager(BaseGameManager):
                 )
             )
 
-            await redis_cache.set_user_balance_in_cache(
+            await wallet_ledger.reconcile(
                 user_session_data["user_id"],
                 user_session_data["merchant_id"],
-                float(updated_game_player["deposit"]),
+                float(data["total_balance"]),
             )
-            user_total_bet = (
-                await GamePlayer.get_motor_collection()
-                .aggregate(
-                    [
-                        {
-                            "$match": {
-                                "player_id": updated_game_player["player_id"],
-                                "game_round": updated_game_player["game_round"],
-                            }
-                        },
-                        {
-                            "$group": {
-                                "_id": "$player_id",
-                                "user_total_bet": {"$sum": "$total_bet"},
-                            }
-                        },
-                    ]
-                )
-                .to_list(length=1)
+            user_total_bet = await BettingManager.increment_user_total_bet(
+                updated_game_player, amount
             )
             update_game_player_data = {
                 "seat_number": updated_game_player["seat_number"],
@@ -132,14 +119,14 @@ class BettingManager(BaseGameManager):
                 "bet": updated_game_player["bet"],
                 "total_bet": sum(updated_game_player["bet_list"]),
                 "user_deposit": updated_game_player["deposit"],
-                "user_total_bet": list(user_total_bet)[0].get("user_total_bet"),
+                "user_total_bet": user_total_bet,
                 "action": "double",
             }
             return update_game_player_data
 
     @staticmethod
     async def make_insurance(
-        user_session_data: dict, game_player: GamePlayer, game_round: GameRound
+        user_session_data: dict, game_player: SeatState, game_round: RoundState
     ):
         insurance_external_id = str(uuid4())
         merchant = await redis_cache.get_or_cache_merchant(
@@ -149,7 +136,7 @@ class BettingManager(BaseGameManager):
         send_data = generate_bet_request_data(
             merchant["schema_type"],
             amount,
-            json.loads(game_player.json()),
+            game_player.to_document(),
             insurance_external_id,
         )
         status_code, data = await send_data_to_merchant(merchant["bet_url"], send_data)
@@ -179,30 +166,13 @@ class BettingManager(BaseGameManager):
                     return_document=True,
                 )
             )
-            await redis_cache.set_user_balance_in_cache(
+            await wallet_ledger.reconcile(
                 user_session_data["user_id"],
                 user_session_data["merchant_id"],
-                float(updated_game_player["deposit"]),
+                float(data["total_balance"]),
             )
-            user_total_bet = (
-                await GamePlayer.get_motor_collection()
-                .aggregate(
-                    [
-                        {
-                            "$match": {
-                                "player_id": updated_game_player["player_id"],
-                                "game_round": updated_game_player["game_round"],
-                            }
-                        },
-                        {
-                            "$group": {
-                                "_id": "$player_id",
-                                "user_total_bet": {"$sum": "$total_bet"},
-                            }
-                        },
-                    ]
-                )
-                .to_list(length=1)
+            user_total_bet = await BettingManager.increment_user_total_bet(
+                updated_game_player, amount
             )
             update_game_player_data = {
                 "seat_number": updated_game_player["seat_number"],
@@ -210,7 +180,7 @@ class BettingManager(BaseGameManager):
                 "bet": updated_game_player["bet"],
                 "total_bet": sum(updated_game_player["bet_list"]),
                 "user_deposit": updated_game_player["deposit"],
-                "user_total_bet": list(user_total_bet)[0].get("user_total_bet"),
+                "user_total_bet": user_total_bet,
                 "action": "insurance",
             }
             return update_game_player_data
@@ -227,13 +197,13 @@ class BettingManager(BaseGameManager):
                 },
                 room=game_player["sid"],
             )
-            await redis_cache.set_user_balance_in_cache(
+            await wallet_ledger.reconcile(
                 user_session_data["user_id"],
                 user_session_data["merchant_id"],
-                float(game_player["deposit"]),
+                float(data["total_balance"]),
             )
 
-    async def make_split(self, game_player: GamePlayer):
+    async def make_split(self, game_player: SeatState):
         split_external_id = str(uuid4())
         merchant = await redis_cache.get_or_cache_merchant(
             game_player.merchant, game_player.game_id
@@ -242,7 +212,7 @@ class BettingManager(BaseGameManager):
         send_data = generate_bet_request_data(
             merchant["schema_type"],
             amount,
-            json.loads(game_player.json()),
+            game_player.to_document(),
             split_external_id,
         )
         status_code, data = await send_data_to_merchant(merchant["bet_url"], send_data)
@@ -273,30 +243,13 @@ class BettingManager(BaseGameManager):
                 game_round_id=game_player.game_round,
                 seat_number=game_player.seat_number,
             )
-            await redis_cache.set_user_balance_in_cache(
+            await wallet_ledger.reconcile(
                 splitted_game_player["user_id"],
                 splitted_game_player["merchant"],
-                float(splitted_game_player["deposit"]),
+                float(data["total_balance"]),
             )
-            user_total_bet = (
-                await GamePlayer.get_motor_collection()
-                .aggregate(
-                    [
-                        {
-                            "$match": {
-                                "player_id": splitted_game_player["player_id"],
-                                "game_round": splitted_game_player["game_round"],
-                            }
-                        },
-                        {
-                            "$group": {
-                                "_id": "$player_id",
-                                "user_total_bet": {"$sum": "$total_bet"},
-                            }
-                        },
-                    ]
-                )
-                .to_list(length=1)
+            user_total_bet = await self.increment_user_total_bet(
+                splitted_game_player, amount
             )
 
             split_data = {
@@ -322,7 +275,7 @@ class BettingManager(BaseGameManager):
                 "total_bet": sum(game_player.bet_list)
                 + splitted_game_player["total_bet"],
                 "user_deposit": splitted_game_player["deposit"],
-                "user_total_bet": list(user_total_bet)[0].get("user_total_bet"),
+                "user_total_bet": user_total_bet,
                 "action": "split",
             }
             await external_sio.emit(
@@ -331,54 +284,78 @@ class BettingManager(BaseGameManager):
             return split_data
 
     async def make_repeat(self, session_data: dict):
+        """Repeats the previous round's bets on all seats at once, the cost in round-trips
+        does not depend on the number of seats."""
         self.game_round = await super().get_game_round()
         repeat_data = await redis_cache.get_repeat_data(
             f"{session_data['user_id']}:"
             f"{session_data['merchant_id']}:"
             f"{self.game_round['prev_round_id']}"
         )
-        return_data = {}
-        for seat in repeat_data:
-            self.game_round = await super().get_game_round()
-            self.user_balance = await redis_cache.get(
-                f"{self.user_id}:{self.merchant_id}"
+        self.user_balance = await redis_cache.get(f"{self.user_id}:{self.merchant_id}")
+        game_players = {
+            game_player["seat_number"]: game_player
+            for game_player in await GamePlayer.get_motor_collection()
+            .find(
+                {
+                    **self.get_game_player_filter(0),
+                    "seat_number": {"$in": [int(seat) for seat in repeat_data]},
+                }
             )
+            .to_list(length=None)
+        }
+        repeat_amount = 0
+        for seat in repeat_data:
             self.seat_number = int(seat)
-            await redis_cache.take_seat(
+            self.check_bet_placement()
+            self.game_player = game_players.get(
+                self.seat_number, {"bet": 0, "total_bet": 0}
+            )
+            repeat_amount += self.get_repeat_amount(repeat_data[seat])
+            self.check_if_can_make_repeat(repeat_data[seat]["bet"], repeat_amount)
+
+        # the funds are reserved before the seats are locked, a failed reservation leaves
+        # no seat locked without a bet
+        balance = await wallet_ledger.reserve(
+            self.user_id, self.merchant_id, repeat_amount
+        )
+        try:
+            await redis_cache.take_seats(
                 str(self.game_round["_id"]),
-                self.seat_number,
+                [int(seat) for seat in repeat_data],
                 self.merchant_id,
                 self.user_id,
                 self.game_round["prev_round_id"],
             )
-            self.check_bet_placement()
-            self.game_player = await super()._get_or_create_game_player(
-                game_round_id=str(self.game_round["_id"]),
-                seat_number=int(seat),
-                sid=self.sid,
-                balance=self.user_balance,
-            )
-            self.check_if_can_make_repeat(repeat_data[seat]["bet"])
-            return_data[seat] = await self.update_game_player_for_repeat(
-                repeat_data[seat]
-            )
-            await external_sio.emit(
-                "new_bet",
-                {
-                    "bet_type": "repeat",
-                    "seat_number": seat,
-                    "total_bet": return_data[seat]["total_bet"],
-                    "bet": return_data[seat]["bet"],
-                    "bet_list": return_data[seat]["bet_list"],
-                    "bet_21_3": repeat_data[seat]["bet_21_3"],
-                    "bet_21_3_list": repeat_data[seat]["bet_21_3_list"],
-                    "bet_perfect_pair": repeat_data[seat]["bet_perfect_pair"],
-                    "bet_perfect_pair_list": repeat_data[seat]["bet_perfect_pair_list"],
-                    "user_name": self.user_session_data["user_name"],
+        except Exception:
+            await wallet_ledger.release(self.user_id, self.merchant_id, repeat_amount)
+            raise
+        return_data = await self.update_game_players_for_repeat(
+            repeat_data, game_players, balance
+        )
+        await external_sio.emit(
+            "new_bets",
+            {
+                "bet_type": "repeat",
+                "user_name": self.user_session_data["user_name"],
+                "seats": {
+                    seat: {
+                        "total_bet": return_data[seat]["total_bet"],
+                        "bet": return_data[seat]["bet"],
+                        "bet_list": return_data[seat]["bet_list"],
+                        "bet_21_3": repeat_data[seat]["bet_21_3"],
+                        "bet_21_3_list": repeat_data[seat]["bet_21_3_list"],
+                        "bet_perfect_pair": repeat_data[seat]["bet_perfect_pair"],
+                        "bet_perfect_pair_list": repeat_data[seat][
+                            "bet_perfect_pair_list"
+                        ],
+                    }
+                    for seat in return_data
                 },
-                room=self.user_session_data["game_id"],
-                skip_sid=self.sid,
-            )
+            },
+            room=self.user_session_data["game_id"],
+            skip_sid=self.sid,
+        )
         return return_data
 
     async def tip_dealer(self, amount: float, session_data: dict):
@@ -408,7 +385,7 @@ class BettingManager(BaseGameManager):
                 external_id=external_id,
             ).create()
 
-            await redis_cache.set_user_balance_in_cache(
+            await wallet_ledger.reconcile(
                 session_data["user_id"],
                 session_data["merchant_id"],
                 float(data["total_balance"]),
@@ -435,72 +412,48 @@ class BettingManager(BaseGameManager):
         return self.merchant_data["transaction_url"]
 
     async def update_game_player(self) -> Dict[str, Any]:
-        self.game_player[f"{self.bet_type}_list"].append(self.amount)
-        updated_game_player = (
-            await GamePlayer.get_motor_collection().find_one_and_update(
-                {"_id": self.game_player["_id"]},
-                {
-                    "$set": {
-                        "total_bet": self.game_player["total_bet"] + self.amount,
-                        "deposit": float(self.user_balance) - self.amount,
-                        f"{self.bet_type}": self.game_player[f"{self.bet_type}"]
-                        + self.amount,
-                        f"{self.bet_type}_list": self.game_player[
-                            f"{self.bet_type}_list"
-                        ],
-                        "action_list": self.game_player["action_list"]
-                        + [
-                            {
-                                f"{self.bet_type}": self.game_player[
-                                    f"{self.bet_type}_list"
-                                ][-1],
-                                "decision_time": self.game_round["start_timestamp"],
-                                "action_time": get_timestamp(),
-                            }
-                        ],
-                    }
-                },
-                return_document=True,
-            )
-        )
-        await redis_cache.set_user_balance_in_cache(
-            self.user_id,
-            self.merchant_id,
-            float(self.user_balance) - self.amount,
+        balance = await wallet_ledger.reserve(
+            self.user_id, self.merchant_id, self.amount
         )
+        try:
+            for _ in range(settings.BET_UPDATE_ATTEMPTS):
+                if updated_game_player := (
+                    await GamePlayer.get_motor_collection().find_one_and_update(
+                        {"_id": self.game_player["_id"], **self.get_bet_guards()},
+                        {
+                            "$push": {
+                                f"{self.bet_type}_list": self.amount,
+                                "action_list": {
+                                    f"{self.bet_type}": self.amount,
+                                    "decision_time": self.game_round["start_timestamp"],
+                                    "action_time": get_timestamp(),
+                                },
+                            },
+                            "$inc": {
+                                self.bet_type: self.amount,
+                                "total_bet": self.amount,
+                                "deposit": -self.amount,
+                            },
+                        },
+                        return_document=True,
+                    )
+                ):
+                    break
+                # the seat changed since it was validated, validate again on the fresh state
+                self.game_player = await GamePlayer.get_motor_collection().find_one(
+                    {"_id": self.game_player["_id"]}
+                )
+                await self._check_if_user_can_place_bet()
+            else:
+                raise ValidationError("Can not place bet, please try again")
+        except Exception:
+            await wallet_ledger.release(self.user_id, self.merchant_id, self.amount)
+            raise
 
-        if self.game_round["start_timestamp"] is None:
-            await GameRound.get_motor_collection().find_one_and_update(
-                {"_id": self.game_round["_id"]},
-                {"$set": {"start_timestamp": get_timestamp(15)}},
-            )
-            await external_sio.emit("start_timer", {"seconds": 15}, room=self.game_id)
-            send_bets_to_merchant.apply_async(
-                args=[str(self.game_round["_id"]), self.game_round["game_id"]],
-                countdown=settings.ACCEPT_BETS_SECONDS,
-                max_retries=5,
-            )
-            self.clean_seats()
+        await self.start_betting_time()
 
-        user_total_bet = (
-            await GamePlayer.get_motor_collection()
-            .aggregate(
-                [
-                    {
-                        "$match": {
-                            "player_id": updated_game_player["player_id"],
-                            "game_round": updated_game_player["game_round"],
-                        }
-                    },
-                    {
-                        "$group": {
-                            "_id": "$player_id",
-                            "user_total_bet": {"$sum": "$total_bet"},
-                        }
-                    },
-                ]
-            )
-            .to_list(length=1)
+        user_total_bet = await self.increment_user_total_bet(
+            updated_game_player, self.amount
         )
 
         return {
@@ -508,52 +461,264 @@ class BettingManager(BaseGameManager):
             "seat_number": self.seat_number,
             "total_bet": updated_game_player["total_bet"],
             self.bet_type: updated_game_player[self.bet_type],
-            "user_deposit": updated_game_player["deposit"],
+            "user_deposit": balance,
             f"{self.bet_type}_list": updated_game_player[f"{self.bet_type}_list"],
             "player_id": updated_game_player["player_id"],
-            "user_total_bet": user_total_bet[0].get("user_total_bet", 0),
+            "user_total_bet": user_total_bet,
         }
 
-    async def update_game_player_for_repeat(self, repeat_data):
-        game_player = await GamePlayer.get_motor_collection().find_one_and_update(
-            {"_id": self.game_player["_id"]},
+    async def update_game_players_for_repeat(
+        self, repeat_data: dict, game_players: dict, balance: float
+    ) -> Dict[str, Dict[str, Any]]:
+        """Repeats the bets of every seat with one bulk write. A seat which got a bet
+        since it was validated is left untouched, only the repeated seats are charged.
+        :param balance - balance left after the whole repeat amount was reserved, the bets
+        a repeat replaces and the seats which were not repeated are released here
+        """
+        operations = []
+        actions = {}
+        total_repeat_amount = sum(map(self.get_repeat_amount, repeat_data.values()))
+        deposit = balance + total_repeat_amount
+        for seat, seat_repeat_data in repeat_data.items():
+            game_player = game_players.get(int(seat), {})
+            repeat_amount = self.get_repeat_amount(seat_repeat_data)
+            previous_total_bet = game_player.get("total_bet", 0)
+            deposit += previous_total_bet - repeat_amount
+            actions[int(seat)] = action = {
+                "repeat": repeat_amount,
+                "decision_time": game_player.get("decision_time", ""),
+                "action_time": get_timestamp(),
+            }
+            bets = {
+                "bet": float(seat_repeat_data["bet"]),
+                "bet_list": seat_repeat_data["bet_list"],
+                "bet_21_3": float(seat_repeat_data["bet_21_3"]),
+                "bet_21_3_list": seat_repeat_data["bet_21_3_list"],
+                "bet_perfect_pair": float(seat_repeat_data["bet_perfect_pair"]),
+                "bet_perfect_pair_list": seat_repeat_data["bet_perfect_pair_list"],
+                "total_bet": repeat_amount,
+            }
+            if game_player:
+                operations.append(
+                    UpdateOne(
+                        {
+                            "_id": game_player["_id"],
+                            "total_bet": game_player["total_bet"],
+                        },
+                        {
+                            "$set": bets,
+                            "$inc": {"deposit": previous_total_bet - repeat_amount},
+                            "$push": {"action_list": action},
+                        },
+                    )
+                )
+                continue
+            bets["deposit"] = deposit
+            defaults = self.generate_game_player_defaults(
+                str(self.game_round["_id"]), int(seat), self.sid, deposit
+            )
+            operations.append(
+                UpdateOne(
+                    self.get_game_player_filter(int(seat)),
+                    {
+                        "$setOnInsert": {
+                            key: value
+                            for key, value in defaults.items()
+                            if key not in bets and key != "action_list"
+                        },
+                        "$set": bets,
+                        "$push": {"action_list": action},
+                    },
+                    upsert=True,
+                )
+            )
+        try:
+            await GamePlayer.get_motor_collection().bulk_write(
+                operations, ordered=False
+            )
+        except BulkWriteError:
+            # a part of the seats was written, they are told apart by their action below
+            pass
+        except Exception:
+            await wallet_ledger.release(
+                self.user_id, self.merchant_id, total_repeat_amount
+            )
+            raise
+
+        return_data = {}
+        # the repeat replaces the bets of the occupied seats, their reservation is released
+        released_amount = total_repeat_amount
+        total_bet_delta = 0
+        async for game_player in GamePlayer.get_motor_collection().find(
             {
-                "$set": {
-                    "deposit": float(self.user_balance)
-                    - (
-                        float(repeat_data["bet"])
-                        + float(repeat_data["bet_21_3"])
-                        + float(repeat_data["bet_perfect_pair"])
+                "game_round": str(self.game_round["_id"]),
+                "seat_number": {"$in": list(actions)},
+            }
+        ):
+            seat_number = game_player["seat_number"]
+            if game_player["action_list"][-1] != actions[seat_number]:
+                continue
+            seat_repeat_amount = actions[seat_number]["repeat"]
+            previous_total_bet = game_players.get(seat_number, {}).get("total_bet", 0)
+            released_amount -= seat_repeat_amount - previous_total_bet
+            total_bet_delta += seat_repeat_amount - previous_total_bet
+            return_data[str(seat_number)] = {
+                "seat_number": seat_number,
+                "bet": game_player["bet"],
+                "bet_list": game_player["bet_list"],
+                "bet_21_3": game_player["bet_21_3"],
+                "bet_21_3_list": game_player["bet_21_3_list"],
+                "bet_perfect_pair": game_player["bet_perfect_pair"],
+                "bet_perfect_pair_list": game_player["bet_perfect_pair_list"],
+                "total_bet": game_player["total_bet"],
+                "player_id": self.user_session_data["player_id"],
+                "action_list": game_player["action_list"],
+            }
+        if released_amount:
+            balance = await wallet_ledger.release(
+                self.user_id, self.merchant_id, released_amount
+            )
+        for seat_data in return_data.values():
+            seat_data["user_deposit"] = balance
+        if not return_data:
+            raise ValidationError("Can not make repeat, please try again")
+
+        await self.increment_user_total_bet(
+            {
+                "game_round": str(self.game_round["_id"]),
+                "player_id": self.user_session_data["player_id"],
+            },
+            total_bet_delta,
+        )
+        await self.start_betting_time()
+        return return_data
+
+    async def charge_chips(
+        self,
+        amounts: List[float],
+        seat_number: int,
+        bet_type: str = "bet",
+        attempt: int = 1,
+    ) -> List[Union[Dict[str, Any], ValidationError]]:
+        """Places a run of chips for one seat and bet type with a single write.
+        Chips are validated in arrival order against the running seat state, the result
+        of every chip is either its ``bet_status`` data or the ValidationError it raised.
+        """
+        self.seat_number = seat_number
+        self.bet_type = bet_type
+        try:
+            self.game_round = await super().get_game_round()
+            if self.bet_type == "bet":
+                await redis_cache.take_seat(
+                    str(self.game_round["_id"]),
+                    self.seat_number,
+                    self.merchant_id,
+                    self.user_id,
+                    self.game_round["prev_round_id"],
+                )
+            self.user_balance = await redis_cache.get(
+                f"{self.user_id}:{self.merchant_id}"
+            )
+            self.check_bet_placement()
+            self.game_player = await super()._get_or_create_game_player(
+                game_round_id=str(self.game_round["_id"]),
+                seat_number=self.seat_number,
+                sid=self.sid,
+                balance=self.user_balance,
+            )
+        except ValidationError as error:
+            return [error] * len(amounts)
+
+        self.merchant_data = await redis_cache.get_or_cache_merchant(
+            self.merchant_id, self.game_id
+        )
+        validators = {
+            "bet": self.check_user_deposit,
+            "bet_21_3": self.check_side_bet_placement,
+            "bet_perfect_pair": self.check_side_bet_placement,
+        }
+        validated_bets = {
+            "bet": self.game_player["bet"],
+            self.bet_type: self.game_player[self.bet_type],
+        }
+        results, placed, accepted, actions = [], [], [], []
+        for amount in amounts:
+            try:
+                await self.check_positive_amount(amount)
+                self.amount = amount
+                validators.get(self.bet_type)()
+            except ValidationError as error:
+                results.append(error)
+                continue
+            accepted.append(amount)
+            actions.append(
+                {
+                    f"{self.bet_type}": amount,
+                    "decision_time": self.game_round["start_timestamp"],
+                    "action_time": get_timestamp(),
+                }
+            )
+            self.user_balance = float(self.user_balance) - amount
+            self.game_player[self.bet_type] += amount
+            self.game_player["total_bet"] += amount
+            self.game_player[f"{self.bet_type}_list"].append(amount)
+            placed.append(
+                {
+                    "bet_type": self.bet_type,
+                    "seat_number": self.seat_number,
+                    "total_bet": self.game_player["total_bet"],
+                    self.bet_type: self.game_player[self.bet_type],
+                    "user_deposit": self.user_balance,
+                    f"{self.bet_type}_list": list(
+                        self.game_player[f"{self.bet_type}_list"]
                     ),
-                    "bet": float(repeat_data["bet"]),
-                    "bet_list": repeat_data["bet_list"],
-                    "bet_21_3": float(repeat_data["bet_21_3"]),
-                    "bet_21_3_list": repeat_data["bet_21_3_list"],
-                    "bet_perfect_pair": float(repeat_data["bet_perfect_pair"]),
-                    "bet_perfect_pair_list": repeat_data["bet_perfect_pair_list"],
-                    "total_bet": repeat_data["bet"]
-                    + repeat_data["bet_21_3"]
-                    + repeat_data["bet_perfect_pair"],
-                    "action_list": self.game_player["action_list"]
-                    + [
-                        {
-                            "repeat": repeat_data["bet"]
-                            + repeat_data["bet_21_3"]
-                            + repeat_data["bet_perfect_pair"],
-                            "decision_time": self.game_player["decision_time"],
-                            "action_time": get_timestamp(),
-                        }
-                    ],
+                    "player_id": self.game_player["player_id"],
                 }
+            )
+            results.append(placed[-1])
+        if not accepted:
+            return results
+        try:
+            balance = await wallet_ledger.reserve(
+                self.user_id, self.merchant_id, sum(accepted)
+            )
+        except ValidationError as error:
+            return [error] * len(amounts)
+
+        result = await GamePlayer.get_motor_collection().update_one(
+            {"_id": self.game_player["_id"], **validated_bets},
+            {
+                "$push": {
+                    f"{self.bet_type}_list": {"$each": accepted},
+                    "action_list": {"$each": actions},
+                },
+                "$inc": {
+                    self.bet_type: sum(accepted),
+                    "total_bet": sum(accepted),
+                    "deposit": -sum(accepted),
+                },
             },
-            return_document=True,
         )
+        if not result.matched_count:
+            # the seat changed since the chips were validated
+            await wallet_ledger.release(self.user_id, self.merchant_id, sum(accepted))
+            if attempt == settings.BET_UPDATE_ATTEMPTS:
+                error = ValidationError("Can not place bet, please try again")
+                return [error] * len(amounts)
+            return await self.charge_chips(amounts, seat_number, bet_type, attempt + 1)
+        await self.start_betting_time()
+        user_total_bet = await self.increment_user_total_bet(
+            self.game_player, sum(accepted)
+        ) - sum(accepted)
+        not_placed = sum(accepted)
+        for result, amount in zip(placed, accepted):
+            user_total_bet += amount
+            not_placed -= amount
+            result["user_total_bet"] = user_total_bet
+            result["user_deposit"] = balance + not_placed
+        return results
 
-        await redis_cache.set_user_balance_in_cache(
-            self.user_id,
-            self.merchant_id,
-            float(self.user_balance) - float(repeat_data["bet"]),
-        )
+    async def start_betting_time(self):
         if self.game_round["start_timestamp"] is None:
             await GameRound.get_motor_collection().find_one_and_update(
                 {"_id": self.game_round["_id"]},
@@ -565,24 +730,14 @@ class BettingManager(BaseGameManager):
                 countdown=settings.ACCEPT_BETS_SECONDS,
                 max_retries=5,
             )
-            self.clean_seats()
-        return {
-            "seat_number": game_player["seat_number"],
-            "bet": game_player["bet"],
-            "bet_list": game_player["bet_list"],
-            "bet_21_3": game_player["bet_21_3"],
-            "bet_21_3_list": repeat_data["bet_21_3_list"],
-            "bet_perfect_pair": game_player["bet_perfect_pair"],
-            "bet_perfect_pair_list": repeat_data["bet_perfect_pair_list"],
-            "user_deposit": game_player["deposit"],
-            "total_bet": game_player["total_bet"],
-            "player_id": game_player["player_id"],
-            "action_list": game_player["action_list"],
-        }
+            await self.clean_seats()
 
-    def clean_seats(self):
-        clean_all_seats_if_no_bets_are_placed.apply_async(
-            args=[str(self.game_round["_id"])], countdown=17, max_retries=5
+    async def clean_seats(self):
+        await timer_wheel.schedule(
+            f"clean_seats:{self.game_round['_id']}",
+            "clean_all_seats_if_no_bets_are_placed",
+            [str(self.game_round["_id"])],
+            17,
         )
 
     def check_bet_placement(self):
@@ -595,6 +750,21 @@ class BettingManager(BaseGameManager):
         ):
             raise ValidationError("betting time is over")
 
+    def get_bet_guards(self) -> Dict[str, Any]:
+        """Filter which matches only when the seat still passes the bet validation."""
+        if self.bet_type == "bet":
+            return {
+                "bet": {
+                    "$lte": self.merchant_data["max_bet"] - self.amount,
+                    "$gte": self.merchant_data["min_bet"] - self.amount,
+                }
+            }
+        return {
+            "bet": {"$gt": 0},
+            self.bet_type: {"$lte": settings.MAX_SIDE_BET - self.amount},
+            "$expr": {"$lte": [{"$add": [f"${self.bet_type}", self.amount]}, "$bet"]},
+        }
+
     def check_user_deposit(self):
         if self.merchant_data["max_bet"] < self.game_player["bet"] + self.amount:
             raise ValidationError("placing more than maximum bet is not allowed")
@@ -613,8 +783,16 @@ class BettingManager(BaseGameManager):
                 "Placing mote than maximum side bet limit is not allowed"
             )
 
-    def check_if_can_make_repeat(self, bet):
-        if bet > float(self.user_balance):
+    def check_if_can_make_repeat(self, bet, repeat_amount):
+        if repeat_amount > float(self.user_balance):
             raise ValidationError("not enough funds to make repeat")
         elif self.game_player["bet"] == bet:
             raise ValidationError("Repeat is already made")
+
+    @staticmethod
+    def get_repeat_amount(seat_repeat_data: dict) -> float:
+        return (
+            float(seat_repeat_data["bet"])
+            + float(seat_repeat_data["bet_21_3"])
+            + float(seat_repeat_data["bet_perfect_pair"])
+        )
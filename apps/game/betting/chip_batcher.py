@@ -0,0 +1,79 @@
+""" Per-sid accumulation window for rapid chip clicks.
+Chips of one socket arriving within ``CHIP_BATCH_WINDOW_SECONDS`` are placed together, every
+run of chips on the same seat and bet type costs a single GamePlayer write. """
+import asyncio
+import logging
+from typing import Dict, List, Tuple
+
+from apps.config import settings
+from apps.game.betting.betting_manager import BettingManager
+from apps.game.services.custom_exception import ValidationError
+
+logger = logging.getLogger(__name__)
+
+Chip = Tuple[float, int, str, asyncio.Future]
+
+
+class ChipBatcher:
+    def __init__(self, window: float = settings.CHIP_BATCH_WINDOW_SECONDS):
+        self.window = window
+        self._pending: Dict[str, List[Chip]] = {}
+        self.stats = {"chips": 0, "batches": 0, "writes": 0}
+
+    async def place_chip(
+        self,
+        sid: str,
+        user_session_data: dict,
+        amount: float,
+        seat_number: int,
+        bet_type: str,
+    ) -> dict:
+        """Returns the ``bet_status`` data of the chip or raises its ValidationError."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if sid not in self._pending:
+            self._pending[sid] = []
+            loop.call_later(
+                self.window,
+                lambda: asyncio.ensure_future(self._flush(sid, user_session_data)),
+            )
+        self._pending[sid].append((amount, seat_number, bet_type, future))
+        self.stats["chips"] += 1
+        return await future
+
+    async def _flush(self, sid: str, user_session_data: dict) -> None:
+        chips = self._pending.pop(sid, [])
+        self.stats["batches"] += 1
+        try:
+            for run in self._split_runs(chips):
+                _, seat_number, bet_type, _ = run[0]
+                betting_manager = BettingManager(user_session_data, sid, bet_type)
+                results = await betting_manager.charge_chips(
+                    [amount for amount, *_ in run], seat_number, bet_type
+                )
+                if any(isinstance(result, dict) for result in results):
+                    self.stats["writes"] += 1
+                for (*_, future), result in zip(run, results):
+                    if isinstance(result, ValidationError):
+                        future.set_exception(result)
+                    else:
+                        future.set_result(result)
+        except Exception as error:
+            logger.exception("Chip batch of %s failed", sid)
+            for *_, future in chips:
+                if not future.done():
+                    future.set_exception(error)
+
+    @staticmethod
+    def _split_runs(chips: List[Chip]) -> List[List[Chip]]:
+        """Consecutive chips on the same seat and bet type, in arrival order."""
+        runs = []
+        for chip in chips:
+            if runs and runs[-1][-1][1:3] == chip[1:3]:
+                runs[-1].append(chip)
+            else:
+                runs.append([chip])
+        return runs
+
+
+chip_batcher = ChipBatcher()
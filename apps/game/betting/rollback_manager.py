@@ -1,9 +1,11 @@
 from typing import Optional
 
+from apps.config import settings
 from apps.connections import redis_cache
 from apps.game.documents import GamePlayer
 from apps.game.services.custom_exception import ValidationError
 from apps.game.services.utils import get_timestamp
+from apps.game.services.wallet_ledger import wallet_ledger
 from apps.game.managers.base_game_manager import BaseGameManager
 
 
@@ -20,64 +22,44 @@ class RollbackManger(BaseGameManager):
         self.game_round = await self.get_game_round()
         self.rollback_type = rollback_type
         self.check_can_make_rollback()
-        amount = self.game_player[f"{self.rollback_type}_list"][-1]
-        user_balance = await redis_cache.get(
-            f"{self.game_player['user_id']}:{self.game_player['merchant']}"
-        )
-        updated_game_player = (
-            await GamePlayer.get_motor_collection().find_one_and_update(
-                {"_id": self.game_player["_id"]},
-                {
-                    "$set": {
-                        self.rollback_type: self.game_player[self.rollback_type]
-                        - amount,
-                        "total_bet": self.game_player["total_bet"] - amount,
-                        "deposit": float(user_balance) + amount,
-                        f"{self.rollback_type}_list": self.game_player[
-                            f"{self.rollback_type}_list"
-                        ][:-1],
-                        "action_list": self.game_player["action_list"]
-                        + [
-                            {
-                                "rollback": self.game_player[
-                                    f"{self.rollback_type}_list"
-                                ][-1]
-                            }
-                        ],
+        for _ in range(settings.BET_UPDATE_ATTEMPTS):
+            amount = self.game_player[f"{self.rollback_type}_list"][-1]
+            if updated_game_player := (
+                await GamePlayer.get_motor_collection().find_one_and_update(
+                    {
+                        "_id": self.game_player["_id"],
+                        **self.get_rollback_guards(amount),
+                    },
+                    {
+                        "$pop": {f"{self.rollback_type}_list": 1},
+                        "$inc": {
+                            self.rollback_type: -amount,
+                            "total_bet": -amount,
+                            "deposit": amount,
+                        },
+                        "$push": {"action_list": {"rollback": amount}},
                     },
-                },
-                return_document=True,
+                    return_document=True,
+                )
+            ):
+                break
+            # the seat changed since it was validated, validate again on the fresh state
+            self.game_player = await GamePlayer.get_motor_collection().find_one(
+                {"_id": self.game_player["_id"]}
             )
-        )
-        await redis_cache.set_user_balance_in_cache(
-            self.game_player["user_id"],
-            self.game_player["merchant"],
-            float(updated_game_player["deposit"]),
+            self.check_can_make_rollback()
+        else:
+            raise ValidationError("Can not make rollback, please try again")
+        balance = await wallet_ledger.release(
+            self.game_player["user_id"], self.game_player["merchant"], amount
         )
         await redis_cache.clean_no_bet_seat_after_rollback(
             updated_game_player["total_bet"],
             updated_game_player["game_round"],
             updated_game_player["seat_number"],
         )
-        user_total_bet = (
-            await GamePlayer.get_motor_collection()
-            .aggregate(
-                [
-                    {
-                        "$match": {
-                            "player_id": updated_game_player["player_id"],
-                            "game_round": updated_game_player["game_round"],
-                        }
-                    },
-                    {
-                        "$group": {
-                            "_id": "$player_id",
-                            "user_total_bet": {"$sum": "$total_bet"},
-                        }
-                    },
-                ]
-            )
-            .to_list(length=1)
+        user_total_bet = await self.increment_user_total_bet(
+            updated_game_player, -amount
         )
         return {
             "seat_number": seat_number,
@@ -85,8 +67,8 @@ class RollbackManger(BaseGameManager):
             "total_bet": updated_game_player["total_bet"],
             "bet": updated_game_player[self.rollback_type],
             "bet_list": updated_game_player[f"{self.rollback_type}_list"],
-            "balance": updated_game_player["deposit"],
-            "user_total_bet": list(user_total_bet)[0].get("user_total_bet"),
+            "balance": balance,
+            "user_total_bet": user_total_bet,
         }
 
     def check_can_make_rollback(self):
@@ -101,6 +83,19 @@ class RollbackManger(BaseGameManager):
         if self.rollback_type == "bet":
             self.check_can_rollback_bet()
 
+    def get_rollback_guards(self, amount: float) -> dict:
+        """Filter which matches only when ``amount`` is still the last chip of the seat
+        and the seat still passes the rollback validation."""
+        guards = [
+            {"$eq": [{"$arrayElemAt": [f"${self.rollback_type}_list", -1]}, amount]}
+        ]
+        if self.rollback_type == "bet":
+            guards += [
+                {"$lte": [f"${side_bet}", {"$subtract": ["$bet", amount]}]}
+                for side_bet in ("bet_21_3", "bet_perfect_pair")
+            ]
+        return {"$expr": {"$and": guards}}
+
     def check_can_rollback_bet(self):
         if (
             self.game_player["bet_21_3"]
@@ -5,6 +5,7 @@ from bson import ObjectId
 
 from apps.config import settings
 from apps.game.documents import GamePlayer, GameRound
+from apps.game.state import RoundState, SeatState
 from apps.game.services.utils import get_timestamp, check_if_player_can_double_or_split
 from apps.game.cards.hand import Hand
 from apps.game.cards.base_card_manager import BaseCardManager
@@ -31,7 +32,7 @@ class ActionCardManager(BaseCardManager):
         }
 
         self.card = card
-        self.game_player: GamePlayer = await GamePlayer.find_one(
+        self.game_player = await SeatState.find_one(
             {"game_id": self.game_id, "game_round": self.round_id, "player_turn": True}
         )
         await self.check_if_dealer_can_scan_player_card()
@@ -41,15 +42,17 @@ class ActionCardManager(BaseCardManager):
         self.check_card(card)
         await self.check_if_dealer_can_scan_card()
         self.card = card
-        game_round = await GameRound.get_motor_collection().find_one_and_update(
-            {"_id": ObjectId(self.round_id), "game_id": self.game_id},
-            {"$push": {"dealer_cards": self.card}},
-            return_document=True,
+        game_round = RoundState.from_document(
+            await GameRound.get_motor_collection().find_one_and_update(
+                {"_id": ObjectId(self.round_id), "game_id": self.game_id},
+                {"$push": {"dealer_cards": self.card}},
+                return_document=True,
+            )
         )
-        hand = Hand(game_round["dealer_cards"])
+        hand = Hand(game_round.dealer_cards)
         await external_sio.emit(
             "dealer_score",
-            {"score": hand.get_score_repr(), "cards": game_round["dealer_cards"]},
+            {"score": hand.get_score_repr(), "cards": game_round.dealer_cards},
             room=self.game_id,
         )
         if hand.dealer_action():
@@ -71,7 +74,7 @@ class ActionCardManager(BaseCardManager):
         await self.save_player_card_and_send_evaluation(False)
         return await self.move_to_next_player()
 
-    async def stand(self, game_player: GamePlayer):
+    async def stand(self, game_player: SeatState):
         self.game_player = game_player
         self.game_player.last_action = "stand"
         self.game_player.action_list.append(
@@ -102,7 +105,7 @@ class ActionCardManager(BaseCardManager):
         return "send_hand_value", data, self.game_id
 
     async def scan_split_second_card(self):
-        game_player: GamePlayer = await GamePlayer.find_one(
+        game_player = await SeatState.find_one(
             {
                 "game_id": self.game_id,
                 "game_round": self.round_id,
@@ -150,7 +153,7 @@ class ActionCardManager(BaseCardManager):
         return evaluation
 
     async def check_if_dealer_can_scan_card(self):
-        game_round = await GameRound.find_one(
+        game_round = await RoundState.find_one(
             {"_id": ObjectId(self.round_id), "game_id": self.game_id}
         )
         hand = Hand(game_round.dealer_cards)
@@ -174,11 +177,11 @@ class ActionCardManager(BaseCardManager):
             {"$set": {"finished": True}},
         )
 
-    async def check_dealer_cards(self, game_round) -> Tuple[str, Dict, str]:
+    async def check_dealer_cards(self, game_round: RoundState) -> Tuple[str, Dict, str]:
         seats = await redis_cache.get_or_cache_game_player_seats(self.round_id)
         players_with_bj = 0
         for seat in seats:
-            game_player: GamePlayer = await GamePlayer.find_one(
+            game_player = await SeatState.find_one(
                 {"seat_number": seat, "game_round": self.round_id}
             )
             data, hand = Hand.generate_data(game_player.cards, game_player.last_action)
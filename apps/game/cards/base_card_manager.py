@@ -4,16 +4,17 @@ from typing import Optional, Dict, Tuple
 from bson import ObjectId
 
 from apps.config import settings
-from apps.game.documents import GamePlayer, GameRound
+from apps.game.documents import GameRound
 from apps.game.services.utils import get_timestamp
 from apps.connections import redis_cache
 from apps.game.cards.deck import deck
 from apps.game.services.custom_exception import ValidationError
-from apps.game.tasks import wait_player
+from apps.game.services.timeout_registry import register_timeout
 from apps.game.cards.hand import Hand
 from apps.game.managers.base_game_manager import BaseGameManager
 from apps.game.services.payment_manager import PaymentManager
 from apps.game.services.utils import check_if_player_can_double_or_split
+from apps.game.state import RoundState, SeatState
 
 
 external_sio = socketio.AsyncRedisManager(settings.WS_MESSAGE_QUEUE, write_only=True)
@@ -24,21 +25,20 @@ class BaseCardManager(BaseGameManager):
         super().__init__(session_data)
         self.round_id = round_id
         self.game_id = session_data["game_id"]
-        self.game_player: Optional[GamePlayer] = None
-        self.next_game_player: Optional[GamePlayer] = None
+        self.game_player: Optional[SeatState] = None
+        self.next_game_player: Optional[SeatState] = None
 
     @staticmethod
     async def check_player_activity(
-        game_player: GamePlayer, can_continue_game: bool
+        game_player: SeatState, can_continue_game: bool
     ) -> bool:
         if game_player.is_active is False and can_continue_game is True:
-            wait_player.apply_async(
-                args=[
-                    str(game_player.id),
-                    game_player.game_id,
-                    len(game_player.action_list),
-                ],
-                countdown=settings.ACCEPT_BETS_SECONDS - 1,
+            await register_timeout(
+                redis_cache.redis_cache,
+                str(game_player.id),
+                game_player.game_id,
+                len(game_player.action_list),
+                settings.ACCEPT_BETS_SECONDS - 1,
             )
             return True
         return False
@@ -83,10 +83,10 @@ class BaseCardManager(BaseGameManager):
             scan_result, data, game_id = await self.all_player_burst_or_have_bj()
             return scan_result, data, game_id
 
-    async def get_next_player(self) -> GamePlayer:
+    async def get_next_player(self) -> SeatState:
         seats = await redis_cache.get_or_cache_game_player_seats(self.round_id)
         seat_id = seats.index(self.game_player.seat_number)
-        next_game_player: GamePlayer = await GamePlayer.find_one(
+        next_game_player = await SeatState.find_one(
             {
                 "seat_number": seats[seat_id + 1],
                 "game_round": self.round_id,
@@ -101,8 +101,8 @@ class BaseCardManager(BaseGameManager):
 
     @staticmethod
     async def finish_player_turn(
-        game_player: GamePlayer, making_decision: bool
-    ) -> GamePlayer:
+        game_player: SeatState, making_decision: bool
+    ) -> SeatState:
         game_player.making_decision = making_decision
         if making_decision is False:
             game_player.player_turn = False
@@ -140,13 +140,15 @@ class BaseCardManager(BaseGameManager):
         seats = await redis_cache.get_or_cache_game_player_seats(self.round_id)
         more_21_score = 0
         bj_score = 0
-        game_round = await GameRound.get_motor_collection().find_one_and_update(
-            {"_id": ObjectId(self.round_id)},
-            {"$set": {"show_dealer_cards": True}},
-            return_document=True,
+        game_round = RoundState.from_document(
+            await GameRound.get_motor_collection().find_one_and_update(
+                {"_id": ObjectId(self.round_id)},
+                {"$set": {"show_dealer_cards": True}},
+                return_document=True,
+            )
         )
         for seat in seats:
-            game_player: GamePlayer = await GamePlayer.find_one(
+            game_player = await SeatState.find_one(
                 {"seat_number": seat, "game_round": self.round_id}
             )
             data, hand = Hand.generate_data(game_player.cards, game_player.last_action)
@@ -162,12 +164,12 @@ class BaseCardManager(BaseGameManager):
             if score == "BJ":
                 bj_score = bj_score + 1
 
-        dealer_hand = Hand(game_round["dealer_cards"])
+        dealer_hand = Hand(game_round.dealer_cards)
         await external_sio.emit(
             "dealer_score",
             {
                 "score": dealer_hand.get_score_repr(),
-                "cards": game_round["dealer_cards"],
+                "cards": game_round.dealer_cards,
             },
             room=self.game_id,
         )
@@ -175,13 +177,13 @@ class BaseCardManager(BaseGameManager):
             bj_score == 0
             or (
                 bj_score > 0
-                and (not game_round["dealer_cards"][0][1] in ["A", "T", "K", "Q", "J"])
+                and (not game_round.dealer_cards[0][1] in ["A", "T", "K", "Q", "J"])
             )
         ):
             payment_manager = PaymentManager(self.game_id, game_round)
             await payment_manager.pay_winnings()
             return "", {}, None
-        elif Hand(game_round["dealer_cards"])._hand_scores.score >= 17:
+        elif Hand(game_round.dealer_cards)._hand_scores.score >= 17:
             payment_manager = PaymentManager(self.game_id, game_round)
             await payment_manager.pay_winnings()
             return "", {}, None
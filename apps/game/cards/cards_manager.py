@@ -1,6 +1,4 @@
-import json
 from typing import Optional
-from beanie import PydanticObjectId
 from bson import ObjectId
 
 
@@ -8,11 +6,13 @@ from apps.config import settings
 from apps.connections import redis_cache
 from apps.game.consumers import external_sio
 from apps.game.documents import GamePlayer, GameRound
-from apps.game.tasks import send_make_decision_to_starter_game_player
+from apps.game.state import RoundState, SeatState
+from apps.game.services.timer_wheel import timer_wheel
 
 from apps.game.services.custom_exception import ValidationError
 from apps.game.cards.base_card_manager import BaseCardManager
 from apps.game.cards.hand import Hand
+from apps.game.cards.side_bets import generate_player_card_update
 from apps.game.services.utils import get_timestamp, check_if_player_can_double_or_split
 from apps.game.services.payment_manager import PaymentManager
 
@@ -21,15 +21,13 @@ class EuropeanCardsManager(BaseCardManager):
     def __init__(self, session_data: dict, round_id: str):
         super().__init__(session_data, round_id)
         self.card: Optional[str] = None
-        self.game_round: Optional[GameRound] = None
+        self.game_round: Optional[RoundState] = None
 
     async def handle_card_dealing(self, card) -> None:
         self.check_card(card)
         self.card = card
         seats = await redis_cache.get_or_cache_game_player_seats(self.round_id)
-        self.game_round: GameRound = await GameRound.get(
-            PydanticObjectId(self.round_id)
-        )
+        self.game_round = await RoundState.get(self.round_id)
         self.check_can_scan_card()
         if len(
             self.game_round.dealer_cards
@@ -71,12 +69,11 @@ class EuropeanCardsManager(BaseCardManager):
                         room=self.game_round.game_id,
                     )
 
-                send_make_decision_to_starter_game_player.apply_async(
-                    args=[seats, 0, str(self.game_round.id), self.game_round.game_id],
-                    countdown=settings.ACCEPT_INSURANCE_SECONDS
-                    if insurable_seats
-                    else 0,
-                    max_retries=5,
+                await timer_wheel.schedule(
+                    f"starter_decision:{self.game_round.id}",
+                    "send_make_decision_to_starter_game_player",
+                    [seats, 0, str(self.game_round.id), self.game_round.game_id],
+                    settings.ACCEPT_INSURANCE_SECONDS if insurable_seats else 0,
                 )
             else:
                 starter_game_player = await self.get_starter_game_player(seats, 0)
@@ -116,11 +113,9 @@ class EuropeanCardsManager(BaseCardManager):
                 "seat_number": seats[self.game_round.card_count],
                 "bet": {"$gt": 0},
             },
-            {"$push": {"cards": self.card}},
+            generate_player_card_update(self.card, self.game_round.dealer_cards),
             return_document=True,
         )
-        await PaymentManager.evaluate_bet_perfect_pair(game_player)
-        await PaymentManager.evaluate_bet_21_3(game_player, self.game_round)
         await self.send_hand_value_to_room(game_player)
 
     async def _save_dealer_card(self) -> None:
@@ -153,7 +148,7 @@ class EuropeanCardsManager(BaseCardManager):
     async def get_starter_game_player(
         self, seats: list, seat_number_index: int
     ) -> dict:
-        game_player: GamePlayer = await GamePlayer.find_one(
+        game_player = await SeatState.find_one(
             {
                 "game_round": self.round_id,
                 "seat_number": seats[seat_number_index],
@@ -203,15 +198,13 @@ class AmericanCardsManager(BaseCardManager):
     def __init__(self, session_data: dict, round_id: str):
         super().__init__(session_data, round_id)
         self.card: Optional[str] = None
-        self.game_round: Optional[GameRound] = None
+        self.game_round: Optional[RoundState] = None
 
     async def handle_card_dealing(self, card):
         self.check_card(card)
         self.card = card
         seats = await redis_cache.get_or_cache_game_player_seats(self.round_id)
-        self.game_round: GameRound = await GameRound.get(
-            PydanticObjectId(self.round_id)
-        )
+        self.game_round = await RoundState.get(self.round_id)
         self.check_can_scan_card()
         if len(self.game_round.dealer_cards) == 1 and self.game_round.card_count == len(
             seats
@@ -237,14 +230,12 @@ class AmericanCardsManager(BaseCardManager):
     async def _save_second_dealer_card(self, seats):
         await self._save_dealer_card()
         dealer_hand = Hand(self.game_round.dealer_cards)
-        game_round_dict = json.loads(self.game_round.json())
-        game_round_dict["_id"] = game_round_dict["id"]
         try:
             if (
                 dealer_hand.get_score_repr() == "BJ"
                 and "A" not in self.game_round.dealer_cards[0]
             ):
-                payment_manager = PaymentManager(self.game_id, game_round_dict)
+                payment_manager = PaymentManager(self.game_id, self.game_round)
                 await payment_manager.pay_winnings()
             elif self.game_round.dealer_cards[0][1] == "A":
                 insurable_seats = await self.get_insurable_seats()
@@ -263,23 +254,22 @@ class AmericanCardsManager(BaseCardManager):
                     )
 
                 if dealer_hand.get_score_repr() == "BJ":
-                    payment_manager = PaymentManager(self.game_id, game_round_dict)
+                    payment_manager = PaymentManager(self.game_id, self.game_round)
                     if insurable_seats:
                         await payment_manager.pay_winnings_after_insurance()
                     else:
                         await payment_manager.pay_winnings()
                 else:
-                    send_make_decision_to_starter_game_player.apply_async(
-                        args=[
+                    await timer_wheel.schedule(
+                        f"starter_decision:{self.game_round.id}",
+                        "send_make_decision_to_starter_game_player",
+                        [
                             seats,
                             0,
                             str(self.game_round.id),
                             self.game_round.game_id,
                         ],
-                        countdown=settings.ACCEPT_INSURANCE_SECONDS
-                        if insurable_seats
-                        else 0,
-                        max_retries=5,
+                        settings.ACCEPT_INSURANCE_SECONDS if insurable_seats else 0,
                     )
             else:
                 starter_game_player = await self.get_starter_game_player(seats, 0)
@@ -316,11 +306,9 @@ class AmericanCardsManager(BaseCardManager):
                 "seat_number": seats[self.game_round.card_count],
                 "bet": {"$gt": 0},
             },
-            {"$push": {"cards": self.card}},
+            generate_player_card_update(self.card, self.game_round.dealer_cards),
             return_document=True,
         )
-        await PaymentManager.evaluate_bet_perfect_pair(game_player)
-        await PaymentManager.evaluate_bet_21_3(game_player, self.game_round)
         await self.send_hand_value_to_room(game_player)
 
     async def _save_dealer_card(self) -> None:
@@ -356,7 +344,7 @@ class AmericanCardsManager(BaseCardManager):
     async def get_starter_game_player(
         self, seats: list, seat_number_index: int
     ) -> dict:
-        game_player: GamePlayer = await GamePlayer.find_one(
+        game_player = await SeatState.find_one(
             {
                 "game_round": self.round_id,
                 "seat_number": seats[seat_number_index],
@@ -0,0 +1,170 @@
+""" Precomputed side bet tables for Perfect Pairs and 21+3.
+Cards are mapped to compact codes once, so evaluation is a single list lookup
+returning ``(multiplier, combination)``. The live path resolves both side bets in the
+same write as the player's second card. """
+from typing import List, Optional, Tuple
+
+from apps.config import settings
+from apps.game.cards.deck import deck
+
+RANKS = ["2", "3", "4", "5", "6", "7", "8", "9", "T", "J", "Q", "K", "A"]
+SUITS = ["S", "C", "D", "H"]
+RANK_INDEX = {rank: index for index, rank in enumerate(RANKS)}
+SUIT_INDEX = {suit: index for index, suit in enumerate(SUITS)}
+
+# deck card ("1AC") -> code in range(52)
+CARD_CODES = {card: RANK_INDEX[card[1]] * 4 + SUIT_INDEX[card[2]] for card in deck}
+# code -> card without the deck number ("AC")
+CARD_KEYS = [RANKS[code // 4] + SUITS[code % 4] for code in range(52)]
+
+NO_WINNING: Tuple[int, Optional[str]] = (0, None)
+
+
+def _is_straight(rank_indexes: List[int]) -> bool:
+    low, middle, high = sorted(rank_indexes)
+    if middle - low == 1 and high - middle == 1:
+        return True
+    # A-2-3, ace plays low
+    return [low, middle, high] == [0, 1, 12]
+
+
+def _perfect_pair_outcome(first: int, second: int) -> Tuple[int, Optional[str]]:
+    first_rank, first_suit = divmod(first, 4)
+    second_rank, second_suit = divmod(second, 4)
+    if first_rank != second_rank:
+        return NO_WINNING
+    if first_suit == second_suit:
+        return settings.PP_MULTIPLIER, "PERFECT PAIR"
+    # spades/clubs and diamonds/hearts share a color
+    if first_suit // 2 == second_suit // 2:
+        return settings.CP_MULTIPLIER, "COLORED PAIR"
+    return settings.MP_MULTIPLIER, "MIXED PAIR"
+
+
+def _21_3_outcome(rank_indexes: List[int], flush: bool) -> Tuple[int, Optional[str]]:
+    trips = len(set(rank_indexes)) == 1
+    straight = _is_straight(rank_indexes)
+    if trips and flush:
+        return settings.ST_MULTIPLIER, "SUITED TRIPS"
+    if flush and straight:
+        return settings.SF_MULTIPLIER, "STRAIGHT FLUSH"
+    if trips:
+        return settings.TK_MULTIPLIER, "THREE OF A KIND"
+    if straight:
+        return settings.S_MULTIPLIER, "STRAIGHT"
+    if flush:
+        return settings.F_MULTIPLIER, "FLUSH"
+    return NO_WINNING
+
+
+def _build_perfect_pair_table() -> List[Tuple[int, Optional[str]]]:
+    return [
+        _perfect_pair_outcome(first, second)
+        for first in range(52)
+        for second in range(52)
+    ]
+
+
+def _build_21_3_table() -> List[Tuple[int, Optional[str]]]:
+    return [
+        _21_3_outcome([first, second, third], bool(flush))
+        for first in range(13)
+        for second in range(13)
+        for third in range(13)
+        for flush in range(2)
+    ]
+
+
+PERFECT_PAIR_TABLE = _build_perfect_pair_table()
+TWENTY_ONE_THREE_TABLE = _build_21_3_table()
+
+
+def evaluate_perfect_pair(cards: List[str]) -> Tuple[int, Optional[str]]:
+    """:param cards - first two cards of the player"""
+    return PERFECT_PAIR_TABLE[CARD_CODES[cards[0]] * 52 + CARD_CODES[cards[1]]]
+
+
+def _lookup_21_3(first: int, second: int, third: int) -> Tuple[int, Optional[str]]:
+    flush = first & 3 == second & 3 == third & 3
+    return TWENTY_ONE_THREE_TABLE[
+        (((first >> 2) * 13 + (second >> 2)) * 13 + (third >> 2)) * 2 + flush
+    ]
+
+
+def evaluate_21_3(cards: List[str]) -> Tuple[int, Optional[str]]:
+    """:param cards - first two cards of the player and the dealer's first card"""
+    return _lookup_21_3(
+        CARD_CODES[cards[0]], CARD_CODES[cards[1]], CARD_CODES[cards[2]]
+    )
+
+
+def _get_first_card_index() -> dict:
+    """Code of the player's first card, without the deck number, as an aggregation expression."""
+    return {
+        "$indexOfArray": [
+            {"$literal": CARD_KEYS},
+            {"$substrCP": [{"$arrayElemAt": ["$cards", 0]}, 1, 2]},
+        ]
+    }
+
+
+def _generate_side_bet_fields(bet_field: str, outcomes: list) -> dict:
+    """``outcomes`` holds the outcome for every possible first card, indexed by its code."""
+    has_bet_on_two_cards = {
+        "$and": [{"$eq": [{"$size": "$cards"}, 2]}, {"$gt": [f"${bet_field}", 0]}]
+    }
+    multipliers, combinations = zip(*outcomes)
+    return {
+        f"{bet_field}_winning": {
+            "$cond": [
+                has_bet_on_two_cards,
+                {
+                    "$multiply": [
+                        f"${bet_field}",
+                        {
+                            "$arrayElemAt": [
+                                {"$literal": list(multipliers)},
+                                _get_first_card_index(),
+                            ]
+                        },
+                    ]
+                },
+                f"${bet_field}_winning",
+            ]
+        },
+        f"{bet_field}_combination": {
+            "$cond": [
+                has_bet_on_two_cards,
+                {
+                    "$arrayElemAt": [
+                        {"$literal": list(combinations)},
+                        _get_first_card_index(),
+                    ]
+                },
+                f"${bet_field}_combination",
+            ]
+        },
+    }
+
+
+def generate_player_card_update(card: str, dealer_cards: List[str]):
+    """Update which pushes the dealt card. Player's second cards are dealt after the dealer's
+    first card, so once the dealer has a card the update is a pipeline which also resolves both
+    side bets in the same write: the dealt card and the dealer's card are known here, and the
+    outcome for every possible first card is looked up by the code of the card in the document."""
+    if not dealer_cards:
+        return {"$push": {"cards": card}}
+    second, third = CARD_CODES[card], CARD_CODES[dealer_cards[0]]
+    side_bet_fields = _generate_side_bet_fields(
+        "bet_perfect_pair",
+        [PERFECT_PAIR_TABLE[first * 52 + second] for first in range(52)],
+    )
+    side_bet_fields.update(
+        _generate_side_bet_fields(
+            "bet_21_3", [_lookup_21_3(first, second, third) for first in range(52)]
+        )
+    )
+    return [
+        {"$set": {"cards": {"$concatArrays": ["$cards", {"$literal": [card]}]}}},
+        {"$set": side_bet_fields},
+    ]
@@ -4,37 +4,60 @@ from urllib.parse import parse_qs
 import socketio
 from beanie import PydanticObjectId
 
+from apps import codec
 from apps.config import settings
 from apps.connections import redis_cache
 from apps.game.documents import GamePlayer, GameRound
 from apps.game.services.payment_manager import ResetManager
 from apps.game.betting.betting_manager import BettingManager
+from apps.game.betting.chip_batcher import chip_batcher
 from apps.game.services.connect_manager import ConnectManager
 from apps.game.services.dispatch_action_manager import DispatchActionManager
 from apps.game.betting.rollback_manager import RollbackManger
 from apps.game.services.connect_manager import DealerConnectManager
-from apps.game.tasks import wait_player
-from apps.game.services.utils import get_time_left_in_seconds, catch_error
+from apps.game.services.timeout_registry import register_timeout
+from apps.game.state import RoundState, find_constructed
+from apps.game.services.utils import (
+    get_time_left_in_seconds,
+    catch_error,
+    log_event,
+    track_latency,
+)
+from apps.logging import bind_log_context, log_context
+from apps.metrics import span
 
 logger = logging.getLogger("player_actions")
-formatter = logging.Formatter("%(asctime)s - %(message)s")
 
-fh = logging.FileHandler("player_actions.log")
-fh.setLevel(level=logging.INFO)
-fh.setFormatter(formatter)
+# the fields of the seats of a player checked on disconnect
+DISCONNECT_FIELDS = (
+    "game_id",
+    "player_turn",
+    "making_decision",
+    "decision_time",
+    "inactivity_check_time",
+    "action_list",
+)
+
+
+class AsyncRedisManager(socketio.AsyncRedisManager):
+    """Adds the time of the emits to the running socket event."""
+
+    async def emit(self, *args, **kwargs):
+        with span("emit"):
+            return await super().emit(*args, **kwargs)
 
-logger.addHandler(fh)
 
-mgr = socketio.AsyncRedisManager(settings.WS_MESSAGE_QUEUE)
+mgr = AsyncRedisManager(settings.WS_MESSAGE_QUEUE)
 sio = socketio.AsyncServer(
     async_mode="asgi",
     cors_allowed_origins=[],
     client_manager=mgr,
     logger=True,
     engineio_logger=True,
+    json=codec,
 )
 
-external_sio = socketio.AsyncRedisManager(settings.WS_MESSAGE_QUEUE, write_only=True)
+external_sio = AsyncRedisManager(settings.WS_MESSAGE_QUEUE, write_only=True)
 sio_app = socketio.ASGIApp(sio)
 
 from apps.game.cards.cards_manager import EuropeanCardsManager, AmericanCardsManager
@@ -42,9 +65,13 @@ from apps.game.cards.actions_card_manager import ActionCardManager
 
 
 @sio.event
+@track_latency
 @catch_error
 async def connect(sid, environ):
     game_id = parse_qs(environ["QUERY_STRING"]).get("game_id")[0]
+    # not reset, the events of a websocket run in copies of the context of its connect
+    bind_log_context(sid=sid, game_id=game_id)
+    logger.info("connect", extra={"event": "connect"})
     token = parse_qs(environ["QUERY_STRING"]).get("token")
     jwt_token = parse_qs(environ["QUERY_STRING"]).get("jwt_token")
     # stream_token = await generate_token_for_stream(game_id)
@@ -77,6 +104,8 @@ async def connect(sid, environ):
 
 
 @sio.event
+@track_latency
+@log_event
 @catch_error
 async def place_bet(sid, data):
     user_session_data = await redis_cache.redis_cache.hgetall(sid)
@@ -85,8 +114,13 @@ async def place_bet(sid, data):
         data["bet_type"],
         data["seat_number"],
     )
-    betting_manager = BettingManager(user_session_data, sid, bet_type)
-    response_data = await betting_manager.charge_user(amount, seat_number, bet_type)
+    if settings.CHIP_BATCH_WINDOW_SECONDS:
+        response_data = await chip_batcher.place_chip(
+            sid, user_session_data, amount, seat_number, bet_type
+        )
+    else:
+        betting_manager = BettingManager(user_session_data, sid, bet_type)
+        response_data = await betting_manager.charge_user(amount, seat_number, bet_type)
     await sio.emit("bet_status", response_data, to=sid)
     await external_sio.emit(
         "new_bet",
@@ -104,6 +138,8 @@ async def place_bet(sid, data):
 
 
 @sio.event
+@track_latency
+@log_event
 @catch_error
 async def tip_dealer(sid, data):
     user_session_data = await redis_cache.redis_cache.hgetall(sid)
@@ -122,6 +158,8 @@ async def tip_dealer(sid, data):
 
 
 @sio.event
+@track_latency
+@log_event
 @catch_error
 async def make_repeat(sid, _):
     session_data = await redis_cache.redis_cache.hgetall(sid)
@@ -131,6 +169,8 @@ async def make_repeat(sid, _):
 
 
 @sio.event
+@track_latency
+@log_event
 @catch_error
 async def make_rollback(sid, data):
     user_session_data = await redis_cache.redis_cache.hgetall(sid)
@@ -149,6 +189,8 @@ async def make_rollback(sid, data):
 
 
 @sio.event
+@track_latency
+@log_event
 @catch_error
 async def make_action(sid, data):
     action_type = data["action_type"]
@@ -167,6 +209,8 @@ async def make_action(sid, data):
 
 
 @sio.event
+@track_latency
+@log_event
 @catch_error
 async def make_insurance(sid, data):
     action_type = data["action_type"]
@@ -184,6 +228,8 @@ async def make_insurance(sid, data):
 
 
 @sio.event
+@track_latency
+@log_event
 @catch_error
 async def make_auto_stand(sid, data):
     action_type = "auto_stand"
@@ -199,6 +245,8 @@ async def make_auto_stand(sid, data):
 
 
 @sio.event
+@track_latency
+@log_event
 @catch_error
 async def scan_card(sid, data):
     user_session_data = await redis_cache.redis_cache.hgetall(sid)
@@ -212,6 +260,8 @@ async def scan_card(sid, data):
 
 
 @sio.event
+@track_latency
+@log_event
 @catch_error
 async def action_cards(sid, data):
     round_id, card = data["round_id"], data["card"]
@@ -222,6 +272,8 @@ async def action_cards(sid, data):
 
 
 @sio.event
+@track_latency
+@log_event
 @catch_error
 async def dealer_cards(sid, data):
     round_id, card = data["round_id"], data["card"]
@@ -231,26 +283,33 @@ async def dealer_cards(sid, data):
 
 
 @sio.event
+@track_latency
+@log_event
 @catch_error
 async def change_dealer(sid, data):
     game_id, dealer_name = data["game_id"], data["dealer_name"]
     await redis_cache.set(f"{game_id}:dealer_name", dealer_name)
-    await GameRound.get_motor_collection().find_one_and_update(
-        {"game_id": game_id, "finished": False}, {"$set": {"dealer_name": dealer_name}}
+    await GameRound.get_motor_collection().update_many(
+        {"game_id": game_id, "finished": {"$in": [False, None]}},
+        {"$set": {"dealer_name": dealer_name}},
     )
     await external_sio.emit("change_dealer", {"dealer_name": dealer_name}, room=game_id)
 
 
 @sio.event
+@track_latency
+@log_event
 @catch_error
 async def reset_game(sid, data):
     round_id, game_id = data["round_id"], data["game_id"]
-    game_round = await GameRound.get(PydanticObjectId(round_id))
+    game_round = await RoundState.get(round_id)
     reset_manager = ResetManager(game_id, game_round)
     await reset_manager.reset()
 
 
 @sio.event
+@track_latency
+@log_event
 @catch_error
 async def send_chat_message(sid, data):
     user_session_data = await redis_cache.redis_cache.hgetall(sid)
@@ -265,7 +324,9 @@ async def send_chat_message(sid, data):
 
 
 @sio.event
+@track_latency
 async def disconnect(sid):
+    token = bind_log_context(event="disconnect", sid=sid)
     try:
 
         user_session_data = await redis_cache.redis_cache.hgetall(sid)
@@ -277,27 +338,28 @@ async def disconnect(sid):
             await redis_cache.get(f"{user_session_data['game_id']}:player_count"),
             room=user_session_data["game_id"],
         )
-        game_players = await GamePlayer.find(
+        game_players = await find_constructed(
+            GamePlayer,
             {
                 "user_id": user_session_data["user_id"],
                 "merchant": user_session_data["merchant_id"],
                 "game_id": user_session_data["game_id"],
                 "archived": False,
-            }
-        ).to_list(14)
+            },
+            DISCONNECT_FIELDS,
+            length=14,
+        )
         for game_player in game_players:
             if game_player.player_turn and game_player.making_decision:
                 if int(game_player.decision_time) > int(
                     game_player.inactivity_check_time
                 ):
-                    wait_player.apply_async(
-                        args=[
-                            str(game_player.id),
-                            game_player.game_id,
-                            len(game_player.action_list),
-                        ],
-                        countdown=get_time_left_in_seconds(game_player.decision_time)
-                        + 1,
+                    await register_timeout(
+                        redis_cache.redis_cache,
+                        str(game_player.id),
+                        game_player.game_id,
+                        len(game_player.action_list),
+                        get_time_left_in_seconds(game_player.decision_time) + 1,
                     )
                     await GamePlayer.get_motor_collection().find_one_and_update(
                         {"_id": PydanticObjectId(game_player.id)},
@@ -331,9 +393,9 @@ async def disconnect(sid):
         await sio.disconnect(sid)
         await redis_cache.redis_cache.delete(sid)
 
-        print(sid, "disconnected")
+        logger.info("disconnect", extra={"game_id": user_session_data["game_id"]})
     except KeyError as e:
-        print(str(e))
+        logger.warning("disconnect without session data: %s", e)
         # user_session_data = await redis_cache.redis_cache.hgetall(sid)
         # await redis_cache.redis_cache.decr(f"{user_session_data['game_id']}:player_count")
         # await external_sio.emit(
@@ -342,4 +404,5 @@ async def disconnect(sid):
         #     room=user_session_data['game_id']
         # )
         await sio.disconnect(sid)
-        print(sid, "disconnected")
+    finally:
+        log_context.reset(token)
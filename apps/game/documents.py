@@ -58,7 +58,8 @@ class GameRound(Document):
 
     winner: str = None
     was_reset: bool = False
-    finished: bool = False
+    # None marks a round pre-allocated during the previous round's dealing phase
+    finished: Optional[bool] = False
     prev_round_id: str = None
 
     dealer_name: str = None
@@ -1,4 +1,5 @@
 from typing import Dict
+from apps.connections import redis_cache
 from apps.game.documents import GameRound, GamePlayer
 from apps.game.services.custom_exception import ValidationError
 
@@ -28,69 +29,127 @@ class BaseGameManager:
         total_bet: float = 0,
         split_external_id: str = None,
     ) -> Dict:
-        if cards is None:
-            cards = []
         return await GamePlayer.get_motor_collection().find_one_and_update(
+            self.get_game_player_filter(seat_number),
             {
-                "user_id": self.user_id,
-                "game_id": self.game_id,
-                "merchant": self.merchant_id,
-                "archived": False,
-                "seat_number": seat_number,
-            },
-            {
-                "$setOnInsert": {
-                    "sid": sid,
-                    "user_token": self.user_session_data["user_token"],
-                    "user_id": self.user_id,
-                    "player_id": self.user_session_data["player_id"],
-                    "user_name": self.user_session_data["user_name"],
-                    "game_id": self.game_id,
-                    "game_round": game_round_id,
-                    "merchant": self.merchant_id,
-                    "bet": bet if bet > 0 else 0,
-                    "bet_list": [bet] if bet > 0 else [],
-                    "bet_21_3": 0,
-                    "bet_21_3_list": [],
-                    "bet_21_3_winning": 0,
-                    "bet_21_3_combination": None,
-                    "bet_perfect_pair": 0,
-                    "bet_perfect_pair_list": [],
-                    "bet_perfect_pair_winning": 0,
-                    "bet_perfect_pair_combination": None,
-                    "action_list": [{"split": bet}] if split_external_id else [],
-                    "decision_time": "",
-                    "deposit": balance,
-                    "insured": None,
-                    "total_bet": total_bet,
-                    "archived": False,
-                    "cards": cards,
-                    "is_active": True,
-                    "seat_number": seat_number,
-                    "finished_turn": False,
-                    "external_ids": {"split": split_external_id}
-                    if split_external_id
-                    else {},
-                    "last_action": "split:2" if split_external_id else None,
-                    "inactivity_check_time": 0,
-                }
+                "$setOnInsert": self.generate_game_player_defaults(
+                    game_round_id,
+                    seat_number,
+                    sid,
+                    balance,
+                    cards,
+                    bet,
+                    total_bet,
+                    split_external_id,
+                )
             },
             upsert=True,
             return_document=True,
         )
 
+    def get_game_player_filter(self, seat_number: int) -> Dict:
+        return {
+            "user_id": self.user_id,
+            "game_id": self.game_id,
+            "merchant": self.merchant_id,
+            "archived": False,
+            "seat_number": seat_number,
+        }
+
+    def generate_game_player_defaults(
+        self,
+        game_round_id: str,
+        seat_number: int,
+        sid: str,
+        balance: float,
+        cards=None,
+        bet: float = 0,
+        total_bet: float = 0,
+        split_external_id: str = None,
+    ) -> Dict:
+        if cards is None:
+            cards = []
+        return {
+            "sid": sid,
+            "user_token": self.user_session_data["user_token"],
+            "user_id": self.user_id,
+            "player_id": self.user_session_data["player_id"],
+            "user_name": self.user_session_data["user_name"],
+            "game_id": self.game_id,
+            "game_round": game_round_id,
+            "merchant": self.merchant_id,
+            "bet": bet if bet > 0 else 0,
+            "bet_list": [bet] if bet > 0 else [],
+            "bet_21_3": 0,
+            "bet_21_3_list": [],
+            "bet_21_3_winning": 0,
+            "bet_21_3_combination": None,
+            "bet_perfect_pair": 0,
+            "bet_perfect_pair_list": [],
+            "bet_perfect_pair_winning": 0,
+            "bet_perfect_pair_combination": None,
+            "action_list": [{"split": bet}] if split_external_id else [],
+            "decision_time": "",
+            # the cached balance is read from redis as a string, $inc needs a number
+            "deposit": float(balance),
+            "insured": None,
+            "total_bet": total_bet,
+            "archived": False,
+            "cards": cards,
+            "is_active": True,
+            "seat_number": seat_number,
+            "finished_turn": False,
+            "external_ids": {"split": split_external_id} if split_external_id else {},
+            "last_action": "split:2" if split_external_id else None,
+            "inactivity_check_time": 0,
+        }
+
     async def get_game_player(self, seat_number: int) -> Dict:
         return await GamePlayer.get_motor_collection().find_one(
-            {
-                "user_id": self.user_id,
-                "game_id": self.game_id,
-                "merchant": self.merchant_id,
-                "archived": False,
-                "seat_number": seat_number,
-            }
+            self.get_game_player_filter(seat_number)
         )
 
     @staticmethod
     async def check_positive_amount(amount: float):
         if amount <= 0:
             raise ValidationError("Unsupported amount")
+
+    @staticmethod
+    async def increment_user_total_bet(game_player: dict, amount: float) -> float:
+        """Running total of the player's bets over all seats of the round. The total is kept
+        in redis, the aggregation only runs when it is not cached yet. The aggregation already
+        counts this bet, so the bet is not added again when the total is seeded."""
+        user_total_bet = await redis_cache.increment_user_total_bet(
+            game_player["game_round"], game_player["player_id"], amount
+        )
+        if user_total_bet is None:
+            user_total_bet = await redis_cache.seed_user_total_bet(
+                game_player["game_round"],
+                game_player["player_id"],
+                await BaseGameManager.aggregate_user_total_bet(game_player),
+            )
+        return user_total_bet
+
+    @staticmethod
+    async def aggregate_user_total_bet(game_player: dict) -> float:
+        user_total_bet = (
+            await GamePlayer.get_motor_collection()
+            .aggregate(
+                [
+                    {
+                        "$match": {
+                            "player_id": game_player["player_id"],
+                            "game_round": game_player["game_round"],
+                        }
+                    },
+                    {
+                        "$group": {
+                            "_id": "$player_id",
+                            "user_total_bet": {"$sum": "$total_bet"},
+                        }
+                    },
+                ]
+            )
+            .to_list(length=1)
+        )
+        return user_total_bet[0].get("user_total_bet", 0) if user_total_bet else 0
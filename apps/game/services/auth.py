@@ -1,6 +1,8 @@
+import secrets
+
 import jwt
 
-from fastapi import HTTPException, status, Cookie
+from fastapi import HTTPException, status, Cookie, Header
 
 from apps.config import settings
 
@@ -19,3 +21,11 @@ def check_token(token: str = Cookie(None)):
         jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
     except jwt.exceptions.InvalidTokenError:
         raise credentials_exception
+
+
+def check_admin_key(admin_key: str = Header("")):
+    """Admin routes, closed while ``settings.ADMIN_API_KEY`` is empty."""
+    if not settings.ADMIN_API_KEY or not secrets.compare_digest(
+        admin_key, settings.ADMIN_API_KEY
+    ):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
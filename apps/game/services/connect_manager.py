@@ -3,7 +3,10 @@ from typing import Optional, Tuple, List
 from apps.connections import redis_cache
 from apps.game.documents import GamePlayer
 from apps.game.services.core_bridge import validate_user_token
+from apps.game.services.timeout_registry import cancel_timeout
+from apps.game.services.wallet_ledger import wallet_ledger
 from apps.game.services.custom_exception import ValidationError
+from apps.game.state import find_constructed
 from apps.game.cards.hand import Hand
 from apps.game.services.utils import (
     get_game_round,
@@ -15,6 +18,29 @@ from apps.game.services.utils import (
 )
 
 
+# the fields of the seats sent on connect
+SEAT_FIELDS = (
+    "seat_number",
+    "cards",
+    "last_action",
+    "user_name",
+    "making_decision",
+    "player_turn",
+    "decision_time",
+    "user_id",
+    "merchant",
+    "player_id",
+    "insured",
+    "deposit",
+    "bet",
+    "bet_list",
+    "bet_21_3",
+    "bet_21_3_list",
+    "bet_perfect_pair",
+    "bet_perfect_pair_list",
+)
+
+
 class BaseConnectManager:
     def __init__(self, game_id: str, sid: str):
         self.game_id = game_id
@@ -61,10 +87,11 @@ class BaseConnectManager:
         seats = {}
         chips = {}
         total_bet = 0
-        game_players: List[GamePlayer] = (
-            await GamePlayer.find(GamePlayer.game_round == str(self.game_round["_id"]))
-            .sort("seat_number")
-            .to_list()
+        game_players: List[GamePlayer] = await find_constructed(
+            GamePlayer,
+            {"game_round": str(self.game_round["_id"])},
+            SEAT_FIELDS,
+            sort="seat_number",
         )
         for game_player in game_players:
             seats[int(game_player.seat_number)] = {
@@ -142,6 +169,8 @@ class ConnectManager(BaseConnectManager):
         user_data = await self._check_if_user_can_connect()
         self.base_data = await super().generate_base_connect_data()
         self.game_players = await self._update_game_player_if_exists(user_data)
+        for game_player in self.game_players:
+            await cancel_timeout(redis_cache.redis_cache, str(game_player["_id"]))
         self.history = await self.get_last_ten_gameplay_history(user_data)
         self.repeat_data = await redis_cache.get(
             f"{user_data['user_id']}:{self.merchant_id}:{str(self.game_round['prev_round_id'])}"
@@ -170,6 +199,8 @@ class ConnectManager(BaseConnectManager):
         raise ValidationError("Can not identify user please try again")
 
     async def _update_game_player_if_exists(self, user_data: dict) -> None:
+        # the pending timeouts are cancelled below, so the inactivity check is reset
+        # with them and the next disconnect registers a new one
         await GamePlayer.get_motor_collection().update_many(
             {
                 "game_round": str(self.game_round["_id"]),
@@ -183,6 +214,7 @@ class ConnectManager(BaseConnectManager):
                     "user_token": self.user_token,
                     "sid": self.sid,
                     "is_active": True,
+                    "inactivity_check_time": 0,
                 }
             },
         )
@@ -220,10 +252,9 @@ class ConnectManager(BaseConnectManager):
                 f"{user_data['user_id']}:{self.merchant_id}"
             )
         else:
-            await redis_cache.set_user_balance_in_cache(
+            self.user_balance = await wallet_ledger.reconcile(
                 user_data["user_id"], self.merchant_id, user_data["total_balance"]
             )
-            self.user_balance = user_data["total_balance"]
 
     def generate_default_send_data(self, user_data):
         return {
@@ -1,11 +1,19 @@
 """ This module is for making http request to Core api for example: getting user balance, place some bets etc. """
+import logging
+
 import httpx
 
+from apps import codec
+from apps.config import settings
 from apps.game.services.custom_exception import ValidationError
+from apps.game.services.merchant_guard import merchant_guard
 from apps.game.services.schema_generator import (
     generate_authentication_request_data,
     inflect_response_data,
 )
+from apps.tracing import get_trace_headers
+
+logger = logging.getLogger(__name__)
 
 
 async def validate_user_token(token: str, merchant_data: dict):  # pragma: no cover
@@ -14,17 +22,38 @@ async def validate_user_token(token: str, merchant_data: dict):  # pragma: no co
     :param merchant_check_url is a dictionary representation of merchant data from redis.
     """
     data = generate_authentication_request_data(token, merchant_data["schema_type"])
-    async with httpx.AsyncClient() as client:
-        resp = await client.post(merchant_data["validate_token_url"], json=data)
-        response = inflect_response_data(resp.json())
+    url = merchant_data["validate_token_url"]
+    async with httpx.AsyncClient(
+        timeout=settings.MERCHANT_TIMEOUT
+    ) as client, merchant_guard.guard_async(url) as result:
+        resp = await client.post(
+            url,
+            content=codec.dumps_bytes(data),
+            headers={**codec.CONTENT_TYPE_HEADERS, **get_trace_headers()},
+        )
+        result["ok"] = resp.status_code < 500
+        response_data = codec.load_response(resp)
+        response = inflect_response_data(response_data)
         if resp.status_code != 200 or response["status"].lower() == "failed":
             raise ValidationError("Can not validate user token please try again")
-        return resp.json()
+        return response_data
 
 
 async def send_data_to_merchant(url, data):
     transport = httpx.AsyncHTTPTransport(retries=5)
-    async with httpx.AsyncClient(transport=transport) as client:
-        resp = await client.post(url, json=data)
-        print(resp.json())
-        return resp.status_code, inflect_response_data(resp.json())
+    async with httpx.AsyncClient(
+        transport=transport, timeout=settings.MERCHANT_TIMEOUT
+    ) as client, merchant_guard.guard_async(url) as result:
+        resp = await client.post(
+            url,
+            content=codec.dumps_bytes(data),
+            headers={**codec.CONTENT_TYPE_HEADERS, **get_trace_headers()},
+        )
+        result["ok"] = resp.status_code < 500
+        response_data = codec.load_response(resp)
+        logger.debug(
+            "Merchant response %s",
+            resp.status_code,
+            extra={"url": url, "response": response_data},
+        )
+        return resp.status_code, inflect_response_data(response_data)
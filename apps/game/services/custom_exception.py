@@ -1,2 +1,6 @@
 class ValidationError(Exception):
     pass
+
+
+class MerchantUnavailable(ValidationError):
+    pass
@@ -5,10 +5,14 @@ import socketio
 from apps.config import settings
 from apps.game.betting.betting_manager import BettingManager
 
-from apps.game.documents import GamePlayer, GameRound
+from apps.game.documents import GamePlayer
+from apps.game.state import RoundState, SeatState
 from apps.game.cards.actions_card_manager import ActionCardManager
 from apps.game.services.custom_exception import ValidationError
 from apps.game.services.utils import get_timestamp
+from apps.connections import redis_cache
+from apps.game.services.timeout_registry import cancel_timeout
+from apps.game.services.wallet_ledger import wallet_ledger
 from apps.game.cards.hand import Hand
 
 external_sio = socketio.AsyncRedisManager(settings.WS_MESSAGE_QUEUE, write_only=True)
@@ -28,7 +32,7 @@ class DispatchActionManager:
         self.seat_number = seat_number
         self.sid = sid
         self.action_type = action_type
-        self.game_player: Optional[GamePlayer] = None
+        self.game_player: Optional[SeatState] = None
 
     async def make_action(self) -> Tuple:
         try:
@@ -40,13 +44,14 @@ class DispatchActionManager:
                 "split": self.split,
             }
             await self.get_player_and_validate_action()
+            await cancel_timeout(redis_cache.redis_cache, str(self.game_player.id))
             return await actions.get(self.action_type)()
         except AttributeError:
             raise ValidationError("Can not make Action")
 
     async def get_player_and_validate_action(self) -> None:
         try:
-            self.game_player = await GamePlayer.find_one(
+            self.game_player = await SeatState.find_one(
                 {
                     "game_round": self.round_id,
                     "making_decision": True,
@@ -98,7 +103,7 @@ class DispatchActionManager:
         return "player_action", data, self.game_player.game_id
 
     async def make_double(self) -> None:
-        self.game_player = await GamePlayer.find_one(
+        self.game_player = await SeatState.find_one(
             {
                 "game_round": self.round_id,
                 "sid": self.sid,
@@ -108,7 +113,7 @@ class DispatchActionManager:
         )
         self.validate_action()
         self.check_decision_timestamp()
-        self.validate_action_for_split_and_double()
+        await self.validate_action_for_split_and_double()
 
         if update_game_player_data := await BettingManager.make_double(
             self.session_data, self.game_player
@@ -125,7 +130,7 @@ class DispatchActionManager:
             )
 
     async def make_insurance(self, value: bool) -> None:
-        self.game_player = await GamePlayer.find_one(
+        self.game_player = await SeatState.find_one(
             {
                 "game_round": self.round_id,
                 "seat_number": self.seat_number,
@@ -171,16 +176,22 @@ class DispatchActionManager:
         if not hand.can_continue_game():
             raise ValidationError("Can not make Action")
 
-    def validate_action_for_split_and_double(self):
+    async def get_user_balance(self) -> float:
+        """The wallet balance is shared by every seat of the user, the deposit of a seat only
+        counts the bets of that seat."""
+        balance = await wallet_ledger.get_balance(
+            self.game_player.user_id, self.game_player.merchant
+        )
+        return balance if balance is not None else float(self.game_player.deposit)
+
+    async def validate_action_for_split_and_double(self):
         if len(self.game_player.cards) > 2:
             raise ValidationError(f"Action {self.action_type} is not allowed")
-        if float(self.game_player.deposit) < self.game_player.bet:
+        if await self.get_user_balance() < self.game_player.bet:
             raise ValidationError(f"Not enough fund to make {self.action_type}")
 
     async def validate_action_for_insurance(self):
-        self.game_round: GameRound = await GameRound.find_one(
-            {"_id": ObjectId(self.round_id)}
-        )
+        self.game_round = await RoundState.get(self.round_id)
 
         if len(self.game_player.cards) > 2:
             raise ValidationError("Action insurance is not allowed")
@@ -192,5 +203,5 @@ class DispatchActionManager:
             )
         if float(self.game_round.insurance_timestamp) <= float(get_timestamp()):
             raise ValidationError("Time for making insurance is over")
-        if float(self.game_player.deposit) < (self.game_player.bet / 2):
+        if await self.get_user_balance() < (self.game_player.bet / 2):
             raise ValidationError("Not enough fund to make insurance")
@@ -0,0 +1,192 @@
+""" Per merchant host circuit breaker with an adaptive (AIMD) concurrency limit.
+The same guard protects the async requests of the ASGI process and the blocking requests of
+celery workers, so one slow or failing merchant can not take the workers of the others.
+The breaker and the limit live in the memory of each process: every ASGI worker, celery child
+and outbox dispatcher counts its own failures and in-flight requests, so a host gets up to
+``MERCHANT_CONCURRENCY_MAX`` requests from each of them. In a prefork celery child, which sends
+one request at a time, only the breaker applies; the limit binds in the ASGI workers and in the
+outbox dispatchers, which send ``OUTBOX_CONCURRENCY`` requests at once. """
+import asyncio
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import requests
+
+from apps import codec
+from apps.config import settings
+from apps.game.services.custom_exception import MerchantUnavailable
+from apps.metrics import add_span
+from apps.tracing import get_trace_headers, start_span
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class HostGuard:
+    def __init__(self, host: str):
+        self.host = host
+        self.state = CLOSED
+        self.limit = float(settings.MERCHANT_CONCURRENCY_INITIAL)
+        self.in_flight = 0
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.last_decrease = 0.0
+        self._lock = threading.Lock()
+        self.stats = {
+            "requests": 0,
+            "failures": 0,
+            "rejected": 0,
+            "transitions": {},
+        }
+
+    def try_acquire(self) -> bool:
+        """Returns False when the concurrency limit of the host is reached."""
+        with self._lock:
+            if self.state == OPEN:
+                if (
+                    time.monotonic() - self.opened_at
+                    < settings.MERCHANT_BREAKER_COOLDOWN
+                ):
+                    self._reject()
+                self._transition(HALF_OPEN)
+            if self.state == HALF_OPEN and self.in_flight:
+                # a single probe request decides whether the merchant is back
+                self._reject()
+            if self.in_flight >= int(self.limit):
+                return False
+            self.in_flight += 1
+            self.stats["requests"] += 1
+            return True
+
+    def acquire(self) -> None:
+        """Blocking workers are the scarce resource, so they never wait for a slot."""
+        if not self.try_acquire():
+            self._reject()
+
+    async def acquire_async(self) -> None:
+        deadline = time.monotonic() + settings.MERCHANT_QUEUE_TIMEOUT
+        while not self.try_acquire():
+            if time.monotonic() > deadline:
+                self._reject()
+            await asyncio.sleep(0.005)
+
+    def release(self, latency: float, ok: bool) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            if ok:
+                self.consecutive_failures = 0
+                if self.state == HALF_OPEN:
+                    self._transition(CLOSED)
+            else:
+                self.stats["failures"] += 1
+                self.consecutive_failures += 1
+                if self.state == HALF_OPEN or (
+                    self.state == CLOSED
+                    and self.consecutive_failures >= settings.MERCHANT_BREAKER_FAILURES
+                ):
+                    self.opened_at = time.monotonic()
+                    self._transition(OPEN)
+            if ok and latency <= settings.MERCHANT_LATENCY_TARGET:
+                self.limit = min(
+                    self.limit + 1 / self.limit, settings.MERCHANT_CONCURRENCY_MAX
+                )
+            elif (
+                time.monotonic() - self.last_decrease > settings.MERCHANT_LATENCY_TARGET
+            ):
+                # one decrease per latency window, a burst of slow responses is one signal
+                self.last_decrease = time.monotonic()
+                self.limit = max(self.limit / 2, settings.MERCHANT_CONCURRENCY_MIN)
+
+    def get_stats(self) -> dict:
+        return {
+            **self.stats,
+            "state": self.state,
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+        }
+
+    def _reject(self):
+        self.stats["rejected"] += 1
+        raise MerchantUnavailable("Merchant is unavailable, please try again")
+
+    def _transition(self, state: str) -> None:
+        transition = f"{self.state}->{state}"
+        self.stats["transitions"][transition] = (
+            self.stats["transitions"].get(transition, 0) + 1
+        )
+        logger.warning("Merchant %s circuit %s", self.host, transition)
+        self.state = state
+
+
+class MerchantGuard:
+    def __init__(self):
+        self._hosts: Dict[str, HostGuard] = {}
+        self._lock = threading.Lock()
+
+    def get(self, url: str) -> HostGuard:
+        host = urlparse(url).netloc
+        if host not in self._hosts:
+            with self._lock:
+                self._hosts.setdefault(host, HostGuard(host))
+        return self._hosts[host]
+
+    @contextmanager
+    def guard(self, url: str):
+        """The response is reported through the yielded dict, ``result["ok"] = ...``.
+        The request is traced, ``get_trace_headers`` within the block are its ``traceparent``."""
+        host_guard = self.get(url)
+        host_guard.acquire()
+        result = {"ok": False}
+        started_at = time.monotonic()
+        try:
+            with start_span(f"POST {host_guard.host}", "client", url=url) as span:
+                yield result
+                span.attributes["ok"] = result["ok"]
+        finally:
+            latency = time.monotonic() - started_at
+            add_span("http", latency)
+            host_guard.release(latency, result["ok"])
+
+    @asynccontextmanager
+    async def guard_async(self, url: str):
+        host_guard = self.get(url)
+        await host_guard.acquire_async()
+        result = {"ok": False}
+        started_at = time.monotonic()
+        try:
+            with start_span(f"POST {host_guard.host}", "client", url=url) as span:
+                yield result
+                span.attributes["ok"] = result["ok"]
+        finally:
+            latency = time.monotonic() - started_at
+            add_span("http", latency)
+            host_guard.release(latency, result["ok"])
+
+    def get_stats(self) -> Dict[str, dict]:
+        return {host: guard.get_stats() for host, guard in self._hosts.items()}
+
+    def reset(self) -> None:
+        self._hosts = {}
+
+
+def post(url: str, data: dict, timeout: Optional[float] = None) -> requests.Response:
+    """``requests.post`` of celery workers behind the guard of the merchant host."""
+    with merchant_guard.guard(url) as result:
+        response = requests.post(
+            url,
+            data=codec.dumps_bytes(data),
+            headers={**codec.CONTENT_TYPE_HEADERS, **get_trace_headers()},
+            timeout=timeout or settings.MERCHANT_TIMEOUT,
+        )
+        result["ok"] = response.status_code < 500
+        return response
+
+
+merchant_guard = MerchantGuard()
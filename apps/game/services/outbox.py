@@ -0,0 +1,469 @@
+""" Durable outbox of merchant transactions.
+Bets, winnings and reset rollbacks are written to the ``MerchantTransaction`` collection, keyed by their
+idempotent external id, before anything is sent. Dispatchers claim batches of due transactions
+with a lease, send them with bounded concurrency and retry failures with exponential backoff.
+A dispatcher which dies mid-batch only delays its claims until the lease runs out.
+Run more dispatchers over disjoint partitions with
+``python -m apps.game.services.outbox --partitions 0-7``. """
+import argparse
+import logging
+import os
+import socket
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+from uuid import uuid4
+
+import requests
+from pymongo import ASCENDING, UpdateOne
+
+from apps import codec
+from apps.config import settings
+from apps.game.services.custom_exception import MerchantUnavailable
+from apps.game.services.merchant_guard import merchant_guard, post as merchant_post
+from apps.game.services.schema_generator import (
+    generate_bet_request_data,
+    generate_reset_request_data,
+    generate_win_request_data,
+    inflect_response_data,
+)
+from apps.game.services.wallet_ledger import get_external_id
+from apps.tracing import start_span
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_COLLECTION = "MerchantTransaction"
+
+PENDING = "pending"
+SENT = "sent"
+FAILED = "failed"
+# the transaction it depends on was rejected by the merchant
+SKIPPED = "skipped"
+
+# KEYS - the dispatch slot; ARGV - token ("<due timestamp>:<id>") of the scheduled run, ttl,
+# margin. A run due more than the margin before the scheduled one takes the slot over, the
+# later run finds its token replaced and does not come back.
+TAKE_DISPATCH_SLOT_SCRIPT = """
+local current = redis.call('get', KEYS[1])
+local due = tonumber(string.match(ARGV[1], '^[^:]+'))
+if current and tonumber(string.match(current, '^[^:]+')) - ARGV[3] <= due then
+    return 0
+end
+redis.call('set', KEYS[1], ARGV[1], 'EX', ARGV[2])
+return 1
+"""
+
+# KEYS - the dispatch slot; ARGV - token of the run which comes back
+RELEASE_DISPATCH_SLOT_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    redis.call('del', KEYS[1])
+    return 1
+end
+return 0
+"""
+
+# handler(transaction, merchant response data), called before the transaction is marked sent or
+# skipped, and with ``{"status": FAILED}`` once it runs out of attempts
+Handler = Callable[[dict, dict], None]
+
+
+def get_partition(game_player: dict) -> int:
+    """Transactions of one player always land in the same partition, so one dispatcher claims
+    them. A batch is sent concurrently and retries back off, a transaction which has to follow
+    another one names it in ``depends_on``."""
+    key = f"{game_player['user_id']}:{game_player['merchant']}"
+    return zlib.crc32(key.encode()) % settings.OUTBOX_PARTITIONS
+
+
+def generate_transaction(
+    transaction_type: str,
+    url: str,
+    send_data: dict,
+    game_player: dict,
+    external_id: str,
+    amount: float,
+    depends_on: Optional[str] = None,
+    **context,
+) -> dict:
+    """:param depends_on - external id of an outbox transaction which has to be sent first"""
+    now = time.time()
+    return {
+        "_id": external_id,
+        "type": transaction_type,
+        "url": url,
+        "send_data": send_data,
+        "amount": amount,
+        "game_player": game_player,
+        "context": context,
+        "depends_on": depends_on,
+        "partition": get_partition(game_player),
+        "status": PENDING,
+        "attempts": 0,
+        "next_attempt_at": now,
+        "claimed_by": None,
+        "claimed_until": 0,
+        "created_at": now,
+    }
+
+
+def generate_bet_transaction(bet_url: str, game_player: dict, schema_type: str) -> dict:
+    external_id = get_external_id(game_player["_id"], "bet")
+    send_data = generate_bet_request_data(
+        schema_type, game_player["total_bet"], game_player, external_id
+    )
+    return generate_transaction(
+        "bet", bet_url, send_data, game_player, external_id, game_player["total_bet"]
+    )
+
+
+def generate_win_transaction(
+    win_url: str, game_player: dict, win: float, round_data: dict, schema_type: str
+) -> dict:
+    """Winning, push or lose (a win of 0) of the game player, sent after the bet."""
+    if win > game_player["bet"]:
+        transaction_type = "win"
+    elif win == game_player["bet"]:
+        transaction_type = "push"
+    else:
+        transaction_type, win = "lose", 0
+    external_id = get_external_id(game_player["_id"], "win")
+    send_data = generate_win_request_data(schema_type, win, game_player, external_id)
+    return generate_transaction(
+        transaction_type,
+        win_url,
+        send_data,
+        game_player,
+        external_id,
+        win,
+        depends_on=get_external_id(game_player["_id"], "bet"),
+        round_data=round_data,
+    )
+
+
+def generate_cancel_transaction(
+    rollback_url: str,
+    game_player: dict,
+    bet_type: str,
+    amount: float,
+    schema_type: str,
+) -> dict:
+    """Rollback of the ``bet_type`` transaction, sent after the canceled one."""
+    send_data = generate_reset_request_data(schema_type, amount, game_player, bet_type)
+    return generate_transaction(
+        "cancel",
+        rollback_url,
+        send_data,
+        game_player,
+        game_player["external_ids"][f"cancel_{bet_type}"],
+        amount,
+        depends_on=game_player["external_ids"][bet_type],
+        bet_type=bet_type,
+    )
+
+
+def get_enqueue_operations(transactions: List[dict]) -> List[UpdateOne]:
+    """Upserts keyed by the external id, enqueuing the same transaction twice is a no-op.
+    Works with ``bulk_write`` of both pymongo and motor collections."""
+    return [
+        UpdateOne(
+            {"_id": transaction["_id"]}, {"$setOnInsert": transaction}, upsert=True
+        )
+        for transaction in transactions
+    ]
+
+
+def get_dispatch_slot_key(partitions: Optional[List[int]]) -> str:
+    return f"outbox:dispatch_slot:{','.join(map(str, partitions or [])) or 'all'}"
+
+
+def take_dispatch_slot_sync(
+    client, partitions: Optional[List[int]], countdown: float
+) -> Optional[str]:
+    """Returns the token of a dispatch run due in ``countdown`` seconds, None when a run of
+    the partitions is already scheduled by then. Every enqueue starts a run, only the one
+    holding the slot comes back for the retries. The slot of a lost run expires."""
+    token = f"{time.time() + countdown}:{uuid4().hex}"
+    ttl = int(countdown + settings.OUTBOX_LEASE_SECONDS) + 1
+    key = get_dispatch_slot_key(partitions)
+    margin = settings.OUTBOX_BACKOFF_BASE
+    if client.eval(TAKE_DISPATCH_SLOT_SCRIPT, 1, key, token, ttl, margin):
+        return token
+    return None
+
+
+def release_dispatch_slot_sync(
+    client, partitions: Optional[List[int]], token: str
+) -> bool:
+    """Returns False when an earlier run took the slot over."""
+    key = get_dispatch_slot_key(partitions)
+    return bool(client.eval(RELEASE_DISPATCH_SLOT_SCRIPT, 1, key, token))
+
+
+def parse_partitions(value: str) -> List[int]:
+    """``"0-3,8"`` -> ``[0, 1, 2, 3, 8]``"""
+    partitions = []
+    for part in value.split(","):
+        start, _, end = part.partition("-")
+        partitions.extend(range(int(start), int(end or start) + 1))
+    return partitions
+
+
+class OutboxDispatcher:
+    def __init__(
+        self,
+        database,
+        handlers: Dict[str, Handler],
+        partitions: Optional[List[int]] = None,
+        batch_size: int = settings.OUTBOX_BATCH_SIZE,
+        concurrency: int = settings.OUTBOX_CONCURRENCY,
+    ):
+        self.collection = database[OUTBOX_COLLECTION]
+        self.handlers = handlers
+        self.partitions = partitions or list(range(settings.OUTBOX_PARTITIONS))
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+        self.stats = {
+            "claimed": 0,
+            "sent": 0,
+            "skipped": 0,
+            "waiting": 0,
+            "retried": 0,
+            "failed": 0,
+        }
+        self.collection.create_index(
+            [
+                ("status", ASCENDING),
+                ("partition", ASCENDING),
+                ("next_attempt_at", ASCENDING),
+            ]
+        )
+
+    def claim(self) -> List[dict]:
+        now = time.time()
+        due = {
+            "status": PENDING,
+            "partition": {"$in": self.partitions},
+            "next_attempt_at": {"$lte": now},
+            "claimed_until": {"$lt": now},
+        }
+        ids = [
+            transaction["_id"]
+            for transaction in self.collection.find(due, {"_id": 1})
+            .sort("next_attempt_at", ASCENDING)
+            .limit(self.batch_size)
+        ]
+        if not ids:
+            return []
+        claim_id = f"{self.worker_id}:{uuid4().hex[:8]}"
+        # another dispatcher may have claimed some of them since the find
+        self.collection.update_many(
+            {"_id": {"$in": ids}, "status": PENDING, "claimed_until": {"$lt": now}},
+            {
+                "$set": {
+                    "claimed_by": claim_id,
+                    "claimed_until": now + settings.OUTBOX_LEASE_SECONDS,
+                }
+            },
+        )
+        claimed = list(self.collection.find({"claimed_by": claim_id}))
+        self.stats["claimed"] += len(claimed)
+        return claimed
+
+    def dispatch(self) -> int:
+        """Sends one batch, returns the number of claimed transactions."""
+        claimed = self.claim()
+        if not claimed:
+            return 0
+        pending, failed, rejected = self.get_dependencies(claimed)
+        ready = []
+        for transaction in claimed:
+            if transaction.get("depends_on") in pending:
+                self._wait(transaction, f"waiting for {transaction['depends_on']}")
+            elif transaction.get("depends_on") in failed:
+                self._retry(transaction, f"{transaction['depends_on']} failed")
+            elif transaction.get("depends_on") in rejected:
+                self._complete(transaction, {"status": SKIPPED}, SKIPPED)
+            else:
+                ready.append(transaction)
+        ready = self.limit_to_merchants(ready)
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for transaction, data, error, requested in executor.map(self._send, ready):
+                if error is None:
+                    self._complete(transaction, data)
+                elif not requested:
+                    # the guard turned the request down, it never reached the merchant
+                    self._wait(transaction, error)
+                else:
+                    self._retry(transaction, error)
+        return len(claimed)
+
+    def limit_to_merchants(self, transactions: List[dict]) -> List[dict]:
+        """The transactions the concurrency limits of the merchant hosts let through. The rest
+        are put back for the next batch, a host whose limit dropped to
+        ``MERCHANT_CONCURRENCY_MIN`` does not reject the other ``OUTBOX_CONCURRENCY`` requests."""
+        free_slots = {}
+        allowed = []
+        for transaction in transactions:
+            host_guard = merchant_guard.get(transaction["url"])
+            if host_guard.host not in free_slots:
+                free_slots[host_guard.host] = (
+                    int(host_guard.limit) - host_guard.in_flight
+                )
+            if free_slots[host_guard.host] > 0:
+                free_slots[host_guard.host] -= 1
+                allowed.append(transaction)
+            else:
+                self._wait(transaction, f"{host_guard.host} is at its limit", delay=0)
+        return allowed
+
+    def get_dependencies(self, transactions: List[dict]) -> Tuple[set, set, set]:
+        """External ids of the dependencies which are in the outbox and still pending, of
+        those which failed and of those the merchant rejected. Dependencies outside of the
+        outbox are sent."""
+        dependencies = [
+            transaction["depends_on"]
+            for transaction in transactions
+            if transaction.get("depends_on")
+        ]
+        pending, failed, rejected = set(), set(), set()
+        if not dependencies:
+            return pending, failed, rejected
+        for dependency in self.collection.find(
+            {"_id": {"$in": dependencies}}, {"status": 1, "response.status": 1}
+        ):
+            if dependency["status"] == PENDING:
+                pending.add(dependency["_id"])
+            elif dependency["status"] == FAILED:
+                failed.add(dependency["_id"])
+            elif dependency["response"]["status"].lower() != "ok":
+                rejected.add(dependency["_id"])
+        return pending, failed, rejected
+
+    def drain(self) -> dict:
+        while self.dispatch():
+            pass
+        return self.stats
+
+    def run_forever(self, poll_interval: float = settings.OUTBOX_POLL_SECONDS) -> None:
+        while True:
+            if not self.dispatch():
+                time.sleep(poll_interval)
+
+    def get_next_attempt_in(self) -> Optional[float]:
+        """Seconds until the earliest pending transaction of the partitions is due."""
+        transaction = self.collection.find_one(
+            {"status": PENDING, "partition": {"$in": self.partitions}},
+            {"next_attempt_at": 1, "claimed_until": 1},
+            sort=[("next_attempt_at", ASCENDING)],
+        )
+        if transaction is None:
+            return None
+        due = max(transaction["next_attempt_at"], transaction["claimed_until"])
+        return max(due - time.time(), 0)
+
+    @staticmethod
+    def _send(transaction: dict) -> Tuple[dict, Optional[dict], Optional[str], bool]:
+        """Returns the transaction, the response data, the error and whether the request
+        was made."""
+        game_player = transaction["game_player"]
+        try:
+            # a span of the round of the transaction, without a parent
+            with start_span(
+                f"outbox:{transaction['type']}",
+                round_id=game_player.get("game_round"),
+                game_id=game_player.get("game_id"),
+                attempt=transaction["attempts"],
+            ):
+                response = merchant_post(transaction["url"], transaction["send_data"])
+        except MerchantUnavailable as error:
+            return transaction, None, repr(error), False
+        except requests.RequestException as error:
+            return transaction, None, repr(error), True
+        if response.status_code != 200:
+            return transaction, None, f"status {response.status_code}", True
+        data = inflect_response_data(codec.load_response(response))
+        return transaction, data, None, True
+
+    def _complete(self, transaction: dict, data: dict, status: str = SENT) -> None:
+        try:
+            self.handlers[transaction["type"]](transaction, data)
+        except Exception as error:  # pragma: no cover
+            logger.exception("Outbox handler of %s failed", transaction["_id"])
+            self._retry(transaction, repr(error))
+            return
+        self.collection.update_one(
+            {"_id": transaction["_id"]},
+            {
+                "$set": {
+                    "status": status,
+                    "response": data,
+                    "sent_at": time.time(),
+                    "claimed_until": 0,
+                }
+            },
+        )
+        self.stats[status] += 1
+
+    def _wait(
+        self,
+        transaction: dict,
+        error: str,
+        delay: Optional[float] = None,
+    ) -> None:
+        """Puts back a transaction which was not sent, its dependency is still being sent or
+        the merchant guard held it back. However long that lasts, the wait does not use up
+        the attempts of the transaction."""
+        self.collection.update_one(
+            {"_id": transaction["_id"]},
+            {
+                "$set": {
+                    "last_error": error,
+                    "next_attempt_at": time.time()
+                    + (
+                        settings.OUTBOX_DEPENDENCY_WAIT_SECONDS
+                        if delay is None
+                        else delay
+                    ),
+                    "claimed_until": 0,
+                }
+            },
+        )
+        self.stats["waiting"] += 1
+
+    def _retry(self, transaction: dict, error: str) -> None:
+        attempts = transaction["attempts"] + 1
+        failed = attempts >= settings.OUTBOX_MAX_ATTEMPTS
+        backoff = min(
+            settings.OUTBOX_BACKOFF_BASE * 2 ** (attempts - 1),
+            settings.OUTBOX_BACKOFF_MAX,
+        )
+        self.collection.update_one(
+            {"_id": transaction["_id"]},
+            {
+                "$set": {
+                    "status": FAILED if failed else PENDING,
+                    "attempts": attempts,
+                    "last_error": error,
+                    "next_attempt_at": time.time() + backoff,
+                    "claimed_until": 0,
+                }
+            },
+        )
+        self.stats["failed" if failed else "retried"] += 1
+        if failed:
+            logger.error("Outbox transaction %s failed: %s", transaction["_id"], error)
+            try:
+                self.handlers[transaction["type"]](transaction, {"status": FAILED})
+            except Exception:  # pragma: no cover
+                logger.exception("Outbox handler of %s failed", transaction["_id"])
+
+
+if __name__ == "__main__":  # pragma: no cover
+    from apps.game.tasks import OUTBOX_HANDLERS, db
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--partitions", type=parse_partitions, default=None)
+    arguments = parser.parse_args()
+    OutboxDispatcher(db, OUTBOX_HANDLERS, arguments.partitions).run_forever()
@@ -1,27 +1,29 @@
-import json
+import time
 import socketio
 
-from uuid import uuid4
-
 from bson import ObjectId
 
+from apps import codec
 from apps.config import settings
 from apps.game.documents import GamePlayer, Merchant, GameRound
 from apps.game.services.custom_exception import ValidationError
-from apps.game.tasks import (
-    send_lose_event_and_game_player_history,
-    send_winning_to_merchant_and_update_game_player,
-    start_new_round,
-    send_push_to_merchant_and_update_game_player,
-    send_reset_to_merchant_and_update_game_player,
-    pay_winnings,
-)
+from apps.game.tasks import dispatch_outbox, start_new_round, pay_winnings
 from apps.game.services.utils import (
     check_cards_are_consecutive,
     get_time_left_in_seconds,
 )
-from apps.game.services.schema_generator import generate_reset_request_data
+from apps.game.services.outbox import (
+    OUTBOX_COLLECTION,
+    generate_bet_transaction,
+    generate_cancel_transaction,
+    generate_win_transaction,
+    get_enqueue_operations,
+)
+from apps.game.services.reset_tracker import start_reset
+from apps.game.services.wallet_ledger import get_external_id, wallet_ledger
+from apps.game.services.timer_wheel import timer_wheel
 from apps.game.cards.hand import Hand
+from apps.game.state import RoundState
 from apps.connections import redis_cache
 
 
@@ -32,31 +34,32 @@ class PaymentManager:
     def __init__(
         self,
         game_id: str,
-        game_round: dict,
+        game_round: RoundState,
     ):
         self.game_id = game_id
         self.game_round = game_round
+        self.transactions = []
 
     async def pay_winnings(self):
         await GameRound.get_motor_collection().find_one_and_update(
-            {"_id": ObjectId(self.game_round["_id"])},
+            {"_id": ObjectId(self.game_round.id)},
             {"$set": {"show_dealer_cards": True}},
         )
-        dealer_hand = Hand(self.game_round["dealer_cards"])
+        dealer_hand = Hand(self.game_round.dealer_cards)
 
         await external_sio.emit(
             "dealer_score",
             {
                 "score": dealer_hand.get_score_repr(),
-                "cards": self.game_round["dealer_cards"],
+                "cards": self.game_round.dealer_cards,
             },
             room=self.game_id,
         )
         taken_seats = {}
+        round_id = str(self.game_round.id)
         await GamePlayer.get_motor_collection().update_many(
-            {"game_round": str(self.game_round["_id"])}, {"$set": {"archived": True}}
+            {"game_round": round_id}, {"$set": {"archived": True}}
         )
-        dealer_hand = Hand(self.game_round["dealer_cards"])
         merchants = (
             await Merchant.get_motor_collection()
             .find(
@@ -67,13 +70,13 @@ class PaymentManager:
         )
 
         round_data = {
-            "dealer_cards": self.game_round["dealer_cards"],
-            "finished": self.game_round["finished"],
-            "created_at": self.game_round["created_at"],
-            "dealer_name": self.game_round["dealer_name"],
-            "round_id": self.game_round["round_id"],
-            "was_reset": self.game_round["was_reset"],
-            "winner": self.game_round["winner"],
+            "dealer_cards": self.game_round.dealer_cards,
+            "finished": self.game_round.finished,
+            "created_at": self.game_round.created_at,
+            "dealer_name": self.game_round.dealer_name,
+            "round_id": self.game_round.round_id,
+            "was_reset": self.game_round.was_reset,
+            "winner": self.game_round.winner,
         }
         total_winnings = {}
         for merchant in merchants:
@@ -83,7 +86,7 @@ class PaymentManager:
                 await GamePlayer.get_motor_collection()
                 .find(
                     {
-                        "game_round": str(self.game_round["_id"]),
+                        "game_round": round_id,
                         "merchant": str(merchant["_id"]),
                         "bet": {"$gt": 0},
                     }
@@ -111,37 +114,49 @@ class PaymentManager:
                 self.send_to_merchant(
                     win, game_player, win_url, round_data, schema_type
                 )
+        await self.enqueue_transactions()
         for sid, win in total_winnings.items():
             await external_sio.emit("total_winning", {"amount": win}, room=sid)
-        await redis_cache.set(f"{self.game_id}:taken_seats", json.dumps(taken_seats))
-        start_new_round.apply_async(
-            args=[self.game_id, str(self.game_round["_id"]), taken_seats],
-            countdown=10,
-            max_retries=5,
+        await redis_cache.set(f"{self.game_id}:settled_at", time.time())
+        await redis_cache.set(f"{self.game_id}:taken_seats", codec.dumps(taken_seats))
+        await redis_cache.delete_total_bets(round_id)
+        await timer_wheel.schedule(
+            f"start_new_round:{self.game_id}",
+            "start_new_round",
+            [self.game_id, round_id, taken_seats],
+            10,
         )
 
     def send_to_merchant(
         self, win, game_player, win_url, round_data, schema_type, *args
     ):
-        if win > game_player["bet"]:
-            send_winning_to_merchant_and_update_game_player.apply_async(
-                args=[game_player, win_url, win, round_data, schema_type],
-                max_retries=5,
-            )
-        elif win == game_player["bet"]:
-            send_push_to_merchant_and_update_game_player.apply_async(
-                args=[game_player, win_url, win, round_data, schema_type],
-                max_retries=5,
-            )
-        else:
-            send_lose_event_and_game_player_history.apply_async(
-                args=[game_player, win_url, round_data, schema_type],
-                max_retries=5,
-            )
+        self.transactions.append(
+            generate_win_transaction(win_url, game_player, win, round_data, schema_type)
+        )
+
+    async def enqueue_transactions(self):
+        if not self.transactions:
+            return
+        for transaction in self.transactions:
+            if transaction["type"] != "lose":
+                # the winning is spendable before the merchant pays it
+                await wallet_ledger.release(
+                    transaction["game_player"]["user_id"],
+                    transaction["game_player"]["merchant"],
+                    transaction["amount"],
+                )
+        await GamePlayer.get_motor_collection().database[OUTBOX_COLLECTION].bulk_write(
+            get_enqueue_operations(self.transactions), ordered=False
+        )
+        self.transactions = []
+        dispatch_outbox.delay()
 
     async def pay_winnings_after_insurance(self):
         pay_winnings.apply_async(
-            args=[self.game_id, self.game_round],
+            args=[
+                self.game_id,
+                {**self.game_round.to_document(), "_id": str(self.game_round.id)},
+            ],
             countdown=settings.ACCEPT_INSURANCE_SECONDS,
             max_retries=5,
         )
@@ -215,7 +230,7 @@ class PaymentManager:
             )
 
     @staticmethod
-    async def evaluate_bet_21_3(game_player: dict, game_round: GameRound):
+    async def evaluate_bet_21_3(game_player: dict, game_round: RoundState):
         if game_player["bet_21_3"] and len(game_player["cards"]) == 2:
             bet_21_3_winning = 0
             bet_21_3_combination = None
@@ -256,49 +271,62 @@ class PaymentManager:
 
 
 class ResetManager:
-    def __init__(self, game_id: str, game_round: GameRound):
+    def __init__(self, game_id: str, game_round: RoundState):
         self.game_id = game_id
         self.game_round = game_round
         self.taken_seats = {}
 
     async def reset(self):
+        """Rollbacks go through the outbox under deterministic external ids, so a reset
+        which is retried after a failure does not refund twice."""
         self._check_can_make_reset()
-
+        started_at = time.time()
+        round_id = str(self.game_round.id)
+        # only the first of concurrent resets gets past, before anything is tracked or sent
         await self.finish_round()
-        merchants = await self.get_merchants()
 
-        for merchant in merchants:
-            rollback_url = merchant["rollback_url"]
-            schema_type = merchant["schema_type"]
-            game_players = (
-                await GamePlayer.get_motor_collection()
-                .find(
-                    {
-                        "merchant": str(merchant["_id"]),
-                        "game_round": str(self.game_round.id),
-                    }
+        merchants = {
+            str(merchant["_id"]): merchant for merchant in await self.get_merchants()
+        }
+        game_players = [
+            game_player
+            for game_player in await GamePlayer.get_motor_collection()
+            .find({"game_round": round_id})
+            .to_list(None)
+            if game_player["merchant"] in merchants
+        ]
+        transactions = []
+        for game_player in game_players:
+            self.update_taken_seats(game_player)
+            transactions.extend(
+                self.generate_cancel_transactions(
+                    game_player, merchants[game_player["merchant"]]
                 )
-                .to_list(1000)
             )
-            for game_player in game_players:
-                self.update_taken_seats(game_player)
-                cancel_list = self.generate_cancel_list(game_player)
-                for bet_type, reset_bet_amount in cancel_list:
-                    game_player["_id"] = str(game_player["_id"])
-                    game_player["external_ids"][f"cancel_{bet_type}"] = str(uuid4())
-                    send_data = generate_reset_request_data(
-                        schema_type, reset_bet_amount, game_player, bet_type
-                    )
-                    send_reset_to_merchant_and_update_game_player.delay(
-                        send_data, rollback_url, game_player, bet_type
-                    )
-                await self.archive_game_player(game_player)
+
+        await start_reset(
+            redis_cache.redis_cache,
+            round_id,
+            len(game_players),
+            [
+                transaction["_id"]
+                for transaction in transactions
+                if transaction["type"] == "cancel"
+            ],
+            started_at,
+        )
+        if transactions:
+            await GamePlayer.get_motor_collection().database[
+                OUTBOX_COLLECTION
+            ].bulk_write(get_enqueue_operations(transactions), ordered=False)
+            dispatch_outbox.delay()
+        await self.archive_game_players(game_players)
 
         await redis_cache.set(
-            f"{self.game_id}:taken_seats", json.dumps(self.taken_seats)
+            f"{self.game_id}:taken_seats", codec.dumps(self.taken_seats)
         )
         start_new_round.apply_async(
-            args=[self.game_id, str(self.game_round.id), self.taken_seats],
+            args=[self.game_id, round_id, self.taken_seats],
             countdown=0,
             max_retries=5,
         )
@@ -310,16 +338,22 @@ class ResetManager:
             raise ValidationError("Can not reset the game before betting time is over")
 
     async def finish_round(self):
+        game_round = await GameRound.get_motor_collection().find_one_and_update(
+            {"_id": self.game_round.id, "was_reset": False},
+            {"$set": {"finished": True, "was_reset": True}},
+        )
+        if game_round is None:
+            raise ValidationError("Game is reset already")
         self.game_round.finished = True
         self.game_round.was_reset = True
-        await self.game_round.save()
+        await redis_cache.delete_total_bets(str(self.game_round.id))
 
     async def get_merchants(self):
         return (
             await Merchant.get_motor_collection()
             .find(
                 {"games.game_id": self.game_id},
-                {"_id": 1, "rollback_url": 1, "schema_type": 1},
+                {"_id": 1, "bet_url": 1, "rollback_url": 1, "schema_type": 1},
             )
             .to_list(1000)
         )
@@ -338,6 +372,41 @@ class ResetManager:
                 "insured": None,
             }
 
+    def generate_cancel_transactions(self, game_player: dict, merchant: dict) -> list:
+        """Rollbacks of the bets of the game player. A bet the merchant has not confirmed yet
+        is enqueued with them: it may not be in the outbox yet, and a rollback whose bet is
+        missing from the outbox would be sent before the bet."""
+        game_player["_id"] = str(game_player["_id"])
+        transactions = []
+        if (
+            game_player["bet"] > 0
+            and not game_player.get("rejected")
+            and "bet" not in game_player["external_ids"]
+        ):
+            # enqueuing a bet which is already in the outbox is a no-op
+            transactions.append(
+                generate_bet_transaction(
+                    merchant["bet_url"], game_player, merchant["schema_type"]
+                )
+            )
+            game_player["external_ids"]["bet"] = transactions[0]["_id"]
+        for bet_type, reset_bet_amount in self.generate_cancel_list(game_player):
+            if reset_bet_amount <= 0:
+                continue
+            game_player["external_ids"][f"cancel_{bet_type}"] = get_external_id(
+                game_player["_id"], f"cancel_{bet_type}"
+            )
+            transactions.append(
+                generate_cancel_transaction(
+                    merchant["rollback_url"],
+                    game_player,
+                    bet_type,
+                    reset_bet_amount,
+                    merchant["schema_type"],
+                )
+            )
+        return transactions
+
     def generate_cancel_list(self, game_player: dict):
         cancel_list = []
         for bet_type in game_player["external_ids"]:
@@ -362,13 +431,14 @@ class ResetManager:
             cancel_list.append((bet_type, reset_bet_amount))
         return cancel_list
 
-    async def archive_game_player(self, game_player):
-        await GamePlayer.get_motor_collection().find_one_and_update(
-            {"_id": ObjectId(game_player["_id"])},
+    async def archive_game_players(self, game_players: list):
+        await GamePlayer.get_motor_collection().update_many(
             {
-                "$set": {
-                    "is_reset": True,
-                    "archived": True,
+                "_id": {
+                    "$in": [
+                        ObjectId(game_player["_id"]) for game_player in game_players
+                    ]
                 }
             },
+            {"$set": {"is_reset": True, "archived": True}},
         )
@@ -0,0 +1,83 @@
+""" Completion time of table resets, by table size (players in the round).
+A reset is complete once the merchant answered every rollback of the round, the outbox
+handler of the last one records the time. """
+import time
+from typing import List
+
+RESET_STATS_KEY = "resets:stats"
+RESET_KEY_TTL = 3600
+
+FINISH_ROLLBACK_SCRIPT = """
+if redis.call('srem', KEYS[2], ARGV[1]) == 0 or redis.call('scard', KEYS[2]) > 0 then
+    return 0
+end
+local started_at = redis.call('hget', KEYS[1], 'started_at')
+local players = redis.call('hget', KEYS[1], 'players')
+redis.call('del', KEYS[1])
+if not started_at then
+    return 0
+end
+local elapsed_ms = (tonumber(ARGV[2]) - tonumber(started_at)) * 1000
+redis.call('hincrby', KEYS[3], players .. ':count', 1)
+redis.call('hincrbyfloat', KEYS[3], players .. ':total_ms', elapsed_ms)
+redis.call('hset', KEYS[3], players .. ':last_ms', elapsed_ms)
+return 1
+"""
+
+
+def get_reset_key(game_round_id: str) -> str:
+    return f"reset:{game_round_id}"
+
+
+def get_rollbacks_key(game_round_id: str) -> str:
+    return f"reset:{game_round_id}:rollbacks"
+
+
+async def start_reset(
+    redis, game_round_id: str, players: int, external_ids: List[str], started_at: float
+) -> None:
+    """:param external_ids - rollbacks of the round, a reset without any is complete"""
+    if not external_ids:
+        elapsed_ms = (time.time() - started_at) * 1000
+        pipe = redis.pipeline()
+        pipe.hincrby(RESET_STATS_KEY, f"{players}:count", 1)
+        pipe.hincrbyfloat(RESET_STATS_KEY, f"{players}:total_ms", elapsed_ms)
+        pipe.hset(RESET_STATS_KEY, f"{players}:last_ms", elapsed_ms)
+        await pipe.execute()
+        return
+    pipe = redis.pipeline()
+    pipe.hset(
+        get_reset_key(game_round_id),
+        mapping={"started_at": started_at, "players": players},
+    )
+    pipe.sadd(get_rollbacks_key(game_round_id), *external_ids)
+    pipe.expire(get_reset_key(game_round_id), RESET_KEY_TTL)
+    pipe.expire(get_rollbacks_key(game_round_id), RESET_KEY_TTL)
+    await pipe.execute()
+
+
+async def get_reset_stats(redis) -> dict:
+    """``{players: {"count", "total_ms", "last_ms", "avg_ms"}}``"""
+    stats = {}
+    for field, value in (await redis.hgetall(RESET_STATS_KEY)).items():
+        players, name = field.split(":")
+        stats.setdefault(players, {})[name] = float(value)
+    for table_stats in stats.values():
+        table_stats["avg_ms"] = table_stats["total_ms"] / table_stats["count"]
+    return stats
+
+
+def finish_rollback_sync(client, game_round_id: str, external_id: str) -> bool:
+    """Returns True when ``external_id`` was the last pending rollback of the reset.
+    Answering the same rollback twice does not count it twice."""
+    return bool(
+        client.eval(
+            FINISH_ROLLBACK_SCRIPT,
+            3,
+            get_reset_key(game_round_id),
+            get_rollbacks_key(game_round_id),
+            RESET_STATS_KEY,
+            external_id,
+            time.time(),
+        )
+    )
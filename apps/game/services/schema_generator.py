@@ -1,79 +1,135 @@
+""" Merchant request payloads in the key style of the merchant ``schema_type``.
+Payloads have fixed shapes, so their keys are inflected once per schema type and cached;
+building a payload is a dict comprehension over the cached keys. """
+from functools import lru_cache
+from typing import Sequence, Tuple
+
 import inflection
 
-from apps.game.documents import GamePlayer
+AUTHENTICATION_FIELDS = ("launch_token", "request_scope")
+GET_BALANCE_FIELDS = ("token", "currency", "hash")
+BET_FIELDS = (
+    "token",
+    "amount",
+    "currency",
+    "game_id",
+    "round_id",
+    "external_id",
+    "hash",
+    "transaction_type",
+)
+WIN_FIELDS = BET_FIELDS[:6] + ("bet_external_id",) + BET_FIELDS[6:]
+RESET_FIELDS = BET_FIELDS[:6] + ("canceled_external_id",) + BET_FIELDS[6:]
+
+
+@lru_cache(maxsize=None)
+def camelize(key: str) -> str:
+    camel_key = inflection.camelize(key)
+    return camel_key[0].lower() + camel_key[1:]
+
+
+@lru_cache(maxsize=None)
+def capital_camelize(key: str) -> str:
+    return inflection.camelize(key)
+
+
+# response keys come from the merchant, so their cache is bounded
+@lru_cache(maxsize=1024)
+def underscore(key: str) -> str:
+    return inflection.underscore(key)
+
+
+KEY_INFLECTORS = {
+    "camel": camelize,
+    "capital_camel": capital_camelize,
+    "snake": lambda key: key,
+}
+
+
+@lru_cache(maxsize=None)
+def get_payload_keys(schema_type: str, fields: Tuple[str, ...]) -> Tuple[str, ...]:
+    key_inflector = KEY_INFLECTORS[schema_type]
+    return tuple(key_inflector(field) for field in fields)
+
+
+def build_payload(schema_type: str, fields: Tuple[str, ...], values: Sequence) -> dict:
+    """:param values - in the order of ``fields``"""
+    return {
+        key: value for key, value in zip(get_payload_keys(schema_type, fields), values)
+    }
 
 
 def generate_authentication_request_data(launch_token: str, schema_type: str):
-    data = {"launch_token": launch_token, "request_scope": "country"}
-    inflector = get_request_inflector(schema_type)
-    return inflector(data)
+    return build_payload(schema_type, AUTHENTICATION_FIELDS, (launch_token, "country"))
 
 
 def inflect_response_data(data: dict):
-    new_data = dict()
-    for key, value in data.items():
-        snake_key = inflection.underscore(key)
-        new_data[snake_key] = value
-    return new_data
+    return {underscore(key): value for key, value in data.items()}
 
 
-def generate_get_balance_request_data(schema_type: str, game_player: GamePlayer):
-    data = {"token": game_player["user_token"], "currency": "USD", "hash": ""}
-    inflector = get_request_inflector(schema_type)
-    return inflector(data)
+def generate_get_balance_request_data(schema_type: str, game_player: dict):
+    return build_payload(
+        schema_type, GET_BALANCE_FIELDS, (game_player["user_token"], "USD", "")
+    )
 
 
 def generate_bet_request_data(
     schema_type: str, amount: float, game_player: dict, external_id: str
 ) -> dict:
-    data = {
-        "token": game_player["user_token"],
-        "amount": amount,
-        "currency": "USD",
-        "game_id": game_player["game_id"],
-        "round_id": game_player["game_round"],
-        "external_id": external_id,
-        "hash": "",
-        "transaction_type": "bet",
-    }
-    inflector = get_request_inflector(schema_type)
-    return inflector(data)
+    return build_payload(
+        schema_type,
+        BET_FIELDS,
+        (
+            game_player["user_token"],
+            amount,
+            "USD",
+            game_player["game_id"],
+            game_player["game_round"],
+            external_id,
+            "",
+            "bet",
+        ),
+    )
 
 
 def generate_win_request_data(
-    schema_type: str, amount: float, game_player: GamePlayer, external_id: str
+    schema_type: str, amount: float, game_player: dict, external_id: str
 ) -> dict:
-    data = {
-        "token": game_player["user_token"],
-        "amount": amount,
-        "currency": "USD",
-        "game_id": game_player["game_id"],
-        "round_id": game_player["game_round"],
-        "external_id": external_id,
-        "bet_external_id": game_player["external_ids"].get("bet"),
-        "hash": "",
-        "transaction_type": "win",
-    }
-    inflector = get_request_inflector(schema_type)
-    return inflector(data)
+    return build_payload(
+        schema_type,
+        WIN_FIELDS,
+        (
+            game_player["user_token"],
+            amount,
+            "USD",
+            game_player["game_id"],
+            game_player["game_round"],
+            external_id,
+            game_player["external_ids"].get("bet"),
+            "",
+            "win",
+        ),
+    )
 
 
 def generate_reset_request_data(
-    schema_type: str, amount: float, game_player: GamePlayer, bet_type: str
+    schema_type: str, amount: float, game_player: dict, bet_type: str
 ) -> dict:
-    data = {
-        "token": game_player["user_token"],
-        "amount": amount,
-        "currency": "USD",
-        "game_id": game_player["game_id"],
-        "round_id": game_player["game_round"],
-        "external_id": game_player["external_ids"][f"cancel_{bet_type}"],
-        "canceled_external_id": game_player["external_ids"][bet_type],
-        "hash": "",
-        "transaction_type": "rollback",
-    }
-    inflector = get_request_inflector(schema_type)
-    return inflector(data)
+    return build_payload(
+        schema_type,
+        RESET_FIELDS,
+        (
+            game_player["user_token"],
+            amount,
+            "USD",
+            game_player["game_id"],
+            game_player["game_round"],
+            game_player["external_ids"][f"cancel_{bet_type}"],
+            game_player["external_ids"][bet_type],
+            "",
+            "rollback",
+        ),
+    )
 
 
 def generate_tip_request_data(
@@ -84,18 +140,11 @@ def generate_tip_request_data(
     game_id: str,
     round_id: str,
 ) -> dict:
-    data = {
-        "token": user_token,
-        "amount": amount,
-        "currency": "USD",
-        "game_id": game_id,
-        "round_id": round_id,
-        "external_id": external_id,
-        "hash": "",
-        "transaction_type": "bet",
-    }
-    inflector = get_request_inflector(schema_type)
-    return inflector(data)
+    return build_payload(
+        schema_type,
+        BET_FIELDS,
+        (user_token, amount, "USD", game_id, round_id, external_id, "", "bet"),
+    )
 
 
 def get_request_inflector(schema_type):
@@ -107,25 +156,12 @@ def get_request_inflector(schema_type):
 
 
 def inflect_from_camel_to_snake_case(data: dict) -> dict:
-    new_data = dict()
-    for camel_key, value in data.items():
-        snake_key = inflection.underscore(camel_key)
-        new_data[snake_key] = value
-    return new_data
+    return {underscore(camel_key): value for camel_key, value in data.items()}
 
 
 def inflect_from_snake_to_capital_came_case(data: dict) -> dict:
-    new_data = dict()
-    for snake_key, value in data.items():
-        camel_key = inflection.camelize(snake_key)
-        new_data[camel_key] = value
-    return new_data
+    return {capital_camelize(snake_key): value for snake_key, value in data.items()}
 
 
 def inflect_from_snake_to_camel_case(data: dict) -> dict:
-    new_data = dict()
-    for snake_key, value in data.items():
-        camel_key = inflection.camelize(snake_key)
-        camel_key = camel_key[0].lower() + camel_key[1:]
-        new_data[camel_key] = value
-    return new_data
+    return {camelize(snake_key): value for snake_key, value in data.items()}
@@ -0,0 +1,83 @@
+""" Registry of pending decision timeouts (``wait_player``).
+Only the latest timeout of a game player is current, so a superseded timer is skipped
+with a single redis read instead of loading the game player from mongo. """
+from uuid import uuid4
+
+from apps.game.services.timer_wheel import timer_wheel, schedule_timer
+
+TIMEOUT_STATS_KEY = "timeouts:stats"
+TIMEOUT_KEY_TTL = 300
+
+CLAIM_TIMEOUT_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    redis.call('del', KEYS[1])
+    return 1
+end
+return 0
+"""
+
+
+def get_timeout_key(game_player_id: str) -> str:
+    return f"timeout:{game_player_id}"
+
+
+def get_timer_key(game_player_id: str) -> str:
+    return f"wait_player:{game_player_id}"
+
+
+async def register_timeout(
+    redis, game_player_id: str, game_id: str, action_count: int, delay: float
+) -> str:
+    token = f"{action_count}:{uuid4().hex}"
+    await redis.set(
+        get_timeout_key(game_player_id), token, ex=int(delay) + TIMEOUT_KEY_TTL
+    )
+    await redis.hincrby(TIMEOUT_STATS_KEY, "scheduled", 1)
+    await timer_wheel.schedule(
+        get_timer_key(game_player_id),
+        "wait_player",
+        [str(game_player_id), game_id, action_count, token],
+        delay,
+    )
+    return token
+
+
+async def cancel_timeout(redis, game_player_id: str) -> bool:
+    if not await redis.delete(get_timeout_key(game_player_id)):
+        return False
+    await redis.hincrby(TIMEOUT_STATS_KEY, "cancelled", 1)
+    await timer_wheel.cancel(get_timer_key(game_player_id))
+    return True
+
+
+async def get_timeout_stats(redis) -> dict:
+    stats = await redis.hgetall(TIMEOUT_STATS_KEY)
+    return {key: int(value) for key, value in stats.items()}
+
+
+def register_timeout_sync(
+    client, game_player_id: str, game_id: str, action_count: int, delay: float
+) -> str:
+    token = f"{action_count}:{uuid4().hex}"
+    pipe = client.pipeline()
+    pipe.set(get_timeout_key(game_player_id), token, ex=int(delay) + TIMEOUT_KEY_TTL)
+    pipe.hincrby(TIMEOUT_STATS_KEY, "scheduled", 1)
+    pipe.execute()
+    schedule_timer(
+        client,
+        get_timer_key(game_player_id),
+        "wait_player",
+        [str(game_player_id), game_id, action_count, token],
+        delay,
+    )
+    return token
+
+
+def claim_timeout_sync(client, game_player_id: str, token: str) -> bool:
+    """Returns True when ``token`` is still the current timeout of the game player.
+    The timeout is consumed so it can fire only once."""
+    if not client.eval(CLAIM_TIMEOUT_SCRIPT, 1, get_timeout_key(game_player_id), token):
+        client.hincrby(TIMEOUT_STATS_KEY, "superseded", 1)
+        return False
+    client.hincrby(TIMEOUT_STATS_KEY, "fired", 1)
+    return True
@@ -0,0 +1,266 @@
+""" In-process hierarchical timer wheel for round timers (decision timeouts, insurance window,
+seat cleanup and next round). Every timer is mirrored in a redis sorted set so that a timer
+scheduled by a celery worker, or left behind by a dead process, is still fired exactly once. """
+import asyncio
+import functools
+import logging
+import time
+from typing import Callable, Dict, List
+
+from apps import codec
+from apps.config import settings
+from apps.tracing import get_trace_context, run_in_span
+
+logger = logging.getLogger(__name__)
+
+TIMERS_KEY = "timers:due"
+TIMERS_PAYLOAD_KEY = "timers:payload"
+
+# KEYS - due timers, payloads; ARGV - key, latest due time the caller fires
+# a timer rescheduled since the caller read it is left to the owner of the new schedule
+CLAIM_TIMER_SCRIPT = """
+local due = redis.call('zscore', KEYS[1], ARGV[1])
+if not due or tonumber(due) > tonumber(ARGV[2]) then
+    return false
+end
+redis.call('zrem', KEYS[1], ARGV[1])
+local payload = redis.call('hget', KEYS[2], ARGV[1])
+redis.call('hdel', KEYS[2], ARGV[1])
+if not payload then
+    return false
+end
+return {due, payload}
+"""
+
+
+class TimerHandle:
+    __slots__ = ("key", "task_name", "args", "due", "expiry_tick", "cancelled")
+
+    def __init__(self, key: str, task_name: str, args: list, due: float):
+        self.key = key
+        self.task_name = task_name
+        self.args = args
+        self.due = due
+        self.expiry_tick = 0
+        self.cancelled = False
+
+
+class TimerWheel:
+    """Hashed hierarchical timer wheel.
+    Level ``n`` has ``slots`` buckets, each bucket covers ``slots ** n`` ticks. Timers are
+    cascaded down one level when the cursor of the lower level wraps around.
+    """
+
+    def __init__(
+        self,
+        tick: float = settings.TIMER_WHEEL_TICK_SECONDS,
+        slots: int = settings.TIMER_WHEEL_SLOTS,
+        levels: int = settings.TIMER_WHEEL_LEVELS,
+    ):
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self._wheels: List[List[List[TimerHandle]]] = [
+            [[] for _ in range(slots)] for _ in range(levels)
+        ]
+        self._handles: Dict[str, TimerHandle] = {}
+        self._callbacks: Dict[str, Callable] = {}
+        self._origin = time.time()
+        self._current_tick = 0
+        self._redis = None
+        self._tasks: List[asyncio.Task] = []
+        self.stats = {
+            "scheduled": 0,
+            "cancelled": 0,
+            "fired": 0,
+            "recovered": 0,
+            "total_lateness_ms": 0.0,
+            "max_lateness_ms": 0.0,
+        }
+
+    def register(self, task_name: str, callback: Callable) -> None:
+        self._callbacks[task_name] = callback
+
+    async def start(self, redis) -> None:
+        self._redis = redis
+        self._origin = time.time()
+        self._current_tick = 0
+        self._tasks = [
+            asyncio.create_task(self._run()),
+            asyncio.create_task(self._sweep_store()),
+        ]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    async def schedule(
+        self, key: str, task_name: str, args: list, delay: float
+    ) -> TimerHandle:
+        """Schedules ``task_name(*args)`` after ``delay`` seconds.
+        Scheduling with a key which is already pending replaces the previous timer.
+        """
+        due = time.time() + delay
+        self._discard(key)
+        handle = TimerHandle(key, task_name, args, due)
+        self._insert(handle)
+        self._handles[key] = handle
+        self.stats["scheduled"] += 1
+        # the payload and the due time change together, a claim sees both or neither
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.hset(TIMERS_PAYLOAD_KEY, key, get_payload(task_name, args))
+            pipe.zadd(TIMERS_KEY, {key: due})
+            await pipe.execute()
+        return handle
+
+    async def cancel(self, key: str) -> bool:
+        self._discard(key)
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.zrem(TIMERS_KEY, key)
+            pipe.hdel(TIMERS_PAYLOAD_KEY, key)
+            removed, _ = await pipe.execute()
+        if removed:
+            self.stats["cancelled"] += 1
+        return bool(removed)
+
+    def get_stats(self) -> dict:
+        fired = self.stats["fired"]
+        return {
+            **self.stats,
+            "pending": len(self._handles),
+            "avg_lateness_ms": self.stats["total_lateness_ms"] / fired if fired else 0,
+        }
+
+    def _discard(self, key: str) -> None:
+        if handle := self._handles.pop(key, None):
+            handle.cancelled = True
+
+    def _tick_for(self, timestamp: float) -> int:
+        return int((timestamp - self._origin) / self.tick)
+
+    def _insert(self, handle: TimerHandle) -> None:
+        handle.expiry_tick = max(self._tick_for(handle.due) + 1, self._current_tick + 1)
+        delta = handle.expiry_tick - self._current_tick
+        for level in range(self.levels):
+            span = self.slots**level
+            if delta < span * self.slots or level == self.levels - 1:
+                slot = (handle.expiry_tick // span) % self.slots
+                self._wheels[level][slot].append(handle)
+                return
+
+    def _advance(self, to_tick: int) -> List[TimerHandle]:
+        expired = []
+        while self._current_tick < to_tick:
+            self._current_tick += 1
+            for level in range(1, self.levels):
+                span = self.slots**level
+                if self._current_tick % span:
+                    break
+                bucket_index = (self._current_tick // span) % self.slots
+                bucket = self._wheels[level][bucket_index]
+                self._wheels[level][bucket_index] = []
+                for handle in bucket:
+                    if not handle.cancelled:
+                        self._insert(handle)
+            bucket_index = self._current_tick % self.slots
+            bucket = self._wheels[0][bucket_index]
+            self._wheels[0][bucket_index] = []
+            for handle in bucket:
+                if handle.cancelled:
+                    continue
+                if handle.expiry_tick > self._current_tick:
+                    self._insert(handle)
+                    continue
+                expired.append(handle)
+        return expired
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.tick)
+            for handle in self._advance(self._tick_for(time.time())):
+                if self._handles.get(handle.key) is handle:
+                    del self._handles[handle.key]
+                await self._claim_and_fire(handle.key, handle.due)
+
+    async def _sweep_store(self) -> None:
+        """Picks up due timers that were scheduled by other processes (celery workers)
+        or whose owner died before firing them."""
+        while True:
+            await asyncio.sleep(settings.TIMER_STORE_POLL_SECONDS)
+            try:
+                now = time.time()
+                keys = await self._redis.zrangebyscore(TIMERS_KEY, 0, now)
+                for key in keys:
+                    self._discard(key)
+                    if await self._claim_and_fire(key, now):
+                        self.stats["recovered"] += 1
+            except Exception:  # pragma: no cover
+                logger.exception("Timer store sweep failed")
+
+    async def _claim_and_fire(self, key: str, latest_due: float) -> bool:
+        """Fires the timer of ``key`` unless it is claimed already or due after
+        ``latest_due``, the due time of the handle or the time of the sweep."""
+        claimed = await self._redis.eval(
+            CLAIM_TIMER_SCRIPT, 2, TIMERS_KEY, TIMERS_PAYLOAD_KEY, key, latest_due
+        )
+        if not claimed:
+            return False
+        due, payload = claimed
+        payload = codec.loads(payload)
+        lateness_ms = max(time.time() - float(due), 0) * 1000
+        self.stats["fired"] += 1
+        self.stats["total_lateness_ms"] += lateness_ms
+        self.stats["max_lateness_ms"] = max(self.stats["max_lateness_ms"], lateness_ms)
+        callback = self._get_callback(payload["task"])
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(
+            None,
+            functools.partial(
+                run_in_span,
+                f"timer:{payload['task']}",
+                "timer",
+                payload.get("trace"),
+                callback,
+                *payload["args"],
+            ),
+        )
+        future.add_done_callback(functools.partial(self._log_failure, key))
+        return True
+
+    def _get_callback(self, task_name: str) -> Callable:
+        if task_name not in self._callbacks:
+            from apps.game import tasks
+
+            self._callbacks[task_name] = getattr(tasks, task_name)
+        return self._callbacks[task_name]
+
+    @staticmethod
+    def _log_failure(key: str, future: asyncio.Future) -> None:
+        if future.exception():
+            logger.error("Timer %s failed", key, exc_info=future.exception())
+
+
+def get_payload(task_name: str, args: list) -> str:
+    # the trace of the round goes on with the timer
+    return codec.dumps({"task": task_name, "args": args, "trace": get_trace_context()})
+
+
+def schedule_timer(client, key: str, task_name: str, args: list, delay: float) -> None:
+    """Synchronous counterpart of ``TimerWheel.schedule`` for celery workers.
+    The timer is only written to redis, the sweep of an ASGI process fires it.
+    """
+    pipe = client.pipeline(transaction=True)
+    pipe.hset(TIMERS_PAYLOAD_KEY, key, get_payload(task_name, args))
+    pipe.zadd(TIMERS_KEY, {key: time.time() + delay})
+    pipe.execute()
+
+
+def cancel_timer(client, key: str) -> None:
+    pipe = client.pipeline(transaction=True)
+    pipe.zrem(TIMERS_KEY, key)
+    pipe.hdel(TIMERS_PAYLOAD_KEY, key)
+    pipe.execute()
+
+
+timer_wheel = TimerWheel()
@@ -1,17 +1,26 @@
 import calendar
+import logging
 import random
 import secrets
+import time
 import jwt
 import functools
+import inspect
 
 from typing import Callable
-from beanie import PydanticObjectId
+from bson import ObjectId
 from datetime import datetime
 from string import ascii_lowercase, ascii_uppercase, digits
 
 from apps.game.services.custom_exception import ValidationError
 from apps.game.cards.hand import Hand
 from apps.config import settings
+from apps.logging import bind_log_context, log_context
+from apps.metrics import EventTimings, event_timings, observe_event
+from apps.profiler import tag_code
+from apps.tracing import start_span
+
+player_actions_logger = logging.getLogger("player_actions")
 
 
 def generate_api_key(length: int = 80) -> secrets:
@@ -57,7 +66,6 @@ def get_game_state_for_dealer(game_round: dict, seats: dict) -> str:
     ):
         return "betting"
     for _, player in seats.items():
-        print(player)
         if player and player["player_turn"] and player["making_decision"]:
             return "waiting_player_decision"
         elif player and player["player_turn"] and not player["making_decision"]:
@@ -98,9 +106,7 @@ async def get_game_round(game_id: str):
 async def generate_token_for_stream(game_id: str):
     from apps.game.documents import Game
 
-    game = await Game.get_motor_collection().find_one(
-        {"_id": PydanticObjectId(game_id)}
-    )
+    game = await Game.get_motor_collection().find_one({"_id": ObjectId(game_id)})
 
     payload_data = {
         "streamID": game["table_stream_key_1"],
@@ -133,6 +139,56 @@ def catch_error(func: Callable):
     return decorator
 
 
+def track_latency(func: Callable):
+    """Records the duration of the socket event with its mongo, redis, merchant http and
+    emit time on ``/metrics`` and tags its samples of the profiler."""
+    event = func.__name__
+    tag_code(inspect.unwrap(func).__code__, event)
+
+    @functools.wraps(func)
+    async def decorator(*args, **kwargs):
+        timings = EventTimings()
+        token = event_timings.set(timings)
+        started_at = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            observe_event(event, time.perf_counter() - started_at, timings)
+            event_timings.reset(token)
+
+    return decorator
+
+
+def log_event(func: Callable):
+    """Binds the socket event, the sid and the round or game of the data to the log records of
+    the handler and to the celery tasks it publishes, logs the event to ``player_actions`` and
+    traces the handler in the round, see ``apps.tracing``."""
+    event = func.__name__
+
+    @functools.wraps(func)
+    async def decorator(sid, data, *args, **kwargs):
+        values = data if isinstance(data, dict) else {}
+        token = bind_log_context(
+            event=event,
+            sid=sid,
+            round_id=values.get("round_id"),
+            game_id=values.get("game_id"),
+        )
+        try:
+            player_actions_logger.info(event, extra={"data": data})
+            with start_span(
+                event,
+                "socket",
+                round_id=values.get("round_id"),
+                game_id=values.get("game_id"),
+            ):
+                return await func(sid, data, *args, **kwargs)
+        finally:
+            log_context.reset(token)
+
+    return decorator
+
+
 def check_should_not_move_to_next_game_player(
     game_player: dict, action_count_before_refresh: int
 ) -> bool:
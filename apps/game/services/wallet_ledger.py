@@ -0,0 +1,211 @@
+""" Local write-behind ledger of the player's merchant wallet.
+Bets reserve funds atomically in redis at bet time and are recorded as pending debits, the
+merchant is only charged when the outbox sends the bets after the betting time. Every merchant
+response reconciles the cached balance as ``merchant balance - pending debits + pending credits``.
+Winnings are credited when they are enqueued and taken back when the merchant does not pay them. """
+import uuid
+from typing import Optional
+
+from apps.game.services.custom_exception import ValidationError
+
+# KEYS - balance, pending; ARGV - amount, pending ttl
+RESERVE_SCRIPT = """
+local balance = tonumber(redis.call('get', KEYS[1]))
+local amount = tonumber(ARGV[1])
+if not balance or balance < amount then
+    return false
+end
+redis.call('incrbyfloat', KEYS[2], amount)
+redis.call('expire', KEYS[2], ARGV[2])
+return redis.call('incrbyfloat', KEYS[1], -amount)
+"""
+
+# KEYS - balance, pending; ARGV - amount, pending ttl
+CREDIT_SCRIPT = """
+redis.call('incrbyfloat', KEYS[2], -tonumber(ARGV[1]))
+redis.call('expire', KEYS[2], ARGV[2])
+if redis.call('exists', KEYS[1]) == 0 then
+    return false
+end
+return redis.call('incrbyfloat', KEYS[1], ARGV[1])
+"""
+
+# KEYS - balance, pending, [settled marker]; ARGV - settled amount, merchant balance, marker ttl,
+# pending ttl
+RECONCILE_SCRIPT = """
+if #KEYS == 3 and not redis.call('set', KEYS[3], 1, 'NX', 'EX', ARGV[3]) then
+    return false
+end
+local pending = tonumber(redis.call('incrbyfloat', KEYS[2], -tonumber(ARGV[1])))
+redis.call('expire', KEYS[2], ARGV[4])
+local balance = tostring(tonumber(ARGV[2]) - pending)
+redis.call('set', KEYS[1], balance, 'KEEPTTL')
+return balance
+"""
+
+# KEYS - balance, pending, settled marker; ARGV - credited amount, marker ttl, pending ttl
+REVERT_CREDIT_SCRIPT = """
+if not redis.call('set', KEYS[3], 1, 'NX', 'EX', ARGV[2]) then
+    return false
+end
+redis.call('incrbyfloat', KEYS[2], ARGV[1])
+redis.call('expire', KEYS[2], ARGV[3])
+if redis.call('exists', KEYS[1]) == 0 then
+    return false
+end
+return redis.call('incrbyfloat', KEYS[1], -tonumber(ARGV[1]))
+"""
+
+SETTLED_MARKER_TTL = 86400
+# pending debits and credits outlive a merchant outage, the key goes once nothing touches it
+PENDING_TTL = 86400
+EXTERNAL_ID_NAMESPACE = uuid.UUID("0f7d8a3e-4c1b-4f4e-9a53-6c2b8e5d7a10")
+
+
+def get_balance_key(user_id: str, merchant_id: str) -> str:
+    return f"{user_id}:{merchant_id}"
+
+
+def get_pending_key(user_id: str, merchant_id: str) -> str:
+    return f"{user_id}:{merchant_id}:pending"
+
+
+def get_settled_marker_key(external_id: str) -> str:
+    return f"ledger:settled:{external_id}"
+
+
+def get_external_id(game_player_id: str, transaction_type: str) -> str:
+    """The same transaction of a game player always gets the same external id, so a
+    retried request can not charge or pay the player twice."""
+    return str(
+        uuid.uuid5(EXTERNAL_ID_NAMESPACE, f"{game_player_id}:{transaction_type}")
+    )
+
+
+def _reconcile_args(
+    user_id: str,
+    merchant_id: str,
+    total_balance: float,
+    settled: float,
+    external_id: Optional[str],
+) -> list:
+    keys = [
+        get_balance_key(user_id, merchant_id),
+        get_pending_key(user_id, merchant_id),
+    ]
+    if external_id:
+        keys.append(get_settled_marker_key(external_id))
+    return [len(keys), *keys, settled, total_balance, SETTLED_MARKER_TTL, PENDING_TTL]
+
+
+class WalletLedger:
+    @property
+    def redis(self):
+        # the celery worker settles through the sync functions, without the async clients
+        from apps.connections import redis_cache
+
+        return redis_cache.redis_cache
+
+    async def reserve(self, user_id: str, merchant_id: str, amount: float) -> float:
+        """Takes ``amount`` from the cached balance, returns the balance left."""
+        balance = await self.redis.eval(
+            RESERVE_SCRIPT,
+            2,
+            get_balance_key(user_id, merchant_id),
+            get_pending_key(user_id, merchant_id),
+            amount,
+            PENDING_TTL,
+        )
+        if balance is None:
+            raise ValidationError("not enough funds")
+        return float(balance)
+
+    async def release(
+        self, user_id: str, merchant_id: str, amount: float
+    ) -> Optional[float]:
+        """Gives a reserved ``amount`` back, returns None when the balance is not cached."""
+        balance = await self.redis.eval(
+            CREDIT_SCRIPT,
+            2,
+            get_balance_key(user_id, merchant_id),
+            get_pending_key(user_id, merchant_id),
+            amount,
+            PENDING_TTL,
+        )
+        return float(balance) if balance is not None else None
+
+    async def reconcile(
+        self,
+        user_id: str,
+        merchant_id: str,
+        total_balance: float,
+        settled: float = 0,
+        external_id: Optional[str] = None,
+    ) -> Optional[float]:
+        """Sets the cached balance from the merchant ``total_balance``.
+        :param settled - pending amount the merchant response covers, debits are positive
+        and credits negative
+        :param external_id - makes the settlement apply once, None when already settled
+        """
+        balance = await self.redis.eval(
+            RECONCILE_SCRIPT,
+            *_reconcile_args(user_id, merchant_id, total_balance, settled, external_id),
+        )
+        return float(balance) if balance is not None else None
+
+    async def get_balance(self, user_id: str, merchant_id: str) -> Optional[float]:
+        balance = await self.redis.get(get_balance_key(user_id, merchant_id))
+        return float(balance) if balance is not None else None
+
+    async def get_pending(self, user_id: str, merchant_id: str) -> float:
+        return float(await self.redis.get(get_pending_key(user_id, merchant_id)) or 0)
+
+
+def credit_sync(client, user_id: str, merchant_id: str, amount: float) -> None:
+    """Synchronous counterpart of ``WalletLedger.release`` for celery workers, records a
+    pending credit (winning) which is visible in the balance before the merchant pays it."""
+    client.eval(
+        CREDIT_SCRIPT,
+        2,
+        get_balance_key(user_id, merchant_id),
+        get_pending_key(user_id, merchant_id),
+        amount,
+        PENDING_TTL,
+    )
+
+
+def revert_credit_sync(
+    client, user_id: str, merchant_id: str, amount: float, external_id: str
+) -> Optional[float]:
+    """Takes back a pending credit the merchant did not pay, once per ``external_id``.
+    Returns None when already settled or the balance is not cached."""
+    balance = client.eval(
+        REVERT_CREDIT_SCRIPT,
+        3,
+        get_balance_key(user_id, merchant_id),
+        get_pending_key(user_id, merchant_id),
+        get_settled_marker_key(external_id),
+        amount,
+        SETTLED_MARKER_TTL,
+        PENDING_TTL,
+    )
+    return float(balance) if balance is not None else None
+
+
+def reconcile_sync(
+    client,
+    user_id: str,
+    merchant_id: str,
+    total_balance: float,
+    settled: float = 0,
+    external_id: Optional[str] = None,
+) -> Optional[float]:
+    """Synchronous counterpart of ``WalletLedger.reconcile`` for celery workers."""
+    balance = client.eval(
+        RECONCILE_SCRIPT,
+        *_reconcile_args(user_id, merchant_id, total_balance, settled, external_id),
+    )
+    return float(balance) if balance is not None else None
+
+
+wallet_ledger = WalletLedger()
@@ -0,0 +1,56 @@
+""" Headless table simulator, plays shoe-driven rounds with basic-strategy bots on the
+memory backend and prints a JSON report with the rounds per second.
+Run with ``python -m apps.game.simulator --rounds 100000``, add ``--profile simulator.prof``
+for a cProfile dump of the game logic (``python -m pstats simulator.prof``). """
+import argparse
+import asyncio
+import cProfile
+import json
+
+from apps.game.simulator.backend import MemoryBackend
+from apps.game.simulator.table import SEATS, TableSimulator
+
+
+async def simulate(
+    rounds: int, players: int, game_type: str, seed: int, profile: str = None
+) -> dict:
+    backend = MemoryBackend()
+    await backend.install()
+    try:
+        table = TableSimulator(backend, players, game_type, seed)
+        await table.setup()
+        profiler = cProfile.Profile() if profile else None
+        if profiler:
+            profiler.enable()
+        report = await table.run(rounds)
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(profile)
+        return report
+    finally:
+        backend.restore()
+
+
+if __name__ == "__main__":  # pragma: no cover
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=10000)
+    parser.add_argument("--players", type=int, default=len(SEATS))
+    parser.add_argument(
+        "--game-type", choices=["european", "american"], default="european"
+    )
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--profile", default=None, help="cProfile output file")
+    arguments = parser.parse_args()
+    print(
+        json.dumps(
+            asyncio.run(
+                simulate(
+                    arguments.rounds,
+                    arguments.players,
+                    arguments.game_type,
+                    arguments.seed,
+                    arguments.profile,
+                )
+            )
+        )
+    )
@@ -0,0 +1,168 @@
+""" Memory backend of the simulator: swaps mongo, redis, the socket.io emitters, the timer
+wheel and the celery queue of the game for in-process stand-ins, so the unchanged managers play
+rounds without external services. ``install`` patches the module globals and ``restore`` puts
+the originals back. """
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from beanie import init_beanie
+from celery import Task
+
+from apps import codec
+from apps.game.simulator.memory_mongo import AsyncMemoryDatabase, MemoryDatabase
+from apps.game.simulator.memory_redis import AsyncMemoryRedis, MemoryRedis
+
+MISSING = object()
+
+
+class MemoryEmitter:
+    """``AsyncRedisManager`` of the memory backend, counts the emitted events."""
+
+    def __init__(self, events: Counter):
+        self.events = events
+
+    async def emit(self, event: str, data=None, **kwargs) -> None:
+        self.events[event] += 1
+
+
+class SyncMemoryEmitter(MemoryEmitter):
+    """``RedisManager`` of the celery tasks."""
+
+    def emit(self, event: str, data=None, **kwargs) -> None:
+        self.events[event] += 1
+
+
+class MemoryScheduler:
+    """Timer wheel and celery queue of the memory backend. Timers and tasks stay pending
+    until the simulator runs them, which stands in for the time between the phases of a
+    round. Arguments go through the codec, like the payloads of the timer store and celery."""
+
+    def __init__(self):
+        self.pending: Dict[str, Tuple[str, list, dict]] = {}
+        self.stats = Counter()
+        self._task_count = 0
+
+    async def schedule(self, key: str, task_name: str, args: list, delay: float):
+        self.pending[key] = (task_name, codec.loads(codec.dumps(args)), {})
+        self.stats[task_name] += 1
+
+    async def cancel(self, key: str) -> bool:
+        return self.pending.pop(key, None) is not None
+
+    def enqueue(self, task_name: str, args=None, kwargs=None) -> None:
+        self._task_count += 1
+        self.pending[f"task:{self._task_count}"] = (
+            task_name,
+            codec.loads(codec.dumps(list(args or []))),
+            dict(kwargs or {}),
+        )
+        self.stats[task_name] += 1
+
+    def get_queue(self, task_name: str):
+        """(``apply_async``, ``delay``) replacements of the celery task ``task_name``"""
+
+        def apply_async(args=None, kwargs=None, **options) -> None:
+            self.enqueue(task_name, args, kwargs)
+
+        def delay(*args, **kwargs) -> None:
+            self.enqueue(task_name, args, kwargs)
+
+        return apply_async, delay
+
+    def run(self, task_names) -> int:
+        """Runs the pending timers and tasks of ``task_names``, also the ones they schedule.
+        Returns how many ran."""
+        from apps.game import tasks
+
+        ran = 0
+        while due := [
+            key
+            for key, (task_name, _, _) in self.pending.items()
+            if task_name in task_names
+        ]:
+            for key in due:
+                task_name, args, kwargs = self.pending.pop(key)
+                getattr(tasks, task_name)(*args, **kwargs)
+                ran += 1
+        return ran
+
+    def clear(self) -> None:
+        self.pending.clear()
+
+
+class MemoryBackend:
+    def __init__(self):
+        self.database = MemoryDatabase()
+        self.redis = MemoryRedis()
+        self.events = Counter()
+        self.emitter = MemoryEmitter(self.events)
+        self.scheduler = MemoryScheduler()
+        self._patches: List[Tuple[object, str, object]] = []
+        self._document_settings: Dict[type, object] = {}
+
+    def _patch(self, target, name: str, value) -> None:
+        # attributes looked up on the class (methods of the timer wheel) are deleted again
+        self._patches.append((target, name, vars(target).get(name, MISSING)))
+        setattr(target, name, value)
+
+    async def install(self) -> None:
+        from apps.connections import redis_cache
+        from apps.game import consumers, tasks
+        from apps.game.betting import betting_manager
+        from apps.game.cards import (
+            actions_card_manager,
+            base_card_manager,
+            cards_manager,
+        )
+        from apps.game.documents import Game, GamePlayer, GameRound, Merchant, Tip
+        from apps.game.services import dispatch_action_manager, payment_manager
+        from apps.game.services.timer_wheel import timer_wheel
+
+        documents = [Game, GameRound, GamePlayer, Merchant, Tip]
+        self._document_settings = {
+            document: document._document_settings for document in documents
+        }
+        await init_beanie(
+            database=AsyncMemoryDatabase(self.database), document_models=documents
+        )
+        self._patch(redis_cache, "redis_cache", AsyncMemoryRedis(self.redis))
+        for module in [
+            consumers,
+            cards_manager,
+            base_card_manager,
+            actions_card_manager,
+            dispatch_action_manager,
+            payment_manager,
+            betting_manager,
+        ]:
+            self._patch(module, "external_sio", self.emitter)
+        self._patch(tasks, "external_sio", SyncMemoryEmitter(self.events))
+        self._patch(tasks, "db", self.database)
+        self._patch(tasks, "r", self.redis)
+        self._patch(timer_wheel, "schedule", self.scheduler.schedule)
+        self._patch(timer_wheel, "cancel", self.scheduler.cancel)
+        for name, task in list(vars(tasks).items()):
+            if isinstance(task, Task):
+                apply_async, delay = self.scheduler.get_queue(name)
+                self._patch(task, "apply_async", apply_async)
+                self._patch(task, "delay", delay)
+
+    def restore(self) -> None:
+        for target, name, value in reversed(self._patches):
+            if value is MISSING:
+                delattr(target, name)
+            else:
+                setattr(target, name, value)
+        self._patches = []
+        for document, settings in self._document_settings.items():
+            document._document_settings = settings
+        self._document_settings = {}
+
+    def get_stats(self, rounds: Optional[int] = None) -> dict:
+        stats = {
+            "events": dict(self.events),
+            "scheduled": dict(self.scheduler.stats),
+        }
+        if rounds:
+            stats["events_per_round"] = round(sum(self.events.values()) / rounds, 1)
+        return stats
@@ -0,0 +1,898 @@
+""" In-memory stand-in for the pymongo and motor collections used by the game.
+Covers the filters, updates (including pipeline updates), projections and results the managers
+and celery tasks rely on, not MongoDB as a whole. Documents are stored as plain dicts and every
+read returns a copy, like a round trip through the server would. """
+import itertools
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo.results import (
+    BulkWriteResult,
+    DeleteResult,
+    InsertManyResult,
+    InsertOneResult,
+    UpdateResult,
+)
+
+
+def copy_value(value):
+    """Deep copy of the dicts and lists of a document, the other bson values are immutable."""
+    value_type = type(value)
+    if value_type is dict:
+        return {key: copy_value(item) for key, item in value.items()}
+    if value_type is list:
+        return [copy_value(item) for item in value]
+    return value
+
+
+# order of the bson types when values of different types are compared
+def _type_rank(value) -> int:
+    if value is None:
+        return 0
+    if isinstance(value, bool):
+        return 6
+    if isinstance(value, (int, float)):
+        return 1
+    if isinstance(value, str):
+        return 2
+    if isinstance(value, dict):
+        return 3
+    if isinstance(value, list):
+        return 4
+    if isinstance(value, ObjectId):
+        return 5
+    return 7
+
+
+def compare(first, second) -> int:
+    first_rank, second_rank = _type_rank(first), _type_rank(second)
+    if first_rank != second_rank:
+        return -1 if first_rank < second_rank else 1
+    if first_rank == 0 or first == second:
+        return 0
+    return -1 if first < second else 1
+
+
+def get_path_values(document: dict, path: str) -> List[Any]:
+    """Values at the dotted ``path``, arrays on the way are descended into."""
+    values = [document]
+    for part in path.split("."):
+        found = []
+        for value in values:
+            if isinstance(value, dict):
+                if part in value:
+                    found.append(value[part])
+            elif isinstance(value, list):
+                if part.isdigit():
+                    if int(part) < len(value):
+                        found.append(value[int(part)])
+                else:
+                    found.extend(
+                        item[part]
+                        for item in value
+                        if isinstance(item, dict) and part in item
+                    )
+        values = found
+    return values
+
+
+def get_field(document: dict, path: str):
+    value = document
+    for part in path.split("."):
+        if isinstance(value, dict):
+            value = value.get(part)
+        elif isinstance(value, list) and part.isdigit() and int(part) < len(value):
+            value = value[int(part)]
+        else:
+            return None
+    return value
+
+
+def set_field(document: dict, path: str, value) -> None:
+    *parents, name = path.split(".")
+    for part in parents:
+        document = document.setdefault(part, {})
+    document[name] = value
+
+
+def unset_field(document: dict, path: str) -> None:
+    *parents, name = path.split(".")
+    for part in parents:
+        document = document.get(part)
+        if not isinstance(document, dict):
+            return
+    document.pop(name, None)
+
+
+# filters
+
+
+def _candidates(values: List[Any]) -> Iterator[Any]:
+    """An array matches a condition when the array or one of its items matches."""
+    for value in values:
+        yield value
+        if isinstance(value, list):
+            yield from value
+
+
+def _equals(values: List[Any], expected) -> bool:
+    if not values:
+        return expected is None
+    if len(values) == 1 and type(values[0]) is type(expected):
+        return values[0] == expected
+    return any(compare(value, expected) == 0 for value in _candidates(values))
+
+
+def _compared(values: List[Any], expected, accept) -> bool:
+    return any(
+        _type_rank(value) == _type_rank(expected) and accept(compare(value, expected))
+        for value in _candidates(values)
+    )
+
+
+QUERY_OPERATORS = {
+    "$eq": _equals,
+    "$ne": lambda values, expected: not _equals(values, expected),
+    "$gt": lambda values, expected: _compared(values, expected, lambda c: c > 0),
+    "$gte": lambda values, expected: _compared(values, expected, lambda c: c >= 0),
+    "$lt": lambda values, expected: _compared(values, expected, lambda c: c < 0),
+    "$lte": lambda values, expected: _compared(values, expected, lambda c: c <= 0),
+    "$in": lambda values, expected: any(_equals(values, item) for item in expected),
+    "$nin": lambda values, expected: not any(
+        _equals(values, item) for item in expected
+    ),
+    "$exists": lambda values, expected: bool(values) == bool(expected),
+    "$size": lambda values, expected: any(
+        isinstance(value, list) and len(value) == expected for value in values
+    ),
+}
+
+
+def _is_operator_condition(condition) -> bool:
+    return (
+        isinstance(condition, dict)
+        and bool(condition)
+        and all(key.startswith("$") for key in condition)
+    )
+
+
+def matches(document: dict, query: Optional[dict]) -> bool:
+    if not query:
+        return True
+    for key, condition in query.items():
+        if key == "$and":
+            if not all(matches(document, part) for part in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(document, part) for part in condition):
+                return False
+        elif key == "$nor":
+            if any(matches(document, part) for part in condition):
+                return False
+        elif key == "$expr":
+            if not evaluate(condition, document):
+                return False
+        else:
+            values = get_path_values(document, key)
+            if _is_operator_condition(condition):
+                for operator, expected in condition.items():
+                    if operator not in QUERY_OPERATORS:
+                        raise NotImplementedError(f"Query operator {operator}")
+                    if not QUERY_OPERATORS[operator](values, expected):
+                        return False
+            elif not _equals(values, condition):
+                return False
+    return True
+
+
+# aggregation expressions of pipeline updates and $expr
+
+
+def _arguments(arguments, document: dict) -> list:
+    if not isinstance(arguments, list):
+        arguments = [arguments]
+    return [evaluate(argument, document) for argument in arguments]
+
+
+def _cond(arguments, document: dict):
+    if isinstance(arguments, dict):
+        arguments = [arguments["if"], arguments["then"], arguments["else"]]
+    condition, then, otherwise = arguments
+    return evaluate(then if evaluate(condition, document) else otherwise, document)
+
+
+def _switch(arguments: dict, document: dict):
+    for branch in arguments["branches"]:
+        if evaluate(branch["case"], document):
+            return evaluate(branch["then"], document)
+    if "default" not in arguments:
+        raise ValueError("$switch has no default and no branch matched")
+    return evaluate(arguments["default"], document)
+
+
+def _array_element_at(arguments, document: dict):
+    array, index = _arguments(arguments, document)
+    if array is None or not -len(array) <= index < len(array):
+        return None
+    return array[index]
+
+
+def _substr(arguments, document: dict) -> str:
+    string, start, length = _arguments(arguments, document)
+    end = start + length
+    return (string or "")[start:end]
+
+
+def _index_of_array(arguments, document: dict):
+    array, value = _arguments(arguments, document)
+    if array is None:
+        return None
+    return array.index(value) if value in array else -1
+
+
+def _multiply(arguments, document: dict):
+    product = 1
+    for value in _arguments(arguments, document):
+        if value is None:
+            return None
+        product *= value
+    return product
+
+
+def _add(arguments, document: dict):
+    values = _arguments(arguments, document)
+    return None if None in values else sum(values)
+
+
+def _subtract(arguments, document: dict):
+    first, second = _arguments(arguments, document)
+    return None if first is None or second is None else first - second
+
+
+def _concat_arrays(arguments, document: dict):
+    arrays = _arguments(arguments, document)
+    if None in arrays:
+        return None
+    return list(itertools.chain.from_iterable(arrays))
+
+
+def _compare_expression(accept):
+    def operator(arguments, document: dict) -> bool:
+        first, second = _arguments(arguments, document)
+        return accept(compare(first, second))
+
+    return operator
+
+
+def _if_null(arguments, document: dict):
+    for value in _arguments(arguments, document):
+        if value is not None:
+            return value
+    return None
+
+
+EXPRESSION_OPERATORS = {
+    "$literal": lambda argument, document: argument,
+    "$cond": _cond,
+    "$switch": _switch,
+    "$and": lambda arguments, document: all(_arguments(arguments, document)),
+    "$or": lambda arguments, document: any(_arguments(arguments, document)),
+    "$not": lambda arguments, document: not _arguments(arguments, document)[0],
+    "$eq": _compare_expression(lambda c: c == 0),
+    "$ne": _compare_expression(lambda c: c != 0),
+    "$gt": _compare_expression(lambda c: c > 0),
+    "$gte": _compare_expression(lambda c: c >= 0),
+    "$lt": _compare_expression(lambda c: c < 0),
+    "$lte": _compare_expression(lambda c: c <= 0),
+    "$size": lambda arguments, document: len(_arguments(arguments, document)[0]),
+    "$arrayElemAt": _array_element_at,
+    "$indexOfArray": _index_of_array,
+    "$concatArrays": _concat_arrays,
+    "$substrCP": _substr,
+    "$multiply": _multiply,
+    "$add": _add,
+    "$subtract": _subtract,
+    "$ifNull": _if_null,
+}
+
+
+def evaluate(expression, document: dict):
+    if isinstance(expression, str):
+        if expression.startswith("$$"):
+            raise NotImplementedError(f"Variable {expression}")
+        if expression.startswith("$"):
+            return copy_value(get_field(document, expression[1:]))
+        return expression
+    if isinstance(expression, list):
+        return [evaluate(item, document) for item in expression]
+    if isinstance(expression, dict):
+        if len(expression) == 1:
+            operator, arguments = next(iter(expression.items()))
+            if operator.startswith("$"):
+                if operator not in EXPRESSION_OPERATORS:
+                    raise NotImplementedError(f"Expression operator {operator}")
+                return EXPRESSION_OPERATORS[operator](arguments, document)
+        return {key: evaluate(value, document) for key, value in expression.items()}
+    return expression
+
+
+# updates
+
+
+def _push(document: dict, path: str, value) -> None:
+    array = get_field(document, path)
+    if array is None:
+        array = []
+        set_field(document, path, array)
+    if isinstance(value, dict) and "$each" in value:
+        array.extend(copy_value(value["$each"]))
+    else:
+        array.append(copy_value(value))
+
+
+def _inc(document: dict, path: str, value) -> None:
+    set_field(document, path, (get_field(document, path) or 0) + value)
+
+
+def _pop(document: dict, path: str, value) -> None:
+    array = get_field(document, path)
+    if array:
+        array.pop(0 if value == -1 else -1)
+
+
+UPDATE_OPERATORS = {
+    "$set": lambda document, path, value: set_field(document, path, copy_value(value)),
+    "$unset": lambda document, path, value: unset_field(document, path),
+    "$inc": _inc,
+    "$push": _push,
+    "$pop": _pop,
+}
+
+
+def apply_update(document: dict, update, inserted: bool = False) -> None:
+    """Applies ``update`` in place, ``$setOnInsert`` only applies to a document the
+    update inserts."""
+    if isinstance(update, list):
+        for stage in update:
+            for name, fields in stage.items():
+                if name in ("$set", "$addFields"):
+                    values = {
+                        path: evaluate(expression, document)
+                        for path, expression in fields.items()
+                    }
+                    for path, value in values.items():
+                        set_field(document, path, value)
+                elif name in ("$unset", "$project") and isinstance(fields, (str, list)):
+                    for path in [fields] if isinstance(fields, str) else fields:
+                        unset_field(document, path)
+                else:
+                    raise NotImplementedError(f"Update stage {name}")
+        return
+    for operator, fields in update.items():
+        if operator == "$setOnInsert":
+            if inserted:
+                for path, value in fields.items():
+                    set_field(document, path, copy_value(value))
+            continue
+        if operator not in UPDATE_OPERATORS:
+            raise NotImplementedError(f"Update operator {operator}")
+        for path, value in fields.items():
+            UPDATE_OPERATORS[operator](document, path, value)
+
+
+def _get_upsert_document(query: dict) -> dict:
+    document = {}
+    for key, condition in query.items():
+        if not key.startswith("$") and not _is_operator_condition(condition):
+            set_field(document, key, copy_value(condition))
+    return document
+
+
+# projections and sorting
+
+
+def project(document: dict, projection, query: Optional[dict] = None) -> dict:
+    if not projection:
+        return copy_value(document)
+    if isinstance(projection, list):
+        projection = {field: 1 for field in projection}
+    included = [field for field, value in projection.items() if value]
+    if not [field for field in included if field != "_id"]:
+        excluded = {field for field, value in projection.items() if not value}
+        return {
+            field: copy_value(value)
+            for field, value in document.items()
+            if field not in excluded
+        }
+    if all("." not in field for field in included):
+        # the projection of every field that beanie reads documents with
+        projected = {
+            field: copy_value(document[field])
+            for field in included
+            if field in document
+        }
+        if not projection.get("_id", 1):
+            projected.pop("_id", None)
+        elif "_id" in document:
+            projected["_id"] = document["_id"]
+        return projected
+    projected = {}
+    if projection.get("_id", 1) and "_id" in document:
+        projected["_id"] = document["_id"]
+    for field in included:
+        if field.endswith(".$"):
+            field = field[:-2]
+            projected[field] = _get_positional_match(document, field, query or {})
+        elif (value := get_field(document, field)) is not None or _has_field(
+            document, field
+        ):
+            set_field(projected, field, copy_value(value))
+    return projected
+
+
+def _has_field(document: dict, path: str) -> bool:
+    *parents, name = path.split(".")
+    for part in parents:
+        document = document.get(part)
+        if not isinstance(document, dict):
+            return False
+    return name in document
+
+
+def _get_positional_match(document: dict, field: str, query: dict) -> list:
+    """``field.$``: the first array item matching the conditions the query has on it"""
+    prefix = f"{field}."
+    conditions = {
+        key.split(".", field.count(".") + 1)[-1]: value
+        for key, value in query.items()
+        if key.startswith(prefix)
+    }
+    for item in get_field(document, field) or []:
+        if isinstance(item, dict) and matches(item, conditions):
+            return [copy_value(item)]
+    return []
+
+
+def get_sort_key(document: dict, path: str) -> Tuple[int, Any]:
+    value = get_field(document, path)
+    if isinstance(value, ObjectId):
+        value = value.binary
+    return _type_rank(value), value if value is not None else 0
+
+
+def normalize_sort(key_or_list, direction=None) -> List[Tuple[str, int]]:
+    if key_or_list is None:
+        return []
+    if isinstance(key_or_list, str):
+        return [(key_or_list, direction or 1)]
+    if isinstance(key_or_list, dict):
+        return list(key_or_list.items())
+    return [tuple(item) for item in key_or_list]
+
+
+def sort_documents(documents: List[dict], sort: List[Tuple[str, int]]) -> List[dict]:
+    for path, direction in reversed(sort):
+        documents.sort(
+            key=lambda document: get_sort_key(document, path), reverse=direction < 0
+        )
+    return documents
+
+
+# sync collection (pymongo)
+
+
+class MemoryCursor:
+    def __init__(
+        self, collection: "MemoryCollection", query, projection, sort, skip, limit
+    ):
+        self.collection = collection
+        self.query = query
+        self.projection = projection
+        self._sort = normalize_sort(sort)
+        self._skip = skip
+        self._limit = limit
+        self._results: Optional[Iterator[dict]] = None
+
+    def sort(self, key_or_list, direction=None) -> "MemoryCursor":
+        self._sort = normalize_sort(key_or_list, direction)
+        return self
+
+    def skip(self, skip: int) -> "MemoryCursor":
+        self._skip = skip
+        return self
+
+    def limit(self, limit: int) -> "MemoryCursor":
+        self._limit = limit
+        return self
+
+    def get_results(self, length: Optional[int] = None) -> List[dict]:
+        documents = self.collection.get_matching(self.query)
+        if self._sort:
+            documents = sort_documents(documents, self._sort)
+        skip = self._skip
+        documents = documents[skip:]
+        for limit in (self._limit, length):
+            if limit:
+                documents = documents[:limit]
+        return [
+            project(document, self.projection, self.query) for document in documents
+        ]
+
+    def __iter__(self) -> Iterator[dict]:
+        return iter(self.get_results())
+
+    def __next__(self) -> dict:
+        if self._results is None:
+            self._results = iter(self.get_results())
+        return next(self._results)
+
+
+class MemoryCollection:
+    def __init__(self, database: "MemoryDatabase", name: str):
+        self.database = database
+        self.name = name
+        self.documents: Dict[Any, dict] = {}
+        self.indexes: Dict[str, dict] = {"_id_": {"key": [("_id", 1)], "v": 2}}
+
+    def get_matching(self, query: Optional[dict]) -> List[dict]:
+        """Stored documents (not copies) matching ``query``."""
+        if query and "_id" in query and not _is_operator_condition(query["_id"]):
+            document = self.documents.get(query["_id"])
+            return [document] if document and matches(document, query) else []
+        return [
+            document for document in self.documents.values() if matches(document, query)
+        ]
+
+    def _get_first(self, query: Optional[dict], sort=None) -> Optional[dict]:
+        documents = self.get_matching(query)
+        if sort:
+            documents = sort_documents(documents, normalize_sort(sort))
+        return documents[0] if documents else None
+
+    def find(
+        self,
+        filter: Optional[dict] = None,
+        projection=None,
+        sort=None,
+        skip: int = 0,
+        limit: int = 0,
+        session=None,
+        **kwargs,
+    ) -> MemoryCursor:
+        return MemoryCursor(self, filter, projection, sort, skip, limit)
+
+    def find_one(
+        self, filter: Optional[dict] = None, projection=None, session=None, **kwargs
+    ) -> Optional[dict]:
+        if filter is not None and not isinstance(filter, dict):
+            filter = {"_id": filter}
+        document = self._get_first(filter, kwargs.get("sort"))
+        return project(document, projection, filter) if document else None
+
+    def count_documents(self, filter: dict, session=None, **kwargs) -> int:
+        return len(self.get_matching(filter))
+
+    def _insert(self, document: dict) -> Any:
+        if "_id" not in document:
+            document["_id"] = ObjectId()
+        if document["_id"] in self.documents:
+            raise ValueError(f"Duplicate _id {document['_id']} in {self.name}")
+        self.documents[document["_id"]] = copy_value(document)
+        return document["_id"]
+
+    def insert_one(self, document: dict, session=None, **kwargs) -> InsertOneResult:
+        return InsertOneResult(self._insert(document), True)
+
+    def insert_many(
+        self, documents: List[dict], ordered: bool = True, session=None, **kwargs
+    ) -> InsertManyResult:
+        return InsertManyResult(
+            [self._insert(document) for document in documents], True
+        )
+
+    def _update(
+        self, filter: dict, update, upsert: bool, many: bool
+    ) -> Tuple[dict, List[dict]]:
+        """(raw result, updated stored documents)"""
+        documents = self.get_matching(filter)
+        if not many:
+            documents = documents[:1]
+        for document in documents:
+            apply_update(document, update)
+        raw_result = {
+            "n": len(documents),
+            "nModified": len(documents),
+            "updatedExisting": bool(documents),
+            "ok": 1.0,
+        }
+        if not documents and upsert:
+            document = _get_upsert_document(filter)
+            apply_update(document, update, inserted=True)
+            raw_result["n"] = 1
+            raw_result["upserted"] = self._insert(document)
+            documents = [self.documents[raw_result["upserted"]]]
+        return raw_result, documents
+
+    def update_one(
+        self, filter: dict, update, upsert: bool = False, session=None, **kwargs
+    ) -> UpdateResult:
+        return UpdateResult(self._update(filter, update, upsert, False)[0], True)
+
+    def update_many(
+        self, filter: dict, update, upsert: bool = False, session=None, **kwargs
+    ) -> UpdateResult:
+        return UpdateResult(self._update(filter, update, upsert, True)[0], True)
+
+    def replace_one(
+        self,
+        filter: dict,
+        replacement: dict,
+        upsert: bool = False,
+        session=None,
+        **kwargs,
+    ) -> UpdateResult:
+        document = self._get_first(filter)
+        raw_result = {"n": 0, "nModified": 0, "updatedExisting": False, "ok": 1.0}
+        if document is not None:
+            replacement = copy_value(replacement)
+            replacement["_id"] = document["_id"]
+            self.documents[document["_id"]] = replacement
+            raw_result.update(n=1, nModified=1, updatedExisting=True)
+        elif upsert:
+            raw_result.update(n=1, upserted=self._insert(dict(replacement)))
+        return UpdateResult(raw_result, True)
+
+    def find_one_and_update(
+        self,
+        filter: dict,
+        update,
+        projection=None,
+        sort=None,
+        upsert: bool = False,
+        return_document: bool = False,
+        session=None,
+        **kwargs,
+    ) -> Optional[dict]:
+        """``return_document`` is ``ReturnDocument.AFTER`` (True) or ``BEFORE`` (False)"""
+        document = self._get_first(filter, sort)
+        if document is None:
+            if not upsert:
+                return None
+            _, documents = self._update(filter, update, True, False)
+            return project(documents[0], projection) if return_document else None
+        before = None if return_document else project(document, projection)
+        apply_update(document, update)
+        return project(document, projection) if return_document else before
+
+    def find_one_and_delete(self, filter: dict, projection=None, **kwargs):
+        document = self._get_first(filter, kwargs.get("sort"))
+        if document is None:
+            return None
+        del self.documents[document["_id"]]
+        return project(document, projection)
+
+    def delete_one(self, filter: dict, session=None, **kwargs) -> DeleteResult:
+        documents = self.get_matching(filter)[:1]
+        for document in documents:
+            del self.documents[document["_id"]]
+        return DeleteResult({"n": len(documents), "ok": 1.0}, True)
+
+    def delete_many(self, filter: dict, session=None, **kwargs) -> DeleteResult:
+        documents = self.get_matching(filter)
+        for document in documents:
+            del self.documents[document["_id"]]
+        return DeleteResult({"n": len(documents), "ok": 1.0}, True)
+
+    def bulk_write(
+        self, requests: list, ordered: bool = True, session=None, **kwargs
+    ) -> BulkWriteResult:
+        """Supports the ``InsertOne``, ``UpdateOne``, ``UpdateMany``, ``ReplaceOne``,
+        ``DeleteOne`` and ``DeleteMany`` requests of pymongo."""
+        result = {
+            "nInserted": 0,
+            "nMatched": 0,
+            "nModified": 0,
+            "nRemoved": 0,
+            "nUpserted": 0,
+            "upserted": [],
+            "writeErrors": [],
+            "writeConcernErrors": [],
+        }
+        for index, request in enumerate(requests):
+            name = type(request).__name__
+            if name == "InsertOne":
+                self._insert(request._doc)
+                result["nInserted"] += 1
+                continue
+            if name in ("DeleteOne", "DeleteMany"):
+                delete = self.delete_one if name == "DeleteOne" else self.delete_many
+                result["nRemoved"] += delete(request._filter).deleted_count
+                continue
+            if name == "ReplaceOne":
+                raw_result = self.replace_one(
+                    request._filter, request._doc, request._upsert
+                ).raw_result
+            elif name in ("UpdateOne", "UpdateMany"):
+                raw_result, _ = self._update(
+                    request._filter, request._doc, request._upsert, name == "UpdateMany"
+                )
+            else:
+                raise NotImplementedError(f"Bulk write request {name}")
+            if "upserted" in raw_result:
+                result["nUpserted"] += 1
+                result["upserted"].append(
+                    {"index": index, "_id": raw_result["upserted"]}
+                )
+            else:
+                result["nMatched"] += raw_result["n"]
+                result["nModified"] += raw_result["nModified"]
+        return BulkWriteResult(result, True)
+
+    def index_information(self, session=None) -> Dict[str, dict]:
+        return copy_value(self.indexes)
+
+    def create_index(self, keys, **kwargs) -> str:
+        keys = normalize_sort(keys)
+        name = kwargs.get("name") or "_".join(
+            f"{key}_{direction}" for key, direction in keys
+        )
+        self.indexes[name] = {"key": keys, "v": 2}
+        return name
+
+    def create_indexes(self, indexes: list, session=None, **kwargs) -> List[str]:
+        return [
+            self.create_index(
+                index.document["key"].items(), name=index.document["name"]
+            )
+            for index in indexes
+        ]
+
+    def drop_index(self, index_or_name, session=None, **kwargs) -> None:
+        self.indexes.pop(index_or_name, None)
+
+    def drop(self, session=None) -> None:
+        self.documents.clear()
+        self.indexes = {"_id_": {"key": [("_id", 1)], "v": 2}}
+
+
+class MemoryDatabase:
+    """pymongo ``Database``: collections by attribute (``db.GamePlayer``) or item."""
+
+    def __init__(self, name: str = "memory"):
+        self.name = name
+        self.collections: Dict[str, MemoryCollection] = {}
+
+    def __getitem__(self, name: str) -> MemoryCollection:
+        if name not in self.collections:
+            self.collections[name] = MemoryCollection(self, name)
+        return self.collections[name]
+
+    def __getattr__(self, name: str) -> MemoryCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def get_collection(self, name: str, **kwargs) -> MemoryCollection:
+        return self[name]
+
+    def list_collection_names(self, session=None, **kwargs) -> List[str]:
+        return [
+            name
+            for name, collection in self.collections.items()
+            if collection.documents
+        ]
+
+    def command(self, command, **kwargs) -> dict:
+        if command == "ping":
+            return {"ok": 1.0}
+        raise NotImplementedError(f"Command {command}")
+
+    def drop_collection(self, name: str, session=None) -> None:
+        self.collections.pop(name, None)
+
+
+# async facades (motor)
+
+
+class AsyncMemoryCursor:
+    def __init__(self, cursor: MemoryCursor):
+        self.cursor = cursor
+        self._results: Optional[Iterator[dict]] = None
+
+    def sort(self, key_or_list, direction=None) -> "AsyncMemoryCursor":
+        self.cursor.sort(key_or_list, direction)
+        return self
+
+    def skip(self, skip: int) -> "AsyncMemoryCursor":
+        self.cursor.skip(skip)
+        return self
+
+    def limit(self, limit: int) -> "AsyncMemoryCursor":
+        self.cursor.limit(limit)
+        return self
+
+    async def to_list(self, length: Optional[int]) -> List[dict]:
+        return self.cursor.get_results(length)
+
+    def __aiter__(self) -> "AsyncMemoryCursor":
+        return self
+
+    async def __anext__(self) -> dict:
+        if self._results is None:
+            self._results = iter(self.cursor.get_results())
+        try:
+            return next(self._results)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class AsyncMemoryCollection(AsyncIOMotorCollection):
+    """motor ``AsyncIOMotorCollection`` over a ``MemoryCollection``, so the beanie documents
+    and the celery tasks share the same documents. Subclasses the motor collection only to
+    pass the type check of beanie, the motor constructor (which needs a client) is not run."""
+
+    def __init__(self, database: "AsyncMemoryDatabase", collection: MemoryCollection):
+        self.database = database
+        self.collection = collection
+
+    @property
+    def name(self) -> str:
+        return self.collection.name
+
+    def find(self, *args, **kwargs) -> AsyncMemoryCursor:
+        return AsyncMemoryCursor(self.collection.find(*args, **kwargs))
+
+    def __getattr__(self, name: str):
+        # motor returns the sub-collection ``name``
+        raise AttributeError(name)
+
+
+def _delegate(name: str):
+    async def method(self: AsyncMemoryCollection, *args, **kwargs):
+        return getattr(self.collection, name)(*args, **kwargs)
+
+    method.__name__ = name
+    return method
+
+
+for _name in [
+    "find_one",
+    "count_documents",
+    "insert_one",
+    "insert_many",
+    "update_one",
+    "update_many",
+    "replace_one",
+    "find_one_and_update",
+    "find_one_and_delete",
+    "delete_one",
+    "delete_many",
+    "bulk_write",
+    "index_information",
+    "create_index",
+    "create_indexes",
+    "drop_index",
+    "drop",
+]:
+    setattr(AsyncMemoryCollection, _name, _delegate(_name))
+
+
+class AsyncMemoryDatabase:
+    def __init__(self, database: MemoryDatabase):
+        self.delegate = database
+        self.name = database.name
+        self._collections: Dict[str, AsyncMemoryCollection] = {}
+
+    def __getitem__(self, name: str) -> AsyncMemoryCollection:
+        if name not in self._collections:
+            self._collections[name] = AsyncMemoryCollection(self, self.delegate[name])
+        return self._collections[name]
+
+    def __getattr__(self, name: str) -> AsyncMemoryCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def get_collection(self, name: str, **kwargs) -> AsyncMemoryCollection:
+        return self[name]
@@ -0,0 +1,323 @@
+""" In-memory stand-in for the redis clients of the game: the sync ``redis.Redis`` of the
+celery tasks and the aioredis client of ``redis_cache``, both with ``decode_responses``.
+Keys never expire, the simulator deletes the keys of a round once it is played. Lua scripts
+run through Python implementations registered under the script source. """
+import fnmatch
+from typing import Callable, Dict, List, Optional
+
+from apps.connections import INCREMENT_TOTAL_BET_SCRIPT, SEED_TOTAL_BET_SCRIPT
+from apps.game.services.timeout_registry import CLAIM_TIMEOUT_SCRIPT
+from apps.game.services.wallet_ledger import (
+    CREDIT_SCRIPT,
+    RECONCILE_SCRIPT,
+    RESERVE_SCRIPT,
+    REVERT_CREDIT_SCRIPT,
+)
+
+
+def encode(value) -> str:
+    if isinstance(value, bytes):
+        return value.decode()
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+class MemoryRedis:
+    def __init__(self):
+        self.values: Dict[str, str] = {}
+        self.hashes: Dict[str, Dict[str, str]] = {}
+        self.sorted_sets: Dict[str, Dict[str, float]] = {}
+
+    def _stores(self) -> List[dict]:
+        return [self.values, self.hashes, self.sorted_sets]
+
+    # keys
+
+    def exists(self, *names: str) -> int:
+        return sum(any(name in store for store in self._stores()) for name in names)
+
+    def delete(self, *names: str) -> int:
+        deleted = 0
+        for name in names:
+            for store in self._stores():
+                if store.pop(name, None) is not None:
+                    deleted += 1
+        return deleted
+
+    def expire(self, name: str, time) -> bool:
+        return bool(self.exists(name))
+
+    def keys(self, pattern: str = "*") -> List[str]:
+        return [
+            name
+            for store in self._stores()
+            for name in store
+            if fnmatch.fnmatchcase(name, pattern)
+        ]
+
+    def flushdb(self, asynchronous: bool = False) -> bool:
+        for store in self._stores():
+            store.clear()
+        return True
+
+    # strings
+
+    def get(self, name: str) -> Optional[str]:
+        return self.values.get(name)
+
+    def set(
+        self,
+        name: str,
+        value,
+        ex=None,
+        px=None,
+        nx: bool = False,
+        xx: bool = False,
+        **kwargs,
+    ) -> Optional[bool]:
+        if (nx and name in self.values) or (xx and name not in self.values):
+            return None
+        self.values[name] = encode(value)
+        return True
+
+    def setex(self, name: str, time, value) -> bool:
+        return self.set(name, value)
+
+    def incrby(self, name: str, amount: int = 1) -> int:
+        value = int(self.values.get(name, 0)) + int(amount)
+        self.values[name] = str(value)
+        return value
+
+    def incr(self, name: str, amount: int = 1) -> int:
+        return self.incrby(name, amount)
+
+    def incrbyfloat(self, name: str, amount: float = 1.0) -> float:
+        value = float(self.values.get(name, 0)) + float(amount)
+        self.values[name] = encode(value)
+        return value
+
+    def execute_command(self, *args, **options):
+        name, *args = args
+        if name.lower() == "set":
+            key, value, *flags = args
+            flags = [str(flag).lower() for flag in flags]
+            return self.set(key, value, nx="nx" in flags, xx="xx" in flags)
+        return getattr(self, name.lower())(*args)
+
+    # hashes
+
+    def hset(
+        self, name: str, key=None, value=None, mapping: Optional[dict] = None, **kwargs
+    ) -> int:
+        fields = dict(mapping or {})
+        if key is not None:
+            fields[key] = value
+        hash_ = self.hashes.setdefault(name, {})
+        added = len([field for field in fields if encode(field) not in hash_])
+        hash_.update({encode(field): encode(value) for field, value in fields.items()})
+        return added
+
+    def hget(self, name: str, key) -> Optional[str]:
+        return self.hashes.get(name, {}).get(encode(key))
+
+    def hgetall(self, name: str) -> Dict[str, str]:
+        return dict(self.hashes.get(name, {}))
+
+    def hexists(self, name: str, key) -> bool:
+        return encode(key) in self.hashes.get(name, {})
+
+    def hdel(self, name: str, *keys) -> int:
+        hash_ = self.hashes.get(name, {})
+        deleted = len([hash_.pop(encode(key)) for key in keys if encode(key) in hash_])
+        if name in self.hashes and not hash_:
+            del self.hashes[name]
+        return deleted
+
+    def hincrby(self, name: str, key, amount: int = 1) -> int:
+        hash_ = self.hashes.setdefault(name, {})
+        value = int(hash_.get(encode(key), 0)) + int(amount)
+        hash_[encode(key)] = str(value)
+        return value
+
+    def hincrbyfloat(self, name: str, key, amount: float = 1.0) -> float:
+        hash_ = self.hashes.setdefault(name, {})
+        value = float(hash_.get(encode(key), 0)) + float(amount)
+        hash_[encode(key)] = encode(value)
+        return value
+
+    # sorted sets
+
+    def zadd(self, name: str, mapping: dict, **kwargs) -> int:
+        sorted_set = self.sorted_sets.setdefault(name, {})
+        added = len([member for member in mapping if member not in sorted_set])
+        sorted_set.update({member: float(score) for member, score in mapping.items()})
+        return added
+
+    def zrem(self, name: str, *members) -> int:
+        sorted_set = self.sorted_sets.get(name, {})
+        removed = len(
+            [sorted_set.pop(member) for member in members if member in sorted_set]
+        )
+        if name in self.sorted_sets and not sorted_set:
+            del self.sorted_sets[name]
+        return removed
+
+    def zscore(self, name: str, member) -> Optional[float]:
+        return self.sorted_sets.get(name, {}).get(member)
+
+    def zrangebyscore(self, name: str, min, max, **kwargs) -> List[str]:
+        return [
+            member
+            for member, score in sorted(
+                self.sorted_sets.get(name, {}).items(), key=lambda item: item[1]
+            )
+            if float(min) <= score <= float(max)
+        ]
+
+    # scripts and pipelines
+
+    def eval(self, script: str, numkeys: int, *keys_and_args):
+        if script not in SCRIPTS:
+            raise NotImplementedError("Script without a memory implementation")
+        keys, args = keys_and_args[:numkeys], keys_and_args[numkeys:]
+        return SCRIPTS[script](self, list(keys), list(args))
+
+    def pipeline(self, transaction: bool = True, shard_hint=None) -> "MemoryPipeline":
+        return MemoryPipeline(self)
+
+    def ping(self) -> bool:
+        return True
+
+    def close(self) -> None:
+        pass
+
+
+class MemoryPipeline:
+    """Queues the commands and runs them on ``execute``, every command returns the pipeline."""
+
+    def __init__(self, client: MemoryRedis):
+        self.client = client
+        self.commands = []
+
+    def __getattr__(self, name: str) -> Callable:
+        method = getattr(self.client, name)
+
+        def queue(*args, **kwargs) -> "MemoryPipeline":
+            self.commands.append((method, args, kwargs))
+            return self
+
+        return queue
+
+    def execute(self, raise_on_error: bool = True) -> list:
+        commands, self.commands = self.commands, []
+        return [method(*args, **kwargs) for method, args, kwargs in commands]
+
+    def reset(self) -> None:
+        self.commands = []
+
+    def __enter__(self) -> "MemoryPipeline":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.reset()
+
+
+class AsyncMemoryPipeline(MemoryPipeline):
+    async def execute(self, raise_on_error: bool = True) -> list:
+        return super().execute(raise_on_error)
+
+    async def __aenter__(self) -> "AsyncMemoryPipeline":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.reset()
+
+
+class AsyncMemoryRedis:
+    """aioredis ``Redis`` over a ``MemoryRedis``, so the server and the celery tasks share
+    the same keys."""
+
+    def __init__(self, client: MemoryRedis):
+        self.client = client
+
+    def pipeline(
+        self, transaction: bool = True, shard_hint=None
+    ) -> AsyncMemoryPipeline:
+        return AsyncMemoryPipeline(self.client)
+
+    def __getattr__(self, name: str):
+        method = getattr(self.client, name)
+
+        async def call(*args, **kwargs):
+            return method(*args, **kwargs)
+
+        # cached, the lookup runs on every redis call of the managers
+        setattr(self, name, call)
+        return call
+
+
+# python implementations of the lua scripts, same keys, arguments and replies
+
+
+def _increment_total_bet(client: MemoryRedis, keys: list, args: list):
+    if not client.hexists(keys[0], args[0]):
+        return None
+    return encode(client.hincrbyfloat(keys[0], args[0], args[1]))
+
+
+def _seed_total_bet(client: MemoryRedis, keys: list, args: list):
+    if not client.hexists(keys[0], args[0]):
+        client.hset(keys[0], args[0], args[1])
+    return client.hget(keys[0], args[0])
+
+
+def _claim_timeout(client: MemoryRedis, keys: list, args: list) -> int:
+    if client.get(keys[0]) == encode(args[0]):
+        client.delete(keys[0])
+        return 1
+    return 0
+
+
+def _reserve(client: MemoryRedis, keys: list, args: list):
+    balance, amount = client.get(keys[0]), float(args[0])
+    if balance is None or float(balance) < amount:
+        return None
+    client.incrbyfloat(keys[1], amount)
+    return encode(client.incrbyfloat(keys[0], -amount))
+
+
+def _credit(client: MemoryRedis, keys: list, args: list):
+    client.incrbyfloat(keys[1], -float(args[0]))
+    if not client.exists(keys[0]):
+        return None
+    return encode(client.incrbyfloat(keys[0], args[0]))
+
+
+def _reconcile(client: MemoryRedis, keys: list, args: list):
+    if len(keys) == 3 and not client.set(keys[2], 1, nx=True):
+        return None
+    pending = client.incrbyfloat(keys[1], -float(args[0]))
+    balance = encode(float(args[1]) - pending)
+    client.set(keys[0], balance)
+    return balance
+
+
+def _revert_credit(client: MemoryRedis, keys: list, args: list):
+    if not client.set(keys[2], 1, nx=True):
+        return None
+    client.incrbyfloat(keys[1], args[0])
+    if not client.exists(keys[0]):
+        return None
+    return encode(client.incrbyfloat(keys[0], -float(args[0])))
+
+
+SCRIPTS: Dict[str, Callable[[MemoryRedis, list, list], object]] = {
+    INCREMENT_TOTAL_BET_SCRIPT: _increment_total_bet,
+    SEED_TOTAL_BET_SCRIPT: _seed_total_bet,
+    CLAIM_TIMEOUT_SCRIPT: _claim_timeout,
+    RESERVE_SCRIPT: _reserve,
+    CREDIT_SCRIPT: _credit,
+    RECONCILE_SCRIPT: _reconcile,
+    REVERT_CREDIT_SCRIPT: _revert_credit,
+}
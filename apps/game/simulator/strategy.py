@@ -0,0 +1,56 @@
+""" Shoe and basic-strategy bots of the simulator. """
+import random
+from typing import List, Optional
+
+from apps.game.cards.deck import deck
+from apps.game.cards.hand import Hand
+
+
+class Shoe:
+    """Six decks, as scanned at the table, reshuffled once the cut card comes out."""
+
+    def __init__(self, penetration: float = 0.75, seed: Optional[int] = None):
+        self.random = random.Random(seed)
+        self.cards: List[str] = list(deck)
+        self.cut = int(len(self.cards) * penetration)
+        self.position = 0
+        self.shuffles = 0
+        self.shuffle()
+
+    def shuffle(self) -> None:
+        self.random.shuffle(self.cards)
+        self.position = 0
+        self.shuffles += 1
+
+    def needs_shuffle(self) -> bool:
+        return self.position >= self.cut
+
+    def draw(self) -> str:
+        # a round which passes the cut card is dealt to its end
+        if self.position == len(self.cards):
+            self.shuffle()
+        card = self.cards[self.position]
+        self.position += 1
+        return card
+
+
+def get_decision(cards: List[str], dealer_card: str) -> str:
+    """Hit or stand of the basic strategy (six decks, dealer stands on soft 17).
+    Doubles and splits are played as hits and stands of the same total, they go through
+    the merchant bet flow which the simulator leaves out."""
+    hand = Hand(cards)
+    score, hard_score = hand._hand_scores.score, hand._hand_scores.second_score
+    dealer_score = deck[dealer_card].score
+    if score <= 21 and score != hard_score:
+        if score <= 17:
+            return "hit"
+        if score == 18:
+            return "hit" if dealer_score >= 9 else "stand"
+        return "stand"
+    if hand.score <= 11:
+        return "hit"
+    if hand.score == 12:
+        return "stand" if 4 <= dealer_score <= 6 else "hit"
+    if hand.score <= 16:
+        return "stand" if dealer_score <= 6 else "hit"
+    return "stand"
@@ -0,0 +1,225 @@
+""" A table of basic-strategy bots played by the dealing, action and payment managers of the
+game on the memory backend. Every round goes through the consumers' code paths from the first
+scanned card to the settlement: ``handle_card_dealing``, ``make_action``, ``action_cards`` and
+``dealer_cards``, with the timers and celery tasks of the round run in between. Bets are seeded
+as placed, the betting time, the merchant requests and the start of the next round are left out. """
+import time
+from collections import Counter
+from typing import Dict, Optional
+
+from beanie import PydanticObjectId
+from bson import ObjectId
+
+from apps.connections import redis_cache
+
+# through the consumers, which the card managers import their emitter from
+from apps.game.consumers import (
+    ActionCardManager,
+    AmericanCardsManager,
+    EuropeanCardsManager,
+)
+from apps.game.documents import Game, GamePlayer, GameRound
+from apps.game.managers.base_game_manager import BaseGameManager
+from apps.game.services.dispatch_action_manager import DispatchActionManager
+from apps.game.services.outbox import OUTBOX_COLLECTION
+from apps.game.services.utils import get_timestamp, id_generator
+from apps.game.services.wallet_ledger import get_balance_key, wallet_ledger
+from apps.game.simulator.backend import MemoryBackend
+from apps.game.simulator.strategy import Shoe, get_decision
+
+SEATS = [1, 3, 5, 7, 9, 11, 13]
+BET = 10
+BALANCE = 1_000_000_000
+# the timers and tasks played within a round, the simulator starts the next round itself
+ROUND_TASKS = {"send_make_decision_to_starter_game_player", "pay_winnings"}
+# scanned cards and decisions, a round which takes more is stuck
+MAX_ROUND_STEPS = 100
+CARD_MANAGERS = {"european": EuropeanCardsManager, "american": AmericanCardsManager}
+
+
+class TableSimulator:
+    def __init__(
+        self,
+        backend: MemoryBackend,
+        players: int = len(SEATS),
+        game_type: str = "european",
+        seed: Optional[int] = None,
+        bet: float = BET,
+    ):
+        if not 1 <= players <= len(SEATS):
+            raise ValueError(f"A table has 1 to {len(SEATS)} players")
+        self.backend = backend
+        self.card_manager = CARD_MANAGERS[game_type]
+        self.game_type = game_type
+        self.bet = bet
+        self.shoe = Shoe(seed=seed)
+        self.game_id = str(ObjectId())
+        self.merchant_id = str(ObjectId())
+        self.dealer_session = {
+            "game_id": self.game_id,
+            "user_id": "",
+            "merchant_id": "",
+        }
+        self.sessions: Dict[int, dict] = {
+            seat_number: {
+                "game_id": self.game_id,
+                "user_id": f"bot-{seat_number}",
+                "merchant_id": self.merchant_id,
+                "user_token": f"bot-{seat_number}",
+                "user_name": f"bot-{seat_number}",
+                "player_id": f"bot-{seat_number}",
+                "sid": f"bot-{seat_number}",
+            }
+            for seat_number in SEATS[:players]
+        }
+        self.stats = Counter()
+
+    async def setup(self) -> None:
+        await Game(
+            id=PydanticObjectId(self.game_id),
+            name="simulator",
+            type=self.game_type,
+            game_status=True,
+            table_stream_key_1="",
+            table_stream_key_2="",
+        ).insert()
+        url = "http://simulator/"
+        self.backend.database.Merchant.insert_one(
+            {
+                "_id": ObjectId(self.merchant_id),
+                "name": "simulator",
+                "games": [{"game_id": self.game_id, "is_active": True}],
+                "transaction_url": url,
+                "validate_token_url": url,
+                "bet_url": url,
+                "win_url": url,
+                "rollback_url": url,
+                "get_balance_url": url,
+                "schema_type": "snake",
+            }
+        )
+        for session in self.sessions.values():
+            await redis_cache.set_user_balance_in_cache(
+                session["user_id"], self.merchant_id, BALANCE
+            )
+
+    async def start_round(self) -> str:
+        """A round whose betting time is over with a bet on every seat."""
+        if self.shoe.needs_shuffle():
+            self.shoe.shuffle()
+        game_round = await GameRound(
+            game_id=self.game_id,
+            round_id=id_generator(),
+            start_timestamp=get_timestamp(-1),
+        ).insert()
+        round_id = str(game_round.id)
+        game_players = []
+        for seat_number, session in self.sessions.items():
+            balance = await wallet_ledger.reserve(
+                session["user_id"], self.merchant_id, self.bet
+            )
+            game_players.append(
+                BaseGameManager(session).generate_game_player_defaults(
+                    round_id,
+                    seat_number,
+                    session["sid"],
+                    balance,
+                    bet=self.bet,
+                    total_bet=self.bet,
+                )
+            )
+        await GamePlayer.get_motor_collection().insert_many(game_players)
+        return round_id
+
+    async def play_round(self) -> None:
+        round_id = await self.start_round()
+        # the dealer's up card, the american hole card, and two cards for every player
+        cards = len(self.sessions) * 2 + (1 if self.game_type == "european" else 2)
+        for _ in range(cards):
+            await self.card_manager(self.dealer_session, round_id).handle_card_dealing(
+                self.shoe.draw()
+            )
+        dealer_card = self.backend.database.GameRound.find_one(
+            {"_id": ObjectId(round_id)}
+        )["dealer_cards"][0]
+        for _ in range(MAX_ROUND_STEPS):
+            self.backend.scheduler.run(ROUND_TASKS)
+            if self.backend.redis.exists(f"{self.game_id}:settled_at"):
+                break
+            await self.play_step(round_id, dealer_card)
+        else:
+            raise RuntimeError(f"Round {round_id} did not settle")
+        self.finish_round(round_id)
+
+    async def play_step(self, round_id: str, dealer_card: str) -> None:
+        """The next move of the round: a bot's decision, the dealer's card for the player
+        whose turn it is, or the dealer's own card."""
+        game_player = self.backend.database.GamePlayer.find_one(
+            {"game_round": round_id, "player_turn": True}
+        )
+        if game_player is None:
+            await ActionCardManager(self.dealer_session, round_id).scan_dealer_card(
+                self.shoe.draw()
+            )
+            return
+        if game_player["making_decision"]:
+            session = self.sessions[game_player["seat_number"]]
+            action_type = get_decision(game_player["cards"], dealer_card)
+            self.stats[action_type] += 1
+            manager = DispatchActionManager(
+                session, round_id, session["sid"], action_type
+            )
+            event_name, data, room = await manager.make_action()
+        else:
+            event_name, data, room = await ActionCardManager(
+                self.dealer_session, round_id
+            ).scan_card(self.shoe.draw())
+        await self.backend.emitter.emit(event_name, data, room=room)
+
+    def finish_round(self, round_id: str) -> None:
+        """Tallies the settlement and drops the round, memory stays flat over millions of
+        rounds."""
+        database, redis = self.backend.database, self.backend.redis
+        outbox = database[OUTBOX_COLLECTION]
+        for transaction in outbox.find():
+            self.stats[transaction["type"]] += 1
+            self.stats["won"] += transaction["amount"]
+        outbox.delete_many({})
+        database.GamePlayer.delete_many({"game_round": round_id})
+        database.GameRound.delete_many({"_id": ObjectId(round_id)})
+        redis.delete(f"{self.game_id}:settled_at", *redis.keys(f"{round_id}:*"))
+        self.backend.scheduler.clear()
+        self.stats["rounds"] += 1
+        self.stats["bet"] += self.bet * len(self.sessions)
+
+    async def run(self, rounds: int) -> dict:
+        started = time.perf_counter()
+        for _ in range(rounds):
+            await self.play_round()
+        return self.get_report(time.perf_counter() - started)
+
+    def get_report(self, seconds: float) -> dict:
+        stats = self.stats
+        balances = [
+            float(self.backend.redis.get(get_balance_key(user_id, self.merchant_id)))
+            for user_id in [session["user_id"] for session in self.sessions.values()]
+        ]
+        return {
+            "game_type": self.game_type,
+            "players": len(self.sessions),
+            "rounds": stats["rounds"],
+            "seconds": round(seconds, 3),
+            "rounds_per_second": round(stats["rounds"] / seconds, 1) if seconds else 0,
+            "shuffles": self.shoe.shuffles,
+            "decisions": {action: stats[action] for action in ("hit", "stand")},
+            "outcomes": {
+                outcome: stats[outcome] for outcome in ("win", "push", "lose")
+            },
+            "bet": stats["bet"],
+            "won": stats["won"],
+            "house_edge": round((stats["bet"] - stats["won"]) / stats["bet"], 4)
+            if stats["bet"]
+            else 0,
+            "wallet_net": round(sum(balances) - BALANCE * len(balances), 2),
+            **self.backend.get_stats(stats["rounds"]),
+        }
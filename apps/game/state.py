@@ -0,0 +1,283 @@
+""" Live state of the seats and rounds on the socket event path.
+``SeatState`` and ``RoundState`` are ``__slots__`` dataclasses with the fields of ``GamePlayer``
+and ``GameRound``, mapped from and to the mongo documents field by field, without pydantic
+validation. The documents stay the boundary: the REST routes and the seats and rounds which
+players create are validated, the managers of a running round read and save the state.
+Reads which are only sent to the players fetch a projection into ``construct``-ed documents.
+With ``VALIDATE_TRUSTED_READS`` every trusted read is validated too and its differences logged. """
+import copy
+import dataclasses
+import logging
+from functools import partial
+from operator import attrgetter
+from typing import ClassVar, Dict, Iterable, List, Optional, Tuple, Type, Union
+
+from beanie import Document
+from bson import ObjectId
+from pydantic import validate_model
+
+from apps.config import settings
+from apps.game.documents import GamePlayer, GameRound
+from apps.game.services.utils import get_timestamp
+
+logger = logging.getLogger(__name__)
+
+REQUIRED = dataclasses.MISSING
+
+
+def diff_validated(
+    document_class: Type[Document], document: dict, values: dict
+) -> dict:
+    """Fields of the mongo ``document`` which the validation of ``document_class`` changes or
+    rejects, as (trusted value, validated value or error). Fields out of the projection are
+    not compared."""
+    validated, _, error = validate_model(document_class, document)
+    errors = (
+        {error["loc"][0]: error["msg"] for error in error.errors()} if error else {}
+    )
+    diff = {}
+    for name, field in document_class.__fields__.items():
+        if field.alias not in document:
+            continue
+        if name in errors:
+            diff[name] = (values[name], errors[name])
+        elif validated[name] != values[name]:
+            diff[name] = (values[name], validated[name])
+    return diff
+
+
+def check_trusted_read(document_class: Type[Document], document: dict, values: dict):
+    if diff := diff_validated(document_class, document, values):
+        logger.warning(
+            "Trusted read of %s %s differs from validation: %s",
+            document_class.__name__,
+            document.get("_id"),
+            diff,
+        )
+
+
+IMMUTABLE_TYPES = (type(None), bool, int, float, str, ObjectId)
+_construct_defaults: Dict[type, Tuple[dict, tuple]] = {}
+
+
+def get_construct_defaults(document_class: Type[Document]) -> Tuple[dict, tuple]:
+    """(immutable defaults, (name, factory) of the other defaults) of the optional fields,
+    ``BaseModel.construct`` deep copies every default."""
+    if document_class not in _construct_defaults:
+        defaults, factories = {}, []
+        for name, field in document_class.__fields__.items():
+            if field.required:
+                continue
+            if field.default_factory is not None:
+                factories.append((name, field.default_factory))
+            elif isinstance(field.default, IMMUTABLE_TYPES):
+                defaults[name] = field.default
+            elif type(field.default) in (list, dict) and not field.default:
+                factories.append((name, type(field.default)))
+            else:
+                factories.append((name, partial(copy.deepcopy, field.default)))
+        _construct_defaults[document_class] = (defaults, tuple(factories))
+    return _construct_defaults[document_class]
+
+
+def construct(document_class: Type[Document], document: dict) -> Document:
+    """``document_class`` of a mongo document without validation, the fields out of the
+    projection keep their defaults."""
+    values = dict(document)
+    values["id"] = values.pop("_id")
+    if settings.VALIDATE_TRUSTED_READS:
+        check_trusted_read(document_class, document, values)
+    defaults, factories = get_construct_defaults(document_class)
+    model = document_class.__new__(document_class)
+    object.__setattr__(
+        model,
+        "__dict__",
+        {
+            **defaults,
+            **{name: factory() for name, factory in factories if name not in values},
+            **values,
+        },
+    )
+    object.__setattr__(model, "__fields_set__", set(values))
+    return model
+
+
+async def find_constructed(
+    document_class: Type[Document],
+    query: dict,
+    fields: Iterable[str],
+    sort: Union[str, list] = None,
+    length: int = None,
+) -> list:
+    cursor = document_class.get_motor_collection().find(query, dict.fromkeys(fields, 1))
+    if sort:
+        cursor = cursor.sort(sort)
+    return [
+        construct(document_class, document) for document in await cursor.to_list(length)
+    ]
+
+
+def slotted(cls):
+    """``@dataclass(slots=True)`` of python 3.10, the defaults stay in ``__init__``."""
+    field_names = tuple(field.name for field in dataclasses.fields(cls))
+    namespace = {
+        key: value
+        for key, value in cls.__dict__.items()
+        if key not in (*field_names, "__dict__", "__weakref__")
+    }
+    namespace["__slots__"] = field_names
+    return type(cls)(cls.__name__, cls.__bases__, namespace)
+
+
+class DocumentState:
+    """Mapping of the state to the documents of ``document_class``."""
+
+    __slots__ = ()
+    document_class: ClassVar[Type[Document]]
+    # (name, default, default factory) of every field but the id
+    _defaults: ClassVar[Tuple[tuple, ...]]
+    _names: ClassVar[Tuple[str, ...]]
+    _get_values: ClassVar[attrgetter]
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if dataclasses.is_dataclass(cls):
+            fields = [field for field in dataclasses.fields(cls) if field.name != "id"]
+            cls._defaults = tuple(
+                (field.name, field.default, field.default_factory) for field in fields
+            )
+            cls._names = tuple(field.name for field in fields)
+            cls._get_values = attrgetter(*cls._names)
+
+    @classmethod
+    def from_document(cls, document: dict):
+        state = cls.__new__(cls)
+        state.id = document["_id"]
+        get = document.get
+        for name, default, default_factory in cls._defaults:
+            value = get(name, REQUIRED)
+            if value is REQUIRED:
+                if default_factory is not REQUIRED:
+                    value = default_factory()
+                elif default is REQUIRED:
+                    raise KeyError(name)
+                else:
+                    value = default
+            setattr(state, name, value)
+        if settings.VALIDATE_TRUSTED_READS:
+            check_trusted_read(
+                cls.document_class, document, {"id": state.id, **state.get_fields()}
+            )
+        return state
+
+    def get_fields(self) -> dict:
+        """The document without its id, the ``$set`` of ``save``."""
+        return dict(zip(self._names, self._get_values(self)))
+
+    def to_document(self) -> dict:
+        return {"_id": self.id, **self.get_fields()}
+
+    @classmethod
+    def get_collection(cls):
+        return cls.document_class.get_motor_collection()
+
+    @classmethod
+    async def find_one(cls, query: dict):
+        if document := await cls.get_collection().find_one(query):
+            return cls.from_document(document)
+        return None
+
+    @classmethod
+    async def get(cls, state_id: str):
+        return await cls.find_one({"_id": ObjectId(state_id)})
+
+    async def save(self) -> None:
+        await self.get_collection().update_one(
+            {"_id": self.id}, {"$set": self.get_fields()}
+        )
+
+
+@slotted
+@dataclasses.dataclass(eq=False)
+class SeatState(DocumentState):
+    document_class: ClassVar[Type[Document]] = GamePlayer
+
+    id: ObjectId
+
+    sid: str
+    user_token: str
+    user_id: str
+    user_name: str
+    decision_time: str
+    game_id: str
+    game_round: str
+    merchant: str
+    deposit: float
+
+    join_game_at: str = dataclasses.field(default_factory=get_timestamp)
+    updated_at: str = dataclasses.field(default_factory=get_timestamp)
+    left_game_at: str = None
+
+    making_decision: bool = False
+    player_turn: bool = False
+    finished_turn: bool = False
+
+    seat_number: int = None
+    action_list: List = dataclasses.field(default_factory=list)
+    last_action: str = None
+    cards: List = dataclasses.field(default_factory=list)
+    player_id: str = None
+    insured: Optional[bool] = None
+
+    bet: float = 0
+    bet_list: Optional[List] = dataclasses.field(default_factory=list)
+    bet_21_3: float = 0
+    bet_21_3_list: Optional[List] = dataclasses.field(default_factory=list)
+    bet_21_3_winning: float = 0
+    bet_21_3_combination: str = None
+    bet_perfect_pair: float = 0
+    bet_perfect_pair_list: Optional[List] = dataclasses.field(default_factory=list)
+    bet_perfect_pair_winning: float = 0
+    bet_perfect_pair_combination: str = None
+
+    winning_amount: float = 0
+    total_bet: float = 0
+    prev_winning_amount: float = None
+    archived_game_player_id: str = None
+    archived: bool = False
+    is_reset: bool = False
+    rejected: bool = False
+    detail: str = None
+    is_active: bool = True
+
+    external_ids: dict = dataclasses.field(default_factory=dict)
+    inactivity_check_time: int = 0
+
+
+@slotted
+@dataclasses.dataclass(eq=False)
+class RoundState(DocumentState):
+    document_class: ClassVar[Type[Document]] = GameRound
+
+    id: ObjectId
+
+    game_id: str
+    round_id: str
+
+    created_at: str = dataclasses.field(default_factory=get_timestamp)
+    updated_at: str = dataclasses.field(default_factory=get_timestamp)
+
+    card_count: int = 0
+    dealer_cards: Optional[List] = dataclasses.field(default_factory=list)
+
+    start_timestamp: str = None
+    insurance_timestamp: str = None
+    finished_dealing: bool = False
+    show_dealer_cards: bool = False
+
+    winner: str = None
+    was_reset: bool = False
+    finished: Optional[bool] = False
+    prev_round_id: str = None
+
+    dealer_name: str = None
@@ -1,15 +1,21 @@
-import json
 import os
+import threading
+import time
+from typing import Callable
 
-import redis
-import requests
-import socketio
-from uuid import uuid4
 from bson import ObjectId
 from celery import shared_task
+from celery.signals import task_postrun, worker_process_init
 from pymongo import MongoClient
 
+from apps import codec
 from apps.config import settings
+from apps.instrumentation import (
+    MonitoredSyncRedis,
+    command_monitor,
+    push_worker_metrics,
+)
+from apps.profiler import listen as listen_to_profiler
 from apps.game.services.utils import (
     get_timestamp,
     id_generator,
@@ -17,214 +23,339 @@ from apps.game.services.utils import (
     check_should_not_move_to_next_game_player,
     check_if_player_can_double_or_split,
 )
-from apps.game.services.schema_generator import (
-    generate_bet_request_data,
-    inflect_response_data,
-    generate_win_request_data,
+from apps.game.services.schema_generator import inflect_response_data
+from apps.game.services.merchant_guard import post as merchant_post
+from apps.game.services.timer_wheel import schedule_timer
+from apps.game.services.outbox import (
+    FAILED,
+    OUTBOX_COLLECTION,
+    OutboxDispatcher,
+    generate_bet_transaction,
+    generate_win_transaction,
+    get_enqueue_operations,
+    release_dispatch_slot_sync,
+    take_dispatch_slot_sync,
+)
+from apps.game.services.reset_tracker import finish_rollback_sync
+from apps.game.services.wallet_ledger import (
+    credit_sync,
+    reconcile_sync,
+    revert_credit_sync,
+)
+from apps.game.services.timeout_registry import (
+    register_timeout_sync,
+    claim_timeout_sync,
 )
 from apps.game.cards.hand import Hand
 
 
-external_sio = socketio.RedisManager(
-    settings.WS_MESSAGE_QUEUE, write_only=True, logger=True
-)
-client = MongoClient(os.environ.get("BLACKJACK_MONGODB_URL"))
-db = client[settings.DATABASE_NAME]
-r = redis.Redis(
-    host=settings.REDIS_HOST_NAME,
-    port=6379,
-    db=4,
-    encoding="utf-8",
-    decode_responses=True,
-)
+class LazyClient:
+    """The client returned by ``connect``, created on its first use. The web process imports
+    the tasks only to send them, and each worker process connects after the fork."""
 
+    def __init__(self, connect: Callable):
+        self._connect = connect
+        self._client = None
+        self._lock = threading.Lock()
 
-@shared_task
-def send_bet_to_merchant_and_update_game_player(
-    bet_url: str, game_player: dict, schema_type: str
-):
-    bet_external_id = str(uuid4())
-    send_data = generate_bet_request_data(
-        schema_type, game_player["total_bet"], game_player, bet_external_id
+    def get_client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._connect()
+        return self._client
+
+    def __getattr__(self, name: str):
+        return getattr(self.get_client(), name)
+
+    def __getitem__(self, name: str):
+        return self.get_client()[name]
+
+
+def connect_emitter():
+    import socketio
+
+    return socketio.RedisManager(
+        settings.WS_MESSAGE_QUEUE, write_only=True, logger=True
     )
-    response = requests.post(bet_url, json=send_data)
-    if response.status_code == 200:
-        data = inflect_response_data(response.json())
-        if data["status"].lower() == "ok":
-            db.GamePlayer.find_one_and_update(
-                {"_id": ObjectId(game_player["_id"])},
-                {"$set": {"external_ids.bet": bet_external_id}},
-            )
-            r.set(
-                f"{game_player['user_id']}:{game_player['merchant']}",
-                data["total_balance"],
-            )
-        else:
-            db.GamePlayer.find_one_and_update(
-                {"_id": ObjectId(game_player["_id"])},
-                {
-                    "$set": {
-                        "archived": True,
-                        "detail": "insufficient_balance",
-                        "rejected": True,
-                    }
-                },
-            )
 
-            external_sio.emit(
-                "insufficient_balance",
-                {
-                    "message": "Not enough funds to place bet",
-                    "balance": data["total_balance"],
-                },
-                room=game_player["sid"],
-            )
-            r.set(
-                f"{game_player['user_id']}:{game_player['merchant']}",
-                data["total_balance"],
-            )
 
+def connect_mongo():
+    client = MongoClient(
+        os.environ.get("BLACKJACK_MONGODB_URL"), event_listeners=[command_monitor]
+    )
+    return client[settings.DATABASE_NAME]
 
-@shared_task
-def send_winning_to_merchant_and_update_game_player(
-    game_player: dict, win_url: str, win: float, round_data: dict, schema_type: str
-):
-    win_external_id = str(uuid4())
-    send_data = generate_win_request_data(
-        schema_type, win, game_player, win_external_id
+
+def connect_redis() -> MonitoredSyncRedis:
+    return MonitoredSyncRedis(
+        host=settings.REDIS_HOST_NAME,
+        port=6379,
+        db=4,
+        encoding="utf-8",
+        decode_responses=True,
     )
-    response = requests.post(win_url, json=send_data)
 
-    if response.status_code == 200:
-        data = inflect_response_data(response.json())
-        if data["status"].lower() == "ok":
-            db.GamePlayer.find_one_and_update(
-                {"_id": ObjectId(game_player["_id"])},
-                {
-                    "$set": {
-                        "winning_amount": win,
-                        "archived": True,
-                        "deposit": game_player["deposit"] + win,
-                        "external_ids.win": win_external_id,
-                    }
-                },
-            )
 
-            r.set(
-                f"{game_player['user_id']}:{game_player['merchant']}",
-                data["total_balance"],
-            )
-            external_sio.emit(
-                "result",
-                {
-                    "type": "win",
-                    "seat_number": game_player["seat_number"],
-                    "winning_amount": win,
-                },
-                room=game_player["game_id"],
-            )
+external_sio = LazyClient(connect_emitter)
+db = LazyClient(connect_mongo)
+r = LazyClient(connect_redis)
 
-            external_sio.emit(
-                "update_balance",
-                {
-                    "balance": data["total_balance"],
-                    "game_history": {
-                        "action_list": game_player["action_list"],
-                        "cards": game_player["cards"],
-                        "game_round": round_data,
-                        "insured": game_player["insured"],
-                        # "join_game_at": game_player['join_game_at'],
-                        "seat_number": game_player["seat_number"],
-                        "total_bet": game_player["total_bet"],
-                        "bet": game_player["bet"],
-                        "bet_21_3": game_player["bet_21_3"],
-                        "bet_21_3_combination": game_player["bet_21_3_combination"],
-                        "bet_perfect_pair": game_player["bet_perfect_pair"],
-                        "bet_perfect_pair_combination": game_player[
-                            "bet_perfect_pair_combination"
-                        ],
-                        "user_name": game_player["user_name"],
-                        "winning_amount": win,
-                    },
-                },
-                room=game_player["sid"],
-            )
+
+@task_postrun.connect
+def push_command_metrics(**kwargs):
+    push_worker_metrics(r)
+
+
+@worker_process_init.connect
+def start_profiler_listener(**kwargs):
+    listen_to_profiler(r)
+
+
+def handle_bet_response(transaction: dict, data: dict) -> None:
+    if data["status"] == FAILED:
+        # the reservation stays pending until the next balance is reconciled
+        return
+    game_player = transaction["game_player"]
+    reconcile_sync(
+        r,
+        game_player["user_id"],
+        game_player["merchant"],
+        data["total_balance"],
+        settled=game_player["total_bet"],
+        external_id=transaction["_id"],
+    )
+    if data["status"].lower() == "ok":
+        db.GamePlayer.find_one_and_update(
+            {"_id": ObjectId(game_player["_id"])},
+            {"$set": {"external_ids.bet": transaction["_id"]}},
+        )
+    else:
+        db.GamePlayer.find_one_and_update(
+            {"_id": ObjectId(game_player["_id"])},
+            {
+                "$set": {
+                    "archived": True,
+                    "detail": "insufficient_balance",
+                    "rejected": True,
+                }
+            },
+        )
+
+        external_sio.emit(
+            "insufficient_balance",
+            {
+                "message": "Not enough funds to place bet",
+                "balance": data["total_balance"],
+            },
+            room=game_player["sid"],
+        )
+
+
+def handle_win_response(transaction: dict, data: dict) -> None:
+    """Win, push and lose responses, ``amount`` of a lose is 0."""
+    game_player = transaction["game_player"]
+    win = transaction["amount"]
+    if data["status"].lower() != "ok":
+        if transaction["type"] != "lose":
+            revert_winning_credit(transaction, data)
+        return
+    if transaction["type"] == "lose":
+        update = {"external_ids.win": transaction["_id"]}
+    else:
+        update = {
+            "winning_amount": win,
+            "archived": True,
+            "deposit": game_player["deposit"] + win,
+            "external_ids.win": transaction["_id"],
+        }
+    db.GamePlayer.find_one_and_update(
+        {"_id": ObjectId(game_player["_id"])}, {"$set": update}
+    )
+
+    balance = reconcile_sync(
+        r,
+        game_player["user_id"],
+        game_player["merchant"],
+        data["total_balance"],
+        settled=-win,
+        external_id=transaction["_id"],
+    )
+    external_sio.emit(
+        "result",
+        {
+            "type": transaction["type"],
+            "seat_number": game_player["seat_number"],
+            "winning_amount": win,
+        },
+        room=game_player["game_id"],
+    )
+
+    external_sio.emit(
+        "update_balance",
+        {
+            "balance": data["total_balance"] if balance is None else balance,
+            "game_history": {
+                "action_list": game_player["action_list"],
+                "cards": game_player["cards"],
+                "game_round": transaction["context"]["round_data"],
+                "insured": game_player["insured"],
+                # "join_game_at": game_player['join_game_at'],
+                "seat_number": game_player["seat_number"],
+                "total_bet": game_player["total_bet"],
+                "bet": game_player["bet"],
+                "bet_21_3": game_player["bet_21_3"],
+                "bet_21_3_combination": game_player["bet_21_3_combination"],
+                "bet_perfect_pair": game_player["bet_perfect_pair"],
+                "bet_perfect_pair_combination": game_player[
+                    "bet_perfect_pair_combination"
+                ],
+                "user_name": game_player["user_name"],
+                "winning_amount": win,
+            },
+        },
+        room=game_player["sid"],
+    )
+
+
+def revert_winning_credit(transaction: dict, data: dict) -> None:
+    """The winning was credited when it was enqueued, it is taken back when the merchant
+    rejects it, when its bet was rejected or when it fails."""
+    game_player = transaction["game_player"]
+    if "total_balance" in data:
+        reconcile_sync(
+            r,
+            game_player["user_id"],
+            game_player["merchant"],
+            data["total_balance"],
+            settled=-transaction["amount"],
+            external_id=transaction["_id"],
+        )
+    else:
+        revert_credit_sync(
+            r,
+            game_player["user_id"],
+            game_player["merchant"],
+            transaction["amount"],
+            transaction["_id"],
+        )
+
+
+def handle_cancel_response(transaction: dict, data: dict) -> None:
+    if data["status"] == FAILED:
+        return
+    game_player = transaction["game_player"]
+    if data["status"].lower() == "ok":
+        db.GamePlayer.find_one_and_update(
+            {"_id": ObjectId(game_player["_id"])},
+            {
+                "$set": {
+                    f"external_ids.cancel_{transaction['context']['bet_type']}": transaction[
+                        "_id"
+                    ]
+                }
+            },
+        )
+        balance = reconcile_sync(
+            r,
+            game_player["user_id"],
+            game_player["merchant"],
+            data["total_balance"],
+        )
+        balance = float(data["total_balance"]) if balance is None else balance
+        external_sio.emit(
+            "reset_status",
+            {"balance": balance, "is_break": False},
+            room=game_player["sid"],
+        )
+
+        external_sio.emit(
+            "update_balance",
+            {"balance": balance},
+            room=f"{game_player['user_id']}:{game_player['merchant']}",
+            skip_sid=game_player["sid"],
+        )
+    finish_rollback_sync(r, game_player["game_round"], transaction["_id"])
+
+
+OUTBOX_HANDLERS = {
+    "bet": handle_bet_response,
+    "win": handle_win_response,
+    "push": handle_win_response,
+    "lose": handle_win_response,
+    "cancel": handle_cancel_response,
+}
 
 
 @shared_task
-def send_push_to_merchant_and_update_game_player(
-    game_player: dict, win_url: str, win: float, round_data: dict, schema_type: str
-):
-    win_external_id = str(uuid4())
-    send_data = generate_win_request_data(
-        schema_type, win, game_player, win_external_id
+def send_bet_to_merchant_and_update_game_player(
+    bet_url: str, game_player: dict, schema_type: str
+) -> bool:
+    """Sends the bet right away, bypassing the outbox.
+    Returns False when the merchant did not answer."""
+    transaction = generate_bet_transaction(bet_url, game_player, schema_type)
+    response = merchant_post(bet_url, transaction["send_data"])
+    if response.status_code != 200:
+        return False
+    handle_bet_response(
+        transaction, inflect_response_data(codec.load_response(response))
     )
-    response = requests.post(win_url, json=send_data)
+    return True
 
-    if response.status_code == 200:
-        data = inflect_response_data(response.json())
-        if data["status"].lower() == "ok":
-            db.GamePlayer.find_one_and_update(
-                {"_id": ObjectId(game_player["_id"])},
-                {
-                    "$set": {
-                        "winning_amount": win,
-                        "archived": True,
-                        "deposit": game_player["deposit"] + win,
-                        "external_ids.win": win_external_id,
-                    }
-                },
-            )
-            external_sio.emit(
-                "result",
-                {
-                    "type": "push",
-                    "seat_number": game_player["seat_number"],
-                    "winning_amount": win,
-                },
-                room=game_player["game_id"],
-            )
 
-            external_sio.emit(
-                "update_balance",
-                {
-                    "balance": data["total_balance"],
-                    "game_history": {
-                        "action_list": game_player["action_list"],
-                        "cards": game_player["cards"],
-                        "game_round": round_data,
-                        "insured": game_player["insured"],
-                        # "join_game_at": game_player['join_game_at'],
-                        "seat_number": game_player["seat_number"],
-                        "total_bet": game_player["total_bet"],
-                        "bet": game_player["bet"],
-                        "bet_21_3": game_player["bet_21_3"],
-                        "bet_21_3_combination": game_player["bet_21_3_combination"],
-                        "bet_perfect_pair": game_player["bet_perfect_pair"],
-                        "bet_perfect_pair_combination": game_player[
-                            "bet_perfect_pair_combination"
-                        ],
-                        "user_name": game_player["user_name"],
-                        "winning_amount": win,
-                    },
-                },
-                room=game_player["sid"],
-            )
+def enqueue_transactions(transactions: list) -> None:
+    if transactions:
+        db[OUTBOX_COLLECTION].bulk_write(
+            get_enqueue_operations(transactions), ordered=False
+        )
+        dispatch_outbox.delay()
+
+
+@shared_task
+def dispatch_outbox(partitions: list = None, slot_token: str = None):
+    """Drains the due outbox transactions and comes back when the next retry is due.
+    Each enqueue starts a run, but a single one holds the slot of the next run, so an outage
+    does not start a chain of runs per enqueue.
+    Dedicated dispatchers (``python -m apps.game.services.outbox``) can run next to it."""
+    if slot_token is not None:
+        release_dispatch_slot_sync(r, partitions, slot_token)
+    dispatcher = OutboxDispatcher(db, OUTBOX_HANDLERS, partitions)
+    dispatcher.drain()
+    next_attempt_in = dispatcher.get_next_attempt_in()
+    if next_attempt_in is None:
+        return
+    slot_token = take_dispatch_slot_sync(r, partitions, next_attempt_in)
+    if slot_token is not None:
+        dispatch_outbox.apply_async(
+            args=[partitions, slot_token], countdown=next_attempt_in
+        )
 
 
 @shared_task
 def send_bets_to_merchant(game_round_id: str, game_id: str):
+    """Enqueues the bets of the round. The reset of the round enqueues the bets with their
+    rollbacks, a reset round and its game players are skipped."""
+    if db.GameRound.find_one(
+        {"_id": ObjectId(game_round_id), "was_reset": True}, {"_id": 1}
+    ):
+        return
     merchants = db.Merchant.find(
         {"games.game_id": game_id}, {"_id": 1, "bet_url": 1, "schema_type": 1}
     )
+    round_has_bets = False
     for merchant in merchants:
         bet_url = merchant["bet_url"]
         schema_type = merchant["schema_type"]
         game_players = db.GamePlayer.find(
-            {"game_round": game_round_id, "merchant": str(merchant["_id"])}
+            {
+                "game_round": game_round_id,
+                "merchant": str(merchant["_id"]),
+                "is_reset": {"$ne": True},
+            }
         ).sort("seat_number")
         total_bet = 0
         players_repeat_data = {}
+        transactions = []
         for game_player in game_players:
             if game_player["bet"] > 0:
                 total_bet += (
@@ -233,8 +364,8 @@ def send_bets_to_merchant(game_round_id: str, game_id: str):
                     + game_player["bet_perfect_pair"]
                 )
                 game_player["_id"] = str(game_player["_id"])
-                send_bet_to_merchant_and_update_game_player.apply_async(
-                    args=[bet_url, game_player, schema_type], max_retries=5
+                transactions.append(
+                    generate_bet_transaction(bet_url, game_player, schema_type)
                 )
                 repeat_data = {
                     game_player["seat_number"]: {
@@ -251,6 +382,7 @@ def send_bets_to_merchant(game_round_id: str, game_id: str):
                     players_repeat_data[f"{repeat_cache_key}"].update(repeat_data)
                 else:
                     players_repeat_data[f"{repeat_cache_key}"] = repeat_data
+        enqueue_transactions(transactions)
 
         if total_bet == 0:
             db.GameRound.find_one_and_update(
@@ -259,38 +391,118 @@ def send_bets_to_merchant(game_round_id: str, game_id: str):
             )
             external_sio.emit("repeat_betting", {}, room=game_id)
         else:
+            round_has_bets = True
             for key, repeat_data in players_repeat_data.items():
                 r.setex(
                     key,
                     settings.TIME_FOR_REPEAT_CACHE,
-                    json.dumps(repeat_data),
+                    codec.dumps(repeat_data),
                 )
+    if round_has_bets:
+        prepare_next_round(game_id, game_round_id)
+
+
+def generate_game_round_data(game_id: str, prev_round_id: str = None) -> dict:
+    return {
+        "created_at": get_timestamp(),
+        "updated_at": get_timestamp(),
+        "card_count": 0,
+        "game_id": game_id,
+        "round_id": id_generator(),
+        "start_timestamp": None,
+        "dealer_name": r.get(f"{game_id}:dealer_name"),
+        "insurance_timestamp": None,
+        "dealer_cards": [],
+        "show_dealer_cards": False,
+        "was_reset": False,
+        "finished": False,
+        "finished_dealing": False,
+        "prev_round_id": prev_round_id,
+    }
 
 
-@shared_task
-def start_new_round(game_id: str, prev_round_id: str = None, taken_seats: dict = {}):
-    db.GameRound.update_many(
-        {"finished": False, "game_id": game_id}, {"$set": {"finished": True}}
+def prepare_next_round(game_id: str, game_round_id: str):
+    """Pre-allocates the next round while the current one is being dealt.
+    Prepared round has ``finished: None`` so it is not returned as an active round
+    until start_new_round activates it.
+    """
+    next_round_data = generate_game_round_data(game_id, game_round_id)
+    for field in ["game_id", "prev_round_id", "finished"]:
+        del next_round_data[field]
+    next_round = db.GameRound.find_one_and_update(
+        {"game_id": game_id, "prev_round_id": game_round_id, "finished": None},
+        {"$setOnInsert": next_round_data},
+        upsert=True,
+        return_document=True,
     )
-    random_id = id_generator()
-    game_round_id = db.GameRound.insert_one(
+    r.set(
+        f"{game_id}:next_round",
+        codec.dumps(
+            {
+                "_id": str(next_round["_id"]),
+                "round_id": next_round["round_id"],
+                "prev_round_id": game_round_id,
+            }
+        ),
+        ex=settings.REDIS_CACHE_EXPIRATION_TIME,
+    )
+
+
+def activate_next_round(game_id: str, prev_round_id: str) -> tuple:
+    """Finishes the current round and activates the prepared one with a single update."""
+    next_round = codec.loads(r.get(f"{game_id}:next_round") or "{}")
+    if not prev_round_id or next_round.get("prev_round_id") != prev_round_id:
+        db.GameRound.update_many(
+            {"finished": False, "game_id": game_id}, {"$set": {"finished": True}}
+        )
+        # the prepared round of a reset or of a lost race is never activated
+        db.GameRound.delete_many(
+            {"game_id": game_id, "finished": {"$exists": True, "$eq": None}}
+        )
+        r.delete(f"{game_id}:next_round")
+        game_round_data = generate_game_round_data(game_id, prev_round_id)
+        game_round_id = db.GameRound.insert_one(game_round_data).inserted_id
+        return game_round_id, game_round_data["round_id"]
+
+    next_round_id = ObjectId(next_round["_id"])
+    is_next_round = {"$eq": ["$_id", next_round_id]}
+    db.GameRound.update_many(
         {
-            "created_at": get_timestamp(),
-            "updated_at": get_timestamp(),
-            "card_count": 0,
             "game_id": game_id,
-            "round_id": random_id,
-            "start_timestamp": None,
-            "dealer_name": r.get(f"{game_id}:dealer_name"),
-            "insurance_timestamp": None,
-            "dealer_cards": [],
-            "show_dealer_cards": False,
-            "was_reset": False,
-            "finished": False,
-            "finished_dealing": False,
-            "prev_round_id": prev_round_id,
-        }
-    ).inserted_id
+            "$or": [{"finished": False}, {"_id": next_round_id}],
+        },
+        [
+            {
+                "$set": {
+                    "finished": {"$not": [is_next_round]},
+                    "created_at": {
+                        "$cond": [is_next_round, get_timestamp(), "$created_at"]
+                    },
+                    "updated_at": {
+                        "$cond": [is_next_round, get_timestamp(), "$updated_at"]
+                    },
+                }
+            }
+        ],
+    )
+    r.delete(f"{game_id}:next_round")
+    return next_round_id, next_round["round_id"]
+
+
+def record_round_transition_gap(game_id: str):
+    if settled_at := r.get(f"{game_id}:settled_at"):
+        r.delete(f"{game_id}:settled_at")
+        gap_ms = (time.time() - float(settled_at)) * 1000
+        pipe = r.pipeline()
+        pipe.hincrby("round_transition:stats", "count", 1)
+        pipe.hincrbyfloat("round_transition:stats", "total_gap_ms", gap_ms)
+        pipe.hset("round_transition:stats", "last_gap_ms", gap_ms)
+        pipe.execute()
+
+
+@shared_task
+def start_new_round(game_id: str, prev_round_id: str = None, taken_seats: dict = {}):
+    game_round_id, random_id = activate_next_round(game_id, prev_round_id)
     external_sio.emit(
         "start_new_round",
         {
@@ -300,109 +512,19 @@ def start_new_round(game_id: str, prev_round_id: str = None, taken_seats: dict =
         },
         room=game_id,
     )
-
-    clean_all_seats_if_no_bets_are_placed.apply_async(
-        args=[str(game_round_id)], countdown=17, max_retries=5
+    record_round_transition_gap(game_id)
+
+    schedule_timer(
+        r,
+        f"clean_seats:{game_round_id}",
+        "clean_all_seats_if_no_bets_are_placed",
+        [str(game_round_id)],
+        17,
     )
 
 
-@shared_task
-def send_reset_to_merchant_and_update_game_player(
-    send_data: dict, rollback_url: str, game_player: dict, bet_type: str, is_break=False
-):
-    response = requests.post(rollback_url, json=send_data)
-    if response.status_code == 200:
-        data = inflect_response_data(response.json())
-        if data["status"].lower() == "ok":
-            db.GamePlayer.find_one_and_update(
-                {"_id": ObjectId(game_player["_id"])},
-                {
-                    "$set": {
-                        f"external_ids.cancel_{bet_type}": game_player["external_ids"][
-                            f"cancel_{bet_type}"
-                        ],
-                    }
-                },
-                return_document=True,
-            )
-            r.set(
-                f"{game_player['user_id']}:{game_player['merchant']}",
-                data["total_balance"],
-            )
-            external_sio.emit(
-                "reset_status",
-                {"balance": float(data["total_balance"]), "is_break": is_break},
-                room=game_player["sid"],
-            )
-
-            external_sio.emit(
-                "update_balance",
-                {"balance": float(data["total_balance"])},
-                room=f"{game_player['user_id']}:{game_player['merchant']}",
-                skip_sid=game_player["sid"],
-            )
-
-
-@shared_task
-def send_lose_event_and_game_player_history(
-    game_player: dict, win_url: str, round_data: dict, schema_type: str
-):
-    win_external_id = str(uuid4())
-    send_data = generate_win_request_data(schema_type, 0, game_player, win_external_id)
-    response = requests.post(win_url, json=send_data)
-
-    if response.status_code == 200:
-        data = inflect_response_data(response.json())
-        if data["status"].lower() == "ok":
-            db.GamePlayer.find_one_and_update(
-                {"_id": ObjectId(game_player["_id"])},
-                {"$set": {"external_ids.win": win_external_id}},
-            )
-
-            r.set(
-                f"{game_player['user_id']}:{game_player['merchant']}",
-                data["total_balance"],
-            )
-
-            external_sio.emit(
-                "result",
-                {
-                    "type": "lose",
-                    "seat_number": game_player["seat_number"],
-                    "winning_amount": 0,
-                },
-                room=game_player["game_id"],
-            )
-
-            external_sio.emit(
-                "update_balance",
-                {
-                    "balance": data["total_balance"],
-                    "game_history": {
-                        "action_list": game_player["action_list"],
-                        "cards": game_player["cards"],
-                        "game_round": round_data,
-                        "insured": game_player["insured"],
-                        # "join_game_at": game_player['join_game_at'],
-                        "seat_number": game_player["seat_number"],
-                        "total_bet": game_player["total_bet"],
-                        "bet": game_player["bet"],
-                        "bet_21_3": game_player["bet_21_3"],
-                        "bet_21_3_combination": game_player["bet_21_3_combination"],
-                        "bet_perfect_pair": game_player["bet_perfect_pair"],
-                        "bet_perfect_pair_combination": game_player[
-                            "bet_perfect_pair_combination"
-                        ],
-                        "user_name": game_player["user_name"],
-                        "winning_amount": 0,
-                    },
-                },
-                room=game_player["sid"],
-            )
-
-
 def sync_get_next_player(game_player: dict) -> dict:
-    seats = json.loads(r.get(f"{game_player['game_round']}:seats"))
+    seats = codec.loads(r.get(f"{game_player['game_round']}:seats"))
     seat_id = seats.index(game_player["seat_number"])
     return db.GamePlayer.find_one_and_update(
         {"seat_number": seats[seat_id + 1], "game_round": game_player["game_round"]},
@@ -456,14 +578,12 @@ def sync_move_to_next_player(game_player_id: str, game_id: str, action_count: in
                 len(next_game_player["action_list"]),
             )
         if next_game_player["is_active"] is False:
-            wait_player.apply_async(
-                args=[
-                    str(next_game_player["_id"]),
-                    game_id,
-                    len(next_game_player["action_list"]),
-                ],
-                countdown=get_time_left_in_seconds(next_game_player["decision_time"])
-                + 1,
+            register_timeout_sync(
+                r,
+                str(next_game_player["_id"]),
+                game_id,
+                len(next_game_player["action_list"]),
+                get_time_left_in_seconds(next_game_player["decision_time"]) + 1,
             )
             db.GamePlayer.find_one_and_update(
                 {"_id": ObjectId(next_game_player["_id"])},
@@ -508,7 +628,11 @@ def sync_move_to_next_player(game_player_id: str, game_id: str, action_count: in
 
 
 @shared_task()
-def wait_player(game_player_id: str, game_id: str, action_count: int):
+def wait_player(
+    game_player_id: str, game_id: str, action_count: int, token: str = None
+):
+    if token and not claim_timeout_sync(r, game_player_id, token):
+        return
     sync_move_to_next_player(game_player_id, game_id, action_count)
 
 
@@ -560,13 +684,12 @@ def sync_get_starter_game_player(seats: list, seat_number_index: int, round_id:
     )
 
     if game_player["is_active"] is False:
-        wait_player.apply_async(
-            args=[
-                str(game_player["_id"]),
-                game_player["game_id"],
-                len(game_player["action_list"]),
-            ],
-            countdown=settings.ACCEPT_BETS_SECONDS - 1,
+        register_timeout_sync(
+            r,
+            str(game_player["_id"]),
+            game_player["game_id"],
+            len(game_player["action_list"]),
+            settings.ACCEPT_BETS_SECONDS - 1,
         )
 
     if Hand(game_player["cards"]).can_continue_game():
@@ -634,6 +757,7 @@ def pay_winnings(game_id: str, game_round: dict):
         "winner": game_round["winner"],
     }
     total_winnings = {}
+    transactions = []
     for merchant in merchants:
         win_url = merchant["win_url"]
         schema_type = merchant["schema_type"]
@@ -662,24 +786,24 @@ def pay_winnings(game_id: str, game_round: dict):
             total_winnings[game_player["sid"]] = (
                 total_winnings.get(game_player["sid"], 0) + win
             )
-            if win > game_player["bet"]:
-                send_winning_to_merchant_and_update_game_player.apply_async(
-                    args=[game_player, win_url, win, round_data, schema_type],
-                    max_retries=5,
-                )
-            elif win == game_player["bet"]:
-                send_push_to_merchant_and_update_game_player.apply_async(
-                    args=[game_player, win_url, win, round_data, schema_type],
-                    max_retries=5,
-                )
-            else:
-                send_lose_event_and_game_player_history.apply_async(
-                    args=[game_player, win_url, round_data, schema_type],
-                    max_retries=5,
+            if win >= game_player["bet"]:
+                # the winning is spendable before the merchant pays it
+                credit_sync(r, game_player["user_id"], game_player["merchant"], win)
+            transactions.append(
+                generate_win_transaction(
+                    win_url, game_player, win, round_data, schema_type
                 )
+            )
+    enqueue_transactions(transactions)
     for sid, win in total_winnings.items():
         external_sio.emit("total_winning", {"amount": win}, room=sid)
-    r.set(f"{game_id}:taken_seats", json.dumps(taken_seats))
-    start_new_round.apply_async(
-        args=[game_id, str(game_round["_id"]), taken_seats], countdown=10, max_retries=5
+    r.set(f"{game_id}:settled_at", time.time())
+    r.set(f"{game_id}:taken_seats", codec.dumps(taken_seats))
+    r.delete(f"{game_round['_id']}:total_bets")
+    schedule_timer(
+        r,
+        f"start_new_round:{game_id}",
+        "start_new_round",
+        [game_id, str(game_round["_id"]), taken_seats],
+        10,
     )
@@ -2,17 +2,26 @@ import os
 import re
 from typing import List
 
-from fastapi import APIRouter, Depends, Response
+from fastapi import APIRouter, Depends, Query, Response
+from fastapi.responses import PlainTextResponse
 
+from apps import metrics
+from apps.config import settings
+from apps.instrumentation import render_worker_metrics
+from apps.profiler import request_profile
 from apps.connections import redis_cache
 from apps.game.consumers import external_sio
 from apps.game.queries import get_game, get_game_player, get_merchant
 from apps.game.tasks import start_new_round
+from apps.game.services.merchant_guard import merchant_guard
+from apps.game.services.reset_tracker import get_reset_stats
+from apps.game.services.timer_wheel import timer_wheel
+from apps.game.services.timeout_registry import get_timeout_stats
 
 from .documents import Game, GameRound, Merchant, GamePlayer
 from .models import MerchantBackOfficeModel, GameUpdateModel, GameMerchantModel
 from .services.permissions import check_merchant_permissions
-from apps.game.services.auth import check_token
+from apps.game.services.auth import check_admin_key, check_token
 
 router = APIRouter()
 
@@ -195,6 +204,51 @@ async def reset_db():
     await redis_cache.flush_db()
 
 
+@router.get("/timers/stats")
+async def get_timer_stats(_=Depends(check_admin_key)):
+    return {
+        **timer_wheel.get_stats(),
+        "timeouts": await get_timeout_stats(redis_cache.redis_cache),
+        "round_transition": await redis_cache.redis_cache.hgetall(
+            "round_transition:stats"
+        ),
+    }
+
+
+@router.get("/merchants/stats")
+async def get_merchant_stats():
+    """Guards of the worker which serves the request, every process keeps its own."""
+    return merchant_guard.get_stats()
+
+
+@router.get("/resets/stats")
+async def get_reset_completion_stats():
+    return await get_reset_stats(redis_cache.redis_cache)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(
+        metrics.registry.render()
+        + await render_worker_metrics(redis_cache.redis_cache),
+        media_type="text/plain; version=0.0.4",
+    )
+
+
+@router.post("/profiler/start", status_code=202)
+async def start_profiler(
+    seconds: float = Query(30, gt=0),
+    interval: float = Query(0.01, gt=0),
+    _=Depends(check_admin_key),
+):
+    """Samples the ASGI processes and celery workers for ``seconds``, see ``apps.profiler``."""
+    processes = await request_profile(redis_cache.redis_cache, seconds, interval)
+    return {
+        "processes": processes,
+        "seconds": min(seconds, settings.PROFILER_MAX_SECONDS),
+    }
+
+
 @router.get("/health")
 async def health_check():
     return {"message": "success"}
@@ -0,0 +1,254 @@
+""" Mongo and redis command monitoring by call-site, for the ASGI process and the celery workers.
+Every command is counted and timed under the function of ``apps`` which sent it, the managers
+rather than the redis cache helpers or the clients. Commands slower than
+``settings.SLOW_COMMAND_SECONDS`` are logged with the shape of the query.
+
+- mongo: ``CommandMonitor``, a pymongo command listener of the motor client and of the
+  ``MongoClient`` of the tasks. Motor sends the commands from its executor threads, so
+  ``instrument_motor`` records the call-site before motor copies the context into them.
+- redis: ``MonitoredRedis`` of ``apps.connections`` and ``MonitoredSyncRedis`` of the tasks.
+
+Celery workers have no ``/metrics``, their counters are pushed to redis after every task and
+rendered by the ASGI process as ``celery_db_commands_total`` and so on. """
+import logging
+import re
+import sys
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+import redis
+from pymongo import monitoring
+
+from apps.config import settings
+from apps.metrics import Counter, registry
+
+logger = logging.getLogger(__name__)
+
+UNKNOWN = "unknown"
+# modules whose functions are call-sites
+CALL_SITE_PACKAGES = ("apps.",)
+# frames of these modules are the plumbing of the commands, not their call-sites
+PLUMBING_MODULES = {"apps.connections", "apps.instrumentation", "apps.metrics"}
+# fields of mongo commands which are not part of the query shape
+SESSION_FIELDS = {"lsid", "txnNumber", "$db", "$clusterTime", "$readPreference"}
+WORKER_METRICS_KEY = "metrics:celery:{}"
+
+LABELS = ["backend", "command", "call_site"]
+command_count = registry.register(
+    Counter("db_commands_total", "Mongo and redis commands by call-site.", LABELS)
+)
+command_seconds = registry.register(
+    Counter(
+        "db_command_seconds_total",
+        "Time of the mongo and redis commands by call-site.",
+        LABELS,
+    )
+)
+slow_command_count = registry.register(
+    Counter(
+        "db_slow_commands_total",
+        "Mongo and redis commands slower than SLOW_COMMAND_SECONDS by call-site.",
+        LABELS,
+    )
+)
+WORKER_COUNTERS = [command_count, command_seconds, slow_command_count]
+
+mongo_call_site: ContextVar[Optional[str]] = ContextVar("mongo_call_site", default=None)
+# (code, line) -> call-site, formatted once
+_call_sites: Dict[Tuple[object, int], str] = {}
+
+
+def get_call_site(depth: int = 2) -> Optional[str]:
+    """``module.function:line`` of the first frame of ``CALL_SITE_PACKAGES`` above the
+    caller."""
+    frame = sys._getframe(depth)
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if module.startswith(CALL_SITE_PACKAGES) and module not in PLUMBING_MODULES:
+            key = (frame.f_code, frame.f_lineno)
+            call_site = _call_sites.get(key)
+            if call_site is None:
+                call_site = _call_sites[
+                    key
+                ] = f"{module}.{frame.f_code.co_name}:{frame.f_lineno}"
+            return call_site
+        frame = frame.f_back
+    return None
+
+
+def get_query_shape(value):
+    """``value`` with its scalars masked, keys and operators are kept."""
+    if isinstance(value, dict):
+        return {
+            key: get_query_shape(item)
+            for key, item in value.items()
+            if key not in SESSION_FIELDS
+        }
+    if isinstance(value, (list, tuple)):
+        # the first element stands for all of them, like the documents of an insert
+        return [get_query_shape(value[0])] if value else []
+    return "?"
+
+
+def get_key_shape(key) -> str:
+    """Redis key with the segments holding ids masked, ``6166...:seats`` is ``*:seats``."""
+    return ":".join(
+        "*" if re.search(r"\d", segment) else segment for segment in str(key).split(":")
+    )
+
+
+def record_command(
+    backend: str,
+    command: str,
+    call_site: Optional[str],
+    seconds: float,
+    get_shape,
+) -> None:
+    """``get_shape`` is only called for slow commands."""
+    labels = (backend, command, call_site or UNKNOWN)
+    command_count.inc(1, *labels)
+    command_seconds.inc(seconds, *labels)
+    if seconds >= settings.SLOW_COMMAND_SECONDS:
+        slow_command_count.inc(1, *labels)
+        logger.warning(
+            "Slow %s %s %.1fms at %s: %s",
+            backend,
+            command,
+            seconds * 1000,
+            labels[2],
+            get_shape(),
+        )
+
+
+class CommandMonitor(monitoring.CommandListener):
+    """Counts and times the mongo commands by call-site."""
+
+    def __init__(self):
+        # (connection, request id) -> (call-site, command) of the commands in flight
+        self._started: Dict[tuple, Tuple[Optional[str], dict]] = {}
+
+    def started(self, event) -> None:
+        call_site = mongo_call_site.get() or get_call_site()
+        self._started[(event.connection_id, event.request_id)] = (
+            call_site,
+            event.command,
+        )
+
+    def succeeded(self, event) -> None:
+        self._finish(event)
+
+    def failed(self, event) -> None:
+        self._finish(event)
+
+    def _finish(self, event) -> None:
+        call_site, command = self._started.pop(
+            (event.connection_id, event.request_id), (None, {})
+        )
+        record_command(
+            "mongo",
+            event.command_name,
+            call_site,
+            event.duration_micros / 1_000_000,
+            lambda: get_query_shape(command),
+        )
+
+
+command_monitor = CommandMonitor()
+
+
+def instrument_motor() -> None:
+    """Records the call-site of the motor calls in ``mongo_call_site``, motor copies the
+    context into the executor thread where ``CommandMonitor`` runs."""
+    from motor.frameworks import asyncio as motor_asyncio
+
+    run_on_executor = motor_asyncio.run_on_executor
+    if getattr(run_on_executor, "instrumented", False):
+        return
+
+    def run_on_executor_with_call_site(loop, fn, *args, **kwargs):
+        token = mongo_call_site.set(get_call_site())
+        try:
+            return run_on_executor(loop, fn, *args, **kwargs)
+        finally:
+            mongo_call_site.reset(token)
+
+    run_on_executor_with_call_site.instrumented = True
+    motor_asyncio.run_on_executor = run_on_executor_with_call_site
+
+
+def get_redis_command_shape(command: str, args: tuple) -> str:
+    # the keys of scripts follow the script and the number of keys
+    key_index = 3 if command in ("eval", "evalsha") else 1
+    if len(args) > key_index:
+        return f"{command} {get_key_shape(args[key_index])}"
+    return command
+
+
+def record_redis_command(args: tuple, call_site: Optional[str], seconds: float):
+    command = str(args[0]).lower() if args else UNKNOWN
+    record_command(
+        "redis",
+        command,
+        call_site,
+        seconds,
+        lambda: get_redis_command_shape(command, args),
+    )
+
+
+class MonitoredSyncPipeline(redis.client.Pipeline):
+    def execute(self, raise_on_error: bool = True):
+        call_site, started_at = get_call_site(), time.perf_counter()
+        try:
+            return super().execute(raise_on_error)
+        finally:
+            record_redis_command(
+                ("pipeline",), call_site, time.perf_counter() - started_at
+            )
+
+
+class MonitoredSyncRedis(redis.Redis):
+    """``redis.Redis`` of the celery workers which counts and times its commands."""
+
+    def execute_command(self, *args, **options):
+        call_site, started_at = get_call_site(), time.perf_counter()
+        try:
+            return super().execute_command(*args, **options)
+        finally:
+            record_redis_command(args, call_site, time.perf_counter() - started_at)
+
+    def pipeline(self, transaction: bool = True, shard_hint=None):
+        return MonitoredSyncPipeline(
+            self.connection_pool, self.response_callbacks, transaction, shard_hint
+        )
+
+
+def push_worker_metrics(client: redis.Redis) -> None:
+    """Adds the counters of the celery worker to redis and resets them."""
+    # a plain pipeline, its own commands would always leave something to push
+    pipe = redis.Redis.pipeline(client, transaction=False)
+    for counter in WORKER_COUNTERS:
+        for label_values, value in counter.drain().items():
+            pipe.hincrbyfloat(
+                WORKER_METRICS_KEY.format(counter.name), "\t".join(label_values), value
+            )
+    if pipe.command_stack:
+        pipe.execute()
+
+
+async def render_worker_metrics(client) -> str:
+    """Counters pushed by the celery workers in the Prometheus text format, ``celery_`` is
+    prepended to their names."""
+    lines = []
+    for counter in WORKER_COUNTERS:
+        if values := await client.hgetall(WORKER_METRICS_KEY.format(counter.name)):
+            lines.extend(
+                counter.render(
+                    {
+                        tuple(field.split("\t")): float(value)
+                        for field, value in values.items()
+                    },
+                    name=f"celery_{counter.name}",
+                )
+            )
+    return "".join(f"{line}\n" for line in lines)
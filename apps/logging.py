@@ -1,35 +1,174 @@
+""" Non-blocking JSON logging of the ASGI process and the celery workers.
+Records are put on a bounded queue by ``NonBlockingQueueHandler`` and written by a
+``QueueListener`` thread, so a slow disk or stdout never blocks the event loop, a full queue
+drops records and counts them in ``log_records_dropped_total``.
+Every record carries the log context of the socket event or celery task which wrote it
+(``event``, ``round_id``, ``game_id``, ``sid``), the context of a socket event is sent with the
+celery tasks it publishes, see ``apps.celery_utils``. High-volume events are sampled with
+``settings.LOG_SAMPLE_RATES``, the records of a round are kept or dropped together. """
+import copy
+import json
 import logging
-import logging.config
+import queue
+import random
+import sys
+import zlib
+from contextvars import ContextVar, Token
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, WatchedFileHandler
+from typing import Dict, Optional
 
+from apps import codec
+from apps.config import settings
+from apps.metrics import Counter, registry
 
-def configure_logging():
-    logging_dict = {
-        "version": 1,
-        "disable_existing_loggers": False,
-        "formatters": {
-            "verbose": {
-                "format": "[%(asctime)s: %(levelname)s] [%(pathname)s:%(lineno)d] %(message)s",
-            },
-        },
-        "handlers": {
-            "console": {
-                "class": "logging.StreamHandler",
-                "formatter": "verbose",
-            },
-        },
-        "root": {
-            "handlers": ["console"],
-            "level": "INFO",
-        },
-        "loggers": {
-            "project": {
-                "handlers": ["console"],
-                "propagate": False,
-            },
-            "uvicorn.access": {
-                "propagate": True,
+# attributes of every log record, anything else was passed with ``extra``
+RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+# loggers which come with their own blocking handlers, routed through the queue instead
+QUEUED_LOGGERS = [
+    "uvicorn",
+    "uvicorn.error",
+    "uvicorn.access",
+    "socketio.server",
+    "engineio.server",
+]
+
+dropped_records = registry.register(
+    Counter("log_records_dropped_total", "Log records dropped on a full log queue.")
+)
+
+log_context: ContextVar[Optional[Dict[str, str]]] = ContextVar(
+    "log_context", default=None
+)
+listener: Optional[QueueListener] = None
+
+
+def get_log_context() -> Dict[str, str]:
+    return log_context.get() or {}
+
+
+def bind_log_context(**values) -> Token:
+    """Adds ``values`` to the context of the records, ``None`` values are skipped."""
+    return log_context.set(
+        {
+            **get_log_context(),
+            **{key: str(value) for key, value in values.items() if value is not None},
+        }
+    )
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            **{
+                key: value
+                for key, value in vars(record).items()
+                if key not in RECORD_ATTRIBUTES
             },
-        },
-    }
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exception"] = record.exc_text
+        try:
+            return codec.dumps(data)
+        except TypeError:
+            return json.dumps(data, default=str, ensure_ascii=False)
+
+
+class ContextFilter(logging.Filter):
+    """Adds the log context to the record, runs in the thread and context which logs."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        for key, value in get_log_context().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps ``rates[key]`` of the records below warning, the key is the event of the record or
+    its logger. Records of the same round are kept or dropped together."""
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rates.get(getattr(record, "event", None))
+        if rate is None:
+            rate = self.rates.get(record.name, 1)
+        if rate >= 1:
+            return True
+        if round_id := getattr(record, "round_id", None):
+            return zlib.crc32(round_id.encode()) % 10_000 < rate * 10_000
+        return random.random() < rate
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            dropped_records.inc(1)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # only the message and the traceback are rendered here, while the arguments are
+        # alive, the listener thread formats the JSON
+        message = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record = copy.copy(record)
+        record.msg, record.args, record.exc_info = message, None, None
+        return record
+
+
+def configure_logging() -> QueueListener:
+    """Routes the records of the process through the queue, again in every forked celery
+    worker process, the listener thread does not survive the fork."""
+    global listener
+    stop_logging()
+    formatter = JsonFormatter()
+    handlers = [logging.StreamHandler(sys.stdout)]
+    if settings.LOG_FILE:
+        handlers.append(WatchedFileHandler(settings.LOG_FILE))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    queue_handler = NonBlockingQueueHandler(queue.Queue(settings.LOG_QUEUE_SIZE))
+    queue_handler.addFilter(ContextFilter())
+    queue_handler.addFilter(SamplingFilter(settings.LOG_SAMPLE_RATES))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, NonBlockingQueueHandler):
+            root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(settings.LOG_LEVEL)
+    for name in QUEUED_LOGGERS:
+        logger = logging.getLogger(name)
+        logger.handlers = []
+        logger.propagate = True
+
+    listener = QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
+
 
-    logging.config.dictConfig(logging_dict)
+def stop_logging() -> None:
+    """Writes the queued records and stops the listener."""
+    global listener
+    if listener is not None:
+        try:
+            listener.stop()
+        except queue.Full:
+            # the queue of the parent process in a forked celery worker
+            pass
+        listener = None
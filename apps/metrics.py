@@ -0,0 +1,273 @@
+""" Prometheus metrics of the process and span accounting of socket events.
+A socket event handler runs with an ``EventTimings`` in a context variable, the mongo, redis,
+merchant http and emit calls it awaits add their time to it (motor copies the context into its
+executor threads, so the mongo command listener sees it as well). Metrics are kept per process
+and rendered in the Prometheus text format by ``/metrics``. """
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from pymongo import monitoring
+
+# seconds, from a cached redis read to a merchant timeout
+BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+)
+COMPONENTS = ("mongo", "redis", "http", "emit")
+
+# metrics are updated by the event loop and by the threads of motor and celery
+_lock = threading.Lock()
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    labels = ",".join(
+        '{}="{}"'.format(
+            name,
+            str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n"),
+        )
+        for name, value in zip(names, values)
+    )
+    return f"{{{labels}}}"
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        # label values -> [count of every bucket and +Inf, sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def get_series(self, *label_values: str) -> list:
+        series = self._series.get(label_values)
+        if series is None:
+            with _lock:
+                series = self._series.setdefault(
+                    label_values, [[0] * (len(self.buckets) + 1), 0.0]
+                )
+        return series
+
+    def observe(self, value: float, *label_values: str) -> None:
+        series = self.get_series(*label_values)
+        index = bisect.bisect_left(self.buckets, value)
+        with _lock:
+            series[0][index] += 1
+            series[1] += value
+
+    def get_count(self, *label_values: str) -> int:
+        series = self._series.get(label_values)
+        return sum(series[0]) if series else 0
+
+    def get_sum(self, *label_values: str) -> float:
+        series = self._series.get(label_values)
+        return series[1] if series else 0.0
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with _lock:
+            series = [
+                (labels, list(counts), total)
+                for labels, (counts, total) in self._series.items()
+            ]
+        for label_values, counts, total in sorted(series):
+            cumulative = 0
+            for bound, count in zip([*self.buckets, "+Inf"], counts):
+                cumulative += count
+                labels = _format_labels(
+                    [*self.label_names, "le"], [*label_values, bound]
+                )
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.label_names, label_values)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+    def clear(self) -> None:
+        # in place, the series of the socket events are cached by ``observe_event``
+        with _lock:
+            for series in self._series.values():
+                series[0] = [0] * (len(self.buckets) + 1)
+                series[1] = 0.0
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float, *label_values: str) -> None:
+        with _lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def get(self, *label_values: str) -> float:
+        return self._values.get(label_values, 0)
+
+    def drain(self) -> Dict[Tuple[str, ...], float]:
+        """Returns the values and resets them."""
+        with _lock:
+            values, self._values = self._values, {}
+        return values
+
+    def render(
+        self,
+        values: Optional[Dict[Tuple[str, ...], float]] = None,
+        name: Optional[str] = None,
+    ) -> List[str]:
+        """``values`` and ``name`` render the counter of another process."""
+        name = name or self.name
+        if values is None:
+            with _lock:
+                values = dict(self._values)
+        lines = [f"# HELP {name} {self.documentation}", f"# TYPE {name} counter"]
+        for label_values, value in sorted(values.items()):
+            labels = _format_labels(self.label_names, label_values)
+            lines.append(f"{name}{labels} {value}")
+        return lines
+
+    def clear(self) -> None:
+        with _lock:
+            self._values = {}
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return (
+            "\n".join(line for metric in self.metrics for line in metric.render())
+            + "\n"
+        )
+
+    def clear(self) -> None:
+        for metric in self.metrics:
+            metric.clear()
+
+
+registry = Registry()
+
+event_duration = registry.register(
+    Histogram(
+        "socket_event_duration_seconds",
+        "Duration of the socket event handlers.",
+        ["event"],
+    )
+)
+event_component_duration = registry.register(
+    Histogram(
+        "socket_event_component_seconds",
+        "Mongo, redis, merchant http and emit time awaited by the socket event handlers.",
+        ["event", "component"],
+    )
+)
+
+
+class EventTimings:
+    __slots__ = COMPONENTS
+
+    def __init__(self):
+        self.mongo = 0.0
+        self.redis = 0.0
+        self.http = 0.0
+        self.emit = 0.0
+
+
+event_timings: ContextVar[Optional[EventTimings]] = ContextVar(
+    "event_timings", default=None
+)
+
+
+def add_span(component: str, seconds: float) -> None:
+    """Adds ``seconds`` to ``component`` of the running socket event, if there is one."""
+    timings = event_timings.get()
+    if timings is not None:
+        setattr(timings, component, getattr(timings, component) + seconds)
+
+
+class span:
+    """Times the block into ``component`` of the running socket event,
+    ``with span("redis"): ...``"""
+
+    __slots__ = ("component", "started_at")
+
+    def __init__(self, component: str):
+        self.component = component
+
+    def __enter__(self) -> "span":
+        self.started_at = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        add_span(self.component, self.get_duration())
+
+    def get_duration(self) -> float:
+        return time.perf_counter() - self.started_at
+
+
+# event -> series of its duration and of its components, in the order of ``COMPONENTS``
+_event_series: Dict[str, Tuple[list, ...]] = {}
+
+
+def observe_event(event: str, seconds: float, timings: EventTimings) -> None:
+    """Runs after every socket event, a single lock and no label lookups."""
+    event_series = _event_series.get(event)
+    if event_series is None:
+        event_series = _event_series[event] = (
+            event_duration.get_series(event),
+            *[
+                event_component_duration.get_series(event, component)
+                for component in COMPONENTS
+            ],
+        )
+    buckets = BUCKETS
+    values = (seconds, timings.mongo, timings.redis, timings.http, timings.emit)
+    with _lock:
+        for series, value in zip(event_series, values):
+            series[0][bisect.bisect_left(buckets, value)] += 1
+            series[1] += value
+
+
+class MongoSpanListener(monitoring.CommandListener):
+    """Adds the duration of every mongo command to the socket event which sent it."""
+
+    def started(self, event) -> None:
+        pass
+
+    def succeeded(self, event) -> None:
+        add_span("mongo", event.duration_micros / 1_000_000)
+
+    def failed(self, event) -> None:
+        add_span("mongo", event.duration_micros / 1_000_000)
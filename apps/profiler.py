@@ -0,0 +1,164 @@
+""" Sampling profiler of the ASGI processes and the celery workers, switched on at runtime by
+``POST /profiler/start`` for a bounded window.
+Every process subscribes to ``PROFILER_CHANNEL`` from a thread which sleeps on the socket, so
+nothing runs while the profiler is off. A request starts a sampling thread in every subscribed
+process, it reads the stacks of the other threads with ``sys._current_frames`` every interval
+and writes them in the folded format of flamegraph.pl and speedscope to
+``settings.PROFILER_DIR``, one file per process. The root of every stack is the socket event
+or celery task it runs in, found by the code of the handlers and tasks on the stack. """
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+from collections import Counter
+from types import CodeType, FrameType
+from typing import Dict, Optional
+
+import redis
+
+from apps import codec
+from apps.config import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILER_CHANNEL = "profiler"
+UNTAGGED = "-"
+
+# code of the socket event handlers and celery tasks -> their name
+_tags: Dict[CodeType, str] = {}
+# code -> frame label, formatted once
+_labels: Dict[CodeType, str] = {}
+
+
+def tag_code(code: CodeType, tag: str) -> None:
+    """Samples running ``code`` are tagged with ``tag``, registered when the handlers are
+    decorated, so the tags cost nothing while the profiler is off."""
+    _tags[code] = tag
+
+
+def tag_tasks() -> None:
+    from celery import current_app
+
+    for name, task in list(current_app.tasks.items()):
+        if (code := getattr(getattr(task, "run", None), "__code__", None)) is not None:
+            _tags.setdefault(code, f"task:{name.rsplit('.', 1)[-1]}")
+
+
+def get_label(code: CodeType) -> str:
+    label = _labels.get(code)
+    if label is None:
+        filename = os.path.basename(code.co_filename)
+        label = _labels[code] = f"{code.co_name} ({filename}:{code.co_firstlineno})"
+    return label
+
+
+def fold_stack(frame: Optional[FrameType]) -> str:
+    """``tag;root;...;leaf`` of the stack, the tag of the outermost handler or task."""
+    labels, tag = [], UNTAGGED
+    while frame is not None:
+        code = frame.f_code
+        labels.append(get_label(code))
+        tag = _tags.get(code, tag)
+        frame = frame.f_back
+    labels.append(tag)
+    return ";".join(reversed(labels))
+
+
+class SamplingProfiler:
+    def __init__(self):
+        self.stacks: Counter = Counter()
+        self.until = 0.0
+        self._thread: Optional[threading.Thread] = None
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds: float, interval: float) -> bool:
+        """Samples every ``interval`` for ``seconds``, at most ``PROFILER_MAX_SECONDS``, returns
+        ``False`` while a window is running."""
+        if self.is_running():
+            return False
+        tag_tasks()
+        self.stacks = Counter()
+        self.until = time.monotonic() + min(seconds, settings.PROFILER_MAX_SECONDS)
+        interval = max(interval, settings.PROFILER_MIN_INTERVAL)
+        self._thread = threading.Thread(
+            target=self._run, args=(interval,), name="profiler", daemon=True
+        )
+        self._thread.start()
+        return True
+
+    def stop(self) -> None:
+        self.until = 0.0
+        if self.is_running():
+            self._thread.join()
+
+    def sample(self) -> None:
+        own_thread = threading.get_ident()
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id != own_thread:
+                self.stacks[fold_stack(frame)] += 1
+
+    def write(self) -> Optional[str]:
+        if not self.stacks:
+            return None
+        os.makedirs(settings.PROFILER_DIR, exist_ok=True)
+        path = os.path.join(
+            settings.PROFILER_DIR,
+            f"{socket.gethostname()}-{os.getpid()}-{int(time.time())}.folded",
+        )
+        with open(path, "w", encoding="utf-8") as file:
+            file.writelines(
+                f"{stack} {count}\n" for stack, count in self.stacks.most_common()
+            )
+        return path
+
+    def _run(self, interval: float) -> None:
+        started_at = time.monotonic()
+        while time.monotonic() < self.until:
+            self.sample()
+            time.sleep(interval)
+        try:
+            path = self.write()
+        except OSError:
+            logger.exception("Profile could not be written")
+            return
+        logger.info(
+            "Profiled %.1fs into %s",
+            time.monotonic() - started_at,
+            path,
+            extra={"samples": sum(self.stacks.values())},
+        )
+
+
+profiler = SamplingProfiler()
+
+
+def listen(client: redis.Redis) -> threading.Thread:
+    """Starts the profiler of the process on every request of ``PROFILER_CHANNEL``."""
+
+    def run() -> None:
+        while True:
+            try:
+                pubsub = client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(PROFILER_CHANNEL)
+                for message in pubsub.listen():
+                    if message["type"] == "message":
+                        options = codec.loads(message["data"])
+                        profiler.start(options["seconds"], options["interval"])
+            except redis.RedisError:
+                logger.warning("Profiler channel lost, subscribing again")
+                time.sleep(1)
+
+    thread = threading.Thread(target=run, name="profiler-listener", daemon=True)
+    thread.start()
+    return thread
+
+
+async def request_profile(client, seconds: float, interval: float) -> int:
+    """Starts the profiler of every process, returns the number of processes."""
+    return await client.publish(
+        PROFILER_CHANNEL, codec.dumps({"seconds": seconds, "interval": interval})
+    )
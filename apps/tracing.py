@@ -0,0 +1,344 @@
+""" Round traces across the ASGI process, the timers, the celery workers and the merchants.
+The trace id of a round is derived from its id, so every span which knows its round joins the
+trace of the round, also without a parent (the outbox dispatchers). The current span goes with
+the celery tasks (``trace_context`` header, see ``apps.celery_utils``), the timers (their
+payload) and the merchant requests (``traceparent`` header).
+Spans are exported by a background thread to ``settings.TRACE_FILE`` (JSON lines) or to an OTLP
+collector (``settings.TRACE_OTLP_ENDPOINT``), tracing is off while ``TRACE_EXPORTER`` is empty.
+Render the waterfall of a round from the file with ``python -m apps.tracing <round id>``. """
+import argparse
+import hashlib
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional
+
+import requests
+
+from apps import codec
+from apps.config import settings
+from apps.metrics import Counter, registry
+
+logger = logging.getLogger(__name__)
+
+FILE = "file"
+OTLP = "otlp"
+# OTLP span kinds
+SPAN_KINDS = {"internal": 1, "socket": 2, "client": 3, "task": 5, "timer": 1}
+
+dropped_spans = registry.register(
+    Counter("trace_spans_dropped_total", "Spans dropped on a full export queue.")
+)
+
+
+def get_trace_id(round_id: str) -> str:
+    if re.fullmatch(r"[0-9a-f]{24}", round_id):
+        return f"00000000{round_id}"
+    return hashlib.md5(round_id.encode()).hexdigest()
+
+
+def generate_id(bits: int = 64) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+class Span:
+    __slots__ = (
+        "name",
+        "kind",
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "round_id",
+        "game_id",
+        "attributes",
+        "start",
+        "end",
+        "_token",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        kind: str = "internal",
+        parent: Optional[dict] = None,
+        round_id: Optional[str] = None,
+        game_id: Optional[str] = None,
+        **attributes,
+    ):
+        """:param parent - context of the parent span, ``Span.get_context()`` of another
+        process, defaults to the current span"""
+        if parent is None and (current := current_span.get()) is not None:
+            parent = current.get_context()
+        parent = parent or {}
+        self.name = name
+        self.kind = kind
+        self.round_id = round_id or parent.get("round_id")
+        self.game_id = game_id or parent.get("game_id")
+        self.trace_id = (
+            get_trace_id(self.round_id)
+            if self.round_id
+            else parent.get("trace_id") or generate_id(128)
+        )
+        # a span of another round starts a trace of its own
+        self.parent_id = (
+            parent.get("span_id") if parent.get("trace_id") == self.trace_id else None
+        )
+        self.span_id = generate_id()
+        self.attributes = attributes
+        self.start = self.end = 0.0
+
+    def get_context(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "round_id": self.round_id,
+            "game_id": self.game_id,
+        }
+
+    def __enter__(self) -> "Span":
+        self.start = time.time()
+        self._token = current_span.set(self)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.end = time.time()
+        current_span.reset(self._token)
+        if exc_info[0] is not None:
+            self.attributes["error"] = repr(exc_info[1])
+        exporter.export(self)
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start": self.start,
+            "end": self.end,
+            "round_id": self.round_id,
+            "game_id": self.game_id,
+            "pid": os.getpid(),
+            "attributes": self.attributes,
+        }
+
+
+class NoopSpan:
+    """Span of a process which does not trace."""
+
+    __slots__ = ()
+
+    @property
+    def attributes(self) -> dict:
+        return {}
+
+    def get_context(self) -> None:
+        return None
+
+    def __enter__(self) -> "NoopSpan":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+
+NOOP_SPAN = NoopSpan()
+current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def start_span(name: str, kind: str = "internal", **kwargs):
+    """``with start_span("scan_card", "socket", round_id=round_id): ...``, see ``Span``."""
+    if not settings.TRACE_EXPORTER:
+        return NOOP_SPAN
+    return Span(name, kind, **kwargs)
+
+
+def get_trace_context() -> Optional[dict]:
+    """Context of the current span, sent with the celery tasks and timers."""
+    if (span := current_span.get()) is not None:
+        return span.get_context()
+    return None
+
+
+def get_trace_headers() -> Dict[str, str]:
+    """W3C ``traceparent`` of the current span for http requests."""
+    if (span := current_span.get()) is not None:
+        return {"traceparent": f"00-{span.trace_id}-{span.span_id}-01"}
+    return {}
+
+
+def run_in_span(
+    name: str, kind: str, parent: Optional[dict], func: Callable, *args, **kwargs
+):
+    """Runs ``func`` in a span whose parent comes from another process or thread."""
+    with start_span(name, kind, parent=parent):
+        return func(*args, **kwargs)
+
+
+def get_otlp_attributes(values: dict) -> List[dict]:
+    return [
+        {"key": key, "value": {"stringValue": str(value)}}
+        for key, value in values.items()
+        if value is not None
+    ]
+
+
+def get_otlp_payload(spans: List[dict]) -> dict:
+    """OTLP/HTTP JSON export request of the spans."""
+    return {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": get_otlp_attributes(
+                        {"service.name": settings.TRACE_SERVICE_NAME}
+                    )
+                },
+                "scopeSpans": [
+                    {
+                        "scope": {"name": __name__},
+                        "spans": [
+                            {
+                                "traceId": span["trace_id"],
+                                "spanId": span["span_id"],
+                                "parentSpanId": span["parent_id"] or "",
+                                "name": span["name"],
+                                "kind": SPAN_KINDS.get(span["kind"], 1),
+                                "startTimeUnixNano": str(int(span["start"] * 1e9)),
+                                "endTimeUnixNano": str(int(span["end"] * 1e9)),
+                                "attributes": get_otlp_attributes(
+                                    {
+                                        "round_id": span["round_id"],
+                                        "game_id": span["game_id"],
+                                        "process.pid": span["pid"],
+                                        **span["attributes"],
+                                    }
+                                ),
+                            }
+                            for span in spans
+                        ],
+                    }
+                ],
+            }
+        ]
+    }
+
+
+class SpanExporter:
+    """Queues the finished spans and writes them in batches from a thread, a full queue
+    drops spans. The thread is started again in forked processes."""
+
+    def __init__(self):
+        self.queue: Optional[queue.Queue] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        if self._pid != os.getpid():
+            self._start()
+        try:
+            self.queue.put_nowait(span.to_dict())
+        except queue.Full:
+            dropped_spans.inc(1)
+
+    def flush(self) -> None:
+        """Waits until the queued spans are written."""
+        if self._pid == os.getpid():
+            self.queue.join()
+
+    def write(self, spans: List[dict]) -> None:
+        if settings.TRACE_EXPORTER == OTLP:
+            requests.post(
+                settings.TRACE_OTLP_ENDPOINT,
+                data=codec.dumps_bytes(get_otlp_payload(spans)),
+                headers=codec.CONTENT_TYPE_HEADERS,
+                timeout=settings.MERCHANT_TIMEOUT,
+            )
+        else:
+            with open(settings.TRACE_FILE, "a", encoding="utf-8") as file:
+                file.writelines(f"{codec.dumps(span)}\n" for span in spans)
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self.queue = queue.Queue(settings.TRACE_QUEUE_SIZE)
+            threading.Thread(
+                target=self._run, args=(self.queue,), name="span-exporter", daemon=True
+            ).start()
+            self._pid = os.getpid()
+
+    def _run(self, spans: queue.Queue) -> None:
+        while True:
+            batch = [spans.get()]
+            deadline = time.monotonic() + settings.TRACE_FLUSH_SECONDS
+            while len(batch) < settings.TRACE_BATCH_SIZE:
+                try:
+                    batch.append(spans.get(timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+            try:
+                self.write(batch)
+            except Exception:
+                logger.exception("Export of %s spans failed", len(batch))
+            for _ in batch:
+                spans.task_done()
+
+
+exporter = SpanExporter()
+
+
+def read_spans(path: str, round_id: str) -> List[dict]:
+    trace_id = get_trace_id(round_id)
+    with open(path, encoding="utf-8") as file:
+        spans = [codec.loads(line) for line in file if line.strip()]
+    return [span for span in spans if span["trace_id"] == trace_id]
+
+
+def render_waterfall(spans: List[dict], width: int = 50) -> str:
+    """One line per span, children under their parent, ordered by start."""
+    if not spans:
+        return "No spans"
+    spans = sorted(spans, key=lambda span: span["start"])
+    span_ids = {span["span_id"] for span in spans}
+    children: Dict[Optional[str], List[dict]] = {}
+    for span in spans:
+        parent_id = span["parent_id"] if span["parent_id"] in span_ids else None
+        children.setdefault(parent_id, []).append(span)
+    started = spans[0]["start"]
+    total = max(max(span["end"] for span in spans) - started, 1e-6)
+    lines = [
+        f"trace {spans[0]['trace_id']}, {len(spans)} spans, {total * 1000:.1f}ms",
+    ]
+
+    def add_lines(parent_id: Optional[str], depth: int) -> None:
+        for span in children.get(parent_id, []):
+            offset = int((span["start"] - started) / total * width)
+            length = max(int((span["end"] - span["start"]) / total * width), 1)
+            bar = (" " * offset + "█" * length)[:width].ljust(width)
+            lines.append(
+                f"{(span['start'] - started) * 1000:9.1f}ms "
+                f"{(span['end'] - span['start']) * 1000:9.1f}ms |{bar}| "
+                f"{'  ' * depth}{span['kind']} {span['name']} ({span['pid']})"
+            )
+            add_lines(span["span_id"], depth + 1)
+
+    add_lines(None, 0)
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    parser = argparse.ArgumentParser(description="Waterfall of the spans of a round")
+    parser.add_argument("round_id")
+    parser.add_argument("--file", default=settings.TRACE_FILE)
+    parser.add_argument("--width", type=int, default=50)
+    arguments = parser.parse_args()
+    print(
+        render_waterfall(
+            read_spans(arguments.file, arguments.round_id), arguments.width
+        )
+    )
@@ -0,0 +1,7 @@
+""" Entry point of the celery worker: ``celery -A apps.worker worker``.
+Loads the celery app and the tasks without the web application of ``main``. """
+from apps.celery_utils import create_celery
+
+celery = create_celery()
+
+import apps.game.tasks  # noqa: E402,F401 registers the shared tasks
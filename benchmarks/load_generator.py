@@ -0,0 +1,374 @@
+""" Full-round load generator for the socket.io server of the test suite.
+Simulates ``tables`` tables, each with a dealer, ``players`` seated players and ``spectators``
+watching clients. Clients connect once, then every round goes through place_bet, the dealer's
+scan_card, hit, action_cards and stand of every player, the dealer's dealer_cards, settlement
+through the outbox and the start of the next round.
+Mongo and Redis op counts are read from the servers themselves, so the benchmark needs
+services of its own. """
+import asyncio
+import functools
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+import socketio
+from beanie import PydanticObjectId
+from bson import ObjectId
+
+from apps.connections import redis_cache
+from apps.game.documents import Game, GameRound, Merchant
+from apps.game.models import GameMerchantModel
+from apps.game.services.outbox import OutboxDispatcher
+from apps.game.services.utils import get_timestamp
+from apps.game.tasks import (
+    OUTBOX_HANDLERS,
+    db,
+    generate_game_round_data,
+    r,
+    send_bets_to_merchant,
+)
+from tests.helpers import (
+    TEST_DEPOSIT,
+    TEST_GAME_ID,
+    TEST_MERCHANT_ID,
+    TEST_ROUND_ID,
+    connect_socket,
+)
+
+SEATS = [1, 3, 5, 7, 9, 11, 13]
+BET = 10
+REPLY_TIMEOUT = 10
+# every player gets 10 + 2, hits a 6 and stands on 18, the dealer stands on 10 + 7
+FIRST_CARD, SECOND_CARD, HIT_CARD = "1TC", "12S", "16H"
+DEALER_FIRST_CARD, DEALER_SECOND_CARD = "1TD", "17C"
+MERCHANT_URL_FIELDS = ["transaction_url", "bet_url", "win_url", "rollback_url"]
+EVENTS = [
+    "error",
+    "bet_status",
+    "new_bet",
+    "start_timer",
+    "send_hand_value",
+    "dealer_score",
+    "make_decision",
+    "decision_maker",
+    "player_action",
+    "scan_dealer_card",
+    "total_winning",
+    "update_balance",
+    "start_new_round",
+    "send_chat_message",
+]
+
+
+async def mock_check_if_user_can_connect_by_token(self):
+    """Every token is a user of its own, so the seats of a table belong to distinct users."""
+    self.merchant_id = TEST_MERCHANT_ID
+    self.merchant_data = await redis_cache.get_or_cache_merchant(
+        TEST_MERCHANT_ID, self.game_id
+    )
+    return {
+        "total_balance": TEST_DEPOSIT,
+        "currency": "USD",
+        "user_name": self.user_token,
+        "user_id": self.user_token,
+        "game_id": self.game_id,
+    }
+
+
+def get_percentiles(latencies: List[float]) -> dict:
+    latencies = sorted(latencies)
+
+    def at(quantile: float) -> float:
+        return round(
+            latencies[min(int(len(latencies) * quantile), len(latencies) - 1)], 2
+        )
+
+    return {
+        "count": len(latencies),
+        "p50_ms": at(0.5),
+        "p95_ms": at(0.95),
+        "p99_ms": at(0.99),
+        "max_ms": round(latencies[-1], 2),
+    }
+
+
+def get_server_op_counts() -> Dict[str, Dict[str, int]]:
+    """Server wide counters: mongo opcounters and calls of every redis command."""
+    return {
+        "mongo": dict(db.command("serverStatus")["opcounters"]),
+        "redis": {
+            name.split("_", 1)[1]: stats["calls"]
+            for name, stats in r.info("commandstats").items()
+        },
+    }
+
+
+def subtract_op_counts(after: Dict[str, int], before: Dict[str, int]) -> Dict[str, int]:
+    return {
+        name: count - before.get(name, 0)
+        for name, count in after.items()
+        if count - before.get(name, 0)
+    }
+
+
+class LoadClient:
+    """socket.io client which resolves the replies awaited from it with the events it receives."""
+
+    def __init__(self, sio: socketio.AsyncClient):
+        self.sio = sio
+        self.received = 0
+        self._waiters: List[Tuple[Tuple[str, ...], asyncio.Future]] = []
+        for event in EVENTS:
+            sio.on(event, functools.partial(self._receive, event))
+
+    def _receive(self, event: str, *args) -> None:
+        self.received += 1
+        for waiter in list(self._waiters):
+            events, future = waiter
+            if future.done():
+                self._waiters.remove(waiter)
+            elif event in events:
+                future.set_result((event, args[0] if args else None))
+                self._waiters.remove(waiter)
+
+    def expect(self, *events: str) -> asyncio.Future:
+        """Future of the first of ``events`` received from now on."""
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append((events, future))
+        return future
+
+
+class Table:
+    def __init__(self, game_id: str, round_id: str):
+        self.game_id = game_id
+        self.round_id = round_id
+        self.dealer: LoadClient = None
+        self.players: List[LoadClient] = []
+        self.spectators: List[LoadClient] = []
+
+    @property
+    def clients(self) -> List[LoadClient]:
+        return [self.dealer, *self.players, *self.spectators]
+
+
+class LoadGenerator:
+    def __init__(self, tables: int, players: int, spectators: int, merchant_url: str):
+        if not 1 <= players <= len(SEATS):
+            raise ValueError(f"A table has 1 to {len(SEATS)} players")
+        self.table_count = tables
+        self.player_count = players
+        self.spectator_count = spectators
+        self.merchant_url = merchant_url
+        self.tables: List[Table] = []
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.dispatcher = OutboxDispatcher(db, OUTBOX_HANDLERS)
+
+    def record(self, event: str, started: float) -> None:
+        self.latencies[event].append((time.perf_counter() - started) * 1000)
+
+    async def create_tables(self) -> None:
+        """The first table is the test game, the others are games of the test merchant."""
+        self.tables = [Table(TEST_GAME_ID, TEST_ROUND_ID)]
+        games = []
+        for index in range(1, self.table_count):
+            game = Game(
+                id=PydanticObjectId(),
+                name=f"load_table_{index}",
+                type="european",
+                game_status=True,
+                table_stream_key_1="123",
+                table_stream_key_2="456",
+            )
+            await game.save()
+            game_round = await GameRound.get_motor_collection().insert_one(
+                generate_game_round_data(str(game.id))
+            )
+            self.tables.append(Table(str(game.id), str(game_round.inserted_id)))
+            games.append(
+                GameMerchantModel(
+                    game_id=str(game.id),
+                    game_name=game.name,
+                    min_bet=10,
+                    max_bet=200,
+                    bet_range=[5, 10, 20, 50],
+                    is_active=True,
+                ).dict()
+            )
+        await Merchant.get_motor_collection().update_one(
+            {"_id": ObjectId(TEST_MERCHANT_ID)},
+            {
+                "$set": {field: self.merchant_url for field in MERCHANT_URL_FIELDS},
+                "$push": {"games": {"$each": games}},
+            },
+        )
+
+    async def connect_client(self, game_id: str, token: str = "", jwt_token: str = ""):
+        started = time.perf_counter()
+        _, sio = await connect_socket(game_id, token, jwt_token)
+        self.record("connect", started)
+        return LoadClient(sio)
+
+    async def connect_table(self, table: Table, index: int) -> None:
+        table.dealer = await self.connect_client(table.game_id, jwt_token="dealer")
+        table.players = await asyncio.gather(
+            *[
+                self.connect_client(table.game_id, f"player-{index}-{player}")
+                for player in range(self.player_count)
+            ]
+        )
+        table.spectators = await asyncio.gather(
+            *[
+                self.connect_client(table.game_id, f"spectator-{index}-{spectator}")
+                for spectator in range(self.spectator_count)
+            ]
+        )
+
+    async def exchange(
+        self, event: str, sender: LoadClient, data: dict, *replies: asyncio.Future
+    ) -> list:
+        """Emits ``event`` from ``sender`` and records the time until every reply arrived."""
+        error = sender.expect("error")
+        started = time.perf_counter()
+        await sender.sio.emit(event, data)
+        received = asyncio.ensure_future(asyncio.gather(*replies))
+        done, _ = await asyncio.wait(
+            {received, error},
+            timeout=REPLY_TIMEOUT,
+            return_when=asyncio.FIRST_COMPLETED,
+        )
+        error.cancel()
+        if received not in done:
+            received.cancel()
+            message = error.result()[1]["message"] if error in done else "timeout"
+            raise AssertionError(f"{event}: {message}")
+        self.record(event, started)
+        return received.result()
+
+    async def finish_betting(self, table: Table) -> None:
+        """Ends the betting time and does the work of the celery worker: bets to the merchant."""
+        await GameRound.get_motor_collection().update_one(
+            {"_id": ObjectId(table.round_id)},
+            {"$set": {"start_timestamp": get_timestamp(-1)}},
+        )
+        started = time.perf_counter()
+        await asyncio.to_thread(send_bets_to_merchant, table.round_id, table.game_id)
+        await asyncio.to_thread(self.dispatcher.drain)
+        self.record("send_bets", started)
+
+    async def play_round(self, table: Table) -> None:
+        dealer, players = table.dealer, table.players
+        await asyncio.gather(
+            *[
+                self.exchange(
+                    "place_bet",
+                    player,
+                    {"amount": BET, "bet_type": "bet", "seat_number": seat_number},
+                    player.expect("bet_status"),
+                )
+                for seat_number, player in zip(SEATS, players)
+            ]
+        )
+        await self.finish_betting(table)
+
+        cards = [FIRST_CARD] * len(players) + [DEALER_FIRST_CARD]
+        cards += [SECOND_CARD] * len(players)
+        for card in cards[:-1]:
+            await self.exchange(
+                "scan_card",
+                dealer,
+                {"round_id": table.round_id, "card": card},
+                dealer.expect("send_hand_value", "dealer_score"),
+            )
+        await self.exchange(
+            "scan_card",
+            dealer,
+            {"round_id": table.round_id, "card": cards[-1]},
+            players[0].expect("make_decision"),
+        )
+
+        for index, player in enumerate(players):
+            action = {"round_id": table.round_id}
+            await self.exchange(
+                "make_action",
+                player,
+                {**action, "action_type": "hit"},
+                player.expect("player_action"),
+            )
+            await self.exchange(
+                "action_cards",
+                dealer,
+                {**action, "card": HIT_CARD},
+                player.expect("make_decision"),
+            )
+            if index + 1 < len(players):
+                next_turn = players[index + 1].expect("make_decision")
+            else:
+                next_turn = dealer.expect("scan_dealer_card")
+            await self.exchange(
+                "make_action", player, {**action, "action_type": "stand"}, next_turn
+            )
+
+        next_round = dealer.expect("start_new_round")
+        await self.exchange(
+            "dealer_cards",
+            dealer,
+            {"round_id": table.round_id, "card": DEALER_SECOND_CARD},
+            *[player.expect("total_winning") for player in players],
+        )
+        started = time.perf_counter()
+        await asyncio.to_thread(self.dispatcher.drain)
+        self.record("send_winnings", started)
+        _, data = await asyncio.wait_for(next_round, REPLY_TIMEOUT)
+        table.round_id = data["next_round_real_id"]
+
+    async def play_rounds(self, table: Table, rounds: int) -> None:
+        for _ in range(rounds):
+            started = time.perf_counter()
+            await self.play_round(table)
+            self.record("round", started)
+
+    async def run(self, rounds: int) -> dict:
+        await self.create_tables()
+        await asyncio.gather(
+            *[
+                self.connect_table(table, index)
+                for index, table in enumerate(self.tables)
+            ]
+        )
+        before = await asyncio.to_thread(get_server_op_counts)
+        started = time.perf_counter()
+        await asyncio.gather(
+            *[self.play_rounds(table, rounds) for table in self.tables]
+        )
+        elapsed = time.perf_counter() - started
+        after = await asyncio.to_thread(get_server_op_counts)
+
+        played = rounds * len(self.tables)
+        mongo_ops = subtract_op_counts(after["mongo"], before["mongo"])
+        redis_ops = subtract_op_counts(after["redis"], before["redis"])
+        return {
+            "tables": self.table_count,
+            "players": self.player_count,
+            "spectators": self.spectator_count,
+            "rounds": played,
+            "seconds": round(elapsed, 3),
+            "rounds_per_minute": round(played / elapsed * 60, 1),
+            "events": {
+                event: get_percentiles(latencies)
+                for event, latencies in sorted(self.latencies.items())
+            },
+            "mongo_ops": mongo_ops,
+            "mongo_ops_per_round": round(sum(mongo_ops.values()) / played, 1),
+            "redis_ops": redis_ops,
+            "redis_ops_per_round": round(sum(redis_ops.values()) / played, 1),
+            "socket_events_received": sum(
+                client.received for table in self.tables for client in table.clients
+            ),
+            "outbox": self.dispatcher.stats,
+        }
+
+    async def close(self) -> None:
+        for table in self.tables:
+            for client in table.clients:
+                if client is not None:
+                    await client.sio.disconnect()
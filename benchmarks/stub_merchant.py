@@ -0,0 +1,41 @@
+""" Local stub merchant with injected latency and error rate.
+``python -m benchmarks.stub_merchant --port 8081 --latency 0.5 --error-rate 0.2`` """
+import argparse
+import asyncio
+import random
+
+from aiohttp import web
+
+
+def create_stub_merchant(latency: float = 0, error_rate: float = 0) -> web.Application:
+    async def transaction(request: web.Request) -> web.Response:
+        await asyncio.sleep(latency)
+        if random.random() < error_rate:
+            return web.json_response({"status": "failed"}, status=503)
+        return web.json_response({"status": "ok", "total_balance": 1000})
+
+    app = web.Application()
+    app.router.add_post("/{path:.*}", transaction)
+    return app
+
+
+async def start_stub_merchant(
+    port: int, latency: float = 0, error_rate: float = 0
+) -> web.AppRunner:
+    runner = web.AppRunner(create_stub_merchant(latency, error_rate))
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return runner
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0)
+    arguments = parser.parse_args()
+    web.run_app(
+        create_stub_merchant(arguments.latency, arguments.error_rate),
+        host="127.0.0.1",
+        port=arguments.port,
+    )
@@ -0,0 +1,37 @@
+""" Bet placement benchmark, 20 chips on each of the 7 seats.
+Run against the test mongo/redis with ``pytest benchmarks/test_bet_placement.py -s``. """
+import json
+import statistics
+import time
+
+import pytest
+
+SEATS = [1, 3, 5, 7, 9, 11, 13]
+CHIPS = 20
+
+
+@pytest.mark.asyncio
+async def test_bet_placement_seven_seats(betting_manager, capsys):
+    latencies = []
+    data = {}
+    for seat_number in SEATS:
+        for _ in range(CHIPS):
+            started = time.perf_counter()
+            data = await betting_manager.charge_user(10, seat_number)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    assert data["user_total_bet"] == len(SEATS) * CHIPS * 10
+    latencies.sort()
+    with capsys.disabled():
+        print(
+            json.dumps(
+                {
+                    "benchmark": "bet_placement",
+                    "seats": len(SEATS),
+                    "chips_per_seat": CHIPS,
+                    "mean_ms": statistics.mean(latencies),
+                    "p50_ms": latencies[len(latencies) // 2],
+                    "p99_ms": latencies[int(len(latencies) * 0.99)],
+                }
+            )
+        )
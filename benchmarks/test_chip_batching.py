@@ -0,0 +1,91 @@
+""" Rapid clicking benchmark, one player placing 50 chips per second over all seats.
+Run against the test mongo/redis with ``pytest benchmarks/test_chip_batching.py -s``. """
+import asyncio
+import json
+import time
+
+import pytest
+from motor.motor_asyncio import AsyncIOMotorCollection
+
+from apps.connections import redis_cache
+from apps.game.betting.betting_manager import BettingManager
+from apps.game.betting.chip_batcher import ChipBatcher
+
+SEATS = [1, 3, 5, 7, 9, 11, 13]
+CHIPS_PER_SEAT = 20
+CLICK_INTERVAL = 1 / 50
+WINDOW = 0.005
+
+
+def count_operations(monkeypatch) -> dict:
+    operations = {"count": 0}
+    for name in ["find_one", "find_one_and_update", "update_one", "aggregate"]:
+
+        def counted(
+            collection, *args, method=getattr(AsyncIOMotorCollection, name), **kwargs
+        ):
+            operations["count"] += 1
+            return method(collection, *args, **kwargs)
+
+        monkeypatch.setattr(AsyncIOMotorCollection, name, counted)
+    return operations
+
+
+async def click(place_chip, seat_number: int) -> float:
+    started = time.perf_counter()
+    await place_chip(seat_number)
+    return (time.perf_counter() - started) * 1000
+
+
+async def run_clicks(place_chip) -> list:
+    clicks = []
+    for seat_number in SEATS:
+        for _ in range(CHIPS_PER_SEAT):
+            clicks.append(asyncio.ensure_future(click(place_chip, seat_number)))
+            await asyncio.sleep(CLICK_INTERVAL)
+    return sorted(await asyncio.gather(*clicks))
+
+
+def report(mode: str, latencies: list, mongo_ops: int, **extra) -> None:
+    print(
+        json.dumps(
+            {
+                "benchmark": "chip_batching",
+                "mode": mode,
+                "clicks": len(latencies),
+                "mongo_ops": mongo_ops,
+                "p50_ms": latencies[len(latencies) // 2],
+                "p99_ms": latencies[int(len(latencies) * 0.99)],
+                **extra,
+            }
+        )
+    )
+
+
+@pytest.mark.asyncio
+async def test_single_chips(betting_manager, monkeypatch, capsys):
+    operations = count_operations(monkeypatch)
+    session_data = await redis_cache.redis_cache.hgetall("test_sid")
+
+    def place_chip(seat_number):
+        return BettingManager(session_data, "test_sid", "bet").charge_user(
+            10, seat_number
+        )
+
+    latencies = await run_clicks(place_chip)
+    with capsys.disabled():
+        report("single", latencies, operations["count"])
+
+
+@pytest.mark.asyncio
+async def test_batched_chips(betting_manager, monkeypatch, capsys):
+    operations = count_operations(monkeypatch)
+    session_data = await redis_cache.redis_cache.hgetall("test_sid")
+    chip_batcher = ChipBatcher(window=WINDOW)
+
+    def place_chip(seat_number):
+        return chip_batcher.place_chip("test_sid", session_data, 10, seat_number, "bet")
+
+    latencies = await run_clicks(place_chip)
+    with capsys.disabled():
+        report("batched", latencies, operations["count"], **chip_batcher.stats)
@@ -0,0 +1,101 @@
+""" Serialisation CPU per round with the codec against the standard library ``json``.
+A round of a full table: cached seats, game and merchant reads, timer payloads, merchant
+bet and win requests and responses, and the socket.io packets of the round.
+Run with ``pytest benchmarks/test_codec_speed.py -s``. """
+import json
+import time
+
+from apps import codec
+
+ROUNDS = 2000
+PLAYERS = 7
+
+
+def generate_round() -> tuple:
+    """(values read from json, values written to json) of one round"""
+    taken_seats = {
+        seat: {
+            "user_name": f"user-{seat}",
+            "cards": [],
+            "decision_time": None,
+            "last_action": None,
+            "making_decision": False,
+            "player_turn": False,
+            "score": "0",
+            "player_id": f"player-{seat}",
+            "insured": None,
+        }
+        for seat in range(1, PLAYERS * 2, 2)
+    }
+    merchant = {
+        "bet_url": "http://merchant/bet/",
+        "win_url": "http://merchant/win/",
+        "rollback_url": "http://merchant/rollback/",
+        "schema_type": "camel",
+        "min_bet": 1,
+        "max_bet": 200,
+    }
+    game_history = {
+        "action_list": [{"bet": 10, "decision_time": 1, "action_time": 2}] * 4,
+        "cards": ["A♠", "10♥", "3♣"],
+        "game_round": {"dealer_cards": ["K♦", "7♠"], "round_id": "round"},
+        "insured": False,
+        "seat_number": 1,
+        "total_bet": 40,
+        "bet": 40,
+        "user_name": "user",
+        "winning_amount": 80,
+    }
+    request = {
+        "token": "token",
+        "amount": 40,
+        "currency": "USD",
+        "gameId": "game",
+        "roundId": "round",
+        "externalId": "1b4e28ba-2fa1-11d2-883f-0016d3cca427",
+        "hash": "",
+        "transactionType": "bet",
+    }
+    response = {"status": "OK", "totalBalance": 1000.5}
+    written = (
+        [taken_seats, list(range(1, 14, 2)), merchant, {"task": "x", "args": [1, 2]}]
+        + [request, request] * PLAYERS
+        + [["update_balance", {"balance": 1000, "game_history": game_history}]]
+        * PLAYERS
+        + [["result", {"type": "win", "seat_number": 1, "winning_amount": 80}]]
+        * PLAYERS
+        + [["dealer_score", {"score": "17", "cards": ["K♦", "7♠"]}]] * 10
+    )
+    read = [json.dumps(value) for value in written[:4]] * 5 + [json.dumps(response)] * (
+        PLAYERS * 2
+    )
+    return read, written
+
+
+def measure(dumps, loads) -> float:
+    read, written = generate_round()
+    started = time.process_time()
+    for _ in range(ROUNDS):
+        for value in written:
+            dumps(value)
+        for value in read:
+            loads(value)
+    return (time.process_time() - started) / ROUNDS * 1_000_000
+
+
+def test_serialisation_cpu_per_round(capsys):
+    stdlib_us = measure(json.dumps, json.loads)
+    codec_us = measure(codec.dumps, codec.loads)
+    with capsys.disabled():
+        print(
+            json.dumps(
+                {
+                    "benchmark": "codec",
+                    "codec": codec.NAME,
+                    "players": PLAYERS,
+                    "stdlib_cpu_us_per_round": round(stdlib_us, 1),
+                    "codec_cpu_us_per_round": round(codec_us, 1),
+                }
+            )
+        )
+    assert codec.loads(codec.dumps({1: "seat"})) == json.loads(json.dumps({1: "seat"}))
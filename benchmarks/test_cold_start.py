@@ -0,0 +1,85 @@
+""" Cold start of the web process and of the celery worker: the cumulative ``-X importtime`` of
+their entry points and the time from the start of the web process to the response of its first
+request, each the median of fresh interpreters. Startup events, which connect to mongo and
+redis, are not run.
+Run with ``pytest benchmarks/test_cold_start.py -s``. """
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+import pytest
+
+RUNS = 5
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FIRST_REQUEST = """
+import time
+started = time.perf_counter()
+import main
+from starlette.testclient import TestClient
+assert TestClient(main.app).get("/health").status_code == 200
+print(time.perf_counter() - started)
+from apps.game import tasks
+assert tasks.db._client is None and tasks.r._client is None
+"""
+
+WORKER_MODULES = """
+import sys
+import apps.worker
+print(",".join(
+    module for module in ("fastapi", "beanie", "motor", "aioredis", "socketio")
+    if module in sys.modules
+))
+"""
+
+
+def run_python(*args) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *args], cwd=ROOT, capture_output=True, text=True, check=True
+    )
+
+
+def measure_import(module: str) -> float:
+    """cumulative import time of ``module`` in milliseconds"""
+    times = []
+    for _ in range(RUNS):
+        stderr = run_python("-X", "importtime", "-c", f"import {module}").stderr
+        [line] = [line for line in stderr.splitlines() if line.endswith(f"| {module}")]
+        times.append(int(line.split("|")[1]) / 1000)
+    return round(statistics.median(times), 1)
+
+
+@pytest.mark.parametrize("entry_point", ["main", "apps.worker"])
+def test_entry_point_import_time(entry_point, capsys):
+    import_ms = measure_import(entry_point)
+    with capsys.disabled():
+        print(
+            json.dumps(
+                {
+                    "benchmark": "cold_start",
+                    "entry_point": entry_point,
+                    "import_ms": import_ms,
+                }
+            )
+        )
+
+
+def test_worker_does_not_import_the_web_application():
+    assert run_python("-c", WORKER_MODULES).stdout.strip() == ""
+
+
+def test_time_to_first_request(capsys):
+    first_request_ms = round(
+        statistics.median(
+            float(run_python("-c", FIRST_REQUEST).stdout) * 1000 for _ in range(RUNS)
+        ),
+        1,
+    )
+    with capsys.disabled():
+        print(
+            json.dumps(
+                {"benchmark": "cold_start", "first_request_ms": first_request_ms}
+            )
+        )
@@ -0,0 +1,100 @@
+""" Deal phase benchmark for a full table.
+Run against the test mongo/redis with ``pytest benchmarks/test_deal_phase.py -s``. """
+import json
+import os
+import statistics
+import time
+
+import pytest
+from motor.motor_asyncio import AsyncIOMotorCollection
+
+from apps.connections import redis_cache
+from apps.game.cards.cards_manager import EuropeanCardsManager
+from apps.game.documents import GamePlayer, GameRound
+from apps.game.services.connect_manager import ConnectManager
+from tests.helpers import (
+    TEST_GAME_ID,
+    TEST_ROUND_ID,
+    TEST_SESSION_DATA,
+    create_game_round_for_testing,
+    get_round_and_finish_betting_time,
+    scan_multiple_cards,
+)
+
+ROUNDS = int(os.environ.get("BENCHMARK_ROUNDS", 20))
+SEATS = [1, 3, 5, 7, 9, 11, 13]
+# 7 first cards, dealer card, 7 second cards (pairs and suited cards to hit side bets)
+CARDS = [
+    "12C",
+    "19S",
+    "1JD",
+    "1QS",
+    "1AS",
+    "13S",
+    "1TS",
+    "1KS",
+    "22C",
+    "29C",
+    "2JH",
+    "2KS",
+    "2QS",
+    "23H",
+    "2TS",
+]
+
+
+async def reset_table():
+    await GameRound.get_motor_collection().drop()
+    await GamePlayer.get_motor_collection().drop()
+    await redis_cache.redis_cache.flushdb()
+    await create_game_round_for_testing()
+    await redis_cache.redis_cache.hset("test_sid", mapping=TEST_SESSION_DATA)
+    await ConnectManager(
+        game_id=TEST_GAME_ID, user_token="test_token", sid="test_sid"
+    ).connect_to_game()
+
+
+@pytest.mark.asyncio
+async def test_deal_phase_seven_seats(betting_manager, monkeypatch, capsys):
+    game_player_writes = []
+    find_one_and_update = AsyncIOMotorCollection.find_one_and_update
+
+    def count_writes(collection, *args, **kwargs):
+        if collection.name == GamePlayer.get_motor_collection().name:
+            game_player_writes[-1] += 1
+        return find_one_and_update(collection, *args, **kwargs)
+
+    monkeypatch.setattr(AsyncIOMotorCollection, "find_one_and_update", count_writes)
+    durations = []
+    for _ in range(ROUNDS):
+        await reset_table()
+        for seat_number in SEATS:
+            await betting_manager.charge_user(10, seat_number)
+            await betting_manager.charge_user(5, seat_number, "bet_21_3")
+            await betting_manager.charge_user(5, seat_number, "bet_perfect_pair")
+        await get_round_and_finish_betting_time()
+        user_session_data = await redis_cache.redis_cache.hgetall("test_sid")
+        card_manager = EuropeanCardsManager(user_session_data, TEST_ROUND_ID)
+        game_player_writes.append(0)
+        started = time.perf_counter()
+        await scan_multiple_cards(CARDS, card_manager)
+        durations.append((time.perf_counter() - started) * 1000)
+
+    # 2 card pushes per seat and the starter player's decision update
+    assert game_player_writes[-1] == len(SEATS) * 2 + 1
+    game_player = await GamePlayer.find_one(GamePlayer.seat_number == 1)
+    assert game_player.bet_perfect_pair_combination == "PERFECT PAIR"
+    with capsys.disabled():
+        print(
+            json.dumps(
+                {
+                    "benchmark": "deal_phase",
+                    "seats": len(SEATS),
+                    "rounds": ROUNDS,
+                    "game_player_writes_per_deal": game_player_writes[-1],
+                    "mean_ms": statistics.mean(durations),
+                    "p50_ms": statistics.median(durations),
+                    "max_ms": max(durations),
+                }
+            )
+        )
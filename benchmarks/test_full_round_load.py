@@ -0,0 +1,74 @@
+""" Full rounds of N tables x M players x K spectators against a local stub merchant.
+Sizes come from ``BENCHMARK_TABLES``, ``BENCHMARK_PLAYERS``, ``BENCHMARK_SPECTATORS`` and
+``BENCHMARK_ROUNDS``. Reports per-event p50/p95/p99 latency, rounds per minute and the
+Mongo/Redis op counts of the rounds.
+Run with ``pytest benchmarks/test_full_round_load.py -s``. """
+import json
+import os
+
+import pytest
+
+from apps.game.documents import Game, Merchant
+from apps.game.services.connect_manager import ConnectManager
+from apps.game.services.merchant_guard import merchant_guard
+from apps.game.services.outbox import OUTBOX_COLLECTION
+from apps.game.services.timer_wheel import timer_wheel
+from apps.game.tasks import db, dispatch_outbox, send_bets_to_merchant
+from benchmarks.load_generator import (
+    LoadGenerator,
+    mock_check_if_user_can_connect_by_token,
+)
+from benchmarks.stub_merchant import start_stub_merchant
+from tests.helpers import create_game_and_merchant_for_testing
+
+TABLES = int(os.environ.get("BENCHMARK_TABLES", 2))
+PLAYERS = int(os.environ.get("BENCHMARK_PLAYERS", 3))
+SPECTATORS = int(os.environ.get("BENCHMARK_SPECTATORS", 5))
+ROUNDS = int(os.environ.get("BENCHMARK_ROUNDS", 5))
+MERCHANT_URL = "http://127.0.0.1:8095/transaction/"
+
+
+@pytest.fixture()
+async def load_environment(monkeypatch):
+    monkeypatch.setattr(
+        ConnectManager,
+        "_check_if_user_can_connect",
+        mock_check_if_user_can_connect_by_token,
+    )
+    # the load generator does the work of the celery worker itself
+    monkeypatch.setattr(
+        send_bets_to_merchant, "apply_async", lambda *args, **kwargs: None
+    )
+    monkeypatch.setattr(dispatch_outbox, "delay", lambda *args, **kwargs: None)
+    schedule = timer_wheel.schedule
+
+    async def schedule_without_round_pause(key, task_name, args, delay):
+        if task_name == "start_new_round":
+            delay = 0
+        return await schedule(key, task_name, args, delay)
+
+    monkeypatch.setattr(timer_wheel, "schedule", schedule_without_round_pause)
+    merchant_guard.reset()
+    runner = await start_stub_merchant(8095)
+    yield
+    await runner.cleanup()
+    db[OUTBOX_COLLECTION].drop()
+    merchant_guard.reset()
+    await Game.get_motor_collection().drop()
+    await Merchant.get_motor_collection().drop()
+    await create_game_and_merchant_for_testing()
+
+
+@pytest.mark.asyncio
+async def test_full_round_load(load_environment, capsys):
+    load_generator = LoadGenerator(TABLES, PLAYERS, SPECTATORS, MERCHANT_URL)
+    try:
+        report = await load_generator.run(ROUNDS)
+    finally:
+        await load_generator.close()
+
+    with capsys.disabled():
+        print(json.dumps({"benchmark": "full_round_load", **report}))
+    assert report["rounds"] == TABLES * ROUNDS
+    # a bet and a win per player and round
+    assert report["outbox"]["sent"] == TABLES * PLAYERS * ROUNDS * 2
@@ -0,0 +1,118 @@
+""" Memory of 1,000 live seats and the mapping time of a seat, as the mongo document, the
+``GamePlayer`` pydantic document the managers used to read, and the ``SeatState`` they read now.
+Run with ``pytest benchmarks/test_live_state_memory.py -s``. """
+import copy
+import json
+import time
+import tracemalloc
+
+from bson import ObjectId
+from pydantic import validate_model
+
+from apps import codec
+from apps.game.documents import GamePlayer
+from apps.game.state import SeatState
+
+SEATS = 1000
+CONVERSIONS = 20_000
+
+
+def generate_seat_document(seat_number: int) -> dict:
+    return {
+        "_id": ObjectId(),
+        "sid": f"sid-{seat_number}",
+        "user_token": f"token-{seat_number}",
+        "user_id": str(seat_number),
+        "user_name": f"user-{seat_number}",
+        "decision_time": "1634567890",
+        "game_id": "507f1f77bcf86cd799439011",
+        "game_round": "5349b4ddd2781d08c09890f3",
+        "merchant": "507f1f77bcf86cd799439011",
+        "deposit": 1000.0,
+        "join_game_at": "1634567800",
+        "updated_at": "1634567850",
+        "left_game_at": None,
+        "making_decision": False,
+        "player_turn": False,
+        "finished_turn": False,
+        "seat_number": seat_number % 14,
+        "action_list": [{"bet": 10, "decision_time": 1, "action_time": 2}] * 3,
+        "last_action": "hit",
+        "cards": ["A♠", "10♥", "3♣"],
+        "player_id": f"player-{seat_number}",
+        "insured": None,
+        "bet": 10.0,
+        "bet_list": [10.0],
+        "bet_21_3": 0.0,
+        "bet_21_3_list": [],
+        "bet_21_3_winning": 0.0,
+        "bet_21_3_combination": None,
+        "bet_perfect_pair": 0.0,
+        "bet_perfect_pair_list": [],
+        "bet_perfect_pair_winning": 0.0,
+        "bet_perfect_pair_combination": None,
+        "winning_amount": 0.0,
+        "total_bet": 10.0,
+        "prev_winning_amount": None,
+        "archived_game_player_id": None,
+        "archived": False,
+        "is_reset": False,
+        "rejected": False,
+        "detail": None,
+        "is_active": True,
+        "external_ids": {"bet": f"external-{seat_number}"},
+        "inactivity_check_time": 0,
+    }
+
+
+def parse_game_player(document: dict) -> GamePlayer:
+    """``GamePlayer.parse_obj`` without the collection beanie checks for on ``__init__``"""
+    values, fields_set, error = validate_model(GamePlayer, document)
+    return GamePlayer.construct(fields_set, **values)
+
+
+def measure_memory(convert) -> int:
+    tracemalloc.start()
+    documents = [generate_seat_document(seat) for seat in range(SEATS)]
+    # the documents of a cursor are dropped once they are mapped
+    seats = [convert(documents.pop()) for _ in range(SEATS)]
+    del documents
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(seats) == SEATS
+    return size
+
+
+def measure_microseconds(function, argument) -> float:
+    started = time.perf_counter()
+    for _ in range(CONVERSIONS):
+        function(argument)
+    return round((time.perf_counter() - started) / CONVERSIONS * 1e6, 2)
+
+
+def test_live_state_memory_and_mapping_speed(capsys):
+    document = generate_seat_document(1)
+    seat = SeatState.from_document(copy.deepcopy(document))
+    game_player = parse_game_player(copy.deepcopy(document))
+    assert seat.get_fields() == game_player.dict(exclude={"id", "revision_id"})
+
+    results = {
+        "document_bytes_per_1000_seats": measure_memory(lambda document: document),
+        "pydantic_bytes_per_1000_seats": measure_memory(parse_game_player),
+        "state_bytes_per_1000_seats": measure_memory(SeatState.from_document),
+        "pydantic_parse_us": measure_microseconds(parse_game_player, document),
+        "state_from_document_us": measure_microseconds(
+            SeatState.from_document, document
+        ),
+        "pydantic_dump_us": measure_microseconds(
+            lambda game_player: codec.loads(game_player.json()), game_player
+        ),
+        "state_to_document_us": measure_microseconds(SeatState.to_document, seat),
+    }
+    with capsys.disabled():
+        print(json.dumps({"benchmark": "live_state", "seats": SEATS, **results}))
+    assert (
+        results["state_bytes_per_1000_seats"] < results["pydantic_bytes_per_1000_seats"]
+    )
+    assert results["state_from_document_us"] < results["pydantic_parse_us"]
+    assert results["state_to_document_us"] < results["pydantic_dump_us"]
@@ -0,0 +1,121 @@
+""" A slow, failing merchant next to a healthy one on a bounded worker pool (like celery's).
+Without the guard the slow merchant holds every worker and the healthy merchant queues behind
+it; with the guard its concurrency limit shrinks and the circuit opens.
+Run with ``pytest benchmarks/test_merchant_isolation.py -s``. """
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+
+from apps.config import settings
+from apps.game.services.core_bridge import send_data_to_merchant
+from apps.game.services.custom_exception import MerchantUnavailable
+from apps.game.services.merchant_guard import merchant_guard, post
+from benchmarks.stub_merchant import start_stub_merchant
+
+SLOW_MERCHANT = "http://127.0.0.1:8091/transaction/"
+HEALTHY_MERCHANT = "http://127.0.0.1:8092/transaction/"
+REQUESTS_PER_MERCHANT = 40
+WORKERS = 8
+
+
+@pytest.fixture()
+async def stub_merchants(monkeypatch):
+    monkeypatch.setattr(settings, "MERCHANT_LATENCY_TARGET", 0.2)
+    monkeypatch.setattr(settings, "MERCHANT_CONCURRENCY_INITIAL", WORKERS)
+    monkeypatch.setattr(settings, "MERCHANT_CONCURRENCY_MIN", 1)
+    monkeypatch.setattr(settings, "MERCHANT_BREAKER_COOLDOWN", 0.5)
+    merchant_guard.reset()
+    runners = [
+        await start_stub_merchant(8091, latency=0.5, error_rate=0.9),
+        await start_stub_merchant(8092, latency=0.01),
+    ]
+    yield
+    for runner in runners:
+        await runner.cleanup()
+    merchant_guard.reset()
+
+
+def unguarded_post(url: str, data: dict):
+    return requests.post(url, json=data, timeout=settings.MERCHANT_TIMEOUT)
+
+
+async def run_worker_pool(send) -> dict:
+    loop = asyncio.get_running_loop()
+    latencies, rejected = [], 0
+
+    def job(url: str) -> float:
+        started = time.perf_counter()
+        send(url, {"amount": 10})
+        return time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=WORKERS) as executor:
+        submitted_at = time.perf_counter()
+        futures = []
+        for _ in range(REQUESTS_PER_MERCHANT):
+            futures.append((SLOW_MERCHANT, executor.submit(job, SLOW_MERCHANT)))
+            futures.append((HEALTHY_MERCHANT, executor.submit(job, HEALTHY_MERCHANT)))
+        for url, future in futures:
+            try:
+                await asyncio.wrap_future(future, loop=loop)
+            except MerchantUnavailable:
+                rejected += 1
+                continue
+            if url == HEALTHY_MERCHANT:
+                latencies.append((time.perf_counter() - submitted_at) * 1000)
+    latencies.sort()
+    return {
+        "healthy_p50_ms": latencies[len(latencies) // 2],
+        "healthy_p99_ms": latencies[int(len(latencies) * 0.99)],
+        "rejected": rejected,
+    }
+
+
+@pytest.mark.asyncio
+async def test_celery_path_isolation(stub_merchants, capsys):
+    unguarded = await run_worker_pool(unguarded_post)
+    guarded = await run_worker_pool(post)
+    with capsys.disabled():
+        print(
+            json.dumps(
+                {
+                    "benchmark": "merchant_isolation",
+                    "path": "celery",
+                    "unguarded": unguarded,
+                    "guarded": guarded,
+                    "merchants": merchant_guard.get_stats(),
+                }
+            )
+        )
+    assert merchant_guard.get_stats()["127.0.0.1:8091"]["transitions"]["closed->open"]
+    assert merchant_guard.get_stats()["127.0.0.1:8092"]["state"] == "closed"
+
+
+@pytest.mark.asyncio
+async def test_async_path_isolation(stub_merchants, capsys):
+    async def send(url: str):
+        try:
+            return await send_data_to_merchant(url, {"amount": 10})
+        except MerchantUnavailable:
+            return None
+
+    results = await asyncio.gather(
+        *[send(SLOW_MERCHANT) for _ in range(REQUESTS_PER_MERCHANT)],
+        *[send(HEALTHY_MERCHANT) for _ in range(REQUESTS_PER_MERCHANT)],
+    )
+    healthy = results[REQUESTS_PER_MERCHANT:]
+    with capsys.disabled():
+        print(
+            json.dumps(
+                {
+                    "benchmark": "merchant_isolation",
+                    "path": "async",
+                    "merchants": merchant_guard.get_stats(),
+                }
+            )
+        )
+    assert all(result and result[0] == 200 for result in healthy)
+    assert merchant_guard.get_stats()["127.0.0.1:8091"]["rejected"]
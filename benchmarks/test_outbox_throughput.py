@@ -0,0 +1,91 @@
+""" Outbox dispatch throughput against a local stub merchant.
+Compares sequential sends with batched concurrent dispatch and with several dispatchers over
+disjoint partitions (threads here, processes in production).
+Run with ``pytest benchmarks/test_outbox_throughput.py -s``. """
+import asyncio
+import json
+import time
+
+import pytest
+
+from apps.config import settings
+from apps.game.services.merchant_guard import merchant_guard
+from apps.game.services.outbox import (
+    OUTBOX_COLLECTION,
+    OutboxDispatcher,
+    generate_transaction,
+    get_enqueue_operations,
+)
+from apps.game.tasks import db
+from benchmarks.stub_merchant import start_stub_merchant
+
+BET_URL = "http://127.0.0.1:8093/bet/"
+TRANSACTIONS = 400
+MERCHANT_LATENCY = 0.02
+
+
+@pytest.fixture()
+async def stub_merchant(monkeypatch):
+    # every dispatcher process has a guard of its own
+    monkeypatch.setattr(settings, "MERCHANT_CONCURRENCY_INITIAL", 200)
+    merchant_guard.reset()
+    runner = await start_stub_merchant(8093, latency=MERCHANT_LATENCY)
+    yield
+    await runner.cleanup()
+    db[OUTBOX_COLLECTION].drop()
+    merchant_guard.reset()
+
+
+def enqueue() -> None:
+    db[OUTBOX_COLLECTION].drop()
+    transactions = [
+        generate_transaction(
+            "bet",
+            BET_URL,
+            {"external_id": f"bet-{index}", "amount": 10},
+            {"_id": f"player-{index}", "user_id": f"user-{index}", "merchant": "m"},
+            f"bet-{index}",
+            10,
+        )
+        for index in range(TRANSACTIONS)
+    ]
+    db[OUTBOX_COLLECTION].bulk_write(get_enqueue_operations(transactions))
+
+
+async def measure(dispatchers: int, concurrency: int) -> dict:
+    enqueue()
+    partitions = range(settings.OUTBOX_PARTITIONS)
+    handlers = {"bet": lambda transaction, data: None}
+    started = time.perf_counter()
+    stats = await asyncio.gather(
+        *[
+            asyncio.to_thread(
+                OutboxDispatcher(
+                    db,
+                    handlers,
+                    list(partitions[index::dispatchers]),
+                    concurrency=concurrency,
+                ).drain
+            )
+            for index in range(dispatchers)
+        ]
+    )
+    elapsed = time.perf_counter() - started
+    sent = sum(dispatcher_stats["sent"] for dispatcher_stats in stats)
+    return {
+        "dispatchers": dispatchers,
+        "concurrency": concurrency,
+        "sent": sent,
+        "seconds": round(elapsed, 3),
+        "transactions_per_second": round(sent / elapsed, 1),
+    }
+
+
+@pytest.mark.asyncio
+async def test_outbox_throughput(stub_merchant, capsys):
+    results = [await measure(1, 1)]
+    for dispatchers in [1, 2, 4]:
+        results.append(await measure(dispatchers, settings.OUTBOX_CONCURRENCY))
+    with capsys.disabled():
+        print(json.dumps({"benchmark": "outbox_throughput", "results": results}))
+    assert all(result["sent"] == TRANSACTIONS for result in results)
@@ -0,0 +1,106 @@
+""" Table reset completion time by table size against a local stub merchant.
+A reset is complete once every rollback of the round is answered.
+Run with ``pytest benchmarks/test_reset_completion.py -s``. """
+import asyncio
+import json
+
+import pytest
+from bson import ObjectId
+
+from apps.connections import redis_cache
+from apps.game.documents import GamePlayer, GameRound
+from apps.game.services.merchant_guard import merchant_guard
+from apps.game.services.outbox import OUTBOX_COLLECTION, OutboxDispatcher
+from apps.game.services.payment_manager import ResetManager
+from apps.game.services.reset_tracker import get_reset_stats
+from apps.game.services.utils import get_timestamp
+from apps.game.tasks import OUTBOX_HANDLERS, db, dispatch_outbox, start_new_round
+from benchmarks.stub_merchant import start_stub_merchant
+from tests.helpers import TEST_GAME_ID, TEST_MERCHANT_ID, TEST_ROUND_ID
+
+ROLLBACK_URL = "http://127.0.0.1:8094/rollback/"
+TABLE_SIZES = [1, 7, 14, 50, 200]
+
+
+@pytest.fixture()
+async def stub_merchant(monkeypatch):
+    async def get_merchants(self):
+        return [
+            {
+                "_id": ObjectId(TEST_MERCHANT_ID),
+                "rollback_url": ROLLBACK_URL,
+                "schema_type": "snake",
+            }
+        ]
+
+    monkeypatch.setattr(ResetManager, "get_merchants", get_merchants)
+    # the benchmark drains the outbox itself
+    monkeypatch.setattr(dispatch_outbox, "delay", lambda *args, **kwargs: None)
+    monkeypatch.setattr(start_new_round, "apply_async", lambda *args, **kwargs: None)
+    merchant_guard.reset()
+    runner = await start_stub_merchant(8094, latency=0.02)
+    yield
+    await runner.cleanup()
+    db[OUTBOX_COLLECTION].drop()
+    merchant_guard.reset()
+
+
+async def create_table(players: int) -> GameRound:
+    await GamePlayer.get_motor_collection().drop()
+    await GamePlayer.get_motor_collection().insert_many(
+        [
+            {
+                "game_round": TEST_ROUND_ID,
+                "game_id": TEST_GAME_ID,
+                "merchant": TEST_MERCHANT_ID,
+                "user_id": f"user-{index}",
+                "user_name": f"user-{index}",
+                "user_token": f"token-{index}",
+                "player_id": f"player-{index}",
+                "sid": f"sid-{index}",
+                "seat_number": index % 14 + 1,
+                "bet": 20,
+                "total_bet": 20,
+                "action_list": [{"bet": 20}],
+                # the merchant confirmed the bets, the reset only rolls them back
+                "external_ids": {"bet": f"bet-{index}"},
+            }
+            for index in range(players)
+        ]
+    )
+    await GameRound.get_motor_collection().update_one(
+        {"_id": ObjectId(TEST_ROUND_ID)},
+        {
+            "$set": {
+                "start_timestamp": get_timestamp(-1),
+                "finished": False,
+                "was_reset": False,
+            }
+        },
+    )
+    return await GameRound.find_one({"_id": ObjectId(TEST_ROUND_ID)})
+
+
+@pytest.mark.asyncio
+async def test_reset_completion_by_table_size(stub_merchant, capsys):
+    dispatcher = OutboxDispatcher(db, OUTBOX_HANDLERS)
+    for players in TABLE_SIZES:
+        game_round = await create_table(players)
+        await ResetManager(TEST_GAME_ID, game_round).reset()
+        await asyncio.to_thread(dispatcher.drain)
+
+    stats = await get_reset_stats(redis_cache.redis_cache)
+    with capsys.disabled():
+        print(
+            json.dumps(
+                {
+                    "benchmark": "reset_completion",
+                    "rollbacks": dispatcher.stats,
+                    "by_table_size": {
+                        players: round(stats[str(players)]["last_ms"], 1)
+                        for players in TABLE_SIZES
+                    },
+                }
+            )
+        )
+    assert dispatcher.stats["sent"] == sum(TABLE_SIZES)
@@ -0,0 +1,81 @@
+""" Merchant payload building and response inflection on 100k payloads, against the previous
+implementation which inflected every key of every payload with ``inflection``.
+Run with ``pytest benchmarks/test_schema_generator_speed.py -s``. """
+import json
+import time
+
+import inflection
+import pytest
+
+from apps.game.services.schema_generator import (
+    generate_bet_request_data,
+    inflect_response_data,
+)
+
+PAYLOADS = 100_000
+GAME_PLAYER = {"user_token": "token", "game_id": "game", "game_round": "round"}
+RESPONSE = {"status": "OK", "totalBalance": 1000, "externalId": "id", "roundId": "r"}
+
+
+def legacy_bet_request_data(schema_type: str, amount: float, external_id: str):
+    data = {
+        "token": GAME_PLAYER["user_token"],
+        "amount": amount,
+        "currency": "USD",
+        "game_id": GAME_PLAYER["game_id"],
+        "round_id": GAME_PLAYER["game_round"],
+        "external_id": external_id,
+        "hash": "",
+        "transaction_type": "bet",
+    }
+    new_data = dict()
+    for snake_key, value in data.items():
+        camel_key = inflection.camelize(snake_key)
+        if schema_type == "camel":
+            camel_key = camel_key[0].lower() + camel_key[1:]
+        new_data[camel_key] = value
+    return new_data
+
+
+def legacy_inflect_response_data(data: dict):
+    new_data = dict()
+    for key, value in data.items():
+        new_data[inflection.underscore(key)] = value
+    return new_data
+
+
+def measure(function, *args) -> float:
+    started = time.perf_counter()
+    for _ in range(PAYLOADS):
+        function(*args)
+    return round(PAYLOADS / (time.perf_counter() - started))
+
+
+@pytest.mark.parametrize("schema_type", ["camel", "capital_camel"])
+def test_payload_building_speed(schema_type, capsys):
+    assert legacy_bet_request_data(schema_type, 10, "id") == generate_bet_request_data(
+        schema_type, 10, GAME_PLAYER, "id"
+    )
+    results = {
+        "legacy_requests_per_second": measure(
+            legacy_bet_request_data, schema_type, 10, "id"
+        ),
+        "requests_per_second": measure(
+            generate_bet_request_data, schema_type, 10, GAME_PLAYER, "id"
+        ),
+        "legacy_responses_per_second": measure(legacy_inflect_response_data, RESPONSE),
+        "responses_per_second": measure(inflect_response_data, RESPONSE),
+    }
+    with capsys.disabled():
+        print(
+            json.dumps(
+                {
+                    "benchmark": "schema_generator",
+                    "schema_type": schema_type,
+                    "payloads": PAYLOADS,
+                    **results,
+                }
+            )
+        )
+    assert results["requests_per_second"] > results["legacy_requests_per_second"]
+    assert results["responses_per_second"] > results["legacy_responses_per_second"]
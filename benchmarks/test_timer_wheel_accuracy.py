@@ -0,0 +1,94 @@
+""" Accuracy of the timer wheel and the broker traffic it saves: timers with the delays of a
+round (decision, insurance, cleanup and next round) are scheduled on a wheel backed by redis, a
+fifth of them are cancelled as a player acting before the timeout does. The lateness of every
+fired timer and the redis round trips of the wheel are recorded; with celery countdowns each timer
+was a broker message and each cancel a revoke broadcast to the workers.
+Run with ``pytest benchmarks/test_timer_wheel_accuracy.py -s``. """
+import asyncio
+import json
+import random
+import statistics
+import time
+
+import aioredis
+
+from apps.config import settings
+from apps.game.services.timer_wheel import TimerWheel
+
+TIMERS = 500
+DELAYS = (0.5, 1, 2, 3)
+CANCELLED_SHARE = 0.2
+
+
+class CountingRedis:
+    """Counts the round trips of the wheel to redis, a transaction is one."""
+
+    def __init__(self, client):
+        self.client = client
+        self.commands = 0
+
+    def pipeline(self, **kwargs):
+        self.commands += 1
+        return self.client.pipeline(**kwargs)
+
+    def __getattr__(self, name: str):
+        command = getattr(self.client, name)
+
+        async def count(*args, **kwargs):
+            self.commands += 1
+            return await command(*args, **kwargs)
+
+        return count
+
+
+async def run_timers() -> dict:
+    client = aioredis.Redis.from_url(
+        settings.REDIS_CACHE_URL, db=15, decode_responses=True
+    )
+    await client.flushdb()
+    redis = CountingRedis(client)
+    wheel = TimerWheel()
+    lateness_ms = []
+    wheel.register("fire", lambda due: lateness_ms.append((time.time() - due) * 1000))
+    await wheel.start(redis)
+    keys = []
+    for index in range(TIMERS):
+        delay = random.choice(DELAYS)
+        key = f"benchmark:{index}"
+        await wheel.schedule(key, "fire", [time.time() + delay], delay)
+        keys.append(key)
+    cancelled = random.sample(keys, int(TIMERS * CANCELLED_SHARE))
+    for key in cancelled:
+        await wheel.cancel(key)
+    while len(lateness_ms) < TIMERS - len(cancelled):
+        await asyncio.sleep(0.1)
+    await wheel.stop()
+    await client.flushdb()
+    await client.close()
+    lateness_ms.sort()
+    return {
+        "fired": len(lateness_ms),
+        "cancelled": len(cancelled),
+        "median_lateness_ms": round(statistics.median(lateness_ms), 1),
+        "p99_lateness_ms": round(lateness_ms[int(len(lateness_ms) * 0.99) - 1], 1),
+        "max_lateness_ms": round(lateness_ms[-1], 1),
+        "redis_round_trips": redis.commands,
+        "broker_messages": 0,
+        "legacy_broker_messages": TIMERS + len(cancelled),
+    }
+
+
+def test_timer_wheel_accuracy(capsys):
+    results = asyncio.get_event_loop().run_until_complete(run_timers())
+    with capsys.disabled():
+        print(
+            json.dumps(
+                {
+                    "benchmark": "timer_wheel",
+                    "timers": TIMERS,
+                    "tick_ms": settings.TIMER_WHEEL_TICK_SECONDS * 1000,
+                    **results,
+                }
+            )
+        )
+    assert results["fired"] == TIMERS - results["cancelled"]
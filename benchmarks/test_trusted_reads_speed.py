@@ -0,0 +1,84 @@
+""" CPU of a read of a 50-field document: validated by pydantic as ``Document.find_one`` does,
+``construct``-ed from the whole document and from a projection of the fields the caller reads,
+and ``construct``-ed with ``VALIDATE_TRUSTED_READS``.
+Run with ``pytest benchmarks/test_trusted_reads_speed.py -s``. """
+import json
+import time
+from typing import List, Optional
+
+from beanie import Document
+from bson import ObjectId
+from pydantic import create_model, validate_model
+
+from apps.config import settings
+from apps.game.state import construct
+
+READS = 20_000
+FIELDS = 50
+PROJECTED = 10
+
+# (type, default, stored value) of the fields
+FIELD_TYPES = [
+    (str, None, "value"),
+    (int, 0, 7),
+    (float, 0, 10.5),
+    (bool, False, True),
+    (Optional[str], None, None),
+    (List[str], [], ["A♠", "10♥"]),
+    (dict, {}, {"bet": "external-id"}),
+]
+
+WideDocument = create_model(
+    "WideDocument",
+    __base__=Document,
+    **{
+        f"field_{index}": FIELD_TYPES[index % len(FIELD_TYPES)][:2]
+        for index in range(FIELDS - 1)
+    },
+)
+DOCUMENT = {
+    "_id": ObjectId(),
+    **{
+        f"field_{index}": FIELD_TYPES[index % len(FIELD_TYPES)][2]
+        for index in range(FIELDS - 1)
+    },
+}
+PROJECTION = {key: DOCUMENT[key] for key in list(DOCUMENT)[:PROJECTED]}
+
+
+def parse(document: dict) -> Document:
+    """``Document.parse_obj`` without the collection beanie checks for on ``__init__``"""
+    values, fields_set, error = validate_model(WideDocument, document)
+    return WideDocument.construct(fields_set, **values)
+
+
+def measure_microseconds(function, *args) -> float:
+    started = time.perf_counter()
+    for _ in range(READS):
+        function(*args)
+    return round((time.perf_counter() - started) / READS * 1e6, 2)
+
+
+def test_trusted_read_speed(monkeypatch, capsys):
+    assert len(WideDocument.__fields__) == FIELDS + 1  # and the revision id of beanie
+    assert construct(WideDocument, DOCUMENT) == parse(DOCUMENT)
+    results = {
+        "validated_read_us": measure_microseconds(parse, DOCUMENT),
+        "constructed_read_us": measure_microseconds(construct, WideDocument, DOCUMENT),
+        "projected_read_us": measure_microseconds(construct, WideDocument, PROJECTION),
+    }
+    monkeypatch.setattr(settings, "VALIDATE_TRUSTED_READS", True)
+    results["debug_read_us"] = measure_microseconds(construct, WideDocument, DOCUMENT)
+    with capsys.disabled():
+        print(
+            json.dumps(
+                {
+                    "benchmark": "trusted_reads",
+                    "fields": FIELDS,
+                    "projected_fields": PROJECTED,
+                    **results,
+                }
+            )
+        )
+    assert results["constructed_read_us"] < results["validated_read_us"]
+    assert results["projected_read_us"] < results["validated_read_us"]
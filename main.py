@@ -1,4 +1,4 @@
+""" Entry point of the web process, the celery worker starts from ``apps.worker``. """
 from apps import create_app
 
 app = create_app()
-celery = app.celery_app
@@ -325,3 +325,15 @@ async def test_make_bet_with_unknown_bet_type(betting_manager):
     with pytest.raises(ValidationError) as error:
         await betting_manager.charge_user(amount=10, seat_number=1, bet_type="unknown")
         assert str(error) == "Bet type is unknown"
+
+
+@pytest.mark.asyncio
+async def test_user_total_bet_over_multiple_seats(betting_manager):
+    await betting_manager.charge_user(10, 1)
+    await betting_manager.charge_user(20, 3)
+    data = await betting_manager.charge_user(5, 3, "bet_21_3")
+    assert data["user_total_bet"] == 35
+    game_round = await GameRound.find_one({})
+    await redis_cache.delete_total_bets(str(game_round.id))
+    data = await betting_manager.charge_user(10, 5)
+    assert data["user_total_bet"] == 45
@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+
+from apps.connections import redis_cache
+from apps.game.betting.chip_batcher import ChipBatcher
+from apps.game.documents import GamePlayer
+from apps.game.services.custom_exception import ValidationError
+from tests.helpers import TEST_DEPOSIT
+
+
+@pytest.mark.asyncio
+async def test_chips_in_window_are_placed_with_one_write(betting_manager):
+    chip_batcher = ChipBatcher(window=0.01)
+    session_data = await redis_cache.redis_cache.hgetall("test_sid")
+    results = await asyncio.gather(
+        *[
+            chip_batcher.place_chip("test_sid", session_data, 10, 1, "bet")
+            for _ in range(3)
+        ],
+        chip_batcher.place_chip("test_sid", session_data, 10, 1, "bet_21_3"),
+    )
+    game_player: GamePlayer = await GamePlayer.find_one(GamePlayer.seat_number == 1)
+    assert game_player.bet_list == [10, 10, 10]
+    assert game_player.bet_21_3_list == [10]
+    assert game_player.total_bet == 40
+    assert game_player.deposit == TEST_DEPOSIT - 40
+    assert len(game_player.action_list) == 4
+    assert [result["bet_list"] for result in results[:3]] == [
+        [10],
+        [10, 10],
+        [10, 10, 10],
+    ]
+    assert [result["user_total_bet"] for result in results] == [10, 20, 30, 40]
+    assert chip_batcher.stats == {"chips": 4, "batches": 1, "writes": 2}
+
+
+@pytest.mark.asyncio
+async def test_rejected_chip_does_not_affect_the_rest_of_the_batch(betting_manager):
+    chip_batcher = ChipBatcher(window=0.01)
+    session_data = await redis_cache.redis_cache.hgetall("test_sid")
+    results = await asyncio.gather(
+        chip_batcher.place_chip("test_sid", session_data, 100, 1, "bet"),
+        chip_batcher.place_chip("test_sid", session_data, 150, 1, "bet"),
+        chip_batcher.place_chip("test_sid", session_data, 50, 1, "bet"),
+        return_exceptions=True,
+    )
+    game_player: GamePlayer = await GamePlayer.find_one(GamePlayer.seat_number == 1)
+    assert isinstance(results[1], ValidationError)
+    assert str(results[1]) == "placing more than maximum bet is not allowed"
+    assert results[2]["bet"] == 150
+    assert game_player.bet_list == [100, 50]
@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+
+from apps.connections import redis_cache
+from apps.game.betting.betting_manager import BettingManager
+from apps.game.betting.rollback_manager import RollbackManger
+from apps.game.documents import GamePlayer
+from apps.game.services.custom_exception import ValidationError
+from tests.helpers import TEST_DEPOSIT, TEST_MERCHANT_ID, TEST_SESSION_DATA
+
+
+async def get_cached_balance() -> float:
+    return float(
+        await redis_cache.get(f"{TEST_SESSION_DATA['user_id']}:{TEST_MERCHANT_ID}")
+    )
+
+
+async def open_tabs(count: int):
+    session_data = await redis_cache.redis_cache.hgetall("test_sid")
+    return [BettingManager(session_data, "test_sid", "bet") for _ in range(count)]
+
+
+@pytest.mark.asyncio
+async def test_rapid_chips_from_two_tabs_are_not_lost(betting_manager):
+    await betting_manager.charge_user(amount=10, seat_number=1)
+    first_tab, second_tab = await open_tabs(2)
+    await asyncio.gather(
+        *[
+            tab.charge_user(amount=10, seat_number=1)
+            for _ in range(8)
+            for tab in (first_tab, second_tab)
+        ]
+    )
+    game_player: GamePlayer = await GamePlayer.find_one(GamePlayer.seat_number == 1)
+    assert game_player.bet_list == [10] * 17
+    assert game_player.bet == 170
+    assert game_player.total_bet == 170
+    assert len(game_player.action_list) == 17
+    assert game_player.deposit == TEST_DEPOSIT - 170
+    assert await get_cached_balance() == TEST_DEPOSIT - 170
+
+
+@pytest.mark.asyncio
+async def test_concurrent_chips_do_not_exceed_max_bet(betting_manager):
+    await betting_manager.charge_user(amount=10, seat_number=1)
+    first_tab, second_tab = await open_tabs(2)
+    results = await asyncio.gather(
+        *[
+            tab.charge_user(amount=10, seat_number=1)
+            for _ in range(15)
+            for tab in (first_tab, second_tab)
+        ],
+        return_exceptions=True,
+    )
+    game_player: GamePlayer = await GamePlayer.find_one(GamePlayer.seat_number == 1)
+    assert game_player.bet == 200
+    assert len(game_player.bet_list) == 20
+    assert game_player.deposit == TEST_DEPOSIT - 200
+    assert await get_cached_balance() == TEST_DEPOSIT - 200
+    assert len([result for result in results if isinstance(result, dict)]) == 19
+    assert all(
+        isinstance(result, ValidationError)
+        for result in results
+        if not isinstance(result, dict)
+    )
+
+
+@pytest.mark.asyncio
+async def test_concurrent_rollbacks_remove_every_chip_once(betting_manager):
+    for _ in range(4):
+        await betting_manager.charge_user(amount=10, seat_number=1)
+    session_data = await redis_cache.redis_cache.hgetall("test_sid")
+    results = await asyncio.gather(
+        *[
+            RollbackManger(session_data, "test_sid", "bet").make_rollback(1)
+            for _ in range(6)
+        ],
+        return_exceptions=True,
+    )
+    game_player: GamePlayer = await GamePlayer.find_one(GamePlayer.seat_number == 1)
+    assert game_player.bet_list == []
+    assert game_player.bet == 0
+    assert game_player.total_bet == 0
+    assert game_player.deposit == TEST_DEPOSIT
+    assert await get_cached_balance() == TEST_DEPOSIT
+    assert len([result for result in results if isinstance(result, dict)]) == 4
+    assert all(
+        str(result) == "There is no bet to rollback"
+        for result in results
+        if not isinstance(result, dict)
+    )
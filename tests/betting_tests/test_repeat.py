@@ -3,10 +3,12 @@ import json
 import pytest
 
 from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorCollection
 
 from apps.connections import redis_cache
 from apps.game.documents import GamePlayer, GameRound
 from apps.game.services.custom_exception import ValidationError
+from apps.game.services.wallet_ledger import wallet_ledger
 from tests.helpers import (
     TEST_GAME_ID,
     TEST_SESSION_DATA,
@@ -149,3 +151,99 @@ async def test_make_repeat_after_making_repeat(betting_manager):
     with pytest.raises(ValidationError) as error:
         await betting_manager.make_repeat(TEST_SESSION_DATA)
         assert str(error) == "Repeat is already made"
+
+
+def generate_repeat_data(seat_numbers):
+    return {
+        seat_number: {
+            "bet": 20,
+            "bet_list": [10, 10],
+            "bet_21_3": 5,
+            "bet_21_3_list": [5],
+            "bet_perfect_pair": 0,
+            "bet_perfect_pair_list": [],
+        }
+        for seat_number in seat_numbers
+    }
+
+
+async def cache_repeat_data(repeat_data):
+    prev_round_id = str(ObjectId())
+    game_round: GameRound = await GameRound.find_one(GameRound.game_id == TEST_GAME_ID)
+    game_round.prev_round_id = prev_round_id
+    await game_round.save()
+    await redis_cache.redis_cache.set(
+        f"{TEST_SESSION_DATA['user_id']}:{TEST_MERCHANT_ID}:{prev_round_id}",
+        json.dumps(repeat_data),
+    )
+
+
+@pytest.mark.asyncio
+async def test_make_repeat_on_multiple_seats(betting_manager):
+    await betting_manager.charge_user(10, 3)
+    await cache_repeat_data(generate_repeat_data([1, 3, 5]))
+
+    return_data = await betting_manager.make_repeat(TEST_SESSION_DATA)
+
+    game_players = await GamePlayer.find(GamePlayer.game_id == TEST_GAME_ID).to_list()
+    assert {game_player.seat_number for game_player in game_players} == {1, 3, 5}
+    for game_player in game_players:
+        assert game_player.bet_list == [10, 10]
+        assert game_player.bet_21_3 == 5
+        assert game_player.total_bet == 25
+    # the repeat replaces the bet of 10 on seat 3
+    assert return_data["5"]["user_deposit"] == TEST_DEPOSIT - 75
+    assert len(return_data["3"]["action_list"]) == 2
+    assert return_data["3"]["action_list"][-1]["repeat"] == 25
+    assert await redis_cache.get(
+        f"{TEST_SESSION_DATA['user_id']}:{TEST_MERCHANT_ID}"
+    ) == str(float(TEST_DEPOSIT - 75))
+    assert await wallet_ledger.get_pending(
+        TEST_SESSION_DATA["user_id"], TEST_MERCHANT_ID
+    ) == float(75)
+
+
+@pytest.mark.asyncio
+async def test_make_repeat_does_not_take_any_seat_when_one_is_taken(betting_manager):
+    await cache_repeat_data(generate_repeat_data([1, 3]))
+    game_round: GameRound = await GameRound.find_one(GameRound.game_id == TEST_GAME_ID)
+    await redis_cache.redis_cache.set(f"{game_round.id}:3", "another:player")
+
+    with pytest.raises(ValidationError) as error:
+        await betting_manager.make_repeat(TEST_SESSION_DATA)
+    assert str(error.value) == "Seat is already taken."
+    assert await redis_cache.get(f"{game_round.id}:1") is None
+    assert await GamePlayer.find(GamePlayer.game_id == TEST_GAME_ID).count() == 0
+    # the reservation is released when the seats can not be taken
+    assert (
+        float(
+            await redis_cache.get(f"{TEST_SESSION_DATA['user_id']}:{TEST_MERCHANT_ID}")
+        )
+        == TEST_DEPOSIT
+    )
+
+
+@pytest.mark.asyncio
+async def test_make_repeat_round_trips_do_not_depend_on_seats(
+    betting_manager, monkeypatch
+):
+    operations = []
+    for name in ["find", "find_one", "find_one_and_update", "bulk_write"]:
+
+        def counted(
+            collection, *args, method=getattr(AsyncIOMotorCollection, name), **kwargs
+        ):
+            operations.append(collection.name)
+            return method(collection, *args, **kwargs)
+
+        monkeypatch.setattr(AsyncIOMotorCollection, name, counted)
+
+    await cache_repeat_data(generate_repeat_data([1]))
+    operations.clear()
+    await betting_manager.make_repeat(TEST_SESSION_DATA)
+    one_seat_operations = len(operations)
+    await GamePlayer.get_motor_collection().drop()
+    await cache_repeat_data(generate_repeat_data([1, 3, 5, 7, 9, 11, 13]))
+    operations.clear()
+    await betting_manager.make_repeat(TEST_SESSION_DATA)
+    assert len(operations) == one_seat_operations
@@ -78,7 +78,10 @@ async def test_make_rollback_on_different_seats(betting_and_rollback_manager):
     )
     assert rollback_data["seat_number"] == 1
     assert player_seat_1.bet == 0
-    assert player_seat_1.deposit == second_bet_data.get(
+    assert player_seat_1.deposit == first_bet_data.get(
+        "user_deposit"
+    ) + first_bet_data.get("bet")
+    assert rollback_data["balance"] == second_bet_data.get(
         "user_deposit"
     ) + first_bet_data.get("bet")
     assert player_seat_3.bet == 10
@@ -6,6 +6,7 @@ import socketio
 from beanie import PydanticObjectId
 from bson import ObjectId
 
+from apps import codec
 from apps.connections import redis_cache
 from apps.game.documents import Game, GameRound, Merchant, GamePlayer
 from apps.game.models import GameMerchantModel
@@ -245,6 +246,10 @@ class MockResponse:
     def json(self) -> dict:
         return {"status": self.status, "total_balance": 980}
 
+    @property
+    def content(self) -> bytes:
+        return codec.dumps_bytes(self.json())
+
 
 def mock_request(*_, **kwargs):
     return MockResponse(200, "Ok")
@@ -266,7 +271,7 @@ def mock_send_to_merchant(*_, **kwargs):
     pass
 
 
-def mock_clean_seats(self):
+async def mock_clean_seats(self):
     pass
 
 
@@ -323,7 +328,7 @@ async def mock_make_double(self) -> None:
     )
     self.validate_action()
     self.check_decision_timestamp()
-    self.validate_action_for_split_and_double()
+    await self.validate_action_for_split_and_double()
 
     amount = self.game_player.bet
     updated_game_player = await GamePlayer.get_motor_collection().find_one_and_update(
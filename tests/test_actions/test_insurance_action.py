@@ -76,6 +76,25 @@ async def test_insurance_action_with_insufficient_funds(socket_client):
     await socket_client.disconnect()
 
 
+@pytest.mark.asyncio
+async def test_insurance_is_checked_against_the_wallet_balance(betting_manager):
+    await betting_manager.charge_user(10, 1)
+    game_player: GamePlayer = await GamePlayer.find_one(GamePlayer.seat_number == 1)
+    # the seat deposit still covers the insurance, the balance left for the user does not
+    await redis_cache.set_user_balance_in_cache(
+        game_player.user_id, game_player.merchant, 4
+    )
+    card_manager = EuropeanCardsManager(TEST_SESSION_DATA, TEST_ROUND_ID)
+    await get_round_and_finish_betting_time()
+    await scan_multiple_cards(["14S", "1AH", "19C"], card_manager)
+    dispatch_manager = DispatchActionManager(
+        TEST_SESSION_DATA, TEST_ROUND_ID, "test_sid", "insurance", 1
+    )
+    with pytest.raises(ValidationError) as error:
+        await dispatch_manager.make_insurance(value=True)
+    assert str(error.value) == "Not enough fund to make insurance"
+
+
 @pytest.mark.asyncio
 async def test_insurance_action_when_insurance_time_is_over(betting_manager):
     await betting_manager.charge_user(10, 1)
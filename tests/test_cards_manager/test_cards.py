@@ -1,5 +1,6 @@
 import pytest
 
+from apps.config import settings
 from apps.connections import redis_cache
 from apps.game.cards.actions_card_manager import ActionCardManager
 from apps.game.documents import GamePlayer, GameRound
@@ -473,3 +474,26 @@ async def test_dealing_card_when_player_is_making_decision(betting_manager):
     with pytest.raises(ValidationError) as error:
         await action_card_manager.scan_card("15C")
         assert str(error) == "Can not scan card when player is making a decision"
+
+
+@pytest.mark.asyncio
+async def test_dealing_cards_resolves_side_bets(betting_manager):
+    await betting_manager.charge_user(10, 1)
+    await betting_manager.charge_user(10, 1, "bet_perfect_pair")
+    await betting_manager.charge_user(10, 1, "bet_21_3")
+    await betting_manager.charge_user(10, 3)
+    await betting_manager.charge_user(10, 3, "bet_perfect_pair")
+    await get_round_and_finish_betting_time()
+    user_session_data = await redis_cache.redis_cache.hgetall("test_sid")
+    card_manager = EuropeanCardsManager(user_session_data, TEST_ROUND_ID)
+    await scan_multiple_cards(["17H", "1KS", "19H", "27H", "2QS"], card_manager)
+    game_player: GamePlayer = await GamePlayer.find_one(GamePlayer.seat_number == 1)
+    second_game_player: GamePlayer = await GamePlayer.find_one(
+        GamePlayer.seat_number == 3
+    )
+    assert game_player.bet_perfect_pair_combination == "PERFECT PAIR"
+    assert game_player.bet_perfect_pair_winning == 10 * settings.PP_MULTIPLIER
+    assert game_player.bet_21_3_combination == "FLUSH"
+    assert game_player.bet_21_3_winning == 10 * settings.F_MULTIPLIER
+    assert second_game_player.bet_perfect_pair_combination is None
+    assert second_game_player.bet_perfect_pair_winning == 0
@@ -1,8 +1,22 @@
 import pytest
-from apps.game.documents import GamePlayer
+from apps.connections import redis_cache
+from apps.game.documents import GamePlayer, GameRound
+from apps.game.cards.cards_manager import EuropeanCardsManager
+from apps.game.services.connect_manager import ConnectManager
+from apps.game.services.timeout_registry import get_timeout_key
 import asyncio
 
-from .helpers import get_players, base_helper
+from .helpers import (
+    TEST_GAME_ID,
+    TEST_ROUND_ID,
+    TEST_SESSION_DATA,
+    base_helper,
+    base_listener,
+    connect_socket,
+    get_players,
+    mock_check_if_user_can_connect,
+    scan_multiple_cards,
+)
 
 
 @pytest.mark.asyncio
@@ -29,3 +43,48 @@ async def test_player_disconnect(base_client):
     game_player_2 = await GamePlayer.find_one({"seat_number": 3})
     assert game_player_1.is_active is False
     assert game_player_2.is_active is False
+
+
+@pytest.mark.asyncio
+async def test_player_disconnect_after_reconnect_registers_timeout(monkeypatch):
+    monkeypatch.setattr(
+        ConnectManager, "_check_if_user_can_connect", mock_check_if_user_can_connect
+    )
+    _, client = await connect_socket(TEST_GAME_ID, "test_sid")
+    await base_helper(
+        client,
+        "bet_status",
+        "place_bet",
+        {"amount": 10, "bet_type": "bet", "seat_number": 1},
+    )
+    card_manager = EuropeanCardsManager(TEST_SESSION_DATA, TEST_ROUND_ID)
+    game_round = await GameRound.find_one({})
+    game_round.start_timestamp = int(game_round.start_timestamp) - 20
+    await game_round.save()
+    await base_listener(
+        scan_multiple_cards,
+        "make_decision",
+        client,
+        ["12C", "14C", "15S"],
+        card_manager,
+    )
+    game_player = await GamePlayer.find_one({"seat_number": 1})
+    timeout_key = get_timeout_key(str(game_player.id))
+
+    await client.disconnect()
+    await asyncio.sleep(0.5)
+    game_player = await GamePlayer.find_one({"seat_number": 1})
+    assert game_player.inactivity_check_time == game_player.decision_time
+    assert await redis_cache.redis_cache.exists(timeout_key)
+
+    _, client = await connect_socket(TEST_GAME_ID, "test_sid")
+    game_player = await GamePlayer.find_one({"seat_number": 1})
+    assert game_player.inactivity_check_time == 0
+    assert not await redis_cache.redis_cache.exists(timeout_key)
+
+    await client.disconnect()
+    await asyncio.sleep(0.5)
+    game_player = await GamePlayer.find_one({"seat_number": 1})
+    assert game_player.is_active is False
+    assert game_player.inactivity_check_time == game_player.decision_time
+    assert await redis_cache.redis_cache.exists(timeout_key)
@@ -0,0 +1,139 @@
+import logging
+from types import SimpleNamespace
+
+import pytest
+import redis
+
+from apps import instrumentation
+from apps.config import settings
+from apps.connections import redis_cache
+from apps.instrumentation import (
+    CommandMonitor,
+    MonitoredSyncRedis,
+    command_count,
+    get_query_shape,
+    push_worker_metrics,
+    render_worker_metrics,
+    slow_command_count,
+)
+
+CALL_SITE = "tests.test_instrumentation"
+
+
+@pytest.fixture()
+def clean_counters(monkeypatch):
+    monkeypatch.setattr(instrumentation, "CALL_SITE_PACKAGES", ("apps.", "tests."))
+    for counter in instrumentation.WORKER_COUNTERS:
+        counter.clear()
+    yield
+    for counter in instrumentation.WORKER_COUNTERS:
+        counter.clear()
+
+
+def delete_worker_metrics(client: redis.Redis):
+    client.delete(
+        *[
+            instrumentation.WORKER_METRICS_KEY.format(counter.name)
+            for counter in instrumentation.WORKER_COUNTERS
+        ]
+    )
+
+
+def get_counts(backend: str, command: str) -> dict:
+    return {
+        labels[2]: value
+        for labels, value in command_count._values.items()
+        if labels[:2] == (backend, command)
+    }
+
+
+def test_query_shape_masks_values():
+    command = {
+        "findAndModify": "GamePlayer",
+        "query": {"_id": "id", "seat_number": {"$in": [1, 3]}},
+        "update": {"$push": {"cards": "A♠"}},
+        "lsid": {"id": "session"},
+    }
+    assert get_query_shape(command) == {
+        "findAndModify": "?",
+        "query": {"_id": "?", "seat_number": {"$in": ["?"]}},
+        "update": {"$push": {"cards": "?"}},
+    }
+    assert instrumentation.get_key_shape("6166a1:seats") == "*:seats"
+
+
+def test_command_monitor_records_mongo_commands_by_call_site(
+    clean_counters, monkeypatch, caplog
+):
+    monkeypatch.setattr(settings, "SLOW_COMMAND_SECONDS", 0.01)
+    monitor = CommandMonitor()
+
+    def send(request_id: int, duration_micros: int):
+        event = SimpleNamespace(
+            connection_id=("localhost", 27017),
+            request_id=request_id,
+            command_name="find",
+            command={"find": "GameRound", "filter": {"game_id": "game"}},
+            duration_micros=duration_micros,
+        )
+        monitor.started(event)
+        monitor.succeeded(event)
+
+    with caplog.at_level(logging.WARNING, logger="apps.instrumentation"):
+        send(1, 500)
+        send(2, 20_000)
+    [call_site] = get_counts("mongo", "find")
+    assert call_site.startswith(f"{CALL_SITE}.send:")
+    assert get_counts("mongo", "find") == {call_site: 2}
+    assert slow_command_count.get("mongo", "find", call_site) == 1
+    assert "Slow mongo find 20.0ms" in caplog.text
+    assert "{'find': '?', 'filter': {'game_id': '?'}}" in caplog.text
+    assert monitor._started == {}
+
+
+def test_sync_redis_counts_commands_and_pushes_them(clean_counters):
+    client = MonitoredSyncRedis.from_url(
+        settings.REDIS_CACHE_URL, decode_responses=True
+    )
+    delete_worker_metrics(client)
+    client.set("instrumentation:key", 1)
+    client.get("instrumentation:key")
+    client.pipeline().get("instrumentation:key").execute()
+    [call_site] = get_counts("redis", "get")
+    assert call_site.startswith(
+        f"{CALL_SITE}.test_sync_redis_counts_commands_and_pushes_them:"
+    )
+    assert get_counts("redis", "pipeline") != {}
+
+    push_worker_metrics(client)
+    assert command_count._values == {}
+    stored = redis.Redis.hgetall(client, "metrics:celery:db_commands_total")
+    assert stored[f"redis\tget\t{call_site}"] == "1"
+    delete_worker_metrics(client)
+    client.delete("instrumentation:key")
+
+
+@pytest.mark.asyncio
+async def test_async_redis_counts_commands_by_call_site(clean_counters):
+    async def get_seats():
+        return await redis_cache.get("instrumentation:seats")
+
+    await get_seats()
+    [call_site] = get_counts("redis", "get")
+    assert call_site.startswith(f"{CALL_SITE}.get_seats:")
+
+
+@pytest.mark.asyncio
+async def test_metrics_route_renders_worker_counters(client, clean_counters):
+    sync_client = redis.Redis.from_url(settings.REDIS_CACHE_URL, decode_responses=True)
+    instrumentation.command_count.inc(3, "mongo", "find", "apps.game.tasks.pay:1")
+    push_worker_metrics(sync_client)
+    assert "celery_db_commands_total" in await render_worker_metrics(
+        redis_cache.redis_cache
+    )
+    response = await client.get("/metrics")
+    assert (
+        'celery_db_commands_total{backend="mongo",command="find",'
+        'call_site="apps.game.tasks.pay:1"} 3.0'
+    ) in response.text
+    delete_worker_metrics(sync_client)
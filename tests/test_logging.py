@@ -0,0 +1,129 @@
+import json
+import logging
+import queue
+from types import SimpleNamespace
+
+import pytest
+
+from apps import celery_utils
+from apps import logging as app_logging
+from apps.config import settings
+from apps.game.services.utils import log_event
+from apps.logging import (
+    ContextFilter,
+    JsonFormatter,
+    NonBlockingQueueHandler,
+    SamplingFilter,
+    bind_log_context,
+    get_log_context,
+    log_context,
+)
+
+
+def make_record(message: str = "message", level: int = logging.INFO, **extra):
+    record = logging.LogRecord("test", level, __file__, 1, message, None, None)
+    for key, value in extra.items():
+        setattr(record, key, value)
+    return record
+
+
+def test_json_formatter_adds_extra_and_context():
+    token = bind_log_context(round_id="round", game_id=None)
+    record = make_record("bet of %s", data={"amount": 10})
+    record.args = (10,)
+    ContextFilter().filter(record)
+    log_context.reset(token)
+    line = json.loads(JsonFormatter().format(record))
+    assert line["message"] == "bet of 10"
+    assert line["level"] == "INFO"
+    assert line["round_id"] == "round"
+    assert line["data"] == {"amount": 10}
+    assert "game_id" not in line
+
+
+def test_sampling_keeps_or_drops_whole_rounds():
+    sampling = SamplingFilter({"scan_card": 0.5, "engineio.server": 0})
+    kept = {
+        round_id: sampling.filter(make_record(event="scan_card", round_id=round_id))
+        for round_id in map(str, range(100))
+    }
+    assert 0 < sum(kept.values()) < 100
+    for round_id, is_kept in kept.items():
+        assert sampling.filter(make_record(event="scan_card", round_id=round_id)) is (
+            is_kept
+        )
+    engineio_record = make_record()
+    engineio_record.name = "engineio.server"
+    assert not sampling.filter(engineio_record)
+    engineio_record.levelno = logging.WARNING
+    assert sampling.filter(engineio_record)
+    assert sampling.filter(make_record(event="make_action"))
+
+
+def test_queue_handler_drops_records_when_the_queue_is_full():
+    app_logging.dropped_records.clear()
+    handler = NonBlockingQueueHandler(queue.Queue(1))
+    for _ in range(3):
+        handler.handle(make_record())
+    assert handler.queue.qsize() == 1
+    assert app_logging.dropped_records.get() == 2
+
+
+def test_configure_logging_writes_json_lines(tmp_path, monkeypatch):
+    log_file = tmp_path / "blackjack.log"
+    monkeypatch.setattr(settings, "LOG_FILE", str(log_file))
+    root = logging.getLogger()
+    level = root.level
+    app_logging.configure_logging()
+    try:
+        token = bind_log_context(event="make_action", round_id="round")
+        logging.getLogger("player_actions").info("make_action")
+        log_context.reset(token)
+        try:
+            raise KeyError("card")
+        except KeyError:
+            logging.getLogger("player_actions").exception("failed")
+    finally:
+        app_logging.stop_logging()
+        for handler in list(root.handlers):
+            if isinstance(handler, NonBlockingQueueHandler):
+                root.removeHandler(handler)
+        root.setLevel(level)
+    first, second = [json.loads(line) for line in log_file.read_text().splitlines()]
+    assert first["message"] == "make_action"
+    assert first["round_id"] == "round"
+    assert "round_id" not in second
+    assert "KeyError: 'card'" in second["exception"]
+
+
+@pytest.mark.asyncio
+async def test_log_event_binds_the_round_of_the_event(caplog):
+    contexts = []
+
+    @log_event
+    async def action_cards(sid, data):
+        contexts.append(get_log_context())
+
+    with caplog.at_level(logging.INFO, logger="player_actions"):
+        await action_cards("sid", {"round_id": "round", "card": "A♠"})
+    assert contexts == [{"event": "action_cards", "sid": "sid", "round_id": "round"}]
+    assert get_log_context() == {}
+    [record] = caplog.records
+    assert record.data == {"round_id": "round", "card": "A♠"}
+
+
+def test_log_context_goes_with_celery_tasks():
+    token = bind_log_context(event="dealer_cards", round_id="round")
+    headers = {}
+    celery_utils.send_log_context(headers=headers)
+    log_context.reset(token)
+    assert headers == {"log_context": {"event": "dealer_cards", "round_id": "round"}}
+
+    task = SimpleNamespace(
+        name="apps.game.tasks.pay_winnings",
+        request=SimpleNamespace(log_context=headers["log_context"]),
+    )
+    celery_utils.bind_task_log_context(task=task)
+    assert get_log_context() == {"event": "pay_winnings", "round_id": "round"}
+    celery_utils.reset_task_log_context()
+    assert get_log_context() == {}
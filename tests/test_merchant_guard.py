@@ -0,0 +1,70 @@
+import pytest
+
+from apps.config import settings
+from apps.game.services.custom_exception import MerchantUnavailable
+from apps.game.services.merchant_guard import MerchantGuard
+
+SLOW_MERCHANT = "http://slow-merchant/api/bet/"
+HEALTHY_MERCHANT = "http://healthy-merchant/api/bet/"
+
+
+def send(merchant_guard: MerchantGuard, url: str, ok: bool, latency: float = 0.01):
+    host_guard = merchant_guard.get(url)
+    host_guard.acquire()
+    host_guard.release(latency, ok)
+
+
+def test_circuit_opens_after_consecutive_failures():
+    merchant_guard = MerchantGuard()
+    for _ in range(settings.MERCHANT_BREAKER_FAILURES):
+        send(merchant_guard, SLOW_MERCHANT, ok=False)
+
+    with pytest.raises(MerchantUnavailable):
+        send(merchant_guard, SLOW_MERCHANT, ok=True)
+    send(merchant_guard, HEALTHY_MERCHANT, ok=True)
+
+    stats = merchant_guard.get_stats()
+    assert stats["slow-merchant"]["state"] == "open"
+    assert stats["slow-merchant"]["transitions"] == {"closed->open": 1}
+    assert stats["slow-merchant"]["rejected"] == 1
+    assert stats["healthy-merchant"]["state"] == "closed"
+
+
+def test_half_open_probe_closes_the_circuit(monkeypatch):
+    monkeypatch.setattr(settings, "MERCHANT_BREAKER_COOLDOWN", 0)
+    merchant_guard = MerchantGuard()
+    for _ in range(settings.MERCHANT_BREAKER_FAILURES):
+        send(merchant_guard, SLOW_MERCHANT, ok=False)
+
+    host_guard = merchant_guard.get(SLOW_MERCHANT)
+    host_guard.acquire()
+    assert host_guard.state == "half_open"
+    with pytest.raises(MerchantUnavailable):
+        host_guard.acquire()
+    host_guard.release(0.01, ok=True)
+
+    assert host_guard.get_stats()["transitions"] == {
+        "closed->open": 1,
+        "open->half_open": 1,
+        "half_open->closed": 1,
+    }
+
+
+def test_concurrency_limit_follows_latency(monkeypatch):
+    monkeypatch.setattr(settings, "MERCHANT_CONCURRENCY_INITIAL", 4)
+    merchant_guard = MerchantGuard()
+    host_guard = merchant_guard.get(SLOW_MERCHANT)
+
+    send(merchant_guard, SLOW_MERCHANT, ok=True, latency=10)
+    assert host_guard.get_stats()["limit"] == 2
+
+    for _ in range(2):
+        host_guard.acquire()
+    with pytest.raises(MerchantUnavailable):
+        host_guard.acquire()
+    for _ in range(2):
+        host_guard.release(0.01, ok=True)
+
+    for _ in range(10):
+        send(merchant_guard, SLOW_MERCHANT, ok=True)
+    assert host_guard.get_stats()["limit"] > 2
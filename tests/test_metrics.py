@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+from apps import metrics
+from apps.game.services.utils import track_latency
+
+
+@pytest.fixture()
+def clean_metrics():
+    metrics.registry.clear()
+    yield
+    metrics.registry.clear()
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = metrics.Histogram("test_seconds", "Test.", ["event"], buckets=[0.1, 1])
+    histogram.observe(0.05, "bet")
+    histogram.observe(0.5, "bet")
+    histogram.observe(5, "bet")
+    assert histogram.render() == [
+        "# HELP test_seconds Test.",
+        "# TYPE test_seconds histogram",
+        'test_seconds_bucket{event="bet",le="0.1"} 1',
+        'test_seconds_bucket{event="bet",le="1"} 2',
+        'test_seconds_bucket{event="bet",le="+Inf"} 3',
+        'test_seconds_sum{event="bet"} 5.55',
+        'test_seconds_count{event="bet"} 3',
+    ]
+
+
+@pytest.mark.asyncio
+async def test_track_latency_records_spans_of_the_event(clean_metrics):
+    @track_latency
+    async def place_bet(sid, data):
+        with metrics.span("redis"):
+            await asyncio.sleep(0.01)
+        metrics.add_span("mongo", 0.02)
+        metrics.add_span("http", 0.03)
+
+    await place_bet("sid", {})
+    assert metrics.event_timings.get() is None
+    assert metrics.event_duration.get_count("place_bet") == 1
+    assert metrics.event_duration.get_sum("place_bet") >= 0.01
+    component_duration = metrics.event_component_duration
+    assert component_duration.get_sum("place_bet", "redis") >= 0.01
+    assert component_duration.get_sum("place_bet", "mongo") == 0.02
+    assert component_duration.get_sum("place_bet", "http") == 0.03
+    assert component_duration.get_sum("place_bet", "emit") == 0
+    # spans outside of an event are not recorded
+    metrics.add_span("mongo", 1)
+    assert component_duration.get_sum("place_bet", "mongo") == 0.02
+
+
+@pytest.mark.asyncio
+async def test_track_latency_records_failed_events(clean_metrics):
+    @track_latency
+    async def scan_card(sid, data):
+        raise KeyError("card")
+
+    with pytest.raises(KeyError):
+        await scan_card("sid", {})
+    assert metrics.event_duration.get_count("scan_card") == 1
+
+
+@pytest.mark.asyncio
+async def test_metrics_route(client, clean_metrics):
+    metrics.event_duration.observe(0.003, "make_action")
+    response = await client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'socket_event_duration_seconds_count{event="make_action"} 1' in response.text
@@ -0,0 +1,255 @@
+import time
+
+import pytest
+import redis
+import requests
+
+from apps.config import settings
+from apps.game import tasks
+from apps.game.services.merchant_guard import merchant_guard
+from apps.game.services.outbox import (
+    OUTBOX_COLLECTION,
+    OutboxDispatcher,
+    generate_transaction,
+    generate_win_transaction,
+    get_dispatch_slot_key,
+    get_enqueue_operations,
+    get_partition,
+)
+from apps.game.services.wallet_ledger import get_external_id
+from apps.game.tasks import db
+from tests.helpers import MockResponse, mock_bad_request, mock_request
+
+BET_URL = "http://testurl/bet/"
+WIN_URL = "http://testurl/win/"
+
+
+@pytest.fixture(autouse=True)
+def outbox():
+    db[OUTBOX_COLLECTION].drop()
+    merchant_guard.reset()
+    yield db[OUTBOX_COLLECTION]
+    merchant_guard.reset()
+
+
+def enqueue(count: int, users: int = 1) -> list:
+    transactions = [
+        generate_transaction(
+            "bet",
+            BET_URL,
+            {"external_id": f"bet-{index}", "amount": 10},
+            {
+                "_id": f"player-{index}",
+                "user_id": f"user-{index % users}",
+                "merchant": "m",
+            },
+            f"bet-{index}",
+            10,
+        )
+        for index in range(count)
+    ]
+    db[OUTBOX_COLLECTION].bulk_write(get_enqueue_operations(transactions))
+    return transactions
+
+
+def get_recording_handlers(handled: list) -> dict:
+    return {"bet": lambda transaction, data: handled.append(transaction["_id"])}
+
+
+def test_claims_of_a_crashed_dispatcher_are_sent_once(monkeypatch, outbox):
+    monkeypatch.setattr(requests, "post", mock_request)
+    monkeypatch.setattr(settings, "OUTBOX_LEASE_SECONDS", 0.2)
+    enqueue(3)
+    handled = []
+
+    crashed = OutboxDispatcher(db, get_recording_handlers(handled))
+    assert len(crashed.claim()) == 3
+
+    recovering = OutboxDispatcher(db, get_recording_handlers(handled))
+    assert recovering.drain()["claimed"] == 0
+    time.sleep(0.3)
+    assert recovering.drain()["sent"] == 3
+    assert recovering.drain()["sent"] == 3
+
+    assert sorted(handled) == ["bet-0", "bet-1", "bet-2"]
+    assert outbox.count_documents({"status": "sent"}) == 3
+
+
+def test_enqueuing_a_transaction_twice_sends_it_once(monkeypatch, outbox):
+    monkeypatch.setattr(requests, "post", mock_request)
+    enqueue(2)
+    enqueue(2)
+    handled = []
+
+    OutboxDispatcher(db, get_recording_handlers(handled)).drain()
+
+    assert outbox.count_documents({}) == 2
+    assert sorted(handled) == ["bet-0", "bet-1"]
+
+
+def test_failed_transactions_back_off(monkeypatch, outbox):
+    monkeypatch.setattr(
+        requests, "post", lambda *_, **kwargs: MockResponse(500, "Failed")
+    )
+    monkeypatch.setattr(settings, "OUTBOX_MAX_ATTEMPTS", 2)
+    enqueue(1)
+    handled = []
+    dispatcher = OutboxDispatcher(
+        db, {"bet": lambda transaction, data: handled.append(data["status"])}
+    )
+
+    dispatcher.drain()
+    transaction = outbox.find_one("bet-0")
+    assert transaction["status"] == "pending"
+    assert transaction["attempts"] == 1
+    assert transaction["next_attempt_at"] > time.time()
+    assert dispatcher.drain()["claimed"] == 1
+    assert 0 < dispatcher.get_next_attempt_in() <= settings.OUTBOX_BACKOFF_BASE
+
+    outbox.update_one({"_id": "bet-0"}, {"$set": {"next_attempt_at": 0}})
+    dispatcher.drain()
+    transaction = outbox.find_one("bet-0")
+    assert transaction["status"] == "failed"
+    assert transaction["attempts"] == 2
+    # the handler hears about the transaction once, when it fails for good
+    assert handled == ["failed"]
+
+
+def test_partitioned_dispatchers_split_the_transactions(monkeypatch, outbox):
+    monkeypatch.setattr(requests, "post", mock_request)
+    transactions = enqueue(40, users=10)
+    handled = []
+    half = settings.OUTBOX_PARTITIONS // 2
+    first = OutboxDispatcher(db, get_recording_handlers(handled), list(range(half)))
+    second = OutboxDispatcher(
+        db,
+        get_recording_handlers(handled),
+        list(range(half, settings.OUTBOX_PARTITIONS)),
+    )
+
+    first.drain()
+    second.drain()
+
+    assert sorted(handled) == sorted(transaction["_id"] for transaction in transactions)
+    assert first.stats["sent"] == sum(
+        get_partition(transaction["game_player"]) < half for transaction in transactions
+    )
+
+
+def test_win_waits_for_its_bet_and_is_skipped_when_the_bet_is_rejected(
+    monkeypatch, outbox
+):
+    monkeypatch.setattr(requests, "post", mock_bad_request)
+    game_player = {
+        "_id": "player-0",
+        "user_id": "user-0",
+        "merchant": "m",
+        "user_token": "token",
+        "game_id": "game",
+        "game_round": "round",
+        "bet": 10,
+        "external_ids": {},
+    }
+    bet_id = get_external_id(game_player["_id"], "bet")
+    bet = generate_transaction("bet", BET_URL, {}, game_player, bet_id, 10)
+    win = generate_win_transaction(WIN_URL, game_player, 20, {}, "snake")
+    assert win["depends_on"] == bet_id
+    outbox.bulk_write(get_enqueue_operations([win, bet]))
+    handled = []
+    dispatcher = OutboxDispatcher(
+        db,
+        {
+            "bet": lambda transaction, data: handled.append(transaction["type"]),
+            "win": lambda transaction, data: handled.append(data["status"]),
+        },
+    )
+
+    dispatcher.drain()
+    assert outbox.find_one(win["_id"])["status"] == "pending"
+    outbox.update_one({"_id": win["_id"]}, {"$set": {"next_attempt_at": 0}})
+    dispatcher.drain()
+
+    assert handled == ["bet", "skipped"]
+    assert outbox.find_one(win["_id"])["status"] == "skipped"
+
+
+def test_transactions_waiting_for_a_retried_dependency_keep_their_attempts(
+    monkeypatch, outbox
+):
+    monkeypatch.setattr(
+        requests, "post", lambda *_, **kwargs: MockResponse(500, "Failed")
+    )
+    # every attempt of the bet reaches the merchant
+    monkeypatch.setattr(settings, "MERCHANT_BREAKER_FAILURES", 100)
+    bet, cancel = enqueue(2)
+    outbox.update_one({"_id": cancel["_id"]}, {"$set": {"depends_on": bet["_id"]}})
+    dispatcher = OutboxDispatcher(db, get_recording_handlers([]))
+
+    for _ in range(settings.OUTBOX_MAX_ATTEMPTS - 1):
+        outbox.update_many({}, {"$set": {"next_attempt_at": 0}})
+        dispatcher.drain()
+
+    waiting = outbox.find_one(cancel["_id"])
+    assert waiting["status"] == "pending"
+    assert waiting["attempts"] == 0
+    assert (
+        waiting["next_attempt_at"]
+        <= time.time() + settings.OUTBOX_DEPENDENCY_WAIT_SECONDS
+    )
+    assert outbox.find_one(bet["_id"])["attempts"] == settings.OUTBOX_MAX_ATTEMPTS - 1
+    assert dispatcher.stats["waiting"] == settings.OUTBOX_MAX_ATTEMPTS - 1
+
+
+def test_transactions_held_back_by_the_merchant_guard_keep_their_attempts(
+    monkeypatch, outbox
+):
+    monkeypatch.setattr(requests, "post", mock_request)
+    transactions = enqueue(5)
+    host_guard = merchant_guard.get(BET_URL)
+    host_guard.limit = settings.MERCHANT_CONCURRENCY_MIN
+    handled = []
+    dispatcher = OutboxDispatcher(db, get_recording_handlers(handled))
+
+    dispatcher.dispatch()
+    assert dispatcher.stats["sent"] == settings.MERCHANT_CONCURRENCY_MIN
+    assert dispatcher.stats["retried"] == 0
+    dispatcher.drain()
+    assert sorted(handled) == sorted(transaction["_id"] for transaction in transactions)
+
+    # an open breaker turns the requests down before they reach the merchant
+    enqueue(7)
+    host_guard.state = "open"
+    host_guard.opened_at = time.monotonic()
+    dispatcher.drain()
+    held = outbox.find_one("bet-6")
+    assert held["status"] == "pending"
+    assert held["attempts"] == 0
+    assert dispatcher.stats["retried"] == 0
+    assert outbox.count_documents({"attempts": {"$gt": 0}}) == 0
+
+
+def test_enqueues_during_an_outage_keep_a_single_dispatch_chain(monkeypatch, outbox):
+    monkeypatch.setattr(
+        requests, "post", lambda *_, **kwargs: MockResponse(500, "Failed")
+    )
+    client = redis.Redis.from_url(settings.REDIS_CACHE_URL, decode_responses=True)
+    client.delete(get_dispatch_slot_key(None))
+    monkeypatch.setattr(tasks, "r", client)
+    scheduled = []
+    monkeypatch.setattr(
+        tasks.dispatch_outbox,
+        "apply_async",
+        lambda args, countdown: scheduled.append(args),
+    )
+
+    for count in range(1, 4):
+        enqueue(count)
+        tasks.dispatch_outbox()
+    assert len(scheduled) == 1
+
+    # the scheduled run comes back for the next retry
+    outbox.update_many({}, {"$set": {"next_attempt_at": 0}})
+    tasks.dispatch_outbox(*scheduled[0])
+    assert len(scheduled) == 2
+    assert scheduled[1][1] != scheduled[0][1]
+    client.delete(get_dispatch_slot_key(None))
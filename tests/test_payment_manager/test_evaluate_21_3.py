@@ -1,7 +1,7 @@
 import pytest
 
-from apps.game.documents import GamePlayer, GameRound
-from apps.game.services.payment_manager import PaymentManager
+from apps.game.cards.side_bets import generate_player_card_update
+from apps.game.documents import GamePlayer
 from apps.config import settings
 from tests.helpers import TEST_GAME_ID
 
@@ -10,15 +10,12 @@ from tests.helpers import TEST_GAME_ID
 async def test_evaluate_game_player_suited_trips(betting_manager):
     await betting_manager.charge_user(amount=10, seat_number=1, bet_type="bet")
     await betting_manager.charge_user(amount=10, seat_number=1, bet_type="bet_21_3")
-    game_player = await GamePlayer.get_motor_collection().find_one_and_update(
-        {"game_id": TEST_GAME_ID},
-        {"$set": {"cards": ["1AC", "2AC"]}},
-        return_document=True,
+    await GamePlayer.get_motor_collection().update_one(
+        {"game_id": TEST_GAME_ID}, {"$set": {"cards": ["1AC"]}}
+    )
+    await GamePlayer.get_motor_collection().update_one(
+        {"game_id": TEST_GAME_ID}, generate_player_card_update("2AC", ["3AC"])
     )
-    game_round = await GameRound.find_one(GameRound.game_id == TEST_GAME_ID)
-    game_round.dealer_cards = ["3AC"]
-
-    await PaymentManager.evaluate_bet_21_3(game_player, game_round)
     game_player: GamePlayer = await GamePlayer.find_one(
         GamePlayer.game_id == TEST_GAME_ID
     )
@@ -30,15 +27,12 @@ async def test_evaluate_game_player_suited_trips(betting_manager):
 async def test_evaluate_game_player_straight_flush(betting_manager):
     await betting_manager.charge_user(amount=10, seat_number=1, bet_type="bet")
     await betting_manager.charge_user(amount=10, seat_number=1, bet_type="bet_21_3")
-    game_player = await GamePlayer.get_motor_collection().find_one_and_update(
-        {"game_id": TEST_GAME_ID},
-        {"$set": {"cards": ["1AC", "2KC"]}},
-        return_document=True,
+    await GamePlayer.get_motor_collection().update_one(
+        {"game_id": TEST_GAME_ID}, {"$set": {"cards": ["1AC"]}}
+    )
+    await GamePlayer.get_motor_collection().update_one(
+        {"game_id": TEST_GAME_ID}, generate_player_card_update("2KC", ["3QC"])
     )
-    game_round = await GameRound.find_one(GameRound.game_id == TEST_GAME_ID)
-    game_round.dealer_cards = ["3QC"]
-
-    await PaymentManager.evaluate_bet_21_3(game_player, game_round)
     game_player: GamePlayer = await GamePlayer.find_one(
         GamePlayer.game_id == TEST_GAME_ID
     )
@@ -50,15 +44,12 @@ async def test_evaluate_game_player_straight_flush(betting_manager):
 async def test_evaluate_game_player_low_straight_flush(betting_manager):
     await betting_manager.charge_user(amount=10, seat_number=1, bet_type="bet")
     await betting_manager.charge_user(amount=10, seat_number=1, bet_type="bet_21_3")
-    game_player = await GamePlayer.get_motor_collection().find_one_and_update(
-        {"game_id": TEST_GAME_ID},
-        {"$set": {"cards": ["1AC", "22C"]}},
-        return_document=True,
+    await GamePlayer.get_motor_collection().update_one(
+        {"game_id": TEST_GAME_ID}, {"$set": {"cards": ["1AC"]}}
+    )
+    await GamePlayer.get_motor_collection().update_one(
+        {"game_id": TEST_GAME_ID}, generate_player_card_update("22C", ["33C"])
     )
-    game_round = await GameRound.find_one(GameRound.game_id == TEST_GAME_ID)
-    game_round.dealer_cards = ["33C"]
-
-    await PaymentManager.evaluate_bet_21_3(game_player, game_round)
     game_player: GamePlayer = await GamePlayer.find_one(
         GamePlayer.game_id == TEST_GAME_ID
     )
@@ -70,15 +61,12 @@ async def test_evaluate_game_player_low_straight_flush(betting_manager):
 async def test_evaluate_game_player_three_of_a_kind(betting_manager):
     await betting_manager.charge_user(amount=10, seat_number=1, bet_type="bet")
     await betting_manager.charge_user(amount=10, seat_number=1, bet_type="bet_21_3")
-    game_player = await GamePlayer.get_motor_collection().find_one_and_update(
-        {"game_id": TEST_GAME_ID},
-        {"$set": {"cards": ["1AD", "2AC"]}},
-        return_document=True,
+    await GamePlayer.get_motor_collection().update_one(
+        {"game_id": TEST_GAME_ID}, {"$set": {"cards": ["1AD"]}}
+    )
+    await GamePlayer.get_motor_collection().update_one(
+        {"game_id": TEST_GAME_ID}, generate_player_card_update("2AC", ["3AS"])
     )
-    game_round = await GameRound.find_one(GameRound.game_id == TEST_GAME_ID)
-    game_round.dealer_cards = ["3AS"]
-
-    await PaymentManager.evaluate_bet_21_3(game_player, game_round)
     game_player: GamePlayer = await GamePlayer.find_one(
         GamePlayer.game_id == TEST_GAME_ID
     )
@@ -90,15 +78,12 @@ async def test_evaluate_game_player_three_of_a_kind(betting_manager):
 async def test_evaluate_game_player_straight(betting_manager):
     await betting_manager.charge_user(amount=10, seat_number=1, bet_type="bet")
     await betting_manager.charge_user(amount=10, seat_number=1, bet_type="bet_21_3")
-    game_player = await GamePlayer.get_motor_collection().find_one_and_update(
-        {"game_id": TEST_GAME_ID},
-        {"$set": {"cards": ["1AD", "2KC"]}},
-        return_document=True,
+    await GamePlayer.get_motor_collection().update_one(
+        {"game_id": TEST_GAME_ID}, {"$set": {"cards": ["1AD"]}}
+    )
+    await GamePlayer.get_motor_collection().update_one(
+        {"game_id": TEST_GAME_ID}, generate_player_card_update("2KC", ["3QS"])
     )
-    game_round = await GameRound.find_one(GameRound.game_id == TEST_GAME_ID)
-    game_round.dealer_cards = ["3QS"]
-
-    await PaymentManager.evaluate_bet_21_3(game_player, game_round)
     game_player: GamePlayer = await GamePlayer.find_one(
         GamePlayer.game_id == TEST_GAME_ID
     )
@@ -110,15 +95,12 @@ async def test_evaluate_game_player_straight(betting_manager):
 async def test_evaluate_game_player_low_straight(betting_manager):
     await betting_manager.charge_user(amount=10, seat_number=1, bet_type="bet")
     await betting_manager.charge_user(amount=10, seat_number=1, bet_type="bet_21_3")
-    game_player = await GamePlayer.get_motor_collection().find_one_and_update(
-        {"game_id": TEST_GAME_ID},
-        {"$set": {"cards": ["1AD", "22C"]}},
-        return_document=True,
+    await GamePlayer.get_motor_collection().update_one(
+        {"game_id": TEST_GAME_ID}, {"$set": {"cards": ["1AD"]}}
+    )
+    await GamePlayer.get_motor_collection().update_one(
+        {"game_id": TEST_GAME_ID}, generate_player_card_update("22C", ["33S"])
     )
-    game_round = await GameRound.find_one(GameRound.game_id == TEST_GAME_ID)
-    game_round.dealer_cards = ["33S"]
-
-    await PaymentManager.evaluate_bet_21_3(game_player, game_round)
     game_player: GamePlayer = await GamePlayer.find_one(
         GamePlayer.game_id == TEST_GAME_ID
     )
@@ -130,15 +112,12 @@ async def test_evaluate_game_player_low_straight(betting_manager):
 async def test_evaluate_game_player_flush(betting_manager):
     await betting_manager.charge_user(amount=10, seat_number=1, bet_type="bet")
     await betting_manager.charge_user(amount=10, seat_number=1, bet_type="bet_21_3")
-    game_player = await GamePlayer.get_motor_collection().find_one_and_update(
-        {"game_id": TEST_GAME_ID},
-        {"$set": {"cards": ["12D", "2KD"]}},
-        return_document=True,
+    await GamePlayer.get_motor_collection().update_one(
+        {"game_id": TEST_GAME_ID}, {"$set": {"cards": ["12D"]}}
+    )
+    await GamePlayer.get_motor_collection().update_one(
+        {"game_id": TEST_GAME_ID}, generate_player_card_update("2KD", ["3QD"])
     )
-    game_round = await GameRound.find_one(GameRound.game_id == TEST_GAME_ID)
-    game_round.dealer_cards = ["3QD"]
-
-    await PaymentManager.evaluate_bet_21_3(game_player, game_round)
     game_player: GamePlayer = await GamePlayer.find_one(
         GamePlayer.game_id == TEST_GAME_ID
     )
@@ -150,15 +129,12 @@ async def test_evaluate_game_player_flush(betting_manager):
 async def test_evaluate_game_player_with_no_21_3_combination(betting_manager):
     await betting_manager.charge_user(amount=10, seat_number=1, bet_type="bet")
     await betting_manager.charge_user(amount=10, seat_number=1, bet_type="bet_21_3")
-    game_player = await GamePlayer.get_motor_collection().find_one_and_update(
-        {"game_id": TEST_GAME_ID},
-        {"$set": {"cards": ["12S", "2KC"]}},
-        return_document=True,
+    await GamePlayer.get_motor_collection().update_one(
+        {"game_id": TEST_GAME_ID}, {"$set": {"cards": ["12S"]}}
+    )
+    await GamePlayer.get_motor_collection().update_one(
+        {"game_id": TEST_GAME_ID}, generate_player_card_update("2KC", ["3QS"])
     )
-    game_round = await GameRound.find_one(GameRound.game_id == TEST_GAME_ID)
-    game_round.dealer_cards = ["3QS"]
-
-    await PaymentManager.evaluate_bet_21_3(game_player, game_round)
     game_player: GamePlayer = await GamePlayer.find_one(
         GamePlayer.game_id == TEST_GAME_ID
     )
@@ -1,7 +1,7 @@
 import pytest
 
 from apps.game.documents import GamePlayer
-from apps.game.services.payment_manager import PaymentManager
+from apps.game.cards.side_bets import generate_player_card_update
 from apps.config import settings
 from tests.helpers import TEST_GAME_ID
 
@@ -12,12 +12,12 @@ async def test_evaluate_game_player_perfect_pair(betting_manager):
     await betting_manager.charge_user(
         amount=10, seat_number=1, bet_type="bet_perfect_pair"
     )
-    game_player = await GamePlayer.get_motor_collection().find_one_and_update(
-        {"game_id": TEST_GAME_ID},
-        {"$set": {"cards": ["1AC", "2AC"]}},
-        return_document=True,
+    await GamePlayer.get_motor_collection().update_one(
+        {"game_id": TEST_GAME_ID}, {"$set": {"cards": ["1AC"]}}
+    )
+    await GamePlayer.get_motor_collection().update_one(
+        {"game_id": TEST_GAME_ID}, generate_player_card_update("2AC", ["3TD"])
     )
-    await PaymentManager.evaluate_bet_perfect_pair(game_player)
     game_player: GamePlayer = await GamePlayer.find_one(
         GamePlayer.game_id == TEST_GAME_ID
     )
@@ -35,12 +35,12 @@ async def test_evaluate_game_player_colored_pair(betting_manager):
     await betting_manager.charge_user(
         amount=10, seat_number=1, bet_type="bet_perfect_pair"
     )
-    game_player = await GamePlayer.get_motor_collection().find_one_and_update(
-        {"game_id": TEST_GAME_ID},
-        {"$set": {"cards": ["1AC", "2AS"]}},
-        return_document=True,
+    await GamePlayer.get_motor_collection().update_one(
+        {"game_id": TEST_GAME_ID}, {"$set": {"cards": ["1AC"]}}
+    )
+    await GamePlayer.get_motor_collection().update_one(
+        {"game_id": TEST_GAME_ID}, generate_player_card_update("2AS", ["3TD"])
     )
-    await PaymentManager.evaluate_bet_perfect_pair(game_player)
     game_player: GamePlayer = await GamePlayer.find_one(
         GamePlayer.game_id == TEST_GAME_ID
     )
@@ -58,12 +58,12 @@ async def test_evaluate_game_player_mixed_pair(betting_manager):
     await betting_manager.charge_user(
         amount=10, seat_number=1, bet_type="bet_perfect_pair"
     )
-    game_player = await GamePlayer.get_motor_collection().find_one_and_update(
-        {"game_id": TEST_GAME_ID},
-        {"$set": {"cards": ["1AC", "2AD"]}},
-        return_document=True,
+    await GamePlayer.get_motor_collection().update_one(
+        {"game_id": TEST_GAME_ID}, {"$set": {"cards": ["1AC"]}}
+    )
+    await GamePlayer.get_motor_collection().update_one(
+        {"game_id": TEST_GAME_ID}, generate_player_card_update("2AD", ["3TD"])
     )
-    await PaymentManager.evaluate_bet_perfect_pair(game_player)
     game_player: GamePlayer = await GamePlayer.find_one(
         GamePlayer.game_id == TEST_GAME_ID
     )
@@ -80,12 +80,12 @@ async def test_evaluate_perfect_pair_without_any_winning(betting_manager):
     await betting_manager.charge_user(
         amount=10, seat_number=1, bet_type="bet_perfect_pair"
     )
-    game_player = await GamePlayer.get_motor_collection().find_one_and_update(
-        {"game_id": TEST_GAME_ID},
-        {"$set": {"cards": ["12C", "2AD"]}},
-        return_document=True,
+    await GamePlayer.get_motor_collection().update_one(
+        {"game_id": TEST_GAME_ID}, {"$set": {"cards": ["12C"]}}
+    )
+    await GamePlayer.get_motor_collection().update_one(
+        {"game_id": TEST_GAME_ID}, generate_player_card_update("2AD", ["3TD"])
     )
-    await PaymentManager.evaluate_bet_perfect_pair(game_player)
     game_player: GamePlayer = await GamePlayer.find_one(
         GamePlayer.game_id == TEST_GAME_ID
     )
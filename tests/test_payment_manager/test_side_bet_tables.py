@@ -0,0 +1,74 @@
+import itertools
+from types import SimpleNamespace
+
+import pytest
+
+from apps.config import settings
+from apps.game.cards.side_bets import (
+    RANKS,
+    SUITS,
+    evaluate_21_3,
+    evaluate_perfect_pair,
+)
+from apps.game.documents import GamePlayer
+from apps.game.services.payment_manager import PaymentManager
+
+CARDS = [f"1{rank}{suit}" for rank in RANKS for suit in SUITS]
+
+
+class RecordingCollection:
+    """Keeps the last ``$set`` of the original evaluators instead of writing it to mongo."""
+
+    def __init__(self):
+        self.fields = None
+
+    async def find_one_and_update(self, query, update):
+        self.fields = update["$set"]
+
+
+@pytest.fixture
+def recorded_fields(monkeypatch):
+    collection = RecordingCollection()
+    monkeypatch.setattr(GamePlayer, "get_motor_collection", lambda: collection)
+    return collection
+
+
+def get_game_player(cards, **bets):
+    return {"_id": "507f1f77bcf86cd799439011", "cards": cards, **bets}
+
+
+@pytest.mark.asyncio
+async def test_perfect_pair_table_matches_original_evaluator(recorded_fields):
+    for cards in itertools.product(CARDS, repeat=2):
+        await PaymentManager.evaluate_bet_perfect_pair(
+            get_game_player(list(cards), bet_perfect_pair=1)
+        )
+        assert evaluate_perfect_pair(list(cards)) == (
+            recorded_fields.fields["bet_perfect_pair_winning"],
+            recorded_fields.fields["bet_perfect_pair_combination"],
+        )
+
+
+@pytest.mark.asyncio
+async def test_21_3_table_matches_original_evaluator(recorded_fields):
+    game_round = SimpleNamespace(dealer_cards=[])
+    for cards in itertools.product(CARDS, repeat=3):
+        game_round.dealer_cards = [cards[2]]
+        await PaymentManager.evaluate_bet_21_3(
+            get_game_player(list(cards[:2]), bet_21_3=1), game_round
+        )
+        assert evaluate_21_3(list(cards)) == (
+            recorded_fields.fields["bet_21_3_winning"],
+            recorded_fields.fields["bet_21_3_combination"],
+        )
+
+
+def test_side_bet_tables_ignore_deck_number():
+    assert evaluate_perfect_pair(["1KH", "6KH"]) == (
+        settings.PP_MULTIPLIER,
+        "PERFECT PAIR",
+    )
+    assert evaluate_21_3(["2QS", "5KS", "3AS"]) == (
+        settings.SF_MULTIPLIER,
+        "STRAIGHT FLUSH",
+    )
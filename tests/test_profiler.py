@@ -0,0 +1,104 @@
+import asyncio
+import sys
+import threading
+import time
+
+import pytest
+import redis
+from fastapi import HTTPException
+
+from apps.config import settings
+from apps.connections import redis_cache
+from apps.game.services.auth import check_admin_key
+from apps.game.services.utils import track_latency
+from apps.profiler import (
+    SamplingProfiler,
+    fold_stack,
+    listen,
+    profiler,
+    request_profile,
+    tag_code,
+)
+
+
+def settle_round(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_fold_stack_tags_the_outermost_handler():
+    def inner():
+        return fold_stack(sys._getframe())
+
+    def outer():
+        return inner()
+
+    tag_code(outer.__code__, "dealer_cards")
+    tag_code(inner.__code__, "nested")
+    stack = outer().split(";")
+    assert stack[0] == "dealer_cards"
+    assert stack[-2].startswith("outer (test_profiler.py:")
+    assert stack[-1].startswith("inner (test_profiler.py:")
+
+
+def test_track_latency_tags_the_socket_event():
+    @track_latency
+    async def scan_card(sid, data):
+        return fold_stack(sys._getframe())
+
+    assert asyncio.run(scan_card("sid", {})).startswith("scan_card;")
+
+
+def test_profiler_writes_folded_stacks_for_a_bounded_window(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "PROFILER_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "PROFILER_MAX_SECONDS", 0.2)
+    tag_code(settle_round.__code__, "task:pay_winnings")
+    stop = threading.Event()
+    worker = threading.Thread(target=settle_round, args=(stop,))
+    worker.start()
+    sampling_profiler = SamplingProfiler()
+    try:
+        assert sampling_profiler.start(60, 0.005)
+        assert not sampling_profiler.start(60, 0.005)
+        started_at = time.monotonic()
+        while sampling_profiler.is_running():
+            time.sleep(0.05)
+    finally:
+        stop.set()
+        worker.join()
+    assert time.monotonic() - started_at < 1
+    [profile] = tmp_path.iterdir()
+    stacks = dict(line.rsplit(" ", 1) for line in profile.read_text().splitlines())
+    assert any(
+        stack.startswith("task:pay_winnings;") and "settle_round" in stack
+        for stack in stacks
+    )
+    assert all(int(count) > 0 for count in stacks.values())
+
+
+def test_admin_key_is_required(monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_API_KEY", "")
+    with pytest.raises(HTTPException):
+        check_admin_key("")
+    monkeypatch.setattr(settings, "ADMIN_API_KEY", "admin")
+    with pytest.raises(HTTPException):
+        check_admin_key("merchant")
+    check_admin_key("admin")
+
+
+@pytest.mark.asyncio
+async def test_profile_request_starts_the_profiler_of_every_process(
+    tmp_path, monkeypatch
+):
+    monkeypatch.setattr(settings, "PROFILER_DIR", str(tmp_path))
+    listen(redis.Redis.from_url(settings.REDIS_CACHE_URL))
+    processes = 0
+    started_at = time.monotonic()
+    while not processes and time.monotonic() - started_at < 2:
+        processes = await request_profile(redis_cache.redis_cache, 0.05, 0.01)
+        await asyncio.sleep(0.05)
+    assert processes >= 1
+    while not list(tmp_path.iterdir()) and time.monotonic() - started_at < 2:
+        await asyncio.sleep(0.05)
+    profiler.stop()
+    assert list(tmp_path.iterdir())
@@ -149,3 +149,26 @@ async def test_set_round_start_timestamp_in_cache_when_no_data_in_db_and_cache()
     with pytest.raises(ValidationError) as error:
         await redis_cache.get_or_cache_round_start_timestamp(game_round_id)
         assert str(error) == "Can not find round with id '5349b4ddd2781d08c09890f4'"
+
+
+@pytest.mark.asyncio
+async def test_increment_user_total_bet_without_cached_total():
+    assert await redis_cache.increment_user_total_bet(TEST_ROUND_ID, "2", 10) is None
+
+
+@pytest.mark.asyncio
+async def test_increment_user_total_bet():
+    assert await redis_cache.seed_user_total_bet(TEST_ROUND_ID, "2", 10) == 10
+    assert await redis_cache.increment_user_total_bet(TEST_ROUND_ID, "2", 15) == 25
+    assert await redis_cache.increment_user_total_bet(TEST_ROUND_ID, "2", -5) == 20
+    await redis_cache.delete_total_bets(TEST_ROUND_ID)
+    assert await redis_cache.increment_user_total_bet(TEST_ROUND_ID, "2", 10) is None
+
+
+@pytest.mark.asyncio
+async def test_seed_user_total_bet_keeps_the_cached_total():
+    assert await redis_cache.seed_user_total_bet(TEST_ROUND_ID, "2", 10) == 10
+    assert await redis_cache.increment_user_total_bet(TEST_ROUND_ID, "2", 15) == 25
+    # an older aggregate does not overwrite the running total
+    assert await redis_cache.seed_user_total_bet(TEST_ROUND_ID, "2", 10) == 25
+    assert await redis_cache.increment_user_total_bet(TEST_ROUND_ID, "2", 5) == 30
@@ -1,9 +1,19 @@
-from apps.game.documents import GameRound
+from apps.game.documents import GamePlayer, GameRound
 import pytest
+import requests
 
+from apps.connections import redis_cache
+from apps.game.services.outbox import OUTBOX_COLLECTION, OutboxDispatcher
 from apps.game.services.payment_manager import ResetManager
 from apps.game.services.custom_exception import ValidationError
-from .helpers import TEST_GAME_ID
+from apps.game.services.reset_tracker import (
+    get_reset_key,
+    get_reset_stats,
+    get_rollbacks_key,
+)
+from apps.game.services.utils import get_timestamp
+from apps.game.tasks import OUTBOX_HANDLERS, db, send_bets_to_merchant
+from .helpers import TEST_GAME_ID, mock_request
 
 
 @pytest.mark.asyncio
@@ -25,3 +35,54 @@ async def test_duplicate_reset(betting_manager):
     with pytest.raises(ValidationError) as error:
         await reset_manager.reset()
         assert error == "Game is reset already"
+
+
+@pytest.mark.asyncio
+async def test_retried_reset_rolls_back_bets_once(monkeypatch, betting_manager):
+    monkeypatch.setattr(requests, "post", mock_request)
+    db[OUTBOX_COLLECTION].drop()
+    await betting_manager.charge_user(amount=20, seat_number=1)
+    game_round = await GameRound.find_one({})
+    game_round.start_timestamp = get_timestamp(-1)
+
+    await ResetManager(TEST_GAME_ID, game_round).reset()
+    # the bet which was not sent yet and its rollback
+    assert OutboxDispatcher(db, OUTBOX_HANDLERS).drain()["sent"] == 2
+    with pytest.raises(ValidationError):
+        await ResetManager(TEST_GAME_ID, game_round).reset()
+
+    rollbacks = list(db[OUTBOX_COLLECTION].find({"type": "cancel"}))
+    assert [rollback["amount"] for rollback in rollbacks] == [20]
+    # the duplicate does not track the finished rollbacks again
+    assert not await redis_cache.redis_cache.exists(
+        get_rollbacks_key(str(game_round.id)), get_reset_key(str(game_round.id))
+    )
+    game_player = await GamePlayer.get_motor_collection().find_one({})
+    assert game_player["is_reset"] is True
+    assert game_player["external_ids"]["cancel_bet"] == rollbacks[0]["_id"]
+    stats = await get_reset_stats(redis_cache.redis_cache)
+    assert stats["1"]["count"] == 1
+
+
+@pytest.mark.asyncio
+async def test_reset_before_the_bets_are_sent_rolls_back_after_the_bet(
+    monkeypatch, betting_manager
+):
+    monkeypatch.setattr(requests, "post", mock_request)
+    db[OUTBOX_COLLECTION].drop()
+    await betting_manager.charge_user(amount=20, seat_number=1)
+    game_round = await GameRound.find_one({})
+    game_round.start_timestamp = get_timestamp(-1)
+
+    await ResetManager(TEST_GAME_ID, game_round).reset()
+    send_bets_to_merchant(str(game_round.id), TEST_GAME_ID)
+    OutboxDispatcher(db, OUTBOX_HANDLERS).drain()
+
+    bet, rollback = [
+        db[OUTBOX_COLLECTION].find_one({"type": transaction_type})
+        for transaction_type in ["bet", "cancel"]
+    ]
+    assert db[OUTBOX_COLLECTION].count_documents({}) == 2
+    assert rollback["depends_on"] == bet["_id"]
+    assert bet["status"] == rollback["status"] == "sent"
+    assert bet["sent_at"] <= rollback["sent_at"]
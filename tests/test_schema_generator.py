@@ -0,0 +1,59 @@
+import inflection
+import pytest
+
+from apps.game.services.schema_generator import (
+    generate_bet_request_data,
+    generate_reset_request_data,
+    generate_win_request_data,
+    inflect_response_data,
+)
+
+GAME_PLAYER = {
+    "user_token": "token",
+    "game_id": "game",
+    "game_round": "round",
+    "external_ids": {"bet": "bet-id", "cancel_bet": "cancel-id"},
+}
+
+
+def inflect_key(schema_type: str, key: str) -> str:
+    if schema_type == "snake":
+        return key
+    camel_key = inflection.camelize(key)
+    if schema_type == "camel":
+        camel_key = camel_key[0].lower() + camel_key[1:]
+    return camel_key
+
+
+@pytest.mark.parametrize("schema_type", ["camel", "capital_camel", "snake"])
+def test_payload_keys_follow_the_schema_type(schema_type):
+    bet = generate_bet_request_data(schema_type, 10, GAME_PLAYER, "external-id")
+    win = generate_win_request_data(schema_type, 20, GAME_PLAYER, "win-id")
+    reset = generate_reset_request_data(schema_type, 10, GAME_PLAYER, "bet")
+
+    assert bet == {
+        inflect_key(schema_type, key): value
+        for key, value in {
+            "token": "token",
+            "amount": 10,
+            "currency": "USD",
+            "game_id": "game",
+            "round_id": "round",
+            "external_id": "external-id",
+            "hash": "",
+            "transaction_type": "bet",
+        }.items()
+    }
+    assert win[inflect_key(schema_type, "bet_external_id")] == "bet-id"
+    assert reset[inflect_key(schema_type, "external_id")] == "cancel-id"
+    assert reset[inflect_key(schema_type, "canceled_external_id")] == "bet-id"
+    assert inflect_response_data(bet) == inflect_response_data(
+        generate_bet_request_data("snake", 10, GAME_PLAYER, "external-id")
+    )
+
+
+def test_unknown_response_keys_are_inflected():
+    assert inflect_response_data({"totalBalance": 10, "NewKey": 1}) == {
+        "total_balance": 10,
+        "new_key": 1,
+    }
@@ -0,0 +1,110 @@
+import pytest
+
+from apps.game.cards.side_bets import generate_player_card_update
+from apps.game.documents import GamePlayer
+from apps.game.simulator.__main__ import simulate
+from apps.game.simulator.memory_mongo import MemoryDatabase
+from apps.game.simulator.memory_redis import MemoryRedis
+from apps.game.simulator.strategy import Shoe, get_decision
+from apps.game.services.wallet_ledger import CREDIT_SCRIPT, RESERVE_SCRIPT
+
+ROUNDS = 30
+PLAYERS = 3
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("game_type", ["european", "american"])
+async def test_simulator_settles_every_round(game_type):
+    document_settings = GamePlayer._document_settings
+    report = await simulate(ROUNDS, PLAYERS, game_type, seed=7)
+
+    assert report["rounds"] == ROUNDS
+    assert sum(report["outcomes"].values()) == ROUNDS * PLAYERS
+    assert report["events"]["total_winning"] == ROUNDS * PLAYERS
+    # the winnings are credited to the cached wallets
+    assert report["wallet_net"] == report["won"] - report["bet"]
+    # the documents are back on the database of the test suite
+    assert GamePlayer._document_settings is document_settings
+
+
+def test_basic_strategy_decisions():
+    assert get_decision(["1TS", "16H"], "17C") == "hit"
+    assert get_decision(["1TS", "16H"], "15D") == "stand"
+    assert get_decision(["1TS", "12H"], "13D") == "hit"
+    assert get_decision(["1TS", "12H"], "14D") == "stand"
+    assert get_decision(["1AS", "17H"], "19D") == "hit"
+    assert get_decision(["1AS", "17H"], "18D") == "stand"
+    assert get_decision(["1AS", "16H", "19C"], "1TD") == "hit"
+
+
+def test_shoe_deals_every_card_once_before_shuffling():
+    shoe = Shoe(seed=1)
+    cards = [shoe.draw() for _ in range(len(shoe.cards))]
+    assert len(set(cards)) == len(cards) == 312
+    assert shoe.needs_shuffle()
+
+
+def test_memory_collection_applies_player_card_pipeline():
+    collection = MemoryDatabase().GamePlayer
+    collection.insert_one(
+        {
+            "seat_number": 1,
+            "bet": 10,
+            "cards": ["1QS"],
+            "bet_perfect_pair": 5,
+            "bet_perfect_pair_winning": 0,
+            "bet_perfect_pair_combination": None,
+            "bet_21_3": 4,
+            "bet_21_3_winning": 0,
+            "bet_21_3_combination": None,
+        }
+    )
+
+    game_player = collection.find_one_and_update(
+        {"seat_number": 1, "bet": {"$gt": 0}},
+        generate_player_card_update("2QS", ["1QS"]),
+        return_document=True,
+    )
+
+    assert game_player["cards"] == ["1QS", "2QS"]
+    assert game_player["bet_perfect_pair_winning"] == 5 * 26
+    assert game_player["bet_perfect_pair_combination"] == "PERFECT PAIR"
+    assert game_player["bet_21_3_winning"] == 4 * 101
+    assert game_player["bet_21_3_combination"] == "SUITED TRIPS"
+
+
+def test_player_first_card_does_not_resolve_side_bets():
+    collection = MemoryDatabase().GamePlayer
+    collection.insert_one(
+        {
+            "seat_number": 1,
+            "bet": 10,
+            "cards": [],
+            "bet_perfect_pair": 5,
+            "bet_perfect_pair_winning": 0,
+            "bet_perfect_pair_combination": None,
+        }
+    )
+
+    game_player = collection.find_one_and_update(
+        {"seat_number": 1, "bet": {"$gt": 0}},
+        generate_player_card_update("1QS", []),
+        return_document=True,
+    )
+
+    assert game_player["cards"] == ["1QS"]
+    assert game_player["bet_perfect_pair_winning"] == 0
+    assert game_player["bet_perfect_pair_combination"] is None
+
+
+def test_memory_redis_runs_wallet_scripts():
+    client = MemoryRedis()
+    client.set("user:merchant", 100)
+    assert (
+        float(client.eval(RESERVE_SCRIPT, 2, "user:merchant", "pending", 30, 60)) == 70
+    )
+    assert client.eval(RESERVE_SCRIPT, 2, "user:merchant", "pending", 80, 60) is None
+    assert (
+        float(client.eval(CREDIT_SCRIPT, 2, "user:merchant", "pending", 60, 60)) == 130
+    )
+    assert float(client.get("pending")) == -30
@@ -0,0 +1,102 @@
+import dataclasses
+import logging
+
+import pytest
+from bson import ObjectId
+
+from apps.config import settings
+from apps.game.documents import GamePlayer, GameRound
+from apps.game.state import (
+    RoundState,
+    SeatState,
+    construct,
+    diff_validated,
+)
+
+SEAT_DOCUMENT = {
+    "_id": ObjectId(),
+    "sid": "test_sid",
+    "user_token": "test_token",
+    "user_id": "2",
+    "user_name": "test_user",
+    "decision_time": "0",
+    "game_id": "507f1f77bcf86cd799439011",
+    "game_round": "5349b4ddd2781d08c09890f3",
+    "merchant": "507f1f77bcf86cd799439011",
+    "deposit": 100092,
+    "seat_number": 1,
+    "cards": ["2C", "AS"],
+    "bet": 10,
+}
+
+
+def test_state_has_the_fields_of_the_documents():
+    for state_class, document_class in (
+        (SeatState, GamePlayer),
+        (RoundState, GameRound),
+    ):
+        assert {field.name for field in dataclasses.fields(state_class)} == set(
+            document_class.__fields__
+        ) - {"revision_id"}
+
+
+def test_state_is_slotted():
+    seat = SeatState.from_document(SEAT_DOCUMENT)
+    assert not hasattr(seat, "__dict__")
+    with pytest.raises(AttributeError):
+        seat.unknown = True
+
+
+def test_seat_is_mapped_from_and_to_the_document():
+    seat = SeatState.from_document(SEAT_DOCUMENT)
+    assert seat.id == SEAT_DOCUMENT["_id"]
+    assert seat.cards == ["2C", "AS"]
+    assert seat.action_list == []
+    assert seat.is_active is True
+    assert seat.last_action is None
+    document = seat.to_document()
+    assert {key: document[key] for key in SEAT_DOCUMENT} == SEAT_DOCUMENT
+    assert SeatState.from_document(document).get_fields() == seat.get_fields()
+
+
+def test_defaults_are_not_shared_between_seats():
+    first = SeatState.from_document(SEAT_DOCUMENT)
+    second = SeatState.from_document(SEAT_DOCUMENT)
+    first.action_list.append({"bet": 10})
+    assert second.action_list == []
+
+
+def test_missing_required_field_is_rejected():
+    document = dict(SEAT_DOCUMENT)
+    del document["user_token"]
+    with pytest.raises(KeyError):
+        SeatState.from_document(document)
+
+
+def test_construct_does_not_validate_the_projection():
+    document = {"_id": SEAT_DOCUMENT["_id"], "seat_number": "1", "cards": ["2C"]}
+    game_player = construct(GamePlayer, document)
+    assert game_player.id == SEAT_DOCUMENT["_id"]
+    assert game_player.seat_number == "1"
+    assert game_player.cards == ["2C"]
+    assert game_player.bet_list == []
+
+
+def test_trusted_reads_are_diffed_against_validation(monkeypatch, caplog):
+    document = {**SEAT_DOCUMENT, "seat_number": "1", "bet": "ten"}
+    diff = diff_validated(GamePlayer, document, {"id": document["_id"], **document})
+    assert set(diff) == {"seat_number", "bet"}
+    assert diff["seat_number"] == ("1", 1)
+    assert (
+        diff_validated(
+            GamePlayer, SEAT_DOCUMENT, {"id": SEAT_DOCUMENT["_id"], **SEAT_DOCUMENT}
+        )
+        == {}
+    )
+
+    monkeypatch.setattr(settings, "VALIDATE_TRUSTED_READS", True)
+    with caplog.at_level(logging.WARNING, logger="apps.game.state"):
+        construct(GamePlayer, {"_id": document["_id"], "cards": ["2C"]})
+        assert not caplog.records
+        SeatState.from_document(document)
+    assert "seat_number" in caplog.records[0].getMessage()
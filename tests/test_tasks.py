@@ -8,6 +8,7 @@ from apps.connections import redis_cache
 from apps.game.tasks import (
     send_bet_to_merchant_and_update_game_player,
     start_new_round,
+    prepare_next_round,
 )
 from tests.helpers import mock_request, mock_bad_request, TEST_GAME_ID, TEST_ROUND_ID
 
@@ -76,3 +77,35 @@ async def test_start_new_round_task():
         "insurance_timestamp": None,
         "prev_round_id": None,
     }
+
+
+@pytest.mark.asyncio
+async def test_start_new_round_activates_prepared_round():
+    prepare_next_round(TEST_GAME_ID, TEST_ROUND_ID)
+    prepared_round = await GameRound.get_motor_collection().find_one(
+        {"prev_round_id": TEST_ROUND_ID}
+    )
+    assert prepared_round["finished"] is None
+    active_round = await GameRound.find_one({"finished": False})
+    assert str(active_round.id) == TEST_ROUND_ID
+
+    start_new_round(TEST_GAME_ID, TEST_ROUND_ID)
+    previous_round = await GameRound.get(PydanticObjectId(TEST_ROUND_ID))
+    assert previous_round.finished is True
+    new_game_round: GameRound = await GameRound.find_one({"finished": False})
+    assert new_game_round.id == prepared_round["_id"]
+    assert new_game_round.round_id == prepared_round["round_id"]
+    assert new_game_round.prev_round_id == TEST_ROUND_ID
+
+
+@pytest.mark.asyncio
+async def test_start_new_round_removes_unused_prepared_round():
+    prepare_next_round(TEST_GAME_ID, TEST_ROUND_ID)
+    start_new_round(TEST_GAME_ID)
+    assert (
+        await GameRound.get_motor_collection().count_documents(
+            {"game_id": TEST_GAME_ID, "finished": None}
+        )
+        == 0
+    )
+    assert await GameRound.find({"finished": False}).count() == 1
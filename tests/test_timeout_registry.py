@@ -0,0 +1,39 @@
+import pytest
+import redis
+
+from apps.config import settings
+from apps.connections import redis_cache
+from apps.game.services.timeout_registry import (
+    cancel_timeout,
+    claim_timeout_sync,
+    get_timeout_stats,
+    register_timeout,
+)
+
+
+@pytest.mark.asyncio
+async def test_only_latest_timeout_is_claimed():
+    client = redis.Redis.from_url(settings.REDIS_CACHE_URL, decode_responses=True)
+    first_token = await register_timeout(
+        redis_cache.redis_cache, "test_game_player", "test_game", 1, 30
+    )
+    second_token = await register_timeout(
+        redis_cache.redis_cache, "test_game_player", "test_game", 2, 30
+    )
+    assert claim_timeout_sync(client, "test_game_player", first_token) is False
+    assert claim_timeout_sync(client, "test_game_player", second_token) is True
+    assert claim_timeout_sync(client, "test_game_player", second_token) is False
+
+
+@pytest.mark.asyncio
+async def test_cancelled_timeout_is_not_claimed():
+    client = redis.Redis.from_url(settings.REDIS_CACHE_URL, decode_responses=True)
+    token = await register_timeout(
+        redis_cache.redis_cache, "test_game_player", "test_game", 1, 30
+    )
+    assert await cancel_timeout(redis_cache.redis_cache, "test_game_player") is True
+    assert claim_timeout_sync(client, "test_game_player", token) is False
+    stats = await get_timeout_stats(redis_cache.redis_cache)
+    assert stats["scheduled"] == 1
+    assert stats["cancelled"] == 1
+    assert stats["superseded"] == 1
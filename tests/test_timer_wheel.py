@@ -0,0 +1,107 @@
+import asyncio
+import time
+
+import pytest
+import redis
+
+from apps.config import settings
+from apps.connections import redis_cache
+from apps.game.services.timer_wheel import (
+    TIMERS_KEY,
+    TimerHandle,
+    TimerWheel,
+    schedule_timer,
+)
+from apps.tracing import get_trace_context, start_span
+
+
+def test_timer_wheel_expires_handle_on_its_tick():
+    wheel = TimerWheel(tick=0.1, slots=8, levels=3)
+    handle = TimerHandle("key", "task", [], wheel._origin + 0.55)
+    wheel._insert(handle)
+    assert wheel._advance(5) == []
+    assert wheel._advance(6) == [handle]
+
+
+def test_timer_wheel_cascades_far_timers():
+    wheel = TimerWheel(tick=0.1, slots=8, levels=3)
+    handle = TimerHandle("key", "task", [], wheel._origin + 10)
+    wheel._insert(handle)
+    assert wheel._advance(100) == []
+    assert wheel._advance(101) == [handle]
+
+
+def test_timer_wheel_skips_cancelled_handle():
+    wheel = TimerWheel(tick=0.1, slots=8, levels=3)
+    handle = TimerHandle("key", "task", [], wheel._origin + 1)
+    wheel._insert(handle)
+    handle.cancelled = True
+    assert wheel._advance(20) == []
+
+
+@pytest.mark.asyncio
+async def test_timer_wheel_fires_and_cancels_timers():
+    fired = []
+    wheel = TimerWheel(tick=0.01)
+    wheel.register("test_task", lambda *args: fired.append(args))
+    await wheel.start(redis_cache.redis_cache)
+    await wheel.schedule("first", "test_task", [1], 0.05)
+    await wheel.schedule("second", "test_task", [2], 0.05)
+    await wheel.cancel("second")
+    await asyncio.sleep(0.3)
+    await wheel.stop()
+    assert fired == [(1,)]
+    assert await redis_cache.redis_cache.zcard(TIMERS_KEY) == 0
+    assert wheel.get_stats()["cancelled"] == 1
+
+
+@pytest.mark.asyncio
+async def test_timer_wheel_recovers_timers_from_store():
+    fired = []
+    wheel = TimerWheel(tick=0.01)
+    wheel.register("test_task", lambda *args: fired.append(args))
+    await wheel.start(redis_cache.redis_cache)
+    client = redis.Redis.from_url(settings.REDIS_CACHE_URL, decode_responses=True)
+    schedule_timer(client, "from_worker", "test_task", ["worker"], 0)
+    started_at = time.time()
+    while not fired and time.time() - started_at < 2:
+        await asyncio.sleep(0.05)
+    await wheel.stop()
+    assert fired == [("worker",)]
+
+
+@pytest.mark.asyncio
+async def test_stale_handle_does_not_fire_a_timer_rescheduled_elsewhere():
+    fired = []
+    wheel = TimerWheel(tick=0.01)
+    wheel.register("test_task", lambda *args: fired.append(args))
+    await wheel.start(redis_cache.redis_cache)
+    await wheel.schedule("rescheduled", "test_task", ["first"], 0.05)
+    # a celery worker moves the same key later
+    client = redis.Redis.from_url(settings.REDIS_CACHE_URL, decode_responses=True)
+    schedule_timer(client, "rescheduled", "test_task", ["second"], 0.5)
+    await asyncio.sleep(0.3)
+    assert fired == []
+    started_at = time.time()
+    while not fired and time.time() - started_at < 2:
+        await asyncio.sleep(0.05)
+    await wheel.stop()
+    assert fired == [("second",)]
+    assert await redis_cache.redis_cache.zcard(TIMERS_KEY) == 0
+
+
+@pytest.mark.asyncio
+async def test_timer_wheel_fires_timers_in_the_trace_of_their_round(monkeypatch):
+    monkeypatch.setattr(settings, "TRACE_EXPORTER", "file")
+    contexts = []
+    wheel = TimerWheel(tick=0.01)
+    wheel.register("test_task", lambda *args: contexts.append(get_trace_context()))
+    await wheel.start(redis_cache.redis_cache)
+    with start_span("dealer_cards", "socket", round_id="round") as span:
+        await wheel.schedule("traced", "test_task", [], 0.02)
+    await asyncio.sleep(0.3)
+    await wheel.stop()
+    [context] = contexts
+    assert context["trace_id"] == span.trace_id
+    assert context["round_id"] == "round"
+    assert context["span_id"] != span.span_id
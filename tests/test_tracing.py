@@ -0,0 +1,114 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+from bson import ObjectId
+
+from apps import celery_utils, tracing
+from apps.config import settings
+from apps.game.services.merchant_guard import MerchantGuard
+from apps.game.services.timer_wheel import get_payload
+from apps.game.services.utils import log_event
+from apps.tracing import (
+    NOOP_SPAN,
+    get_otlp_payload,
+    get_trace_context,
+    get_trace_headers,
+    get_trace_id,
+    read_spans,
+    render_waterfall,
+    run_in_span,
+    start_span,
+)
+
+
+@pytest.fixture
+def trace_file(tmp_path, monkeypatch):
+    path = tmp_path / "traces.jsonl"
+    monkeypatch.setattr(settings, "TRACE_EXPORTER", tracing.FILE)
+    monkeypatch.setattr(settings, "TRACE_FILE", str(path))
+    monkeypatch.setattr(settings, "TRACE_FLUSH_SECONDS", 0.01)
+    return path
+
+
+def test_tracing_is_off_without_exporter(monkeypatch):
+    monkeypatch.setattr(settings, "TRACE_EXPORTER", "")
+    with start_span("scan_card", "socket", round_id="round") as span:
+        assert span is NOOP_SPAN
+        assert get_trace_context() is None
+        assert get_trace_headers() == {}
+
+
+def test_spans_of_a_round_join_its_trace(trace_file):
+    round_id = str(ObjectId())
+    with start_span("dealer_cards", "socket", round_id=round_id, game_id="game"):
+        headers = {}
+        celery_utils.send_trace_context(headers=headers)
+        traceparent = get_trace_headers()["traceparent"]
+        payload = json.loads(get_payload("start_new_round", ["game", round_id]))
+
+    # the celery task published by the socket event
+    task = SimpleNamespace(
+        name="apps.game.tasks.pay_winnings",
+        request=SimpleNamespace(trace_context=headers["trace_context"], eta=None),
+    )
+    celery_utils.start_task_span(task_id="task", task=task)
+    with MerchantGuard().guard("http://merchant/win") as result:
+        assert get_trace_context()["round_id"] == round_id
+        result["ok"] = True
+    celery_utils.finish_task_span(task_id="task", state="SUCCESS")
+
+    # the timer scheduled by the task and a dispatcher without a parent
+    run_in_span("timer:start_new_round", "timer", payload["trace"], lambda: None)
+    with start_span("outbox:win", round_id=round_id):
+        pass
+    with start_span("scan_card", "socket", round_id=str(ObjectId())):
+        pass
+    tracing.exporter.flush()
+
+    spans = {span["name"]: span for span in read_spans(str(trace_file), round_id)}
+    assert set(spans) == {
+        "dealer_cards",
+        "task:pay_winnings",
+        "POST merchant",
+        "timer:start_new_round",
+        "outbox:win",
+    }
+    socket_span = spans["dealer_cards"]
+    assert socket_span["trace_id"] == get_trace_id(round_id)
+    assert traceparent == f"00-{socket_span['trace_id']}-{socket_span['span_id']}-01"
+    assert spans["task:pay_winnings"]["parent_id"] == socket_span["span_id"]
+    assert spans["task:pay_winnings"]["game_id"] == "game"
+    assert spans["task:pay_winnings"]["attributes"]["state"] == "SUCCESS"
+    assert spans["POST merchant"]["parent_id"] == spans["task:pay_winnings"]["span_id"]
+    assert spans["POST merchant"]["attributes"]["ok"] is True
+    assert spans["timer:start_new_round"]["parent_id"] == socket_span["span_id"]
+    assert spans["outbox:win"]["parent_id"] is None
+
+    lines = render_waterfall(list(spans.values())).splitlines()
+    assert lines[0].startswith(f"trace {socket_span['trace_id']}, 5 spans")
+    assert lines[1].endswith(f"socket dealer_cards ({socket_span['pid']})")
+    assert "    client POST merchant" in lines[3]
+
+    [resource_spans] = get_otlp_payload([socket_span])["resourceSpans"]
+    [otlp_span] = resource_spans["scopeSpans"][0]["spans"]
+    assert otlp_span["traceId"] == socket_span["trace_id"]
+    assert otlp_span["kind"] == 2
+    assert {"key": "round_id", "value": {"stringValue": round_id}} in otlp_span[
+        "attributes"
+    ]
+
+
+@pytest.mark.asyncio
+async def test_log_event_traces_the_handler_and_its_error(trace_file):
+    @log_event
+    async def make_action(sid, data):
+        raise KeyError("card")
+
+    with pytest.raises(KeyError):
+        await make_action("sid", {"round_id": "round", "action_type": "hit"})
+    tracing.exporter.flush()
+    [span] = read_spans(str(trace_file), "round")
+    assert span["name"] == "make_action"
+    assert span["attributes"]["error"] == "KeyError('card')"
+    assert get_trace_context() is None
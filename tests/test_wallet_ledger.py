@@ -0,0 +1,160 @@
+import asyncio
+
+import pytest
+import redis
+import requests
+
+from apps import codec
+from apps.config import settings
+from apps.connections import redis_cache
+from apps.game import tasks
+from apps.game.documents import GamePlayer
+from apps.game.services.custom_exception import ValidationError
+from apps.game.services.outbox import (
+    OUTBOX_COLLECTION,
+    OutboxDispatcher,
+    generate_bet_transaction,
+    get_enqueue_operations,
+)
+from apps.game.services.wallet_ledger import (
+    PENDING_TTL,
+    get_external_id,
+    wallet_ledger,
+)
+from apps.game.tasks import OUTBOX_HANDLERS, db
+from tests.helpers import TEST_DEPOSIT, mock_request
+
+
+@pytest.mark.asyncio
+async def test_reserve_never_overdraws_the_balance():
+    await redis_cache.set_user_balance_in_cache("user", "merchant", 50)
+    results = await asyncio.gather(
+        *[wallet_ledger.reserve("user", "merchant", 10) for _ in range(8)],
+        return_exceptions=True,
+    )
+    assert sorted(result for result in results if isinstance(result, float)) == [
+        0,
+        10,
+        20,
+        30,
+        40,
+    ]
+    assert (
+        len([result for result in results if isinstance(result, ValidationError)]) == 3
+    )
+    assert await wallet_ledger.get_pending("user", "merchant") == 50
+
+
+@pytest.mark.asyncio
+async def test_reconcile_keeps_pending_debits_and_credits():
+    await redis_cache.set_user_balance_in_cache("user", "merchant", 100)
+    await wallet_ledger.reserve("user", "merchant", 30)
+    await wallet_ledger.reserve("user", "merchant", 20)
+
+    # the merchant has charged the first bet only
+    balance = await wallet_ledger.reconcile(
+        "user", "merchant", 70, settled=30, external_id="first_bet"
+    )
+    assert balance == 50
+    assert await wallet_ledger.get_pending("user", "merchant") == 20
+    assert (
+        await wallet_ledger.reconcile(
+            "user", "merchant", 70, settled=30, external_id="first_bet"
+        )
+        is None
+    )
+
+    assert await wallet_ledger.release("user", "merchant", 20) == 70
+    assert await wallet_ledger.get_pending("user", "merchant") == 0
+
+
+@pytest.mark.asyncio
+async def test_reconcile_keeps_the_balance_ttl_and_pending_expires():
+    await redis_cache.set("user:merchant", 100)
+    await wallet_ledger.reserve("user", "merchant", 30)
+    await wallet_ledger.reconcile("user", "merchant", 100)
+
+    assert 0 < await redis_cache.redis_cache.ttl("user:merchant")
+    assert 0 < await redis_cache.redis_cache.ttl("user:merchant:pending") <= PENDING_TTL
+
+
+@pytest.mark.asyncio
+async def test_unpaid_winnings_are_taken_back(monkeypatch):
+    monkeypatch.setattr(
+        tasks,
+        "r",
+        redis.Redis.from_url(settings.REDIS_CACHE_URL, decode_responses=True),
+    )
+    await redis_cache.set_user_balance_in_cache("user", "merchant", 100)
+    game_player = {"_id": "player", "user_id": "user", "merchant": "merchant"}
+    responses = {
+        "rejected_win": {"status": "Failed", "total_balance": 100},
+        "skipped_win": {"status": "skipped"},
+        "failed_win": {"status": "failed"},
+    }
+    for external_id, data in responses.items():
+        # credited when the winning was enqueued
+        assert await wallet_ledger.release("user", "merchant", 20) == 120
+        transaction = {
+            "_id": external_id,
+            "type": "win",
+            "amount": 20,
+            "game_player": game_player,
+        }
+        tasks.handle_win_response(transaction, data)
+        tasks.handle_win_response(transaction, data)
+
+        assert await wallet_ledger.get_balance("user", "merchant") == 100
+        assert await wallet_ledger.get_pending("user", "merchant") == 0
+
+
+@pytest.mark.asyncio
+async def test_bets_and_rollbacks_move_the_reserved_balance(
+    betting_and_rollback_manager,
+):
+    betting_manager, rollback_manager = betting_and_rollback_manager
+    bet_data = await betting_manager.charge_user(amount=30, seat_number=1)
+    assert bet_data["user_deposit"] == TEST_DEPOSIT - 30
+    pending = await wallet_ledger.get_pending(
+        betting_manager.user_id, betting_manager.merchant_id
+    )
+    assert pending == 30
+
+    rollback_data = await rollback_manager.make_rollback(seat_number=1)
+    assert rollback_data["balance"] == TEST_DEPOSIT
+    pending = await wallet_ledger.get_pending(
+        betting_manager.user_id, betting_manager.merchant_id
+    )
+    assert pending == 0
+
+
+@pytest.mark.asyncio
+async def test_outbox_sends_debits_once(monkeypatch, betting_manager):
+    sent = []
+
+    def count_request(*args, **kwargs):
+        sent.append(codec.loads(kwargs["data"])["external_id"])
+        return mock_request(*args, **kwargs)
+
+    monkeypatch.setattr(requests, "post", count_request)
+    await betting_manager.charge_user(10, 1)
+    game_player = await GamePlayer.get_motor_collection().find_one({"seat_number": 1})
+    game_player["_id"] = str(game_player["_id"])
+    external_id = get_external_id(game_player["_id"], "bet")
+    db[OUTBOX_COLLECTION].drop()
+    for _ in range(2):
+        db[OUTBOX_COLLECTION].bulk_write(
+            get_enqueue_operations(
+                [generate_bet_transaction("http://testurl", game_player, "snake")]
+            )
+        )
+        OutboxDispatcher(db, OUTBOX_HANDLERS).drain()
+
+    assert sent == [external_id]
+    assert db[OUTBOX_COLLECTION].find_one(external_id)["status"] == "sent"
+    cached_balance = await redis_cache.get(
+        f"{game_player['user_id']}:{game_player['merchant']}"
+    )
+    assert float(cached_balance) == 980
+    game_player = await GamePlayer.get_motor_collection().find_one({"seat_number": 1})
+    assert game_player["external_ids"]["bet"] == external_id